@@ -6,6 +6,13 @@ import streamlit as st
 import json
 import os
 from core_logic import WikiScraper, ScriptGenerator, AudioEngine
+from artifact_store import get_artifact_store, ArtifactStore, TEXT, JSON, BYTES, PARTS
+from scheduler import get_tts_scheduler, get_lane_scheduler, estimate_tts_cost, INTERACTIVE
+from ratelimit import get_key_pool
+from background import BackgroundExecutor, get_background_executor, generate_broadcast, join_task_audio, RUNNING
+from job_service import JobServiceClient, DONE, FAILED
+from estimator import get_estimator, scraped_length
+from telemetry import get_tracer, start_metrics_server
 import config
 
 # Page configuration
@@ -15,15 +22,83 @@ st.set_page_config(
     layout="wide"
 )
 
+# Long-lived clients are shared by every session instead of being rebuilt on each click
+@st.cache_resource
+def get_scraper() -> WikiScraper:
+    return WikiScraper()
+
+
+@st.cache_resource
+def get_audio_engine() -> AudioEngine:
+    return AudioEngine()
+
+
+@st.cache_resource
+def get_store() -> ArtifactStore:
+    return get_artifact_store()
+
+
+@st.cache_resource
+def get_executor() -> BackgroundExecutor:
+    return get_background_executor()
+
+
+@st.cache_resource
+def get_metrics_server():
+    """Expose /metrics once per process when config.TELEMETRY_METRICS_PORT is set"""
+    if config.TELEMETRY_METRICS_PORT:
+        return start_metrics_server(config.TELEMETRY_METRICS_PORT)
+    return None
+
+
+get_metrics_server()
+
+
+# Large artifacts live in the disk-backed store; session state only keeps their handles
+ARTIFACT_KINDS = {
+    "wikipedia_content": TEXT,
+    "script_json": JSON,
+    "audio_bytes": BYTES,
+    "audio_segments": PARTS,  # one MP3 segment per script line
+    "rendered_script": JSON,  # script the segments were rendered from
+}
+
+
+def save_artifact(name: str, value):
+    """Store an artifact for this session (None clears it)"""
+    st.session_state.artifacts[name] = None if value is None else get_store().save(value, ARTIFACT_KINDS[name])
+
+
+def load_artifact(name: str):
+    """Load an artifact for this session, or None if it was never set or has been evicted"""
+    return get_store().load(st.session_state.artifacts.get(name), ARTIFACT_KINDS[name])
+
+
+def script_edit_error(edited_script, script_json, variant: str):
+    """Error message if an edited script is not a list of valid {"speaker", "text"} lines, or None"""
+    if not isinstance(edited_script, list) or not edited_script:
+        return 'The script must be a non-empty JSON list of {"speaker", "text"} objects'
+    # Edited lines keep the cast of the variant the script was written for
+    speakers = {line.get("speaker") for line in script_json or [] if isinstance(line, dict)}
+    script_variant = next((name for name, cast in config.SPEAKER_NAMES.items() if speakers <= set(cast.values())),
+                          variant)
+    expected_speakers = list(config.SPEAKER_NAMES[script_variant].values())
+    for number, entry in enumerate(edited_script, 1):
+        error = ScriptGenerator._validate_entry(entry, expected_speakers, script_variant)
+        if error:
+            return f"Line {number}: {error}"
+    return None
+
+
 # Initialize session state
-if 'script_json' not in st.session_state:
-    st.session_state.script_json = None
-if 'audio_bytes' not in st.session_state:
-    st.session_state.audio_bytes = None
-if 'wikipedia_content' not in st.session_state:
-    st.session_state.wikipedia_content = None
+if 'artifacts' not in st.session_state:
+    st.session_state.artifacts = {}
 if 'scrape_mode' not in st.session_state:
     st.session_state.scrape_mode = None
+if 'task_id' not in st.session_state:
+    st.session_state.task_id = None  # background generation in progress
+if 'generation_error' not in st.session_state:
+    st.session_state.generation_error = None
 
 # Sidebar
 with st.sidebar:
@@ -84,17 +159,138 @@ with st.sidebar:
     
     # Advanced Options
     with st.expander("Advanced Options"):
-        debug_mode = st.checkbox(
-            "Debug Mode",
-            help="Generate only 3 lines of script to save credits"
+        preview_mode = st.checkbox(
+            "Preview Mode",
+            help=f"Generate a {config.PREVIEW_BUDGET['lines']}-line preview (~{config.PREVIEW_BUDGET['characters']} characters) to save credits"
+        )
+        fast_start = st.checkbox(
+            "⚡ Fast Start",
+            help="Voice the script in small batches while it is still being written, so audio starts within seconds"
         )
+    
+    estimate = get_estimator().estimate(variant, mode, preview=preview_mode,
+                                        content_length=scraped_length(wikipedia_url, mode, get_store()))
+    st.caption(f"Estimated: ~${estimate['cost']:.2f}, ~{estimate['seconds']:.0f}s, "
+               f"{estimate['characters']:,} TTS characters")
 
 # Main Page
 st.title("The Synthetic Radio Host - Wiki-talks")
 st.markdown("**Generate natural Hinglish radio conversations from Wikipedia articles**")
 
+
+@st.fragment(run_every=config.UI_POLL_SECONDS)
+def run_via_job_service(job_id: str):
+    """
+    Poll a job submitted to the job service and load its results into session state.
+    The job id is kept in the page URL, so a browser refresh resumes polling instead of losing the job.
+    Runs as a fragment, so each poll only re-renders this part of the page.
+    """
+    client = JobServiceClient(config.JOB_SERVICE_URL)
+    st.query_params["job"] = job_id
+    stage_progress = {"scrape": 20, "script": 50, "audio": 80}
+    
+    job, error = client.status(job_id)
+    if error:
+        st.error(f"❌ Job service unavailable: {error}")
+        return
+    if job["status"] not in (DONE, FAILED):
+        st.progress(stage_progress.get(job["stage"], 5),
+                    text=f"⏳ Job {job_id[:8]}: {job['status']} ({job['stage'] or 'waiting for a worker'})")
+        return
+    
+    del st.query_params["job"]
+    if "content" in job["artifacts"]:
+        content, _ = client.artifact(job_id, "content")
+        save_artifact("wikipedia_content", content.decode('utf-8'))
+        st.session_state.scrape_mode = job["mode"]
+    if "script" in job["artifacts"]:
+        script, _ = client.artifact(job_id, "script")
+        save_artifact("script_json", json.loads(script))
+    if "audio" in job["artifacts"]:
+        audio_bytes, _ = client.artifact(job_id, "audio")
+        save_artifact("audio_bytes", audio_bytes)
+        # The service returns one continuous file; an edit re-renders the whole script
+        save_artifact("audio_segments", None)
+        save_artifact("rendered_script", None)
+    
+    if job["status"] == FAILED:
+        st.session_state.generation_error = f"Job failed in {job['stage']} stage: {job['error']}"
+    st.rerun()
+
+
+@st.fragment(run_every=config.UI_POLL_SECONDS)
+def show_generation_progress():
+    """
+    Poll this session's background generation and show what has arrived so far.
+    Runs as a fragment, so the rest of the page stays interactive while it refreshes.
+    """
+    task = get_executor().get(st.session_state.task_id)
+    if task is None:
+        st.session_state.task_id = None
+        st.session_state.generation_error = "The generation is no longer available (server restarted or result expired)"
+        st.rerun()
+    snap = task.snapshot()
+    
+    st.progress(snap["fraction"], text=f"{snap['message']} ({snap['elapsed']:.0f}s)")
+    if snap["content"]:
+        with st.expander("📖 Step 1: Wikipedia Content", expanded=False):
+            st.text_area("Scraped Content", snap["content"], height=200, disabled=True, key="wiki_content_live")
+            st.caption(f"Characters: {len(snap['content']):,}")
+    if snap["script_lines"]:
+        with st.expander(f"✍️ Step 2: Script ({len(snap['script_lines'])} lines)", expanded=True):
+            for entry in snap["script_lines"]:
+                st.markdown(f"**{entry['speaker']}:** {entry['text']}")
+    if snap["audio_chunks"]:
+        with st.expander("🎵 Live Broadcast", expanded=True):
+            for i, chunk in enumerate(snap["audio_chunks"]):
+                # Only the first part autoplays; the rest queue up below it
+                st.audio(chunk, format="audio/mp3", autoplay=i == 0)
+    
+    if snap["status"] == RUNNING:
+        return
+    
+    # Finished: move the results into this session's artifacts (once)
+    if not st.session_state.get("task_saved"):
+        st.session_state.task_saved = True
+        if snap["content"]:
+            save_artifact("wikipedia_content", snap["content"])
+        if snap["script_lines"]:
+            save_artifact("script_json", snap["script_lines"])
+        audio_bytes = join_task_audio(snap)
+        if audio_bytes:
+            save_artifact("audio_bytes", audio_bytes)
+            save_artifact("audio_segments", snap["audio_segments"])
+            # Streamed audio is per batch, not per line, so the next edit re-renders the whole script
+            save_artifact("rendered_script", snap["script_lines"] if snap["audio_segments"] else None)
+        st.session_state.generation_error = snap["error"]
+    
+    if snap["audio_chunks"] and not snap["error"]:
+        # Re-rendering the page now would cut off the live parts mid-playback
+        st.success(f"✓ Broadcast complete in {snap['elapsed']:.0f}s")
+        if not st.button("📋 Show full results", key="show_results"):
+            return
+    st.session_state.task_id = None
+    st.rerun()
+
+
+# Resume a job-service job after a browser refresh
+if config.JOB_SERVICE_URL and "job" in st.query_params:
+    run_via_job_service(st.query_params["job"])
+
 # Generate Button
-if st.button("🎙️ Generate Broadcast", type="primary", use_container_width=True):
+generate_clicked = st.button("🎙️ Generate Broadcast", type="primary", use_container_width=True)
+
+if generate_clicked and config.JOB_SERVICE_URL:
+    # Thin-client mode: the job service holds the API keys and does the work
+    if not wikipedia_url:
+        st.error("❌ Please enter a Wikipedia URL")
+        st.stop()
+    job_id, error = JobServiceClient(config.JOB_SERVICE_URL).submit(wikipedia_url, variant, mode)
+    if error:
+        st.error(f"❌ Could not submit job: {error}")
+        st.stop()
+    run_via_job_service(job_id)
+elif generate_clicked:
     # Validate inputs
     if not gemini_key:
         st.error("❌ Please enter Gemini API key in the sidebar")
@@ -108,157 +304,178 @@ if st.button("🎙️ Generate Broadcast", type="primary", use_container_width=T
         st.error("❌ Please enter a Wikipedia URL")
         st.stop()
     
-    # Progress tracking
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    try:
-        # Step 1: Scrape Wikipedia
-        status_text.text("📖 Scraping Wikipedia...")
-        progress_bar.progress(10)
-        
-        scraper = WikiScraper()
-        content, error = scraper.scrape(wikipedia_url, mode)
-        
-        if error:
-            st.error(f"❌ Wikipedia scraping failed: {error}")
-            st.stop()
-        
-        # Store in session state
-        st.session_state.wikipedia_content = content
-        st.session_state.scrape_mode = mode
-        
-        st.success(f"✓ Scraped {len(content)} characters from Wikipedia")
-        progress_bar.progress(30)
-        
-        # Display Wikipedia content in expander
-        with st.expander("📖 Step 1: Wikipedia Content", expanded=True):
-            st.text_area("Scraped Content", content, height=200, disabled=True, key="wiki_content_display")
-            st.caption(f"Mode: {mode} | Characters: {len(content):,}")
-        
-        # Step 2: Generate Script
-        status_text.text("✍️ Generating Hinglish conversation script...")
-        progress_bar.progress(40)
-        
-        script_gen = ScriptGenerator(gemini_key)
-        
-        # Debug mode: limit script length
-        if debug_mode:
-            # Modify prompt to generate only 3 lines
-            original_generate = script_gen.generate_script
-            def debug_generate(*args, **kwargs):
-                script, err = original_generate(*args, **kwargs)
-                if script and len(script) > 3:
-                    script = script[:3]
-                return script, err
-            script_gen.generate_script = debug_generate
-        
-        script_json, error = script_gen.generate_script(content, variant, duration=120)
-        
-        if error:
-            st.error(f"❌ Script generation failed: {error}")
-            st.stop()
-        
-        st.session_state.script_json = script_json
-        st.success(f"✓ Generated script with {len(script_json)} dialogue entries")
-        progress_bar.progress(70)
-        
-        # Display generated script in expander
-        with st.expander("✍️ Step 2: Generated Script", expanded=True):
-            for i, entry in enumerate(script_json):
-                speaker_icon = "🎙️" if entry['speaker'] == "Host" else "🗣️"
-                st.markdown(f"**{speaker_icon} {entry['speaker']}:** {entry['text']}")
-            st.caption(f"Total entries: {len(script_json)}")
-        
-        # Step 3: Generate Audio
-        status_text.text("🎵 Generating audio with ElevenLabs V3...")
-        progress_bar.progress(80)
-        
-        audio_engine = AudioEngine()
-        audio_bytes, error = audio_engine.generate_dialogue_v3(script_json, eleven_key, None)
-        
-        if error:
-            st.error(f"❌ Audio generation failed: {error}")
-            st.stop()
-        
-        st.session_state.audio_bytes = audio_bytes
-        st.success(f"✓ Generated audio ({len(audio_bytes)} bytes)")
-        progress_bar.progress(100)
-        status_text.text("✓ Complete!")
-        
-        # Display audio in expander
-        with st.expander("🎵 Step 3: Generated Audio", expanded=True):
-            st.audio(audio_bytes, format="audio/mp3")
-            st.download_button(
-                label="📥 Download MP3",
-                data=audio_bytes,
-                file_name="wiki_talk_output.mp3",
-                mime="audio/mp3",
-                key="download_audio_realtime"
-            )
-        
-    except Exception as e:
-        st.error(f"❌ Unexpected error: {str(e)}")
-        st.stop()
+    # The work runs on a shared background thread; this script run returns immediately
+    task = get_executor().submit(
+        lambda task: generate_broadcast(task, get_scraper(), get_audio_engine(), get_store(), gemini_key, eleven_key),
+        {"url": wikipedia_url, "variant": variant, "mode": mode, "preview": preview_mode, "fast_start": fast_start}
+    )
+    st.session_state.task_id = task.task_id
+    st.session_state.task_saved = False
+    st.session_state.scrape_mode = mode
+    st.session_state.generation_error = None
+
+if st.session_state.generation_error:
+    st.error(f"❌ {st.session_state.generation_error}")
+
+if st.session_state.task_id:
+    show_generation_progress()
 
 # Display Results (persistent view of all outputs)
-if st.session_state.wikipedia_content or st.session_state.script_json or st.session_state.audio_bytes:
+# Artifacts live on disk; load this session's handles once per rerun
+wikipedia_content = load_artifact("wikipedia_content")
+script_json = load_artifact("script_json")
+audio_bytes = load_artifact("audio_bytes")
+if not st.session_state.task_id and (wikipedia_content or script_json or audio_bytes):
     st.divider()
     
     # Show Step 1 output if available
-    if st.session_state.wikipedia_content:
+    if wikipedia_content:
         with st.expander("📖 Step 1: Wikipedia Content", expanded=False):
-            st.text_area("Scraped Content", st.session_state.wikipedia_content, height=200, disabled=True, key="wiki_content_persistent")
+            st.text_area("Scraped Content", wikipedia_content, height=200, disabled=True, key="wiki_content_persistent")
             mode_display = st.session_state.scrape_mode or "unknown"
-            st.caption(f"Mode: {mode_display} | Characters: {len(st.session_state.wikipedia_content):,}")
+            st.caption(f"Mode: {mode_display} | Characters: {len(wikipedia_content):,}")
     
     # Show Step 2 output if available
-    if st.session_state.script_json:
+    if script_json:
         with st.expander("✍️ Step 2: Generated Script", expanded=False):
-            for i, entry in enumerate(st.session_state.script_json):
+            for i, entry in enumerate(script_json):
                 speaker_icon = "🎙️" if entry['speaker'] == "Host" else "🗣️"
                 st.markdown(f"**{speaker_icon} {entry['speaker']}:** {entry['text']}")
-            st.caption(f"Total entries: {len(st.session_state.script_json)}")
+            st.caption(f"Total entries: {len(script_json)}")
     
     # Show Step 3 output if available
-    if st.session_state.audio_bytes:
+    if audio_bytes:
         with st.expander("🎵 Step 3: Generated Audio", expanded=False):
-            st.audio(st.session_state.audio_bytes, format="audio/mp3")
+            st.audio(audio_bytes, format="audio/mp3")
             st.download_button(
                 label="📥 Download MP3",
-                data=st.session_state.audio_bytes,
+                data=audio_bytes,
                 file_name="wiki_talk_output.mp3",
                 mime="audio/mp3",
                 key="download_audio_persistent"
             )
     
     # Stats Section (only if we have script)
-    if st.session_state.script_json:
+    if script_json:
         st.divider()
         st.subheader("📊 Stats for Nerds")
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            total_chars = sum(len(entry['text']) for entry in st.session_state.script_json)
+            total_chars = AudioEngine.character_cost(script_json)
             st.metric("Total Characters", f"{total_chars:,}")
         
         with col2:
-            # Rough estimate: $0.30 per 1000 characters for ElevenLabs
-            estimated_cost = (total_chars / 1000) * 0.30
+            estimated_cost = estimate_tts_cost(total_chars)
             st.metric("Estimated Cost", f"${estimated_cost:.4f}")
         
         with col3:
-            st.metric("Dialogue Entries", len(st.session_state.script_json))
+            st.metric("Dialogue Entries", len(script_json))
+        
+        quota = get_tts_scheduler().snapshot()
+        if quota["remaining_characters"] is not None:
+            st.caption(f"ElevenLabs quota remaining: {quota['remaining_characters']:,} characters | "
+                       f"Active requests: {quota['active']}/{quota['max_concurrency']}")
+        guards = {upstream: get_lane_scheduler(upstream).guard.snapshot() for upstream in ("gemini", "elevenlabs")}
+        st.caption(" | ".join(
+            f"{upstream.capitalize()}: circuit {guard['state']}, concurrency {guard['limit']:g}/{guard['max_limit']}"
+            for upstream, guard in guards.items()
+        ))
+        store = get_store().snapshot()
+        st.caption(f"Artifact store: {store['bytes'] / 2**20:.1f} / {store['max_bytes'] / 2**20:.0f} MB in {store['files']} files | "
+                   f"memo hits {store['stats']['hits']}, misses {store['stats']['misses']}")
+        timings = get_tracer().summary()
+        stages = [name for name in ("scrape", "script", "script.stream", "audio", "audio.segments") if name in timings]
+        if stages:
+            st.caption("Stage latency (p50 / p95): " + " | ".join(
+                f"{name} {timings[name]['p50']:.1f}s / {timings[name]['p95']:.1f}s" for name in stages
+            ))
         
         st.divider()
         
         # Script JSON Display
         with st.expander("📝 View Generated Script (JSON)"):
-            st.json(st.session_state.script_json)
+            st.json(script_json)
             
             # Copy button
-            script_json_str = json.dumps(st.session_state.script_json, indent=2, ensure_ascii=False)
+            script_json_str = json.dumps(script_json, indent=2, ensure_ascii=False)
             st.code(script_json_str, language="json")
+        
+        # Edit & Re-render: only changed / inserted lines go back to ElevenLabs
+        with st.expander("✏️ Edit Script & Re-render Audio"):
+            edited_str = st.text_area(
+                "Script JSON",
+                json.dumps(script_json, indent=2, ensure_ascii=False),
+                height=300,
+                key="script_editor"
+            )
+            if st.button("🔁 Re-render Edited Script", key="rerender_button"):
+                try:
+                    edited_script = json.loads(edited_str)
+                except json.JSONDecodeError as e:
+                    st.error(f"❌ Invalid JSON: {str(e)}")
+                    st.stop()
+                edit_error = script_edit_error(edited_script, script_json, variant)
+                if edit_error:
+                    st.error(f"❌ Invalid script: {edit_error}")
+                    st.stop()
+                if not eleven_key:
+                    st.error("❌ Please enter ElevenLabs API key in the sidebar")
+                    st.stop()
+                
+                audio_engine = get_audio_engine()
+                tts_scheduler = get_tts_scheduler(eleven_key)
+                old_script = load_artifact("rendered_script")
+                old_segments = load_artifact("audio_segments")
+                
+                elevenlabs_lanes = get_lane_scheduler("elevenlabs")
+                eleven_pool = get_key_pool("elevenlabs", eleven_key)
+                with st.spinner("🎵 Re-rendering changed lines..."):
+                    if old_script and old_segments and len(old_segments) == len(old_script):
+                        changed = AudioEngine.changed_lines(old_script, edited_script)
+                        pooled_key, error = eleven_pool.acquire(AudioEngine.character_cost(changed))
+                        if error:
+                            st.error(f"❌ Re-render failed: {error}")
+                            st.stop()
+                        audio_bytes, segments, error = elevenlabs_lanes.run(
+                            INTERACTIVE,
+                            lambda: tts_scheduler.call(
+                                changed,
+                                lambda: audio_engine.rerender_dialogue(old_script, edited_script, old_segments, pooled_key),
+                                result_size=3,
+                                on_retry=lambda: eleven_pool.charge(pooled_key, AudioEngine.character_cost(changed))
+                            ),
+                            result_size=3
+                        )
+                    else:
+                        # Nothing to splice into, render the whole script
+                        changed = edited_script
+                        pooled_key, error = eleven_pool.acquire(AudioEngine.character_cost(edited_script))
+                        if error:
+                            st.error(f"❌ Re-render failed: {error}")
+                            st.stop()
+                        segments, error = elevenlabs_lanes.run(
+                            INTERACTIVE,
+                            lambda: tts_scheduler.call(
+                                edited_script,
+                                lambda: audio_engine.generate_dialogue_segments(edited_script, pooled_key),
+                                on_retry=lambda: eleven_pool.charge(pooled_key, AudioEngine.character_cost(edited_script))
+                            )
+                        )
+                        audio_bytes = b"".join(segments) if segments else None
+                # Characters of a request stopped before ElevenLabs (open circuit, slot wait, quota) go back
+                eleven_pool.settle(pooled_key, AudioEngine.character_cost(changed), error)
+                
+                if error:
+                    st.error(f"❌ Re-render failed: {error}")
+                    st.stop()
+                
+                save_artifact("script_json", edited_script)
+                save_artifact("rendered_script", edited_script)
+                save_artifact("audio_segments", segments)
+                save_artifact("audio_bytes", audio_bytes)
+                st.toast(f"✓ Re-rendered {len(changed)} of {len(edited_script)} lines")
+                st.rerun()
 
 # Footer
 st.divider()
@@ -0,0 +1,334 @@
+"""
+Disk-backed artifact store for The Synthetic Radio Host - Wiki-talks
+Content-addressed blobs with LRU eviction, plus memoization of scrapes, scripts and audio by request key
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import List, Dict, Optional, Tuple, Callable, Hashable
+import config
+import telemetry
+
+# How a value is encoded on disk
+TEXT = "text"
+JSON = "json"
+BYTES = "bytes"
+PARTS = "parts"  # list of bytes, e.g. per-line MP3 segments
+
+_SUFFIXES = {TEXT: "txt", JSON: "json", BYTES: "bin", PARTS: "parts.json"}
+
+
+def _key_digest(key: Hashable) -> str:
+    data = json.dumps(list(key) if isinstance(key, tuple) else key, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class ArtifactStore:
+    """
+    Content-addressed files on disk, shared by every process that uses the same directory
+
+    Callers keep small handles (file names) instead of the data itself, so a
+    Streamlit session holds a few bytes per artifact. Reading a blob marks it
+    as recently used; when the store grows past max_bytes the least recently
+    used blobs are deleted. A handle whose blob was evicted loads as None.
+    The size is tracked incrementally (this process's writes on top of the
+    last directory scan, rescanned every config.ARTIFACT_STORE_RESCAN_SECONDS
+    for other processes' writes), so a write only scans the directory when
+    the store may be over the limit.
+
+    Memoized results are stored under a request key (see coalesce.scrape_key /
+    script_key / audio_key), so any process can reuse work done by another,
+    including a background prewarmer.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        Initialize ArtifactStore
+
+        Args:
+            root: Directory for blobs and keys (defaults to config.ARTIFACT_STORE_DIR)
+            max_bytes: Size limit before LRU eviction (defaults to config.ARTIFACT_STORE_MAX_BYTES)
+        """
+        self.root = root or config.ARTIFACT_STORE_DIR
+        self.max_bytes = max_bytes or config.ARTIFACT_STORE_MAX_BYTES
+        self._blobs = os.path.join(self.root, "blobs")
+        self._keys = os.path.join(self.root, "keys")
+        os.makedirs(self._blobs, exist_ok=True)
+        os.makedirs(self._keys, exist_ok=True)
+        self._lock = threading.Lock()
+        self._bytes = None  # blob bytes at the last scan plus this process's writes since
+        self._scanned = 0.0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _path(self, handle: str) -> str:
+        # Handles are file names we generated; refuse anything that could leave the store
+        if not handle or os.path.basename(handle) != handle:
+            raise ValueError(f"Invalid artifact handle: {handle!r}")
+        return os.path.join(self._blobs, handle)
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put(self, data: bytes, suffix: str = "bin") -> str:
+        """
+        Store bytes and return their handle (identical data shares one file)
+
+        Args:
+            data: Bytes to store
+            suffix: File extension for the handle
+
+        Returns:
+            Handle string
+        """
+        handle = f"{hashlib.sha256(data).hexdigest()}.{suffix}"
+        path = self._path(handle)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            self._write_atomic(path, data)
+            if self._grow(len(data)) > self.max_bytes:
+                self.evict()
+        return handle
+
+    def _grow(self, size: int) -> int:
+        """Add a new blob's size to the tracked total and return it (scanning the directory if that is stale)"""
+        with self._lock:
+            if self._bytes is None or time.monotonic() - self._scanned > config.ARTIFACT_STORE_RESCAN_SECONDS:
+                # The scan already sees the new blob
+                self._bytes = sum(size for _, size, _ in self._entries(self._blobs))
+                self._scanned = time.monotonic()
+            else:
+                self._bytes += size
+            return self._bytes
+
+    def get(self, handle: Optional[str]) -> Optional[bytes]:
+        """Bytes for a handle, or None if it was never stored or has been evicted"""
+        if not handle:
+            return None
+        path = self._path(handle)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+
+    def save(self, value, kind: str) -> str:
+        """
+        Encode and store a value
+
+        Args:
+            value: str for TEXT, JSON-serializable for JSON, bytes for BYTES, list of bytes for PARTS
+            kind: TEXT, JSON, BYTES or PARTS
+
+        Returns:
+            Handle string
+        """
+        if kind == TEXT:
+            data = value.encode('utf-8')
+        elif kind == JSON:
+            data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        elif kind == BYTES:
+            data = value
+        elif kind == PARTS:
+            data = json.dumps([self.put(part) for part in value]).encode('utf-8')
+        else:
+            raise ValueError(f"Unknown artifact kind: {kind}")
+        return self.put(data, _SUFFIXES[kind])
+
+    def load(self, handle: Optional[str], kind: str):
+        """Decode a value stored with save, or None if any part of it is gone"""
+        data = self.get(handle)
+        if data is None:
+            return None
+        if kind == TEXT:
+            return data.decode('utf-8')
+        if kind == JSON:
+            return json.loads(data)
+        if kind == PARTS:
+            parts = [self.get(part) for part in json.loads(data)]
+            return None if any(part is None for part in parts) else parts
+        return data
+
+    def remember(self, key: Hashable, handle: str, meta: Optional[Dict] = None):
+        """
+        Record that the result for a request key is stored under handle
+
+        Args:
+            key: Request key
+            handle: Handle returned by save
+            meta: Small JSON-serializable facts about the value, readable without loading it (see metadata)
+        """
+        data = handle if meta is None else handle + "\n" + json.dumps(meta, ensure_ascii=False)
+        self._write_atomic(os.path.join(self._keys, _key_digest(key)), data.encode('utf-8'))
+
+    @staticmethod
+    def _read_key(path: str, max_age: Optional[float] = None) -> Optional[Tuple[str, Dict]]:
+        """(handle, meta) of a key file, or None if it is missing or was written over max_age seconds ago"""
+        try:
+            if max_age is not None and time.time() - os.stat(path).st_mtime > max_age:
+                return None
+            with open(path, "rb") as f:
+                handle, _, meta = f.read().decode('utf-8').partition("\n")
+        except FileNotFoundError:
+            return None
+        return handle, json.loads(meta) if meta else {}
+
+    def _handle(self, key: Hashable, max_age: Optional[float] = None) -> Optional[str]:
+        """Handle remembered for a request key, or None if there is none or it was remembered over max_age seconds ago"""
+        entry = self._read_key(os.path.join(self._keys, _key_digest(key)), max_age)
+        return None if entry is None else entry[0]
+
+    def metadata(self, key: Hashable, max_age: Optional[float] = None) -> Optional[Dict]:
+        """
+        Metadata remembered with a request key's result, without reading the result itself
+
+        Returns:
+            Dict (empty for results memoized without metadata), or None if the key is
+            unknown, older than max_age or its result has been evicted
+        """
+        entry = self._read_key(os.path.join(self._keys, _key_digest(key)), max_age)
+        if entry is None or not os.path.exists(self._path(entry[0])):
+            return None
+        return entry[1]
+
+    def lookup(self, key: Hashable, kind: str, max_age: Optional[float] = None):
+        """Memoized value for a request key, or None (also if it was memoized more than max_age seconds ago)"""
+        handle = self._handle(key, max_age)
+        return None if handle is None else self.load(handle, kind)
+
+    def contains(self, key: Hashable, kind: str, max_age: Optional[float] = None) -> bool:
+        """Whether a request key has a complete memoized value, without reading it (marks it as recently used)"""
+        handle = self._handle(key, max_age)
+        if handle is None:
+            return False
+        handles = [handle]
+        try:
+            if kind == PARTS:
+                with open(self._path(handle), "rb") as f:
+                    handles += json.loads(f.read())
+            for part in handles:
+                os.utime(self._path(part))
+        except (FileNotFoundError, ValueError):
+            return False
+        return True
+
+    def cached(self, key: Hashable, fn: Callable, kind: str, max_age: Optional[float] = None) -> Tuple:
+        """
+        Return the memoized result for key, or call fn and memoize its result
+
+        Args:
+            key: Request key, e.g. coalesce.script_key(...)
+            fn: Zero-argument callable returning (value, error_message)
+            kind: How the value is stored (TEXT, JSON, BYTES or PARTS)
+            max_age: Seconds a memoized result stays fresh (None = until evicted); older ones are recomputed
+
+        Returns:
+            Tuple of (value, error_message). Errors are never memoized.
+        """
+        namespace = key[0] if isinstance(key, tuple) and key and isinstance(key[0], str) else "artifact"
+        with telemetry.span(f"cache.{namespace}", kind=kind) as span:
+            value = self.lookup(key, kind, max_age)
+            if value is not None:
+                with self._lock:
+                    self.stats["hits"] += 1
+                span.set(cache_hit=True)
+                return value, None
+            with self._lock:
+                self.stats["misses"] += 1
+            span.set(cache_hit=False)
+            value, error = fn()
+            if error is None and value is not None:
+                # Length is kept beside the handle so callers such as estimator.scraped_length need not load the value
+                meta = {"length": len(value)} if hasattr(value, "__len__") else None
+                self.remember(key, self.save(value, kind), meta)
+            elif error:
+                span.fail(error)
+            return value, error
+
+    def _entries(self, directory: str) -> List[Tuple[float, int, str]]:
+        entries = []
+        for name in os.listdir(directory):
+            if name.startswith(".tmp-"):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # Evicted by another process meanwhile
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self) -> int:
+        """
+        Delete least recently used blobs until the store fits in max_bytes
+
+        Returns:
+            Number of blobs deleted
+        """
+        with self._lock:
+            entries = self._entries(self._blobs)
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            self.stats["evictions"] += removed
+            self._bytes = total
+            self._scanned = time.monotonic()
+            if removed:
+                # Forget request keys whose result is gone
+                for _, _, path in self._entries(self._keys):
+                    try:
+                        entry = self._read_key(path)
+                        if entry is not None and not os.path.exists(self._path(entry[0])):
+                            os.remove(path)
+                    except (FileNotFoundError, ValueError):
+                        pass
+            return removed
+
+    def snapshot(self) -> Dict:
+        """Size, file count and hit / miss / eviction counters"""
+        entries = self._entries(self._blobs)
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            "bytes": sum(size for _, size, _ in entries),
+            "files": len(entries),
+            "max_bytes": self.max_bytes,
+            "stats": stats
+        }
+
+
+_artifact_store = None
+_artifact_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    """Process-wide ArtifactStore on config.ARTIFACT_STORE_DIR"""
+    global _artifact_store
+    with _artifact_store_lock:
+        if _artifact_store is None:
+            _artifact_store = ArtifactStore()
+            telemetry.register_collector("artifact_store", _artifact_store.snapshot)
+        return _artifact_store
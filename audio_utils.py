@@ -0,0 +1,187 @@
+"""
+MP3 helpers for The Synthetic Radio Host - Wiki-talks
+Frame-level parsing so audio returned by ElevenLabs can be measured, split and spliced
+without pydub / ffmpeg
+"""
+
+from typing import List, Tuple
+
+# Bitrates in kbps indexed by [mpeg1?][bitrate_index] for Layer III
+_BITRATES = {
+    True: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0],
+    False: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0],
+}
+
+# Sample rates indexed by version bits then sample_rate_index
+_SAMPLE_RATES = {
+    0b11: [44100, 48000, 32000],  # MPEG 1
+    0b10: [22050, 24000, 16000],  # MPEG 2
+    0b00: [11025, 12000, 8000],   # MPEG 2.5
+}
+
+
+def _skip_id3(data: bytes) -> int:
+    """Return the offset of the first byte after an ID3v2 tag (0 if there is none)"""
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        return 10 + size
+    return 0
+
+
+def _parse_header(data: bytes, offset: int):
+    """Parse a Layer III frame header, returning (frame_length, samples, sample_rate) or None"""
+    if offset + 4 > len(data):
+        return None
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    if data[offset] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 0b11
+    layer = (b1 >> 1) & 0b11
+    if version == 0b01 or layer != 0b01:  # reserved version / not Layer III
+        return None
+    bitrate_index = (b2 >> 4) & 0x0F
+    sample_rate_index = (b2 >> 2) & 0b11
+    if sample_rate_index == 0b11:
+        return None
+    mpeg1 = version == 0b11
+    bitrate = _BITRATES[mpeg1][bitrate_index] * 1000
+    if not bitrate:
+        return None
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 1
+    samples = 1152 if mpeg1 else 576
+    frame_length = (samples // 8) * bitrate // sample_rate + padding
+    return frame_length, samples, sample_rate
+
+
+def _is_info_frame(data: bytes, offset: int, length: int) -> bool:
+    """True for the Xing / Info / VBRI metadata frame encoders put first"""
+    frame = data[offset:offset + length]
+    return b"Xing" in frame or b"Info" in frame or b"VBRI" in frame
+
+
+def mp3_frames(data: bytes) -> List[Tuple[int, int, float]]:
+    """
+    Walk the MP3 frames in a byte string
+
+    Args:
+        data: MP3 bytes (optionally starting with an ID3v2 tag)
+
+    Returns:
+        List of (offset, length, start_time_seconds) for each audio frame.
+        The Xing/Info metadata frame is skipped.
+    """
+    frames = []
+    offset = _skip_id3(data)
+    elapsed = 0.0
+    first = True
+    while offset < len(data):
+        header = _parse_header(data, offset)
+        if header is None:
+            # Resync on the next possible frame start
+            offset += 1
+            continue
+        length, samples, sample_rate = header
+        if first and _is_info_frame(data, offset, length):
+            first = False
+            offset += length
+            continue
+        first = False
+        frames.append((offset, length, elapsed))
+        elapsed += samples / sample_rate
+        offset += length
+    return frames
+
+
+def mp3_duration(data: bytes) -> float:
+    """Duration of MP3 audio in seconds, computed from the frame headers (the Xing/Info frame is not audio)"""
+    duration = 0.0
+    offset = _skip_id3(data)
+    first = True
+    while offset < len(data):
+        header = _parse_header(data, offset)
+        if header is None:
+            offset += 1
+            continue
+        length, samples, sample_rate = header
+        if not (first and _is_info_frame(data, offset, length)):
+            duration += samples / sample_rate
+        first = False
+        offset += length
+    return duration
+
+
+def split_mp3(data: bytes, boundaries: List[float]) -> List[bytes]:
+    """
+    Cut MP3 audio at frame boundaries
+
+    Args:
+        data: MP3 bytes
+        boundaries: Ascending cut points in seconds (len(boundaries) + 1 pieces are returned)
+
+    Returns:
+        List of MP3 byte strings; each cut happens at the first frame starting at or after the boundary
+    """
+    frames = mp3_frames(data)
+    pieces = []
+    current = bytearray()
+    cuts = list(boundaries)
+    for offset, length, start in frames:
+        while cuts and start >= cuts[0]:
+            pieces.append(bytes(current))
+            current = bytearray()
+            cuts.pop(0)
+        current += data[offset:offset + length]
+    pieces.append(bytes(current))
+    # Boundaries past the end of the audio produce empty pieces
+    while cuts:
+        pieces.append(b"")
+        cuts.pop(0)
+    return pieces
+
+
+def _side_info(data: bytes, offset: int, length: int) -> Tuple[int, int, int]:
+    """Return (side_info_offset, side_info_size, main_data_bytes) of the Layer III frame at offset"""
+    b1, b3 = data[offset + 1], data[offset + 3]
+    mpeg1 = (b1 >> 3) & 0b11 == 0b11
+    mono = (b3 >> 6) & 0b11 == 0b11
+    crc = 0 if b1 & 1 else 2
+    size = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    return offset + 4 + crc, size, max(0, length - 4 - crc - size)
+
+
+def _silence_orphaned_frames(piece: bytes) -> bytes:
+    """Silence leading frames whose main data starts before the beginning of the piece"""
+    fixed = None
+    available = 0  # main data bytes of the piece's earlier frames
+    for offset, length, _ in mp3_frames(piece):
+        if offset + length > len(piece):
+            break
+        start, size, carried = _side_info(piece, offset, length)
+        mpeg1 = (piece[offset + 1] >> 3) & 0b11 == 0b11
+        begin = (piece[start] << 1 | piece[start + 1] >> 7) if mpeg1 else piece[start]
+        if begin > available:
+            # Zeroed side info means main_data_begin = 0 and no coded granules: the frame decodes to silence.
+            # Its main data bytes are kept, later frames may read theirs from them.
+            fixed = fixed if fixed is not None else bytearray(piece)
+            fixed[start:start + size] = bytes(size)
+        available += carried
+        if available >= 511:
+            # main_data_begin is at most 511 bytes, so no later frame reaches back out of the piece
+            break
+    return piece if fixed is None else bytes(fixed)
+
+
+def join_mp3(pieces: List[bytes]) -> bytes:
+    """
+    Concatenate MP3 pieces
+
+    Layer III frames are not self-contained: main_data_begin lets a frame's
+    audio data start in the bit reservoir of the frames before it. At a join
+    those bytes belong to a different piece (or, for the first piece, to
+    nothing), so a leading frame that borrows from before its piece would
+    decode to noise. Such frames are replaced by silent frames of the same
+    size, which costs at most a few tens of milliseconds at each join
+    instead of a glitch.
+    """
+    return b"".join(_silence_orphaned_frames(piece) for piece in pieces)
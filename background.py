@@ -0,0 +1,416 @@
+"""
+Background generation for The Synthetic Radio Host - Wiki-talks
+Runs a broadcast off the Streamlit script thread and records real progress events the UI can poll
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Callable
+import config
+from core_logic import WikiScraper, ScriptGenerator, AudioEngine
+from artifact_store import ArtifactStore, TEXT, JSON, PARTS
+from coalesce import get_single_flight, scrape_key, script_key, audio_key, scoped_key
+from ratelimit import get_key_pool
+from scheduler import get_tts_scheduler, get_lane_scheduler, INTERACTIVE
+from streaming import stream_broadcast, hold_slot
+from pacing import get_pacing_model
+from script_quality import get_script_quality_gate
+import audio_utils
+
+# Task states
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Share of the progress bar per stage
+_STAGE_WEIGHTS = {"scrape": 0.1, "script": 0.5, "audio": 0.4}
+
+
+class GenerationTask:
+    """
+    One broadcast being generated in the background
+
+    The worker thread calls emit() as work arrives (bytes scraped, lines
+    written, audio received); the UI thread reads snapshot() whenever it
+    polls. All shared state is guarded by one lock.
+    """
+
+    def __init__(self, request: Dict):
+        """
+        Initialize GenerationTask
+
+        Args:
+            request: What to generate (url, variant, mode, preview, fast_start, priority)
+        """
+        self.task_id = uuid.uuid4().hex
+        self.request = dict(request)
+        self.status = RUNNING
+        self.stage = "scrape"
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.content = None
+        self.script_lines = []
+        self.script_done = False
+        self.lines_voiced = 0
+        self.expected_lines = self._expected_lines(request)
+        self.audio_chunks = []  # fast start: one MP3 per batch of lines
+        self.audio_segments = None  # regular run: one MP3 per line
+        self.audio_received = 0
+        self.audio_total = None
+        self.events = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _expected_lines(request: Dict) -> int:
+        if request.get("preview"):
+            return config.PREVIEW_BUDGET["lines"]
+        target_words = ScriptGenerator.target_words(request.get("duration", 120), request.get("variant", "RJ"))
+        return max(1, round(target_words / config.UI_WORDS_PER_LINE))
+
+    def emit(self, stage: str, message: str, **data):
+        """Record a progress event and update the task's partial results"""
+        with self._lock:
+            self.stage = stage
+            if "content" in data:
+                self.content = data["content"]
+            if data.get("restart"):
+                # The script is being written again from the start
+                self.script_lines = []
+            if "line" in data:
+                self.script_lines.append(data["line"])
+            if "lines" in data:
+                # The complete script
+                self.script_lines = list(data["lines"])
+                self.script_done = True
+            if "chunk" in data:
+                self.audio_chunks.append(data["chunk"])
+                self.lines_voiced = data.get("voiced", self.lines_voiced)
+            if "received" in data:
+                self.audio_received = data["received"]
+                self.audio_total = data.get("total")
+            self.events.append({"time": time.time() - self.created, "stage": stage, "message": message})
+
+    def finish(self, error: Optional[str] = None, audio_segments: Optional[List[bytes]] = None):
+        """Mark the task done (or failed) and attach the final per-line audio"""
+        with self._lock:
+            self.audio_segments = audio_segments
+            self.error = error
+            self.status = FAILED if error else DONE
+            self.finished = time.time()
+            self.events.append({"time": self.finished - self.created, "stage": self.stage,
+                                "message": f"Failed: {error}" if error else "Complete"})
+
+    def _fraction(self) -> float:
+        if self.status == DONE:
+            return 1.0
+        done = _STAGE_WEIGHTS["scrape"] if self.content is not None else 0.0
+        lines = len(self.script_lines)
+        expected = max(self.expected_lines, lines)
+        done += _STAGE_WEIGHTS["script"] * (1.0 if self.script_done else lines / (expected + 1))
+        if self.request.get("fast_start"):
+            audio = self.lines_voiced / max(expected, 1)
+        elif self.audio_total:
+            audio = self.audio_received / self.audio_total
+        else:
+            # Size unknown: approach the end without reaching it
+            audio = self.audio_received / (self.audio_received + 256 * 1024)
+        done += _STAGE_WEIGHTS["audio"] * min(1.0, audio)
+        return min(done, 0.99)
+
+    def snapshot(self) -> Dict:
+        """Copy of the task state for rendering"""
+        with self._lock:
+            return {
+                "task_id": self.task_id,
+                "status": self.status,
+                "stage": self.stage,
+                "error": self.error,
+                "fraction": self._fraction(),
+                "message": self.events[-1]["message"] if self.events else "Starting...",
+                "elapsed": (self.finished or time.time()) - self.created,
+                "content": self.content,
+                "script_lines": list(self.script_lines),
+                "audio_chunks": list(self.audio_chunks),
+                "audio_segments": self.audio_segments,
+                "audio_received": self.audio_received,
+                "events": list(self.events)
+            }
+
+
+class BackgroundExecutor:
+    """
+    Thread pool for UI generations, shared by every session in the process
+
+    Finished tasks are kept for keep_seconds so the session that started
+    them can pick up the results, then dropped; memory therefore scales
+    with active generations rather than with sessions.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, keep_seconds: Optional[float] = None):
+        """
+        Initialize BackgroundExecutor
+
+        Args:
+            max_workers: Concurrent generations (defaults to config.UI_BACKGROUND_WORKERS)
+            keep_seconds: How long finished tasks stay available (defaults to config.UI_TASK_KEEP_SECONDS)
+        """
+        self.max_workers = max_workers or config.UI_BACKGROUND_WORKERS
+        self.keep_seconds = config.UI_TASK_KEEP_SECONDS if keep_seconds is None else keep_seconds
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="wiki-talks-ui")
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[[GenerationTask], None], request: Dict) -> GenerationTask:
+        """
+        Start fn(task) on a worker thread
+
+        Args:
+            fn: Function doing the work; it reports through task.emit and must call task.finish
+            request: Parameters stored on the task
+
+        Returns:
+            The new GenerationTask
+        """
+        task = GenerationTask(request)
+
+        def run():
+            try:
+                fn(task)
+            except Exception as e:
+                task.finish(f"Unexpected error: {str(e)}")
+            if task.status == RUNNING:
+                task.finish()
+
+        with self._lock:
+            self._prune()
+            self._tasks[task.task_id] = task
+        self._pool.submit(run)
+        return task
+
+    def get(self, task_id: Optional[str]) -> Optional[GenerationTask]:
+        """Task by id, or None if unknown or already pruned"""
+        with self._lock:
+            self._prune()
+            return self._tasks.get(task_id)
+
+    def _prune(self):
+        now = time.time()
+        for task_id in [task_id for task_id, task in self._tasks.items()
+                        if task.finished and now - task.finished > self.keep_seconds]:
+            del self._tasks[task_id]
+
+    def active(self) -> int:
+        """Number of generations still running"""
+        with self._lock:
+            return sum(1 for task in self._tasks.values() if task.status == RUNNING)
+
+
+_script_generators = {}
+_script_generators_lock = threading.Lock()
+
+
+def get_script_generator(api_key: str) -> ScriptGenerator:
+    """Process-wide ScriptGenerator per API key (safe to call from worker threads)"""
+    with _script_generators_lock:
+        if api_key not in _script_generators:
+            _script_generators[api_key] = ScriptGenerator(api_key)
+        return _script_generators[api_key]
+
+
+def generate_broadcast(task: GenerationTask, scraper: WikiScraper, audio_engine: AudioEngine, store: ArtifactStore,
+                       gemini_key: str, eleven_key: str,
+                       script_generator_for: Callable[[str], ScriptGenerator] = get_script_generator):
+    """
+    Scrape → script → audio for one task, reporting progress as it goes
+
+    Runs through the same single-flight groups, key pools, lanes, TTS scheduler
+    and artifact store as the rest of the app. Script lines are streamed from
+    Gemini; with fast_start, batches of lines are also voiced while the script
+    is still being written, so only the regular path can hold a script back at
+    the quality gate.
+
+    Args:
+        task: Task to report to; task.request holds url, variant, mode, preview, fast_start and
+            optionally priority (lane, defaults to scheduler.INTERACTIVE)
+        scraper: Shared WikiScraper
+        audio_engine: Shared AudioEngine
+        store: ArtifactStore for memoized results
+        gemini_key: Gemini API key (fallback when no key pool is configured)
+        eleven_key: ElevenLabs API key (fallback when no key pool is configured)
+        script_generator_for: Returns the shared ScriptGenerator for an API key
+    """
+    request = task.request
+    url, variant, mode = request["url"], request["variant"], request["mode"]
+    preview = request.get("preview", False)
+    duration = request.get("duration", 120)
+    priority = request.get("priority", INTERACTIVE)
+    single_flight = get_single_flight()
+
+    # Step 1: Scrape
+    task.emit("scrape", "📖 Scraping Wikipedia...")
+    (content, error), _ = single_flight.do(
+        scrape_key(url, mode),
+        lambda: store.cached(scrape_key(url, mode), lambda: scraper.scrape(url, mode), TEXT,
+                             max_age=config.SCRAPE_MAX_AGE_SECONDS)
+    )
+    if error:
+        task.finish(f"Wikipedia scraping failed: {error}")
+        return
+    task.emit("scrape", f"✓ Scraped {len(content):,} characters", content=content)
+
+    # Step 2: Script (streamed line by line unless a memoized script exists)
+    script_request = script_key(content, variant, duration) + (preview,)
+    script_json = store.lookup(script_request, JSON)
+    if script_json is not None:
+        task.emit("script", f"✓ Reused script with {len(script_json)} lines", lines=script_json)
+        # Audio rendered for the same script earlier (or by the prewarmer) needs no TTS at all
+        audio_segments = store.lookup(audio_key(script_json) + ("segments",), PARTS)
+        if audio_segments is not None:
+            task.emit("audio", f"✓ Reused audio for {len(audio_segments)} lines")
+            task.finish(audio_segments=audio_segments)
+            return
+
+    def stream_lines():
+        gemini_pool = get_key_pool("gemini", gemini_key)
+        pooled_key, error = gemini_pool.acquire(1)
+        if error:
+            yield None, error
+            return
+        lines = script_generator_for(pooled_key).stream_script(content, variant, duration=duration, preview=preview)
+        for line, error in hold_slot(get_lane_scheduler("gemini"), priority, lines):
+            if line is not None:
+                task.emit("script", f"✍️ Writing script: {len(task.script_lines) + 1} lines", line=line)
+            # An open circuit, a slot wait that gave up spent nothing upstream
+            gemini_pool.settle(pooled_key, 1, error)
+            yield line, error
+
+    def remember_script(lines: List[Dict]):
+        store.remember(script_request, store.save(lines, JSON))
+
+    tts_scheduler = get_tts_scheduler(eleven_key)
+    pacing = get_pacing_model()
+    elevenlabs_lanes = get_lane_scheduler("elevenlabs")
+    eleven_pool = get_key_pool("elevenlabs", eleven_key)
+
+    if request.get("fast_start"):
+        # Steps 2 + 3 interleaved
+        def synthesize(lines):
+            cost = AudioEngine.character_cost(lines)
+            line_key, error = eleven_pool.acquire(cost)
+            if error:
+                return None, error
+            audio_bytes, error = elevenlabs_lanes.run(
+                priority,
+                lambda: tts_scheduler.call(lines, lambda: audio_engine.generate_dialogue_v3(lines, line_key),
+                                           on_retry=lambda: eleven_pool.charge(line_key, cost))
+            )
+            eleven_pool.settle(line_key, cost, error)
+            return audio_bytes, error
+
+        source = ((line, None) for line in script_json) if script_json is not None else stream_lines()
+        lines_voiced = []
+        for chunk in stream_broadcast(source, synthesize):
+            lines_voiced.extend(chunk.lines)
+            if chunk.audio_bytes:
+                task.emit("audio", f"🎵 Part {chunk.index + 1} ready after {chunk.elapsed:.1f}s",
+                          chunk=chunk.audio_bytes, voiced=len(lines_voiced))
+            if chunk.error:
+                task.finish(f"Broadcast failed: {chunk.error}")
+                return
+        if not lines_voiced:
+            task.finish("Broadcast failed: no audio was generated")
+            return
+        if script_json is None:
+            remember_script(lines_voiced)
+        pacing.record(variant, lines_voiced, task.snapshot()["audio_chunks"])
+        task.emit("audio", f"✓ Streamed {len(lines_voiced)} lines", lines=lines_voiced)
+        task.finish()
+        return
+
+    if script_json is None:
+        def collect_script():
+            if task.snapshot()["script_lines"]:
+                task.emit("script", "🔁 Script failed the quality check, rewriting...", restart=True)
+            streamed = []
+            for line, error in stream_lines():
+                if error:
+                    return None, error
+                streamed.append(line)
+            if not streamed:
+                return None, "empty script"
+            return streamed, None
+
+        # Concurrent requests for the same script share one Gemini stream (followers see no partial lines);
+        # the quality gate rewrites a script not worth voicing before any TTS characters are spent
+        quality_gate = get_script_quality_gate()
+        (script_json, error), _ = single_flight.do(
+            scoped_key(script_request, get_key_pool("gemini", gemini_key).scope),
+            lambda: store.cached(
+                script_request,
+                lambda: quality_gate.generate(collect_script, duration, preview=preview, variant=variant),
+                JSON
+            )
+        )
+        if error:
+            task.finish(f"Script generation failed: {error}")
+            return
+        task.emit("script", f"✓ Generated script with {len(script_json)} lines", lines=script_json)
+
+    # Step 3: Audio, one MP3 segment per line so later edits only re-render changed lines
+    task.emit("audio", "🎵 Generating audio with ElevenLabs V3...")
+
+    def on_bytes(received: int, total: Optional[int]):
+        task.emit("audio", f"🎵 Receiving audio: {received / 1024:.0f} KB", received=received, total=total)
+
+    def render_audio():
+        cost = AudioEngine.character_cost(script_json)
+        pooled_key, error = eleven_pool.acquire(cost)
+        if error:
+            return None, error
+        segments, error = elevenlabs_lanes.run(
+            priority,
+            lambda: tts_scheduler.call(
+                script_json,
+                lambda: audio_engine.generate_dialogue_segments(script_json, pooled_key, None, on_bytes=on_bytes),
+                on_retry=lambda: eleven_pool.charge(pooled_key, cost)
+            )
+        )
+        eleven_pool.settle(pooled_key, cost, error)
+        if segments:
+            pacing.record(variant, script_json, segments)
+        return segments, error
+
+    audio_request = audio_key(script_json) + ("segments",)
+    (audio_segments, error), _ = single_flight.do(
+        scoped_key(audio_request, eleven_pool.scope),
+        lambda: store.cached(audio_request, render_audio, PARTS)
+    )
+    if error:
+        task.finish(f"Audio generation failed: {error}")
+        return
+    task.finish(audio_segments=audio_segments)
+
+
+def join_task_audio(snapshot: Dict) -> Optional[bytes]:
+    """Complete MP3 for a finished task snapshot"""
+    if snapshot["audio_segments"]:
+        return b"".join(snapshot["audio_segments"])
+    if snapshot["audio_chunks"]:
+        return audio_utils.join_mp3(snapshot["audio_chunks"])
+    return None
+
+
+_background_executor = None
+_background_executor_lock = threading.Lock()
+
+
+def get_background_executor() -> BackgroundExecutor:
+    """Process-wide BackgroundExecutor shared by every UI session"""
+    global _background_executor
+    with _background_executor_lock:
+        if _background_executor is None:
+            _background_executor = BackgroundExecutor()
+        return _background_executor
@@ -0,0 +1,4 @@
+"""
+Micro-benchmarks for the CPU hot paths of The Synthetic Radio Host - Wiki-talks
+Run with: python -m benchmarks.bench_core
+"""
@@ -0,0 +1,293 @@
+"""
+Micro-benchmarks for the CPU hot paths in core_logic
+Measures time and peak memory per call on fixed fixtures and compares them with a stored baseline
+
+Usage:
+    python -m benchmarks.bench_core                      # run and compare with benchmarks/baseline.json
+    python -m benchmarks.bench_core --filter extract     # only benchmarks whose name contains "extract"
+    python -m benchmarks.bench_core --save-baseline      # record the current numbers as the new baseline
+"""
+
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import List, Dict, Optional, Callable
+import config
+from core_logic import WikiScraper, ScriptGenerator
+from benchmarks import fixtures
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+class BenchmarkRunner:
+    """
+    Times zero-argument callables and records their peak memory
+
+    Each benchmark is calibrated so one timing round lasts at least min_time,
+    then timed for repeat rounds; the fastest round is the least disturbed by
+    other work on the machine and is what baselines compare. Peak memory is
+    measured in a separate call under tracemalloc, which would skew timings.
+    """
+
+    def __init__(self, repeat: Optional[int] = None, min_time: Optional[float] = None):
+        """
+        Initialize BenchmarkRunner
+
+        Args:
+            repeat: Timing rounds per benchmark (defaults to config.BENCHMARK_REPEAT)
+            min_time: Minimum seconds per round (defaults to config.BENCHMARK_MIN_TIME)
+        """
+        self.repeat = repeat or config.BENCHMARK_REPEAT
+        self.min_time = min_time or config.BENCHMARK_MIN_TIME
+        self.benchmarks = {}
+
+    def add(self, name: str, fn: Callable):
+        """Register a benchmark"""
+        self.benchmarks[name] = fn
+
+    def measure(self, fn: Callable) -> Dict:
+        """
+        Time and memory for one callable
+
+        Returns:
+            Dict with seconds (fastest round, per call), median, calls per round and peak_bytes
+        """
+        fn()  # warm caches (regex compilation, imports) outside the measurement
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.min_time or number >= 1_000_000:
+                break
+            number *= 10 if elapsed < self.min_time / 10 else 2
+
+        rounds = [elapsed / number]
+        for _ in range(self.repeat - 1):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            rounds.append((time.perf_counter() - start) / number)
+
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "seconds": min(rounds),
+            "median": statistics.median(rounds),
+            "calls": number,
+            "peak_bytes": max(0, peak - before)
+        }
+
+    def run(self, pattern: Optional[str] = None, report: Optional[Callable[[str, Dict], None]] = None) -> Dict[str, Dict]:
+        """
+        Run every benchmark whose name contains pattern
+
+        Args:
+            pattern: Substring filter on benchmark names
+            report: Optional callback(name, result) after each benchmark
+
+        Returns:
+            Dict of name -> measure() result
+        """
+        results = {}
+        for name, fn in self.benchmarks.items():
+            if pattern and pattern not in name:
+                continue
+            results[name] = self.measure(fn)
+            if report:
+                report(name, results[name])
+        return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], time_tolerance: Optional[float] = None,
+            memory_tolerance: Optional[float] = None) -> List[Dict]:
+    """
+    Benchmarks that got slower or use more memory than the baseline allows
+
+    Args:
+        results: Output of BenchmarkRunner.run
+        baseline: Stored results (the "results" field of a baseline file)
+        time_tolerance: Allowed relative slowdown (defaults to config.BENCHMARK_TIME_TOLERANCE)
+        memory_tolerance: Allowed relative peak memory growth (defaults to config.BENCHMARK_MEMORY_TOLERANCE)
+
+    Returns:
+        List of {"name", "metric", "baseline", "current", "ratio"} dicts
+    """
+    time_tolerance = config.BENCHMARK_TIME_TOLERANCE if time_tolerance is None else time_tolerance
+    memory_tolerance = config.BENCHMARK_MEMORY_TOLERANCE if memory_tolerance is None else memory_tolerance
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        checks = (
+            ("seconds", time_tolerance, 0),
+            # A few KB of allocator noise is not a regression for small fixtures
+            ("peak_bytes", memory_tolerance, 4096),
+        )
+        for metric, tolerance, slack in checks:
+            if result[metric] > old[metric] * (1 + tolerance) + slack:
+                regressions.append({
+                    "name": name,
+                    "metric": metric,
+                    "baseline": old[metric],
+                    "current": result[metric],
+                    "ratio": result[metric] / old[metric] if old[metric] else float("inf")
+                })
+    return regressions
+
+
+def confirm(runner: BenchmarkRunner, results: Dict[str, Dict], baseline: Dict[str, Dict],
+            time_tolerance: Optional[float] = None, retries: Optional[int] = None) -> List[Dict]:
+    """
+    compare(), re-measuring flagged benchmarks so a noisy round is not reported as a regression
+
+    Timings on shared machines come in slow phases; a benchmark is only
+    flagged if it is still over the tolerance in its best measurement.
+    results is updated with the best numbers seen.
+    """
+    retries = config.BENCHMARK_RETRIES if retries is None else retries
+    regressions = compare(results, baseline, time_tolerance)
+    for _ in range(retries):
+        if not regressions:
+            break
+        for name in {regression["name"] for regression in regressions}:
+            again = runner.measure(runner.benchmarks[name])
+            best = results[name]
+            results[name] = {**best, **{metric: min(best[metric], again[metric]) for metric in ("seconds", "peak_bytes")}}
+        regressions = compare(results, baseline, time_tolerance)
+    return regressions
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, Dict]:
+    """Stored results, or {} if there is no baseline yet"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("results", {})
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(results: Dict[str, Dict], path: str = BASELINE_PATH):
+    """Store results together with the interpreter and machine they were measured on"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}",
+            "results": {name: {"seconds": r["seconds"], "peak_bytes": r["peak_bytes"]} for name, r in sorted(results.items())}
+        }, f, indent=2)
+        f.write("\n")
+
+
+class _StubModels:
+    def __init__(self, text: str):
+        self._response = type("Response", (), {"text": text, "usage_metadata": None})()
+
+    def generate_content(self, **kwargs):
+        return self._response
+
+
+class _StubClient:
+    """Gemini client returning a fixed response, so only local parsing and validation are timed"""
+
+    def __init__(self, text: str):
+        self.models = _StubModels(text)
+
+
+def core_benchmarks(runner: Optional[BenchmarkRunner] = None) -> BenchmarkRunner:
+    """Register the core_logic hot paths on fixed small / long / huge fixtures"""
+    runner = runner or BenchmarkRunner()
+    scraper = WikiScraper()
+
+    for size in fixtures.ARTICLE_SIZES:
+        page = fixtures.make_article(size)
+        runner.add(f"extract_sections[{size}]", lambda page=page: scraper._extract_sections(page, max_words=4000))
+
+    runner.add("extract_title_from_url[5 urls]",
+               lambda: [scraper._extract_title_from_url(url) for url in fixtures.URLS])
+
+    generator = ScriptGenerator("benchmark-key")
+    for size in fixtures.SCRIPT_SIZES:
+        text = fixtures.make_response_text(size)
+        runner.add(f"strip_markdown[{size}]", lambda text=text: generator._strip_markdown(text))
+
+    content = scraper._extract_sections(fixtures.make_article("long"), max_words=4000)
+    for variant in config.VARIANTS:
+        runner.add(f"build_prompt[{variant}]", lambda variant=variant: generator._build_prompt(content, variant, 120))
+    runner.add("build_prompt[preview]", lambda: generator._build_prompt(content, "RJ", 120, preview=True))
+
+    for size in fixtures.SCRIPT_SIZES:
+        stub = ScriptGenerator("benchmark-key")
+        stub.client = _StubClient(fixtures.make_response_text(size))
+        runner.add(f"generate_script[{size}]", lambda stub=stub: stub.generate_script(content, "RJ", 120))
+
+    return runner
+
+
+def _duration(seconds: float) -> str:
+    return f"{seconds * 1e6:.1f} µs" if seconds < 1e-3 else f"{seconds * 1e3:.2f} ms"
+
+
+def _format(result: Dict) -> str:
+    return (f"{_duration(result['seconds']):>10}  (median {_duration(result['median'])}, x{result['calls']})  "
+            f"peak {result['peak_bytes'] / 1024:8.1f} KiB")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="The Synthetic Radio Host - Wiki-talks - core_logic micro-benchmarks")
+    parser.add_argument("--filter", type=str, default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--baseline", type=str, default=BASELINE_PATH, help="Baseline file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="Allowed relative slowdown (default: config.BENCHMARK_TIME_TOLERANCE)")
+    parser.add_argument("--repeat", type=int, default=None, help="Timing rounds per benchmark")
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    runner = core_benchmarks(BenchmarkRunner(repeat=args.repeat))
+    print("=" * 60)
+    print("The Synthetic Radio Host - Wiki-talks - core_logic benchmarks")
+    print("=" * 60)
+    results = runner.run(args.filter, report=lambda name, result: print(f"{name:<32} {_format(result)}"))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        # Keep baseline entries for benchmarks that were filtered out of this run
+        merged = {**load_baseline(args.baseline), **results}
+        save_baseline(merged, args.baseline)
+        print(f"\n✓ Baseline saved to: {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if not baseline:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    regressions = confirm(runner, results, baseline, args.tolerance)
+    for regression in regressions:
+        unit = "time" if regression["metric"] == "seconds" else "peak memory"
+        print(f"❌ {regression['name']}: {unit} {regression['ratio']:.2f}x baseline")
+    if regressions:
+        return 1
+    print(f"\n✓ No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Cold-start benchmark for the CLI and worker entry points
+Imports each module in a fresh interpreter, records the import time and memory growth, and checks that
+no heavy client library (config.STARTUP_HEAVY_MODULES) is loaded before it is used
+
+Usage:
+    python -m benchmarks.bench_startup                    # compare with benchmarks/baseline.json
+    python -m benchmarks.bench_startup --save-baseline    # record the current numbers
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import List, Dict, Optional
+import config
+from benchmarks.bench_core import BASELINE_PATH, BenchmarkRunner, confirm, load_baseline, save_baseline, _duration
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter: import one module and report time, RSS growth and loaded modules
+_PROBE = """
+import json, resource, sys, time
+heavy = {heavy!r}
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+scale = 1 if sys.platform == "darwin" else 1024
+print(json.dumps({{"seconds": seconds, "peak_bytes": (after - before) * scale,
+                   "heavy": [name for name in heavy if name in sys.modules]}}))
+"""
+
+
+def cold_import(module: str, heavy: Optional[List[str]] = None) -> Dict:
+    """
+    Import a module in a new interpreter (from the repo root)
+
+    Returns:
+        Dict with seconds, peak_bytes (RSS growth) and heavy (heavy modules it loaded)
+    """
+    probe = _PROBE.format(module=module, heavy=list(config.STARTUP_HEAVY_MODULES if heavy is None else heavy))
+    output = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+class StartupRunner(BenchmarkRunner):
+    """BenchmarkRunner whose benchmarks are module names, each measured as repeat cold imports"""
+
+    def measure(self, module: str) -> Dict:
+        cold_import(module)  # first run may still write .pyc files
+        runs = [cold_import(module) for _ in range(self.repeat)]
+        return {
+            "seconds": min(run["seconds"] for run in runs),
+            "median": statistics.median(run["seconds"] for run in runs),
+            "calls": 1,
+            "peak_bytes": min(run["peak_bytes"] for run in runs),
+            "heavy": runs[0]["heavy"]
+        }
+
+
+def startup_benchmarks(runner: Optional[StartupRunner] = None) -> StartupRunner:
+    """Register one cold-import benchmark per config.STARTUP_MODULES entry"""
+    runner = runner or StartupRunner()
+    for module in config.STARTUP_MODULES:
+        runner.add(f"startup[{module}]", module)
+    return runner
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="The Synthetic Radio Host - Wiki-talks - cold-start benchmark")
+    parser.add_argument("--baseline", type=str, default=BASELINE_PATH, help="Baseline file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results into the baseline")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="Allowed relative slowdown (default: config.BENCHMARK_TIME_TOLERANCE)")
+    parser.add_argument("--repeat", type=int, default=None, help="Cold imports per module")
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    runner = startup_benchmarks(StartupRunner(repeat=args.repeat))
+    print("=" * 60)
+    print("The Synthetic Radio Host - Wiki-talks - cold-start benchmark")
+    print("=" * 60)
+    results = runner.run(report=lambda name, result: print(
+        f"{name:<24} {_duration(result['seconds']):>10}  (median {_duration(result['median'])})  "
+        f"RSS +{result['peak_bytes'] / 2**20:5.1f} MiB" + (f"  loads {', '.join(result['heavy'])}" if result["heavy"] else "")))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    eager = {name: result["heavy"] for name, result in results.items() if result["heavy"]}
+    for name, modules in eager.items():
+        print(f"❌ {name}: imports {', '.join(modules)} eagerly")
+
+    if args.save_baseline:
+        save_baseline({**load_baseline(args.baseline), **results}, args.baseline)
+        print(f"\n✓ Baseline saved to: {args.baseline}")
+        return 1 if eager else 0
+
+    baseline = load_baseline(args.baseline)
+    regressions = confirm(runner, results, baseline, args.tolerance) if baseline else []
+    for regression in regressions:
+        unit = "import time" if regression["metric"] == "seconds" else "memory"
+        print(f"❌ {regression['name']}: {unit} {regression['ratio']:.2f}x baseline")
+    if eager or regressions:
+        return 1
+    print("\n✓ No cold-start regressions" + (f" against {args.baseline}" if baseline else " (no baseline yet)"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
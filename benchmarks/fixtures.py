@@ -0,0 +1,95 @@
+"""
+Fixed fixture articles and Gemini responses for the benchmarks
+Generated deterministically so every run (and every machine) measures the same input
+"""
+
+import json
+import random
+from typing import List, Dict
+import config
+
+# words per summary, sections, words per section, subsections per section
+ARTICLE_SIZES = {
+    "small": (80, 4, 60, 0),
+    "long": (300, 40, 180, 2),
+    "huge": (600, 300, 400, 4),
+}
+
+# dialogue lines per fixture script
+SCRIPT_SIZES = {"small": 8, "long": 60, "huge": 600}
+
+_VOCABULARY = (
+    "the team won league title season captain stadium Mumbai India cricket franchise match runs wickets "
+    "history founded owner players coach trophy final record innings batting bowling auction fans city "
+    "championship tournament victory defeat partnership century squad retained released sponsor broadcast"
+).split()
+
+URLS = [
+    "https://en.wikipedia.org/wiki/Mumbai_Indians",
+    "https://en.m.wikipedia.org/wiki/Indian_Premier_League?action=render#History",
+    "https://hi.wikipedia.org/wiki/%E0%A4%AE%E0%A5%81%E0%A4%82%E0%A4%AC%E0%A4%88",
+    "https://en.wikipedia.org/wiki/Sachin_Tendulkar#Early_life",
+    "https://example.com/not/a/wiki/page",
+]
+
+
+class FixtureSection:
+    """Stand-in for a wikipediaapi section (title, text, nested sections)"""
+
+    def __init__(self, title: str, text: str, sections: List["FixtureSection"]):
+        self.title = title
+        self.text = text
+        self.sections = sections
+
+
+class FixturePage:
+    """Stand-in for a wikipediaapi page with the attributes WikiScraper reads"""
+
+    def __init__(self, title: str, summary: str, sections: List[FixtureSection]):
+        self.title = title
+        self.summary = summary
+        self.sections = sections
+
+    def exists(self) -> bool:
+        return True
+
+    def word_count(self) -> int:
+        def count(sections):
+            return sum(len(s.text.split()) + count(s.sections) for s in sections)
+        return len(self.summary.split()) + count(self.sections)
+
+
+def _words(rng: random.Random, count: int) -> str:
+    words = [rng.choice(_VOCABULARY) for _ in range(count)]
+    # Sentences of ~15 words, like real prose
+    for i in range(14, count, 15):
+        words[i] += "."
+    return " ".join(words)
+
+
+def make_article(size: str) -> FixturePage:
+    """Build the small, long or huge fixture article"""
+    summary_words, section_count, section_words, subsection_count = ARTICLE_SIZES[size]
+    rng = random.Random(f"article-{size}")
+    sections = []
+    for i in range(section_count):
+        subsections = [FixtureSection(f"Part {i}.{j}", _words(rng, section_words // 2), [])
+                       for j in range(subsection_count)]
+        sections.append(FixtureSection(f"Section {i}", _words(rng, section_words), subsections))
+    return FixturePage(f"Fixture {size}", _words(rng, summary_words), sections)
+
+
+def make_script(size: str, variant: str = "RJ") -> List[Dict]:
+    """Build a valid dialogue script with the size's number of lines"""
+    rng = random.Random(f"script-{size}")
+    speakers = config.SPEAKER_NAMES[variant]
+    return [
+        {"speaker": speakers["Person A"] if i % 2 == 0 else speakers["Person B"],
+         "text": f"[excited] {_words(rng, rng.randint(8, 30))}"}
+        for i in range(SCRIPT_SIZES[size])
+    ]
+
+
+def make_response_text(size: str, variant: str = "RJ") -> str:
+    """Gemini response text for a fixture script, wrapped in the markdown fences Gemini sometimes adds"""
+    return "```json\n" + json.dumps(make_script(size, variant), ensure_ascii=False, indent=2) + "\n```"
@@ -0,0 +1,129 @@
+"""
+Request coalescing for The Synthetic Radio Host - Wiki-talks
+Concurrent identical requests share one in-flight scrape / Gemini / ElevenLabs call
+"""
+
+import hashlib
+import json
+import threading
+from typing import List, Dict, Optional, Tuple, Callable, Hashable
+import telemetry
+
+
+class _Call:
+    """One in-flight computation and the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Single-flight group: the first caller for a key runs the function, every
+    caller that arrives with the same key while it is running blocks and
+    receives the same result. Nothing is cached once the call finishes, so
+    later requests see fresh data (caching is a separate concern).
+    """
+
+    def __init__(self):
+        """Initialize SingleFlight"""
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {"leaders": 0, "followers": 0}
+
+    def do(self, key: Hashable, fn: Callable):
+        """
+        Run fn once per key among concurrent callers
+
+        Args:
+            key: Hashable identity of the request
+            fn: Zero-argument callable
+
+        Returns:
+            Tuple of (result, shared). shared is True if this caller reused another caller's call.
+            Exceptions raised by fn are re-raised in every caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.stats["followers"] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.stats["leaders"] += 1
+                leader = True
+
+        # Lets the enclosing span (e.g. cache.script) show whether this caller did the work
+        telemetry.current_span().set(coalesced=not leader)
+        if not leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.exception = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        """Number of distinct keys currently being computed"""
+        with self._lock:
+            return len(self._calls)
+
+
+def _digest(value) -> str:
+    data = value if isinstance(value, str) else json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def scrape_key(url: str, mode: str) -> Tuple:
+    return ("scrape", url, mode.lower())
+
+
+def script_key(content: str, variant: str, duration: int) -> Tuple:
+    return ("script", _digest(content), variant, duration)
+
+
+def audio_key(script_json: List[Dict], base_url: Optional[str] = None) -> Tuple:
+    return ("audio", _digest(script_json), base_url)
+
+
+def pipeline_key(url: str, variant: str, mode: str, duration: int = 120) -> Tuple:
+    return ("pipeline", url, variant, mode.lower(), duration)
+
+
+def scoped_key(key: Tuple, scope: str) -> Tuple:
+    """
+    Single-flight key for a request made with one set of API keys (e.g. ratelimit.KeyPool.scope)
+
+    A memoized script or audio is the same whichever key produced it, so artifact
+    store keys leave the key out; a call in flight is not, and a follower must
+    not be handed a leader's 401 or quota error for a key it would not have used.
+    """
+    return key + (scope,)
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Process-wide SingleFlight shared by every UI session and pipeline worker"""
+    global _single_flight
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = SingleFlight()
+            telemetry.register_collector("single_flight", lambda: {**_single_flight.stats, "in_flight": _single_flight.in_flight()})
+        return _single_flight
@@ -4,15 +4,254 @@ Contains variants, voice mappings, API settings, and helper functions
 """
 
 import os
-import streamlit as st
+import sys
+import tempfile
 
 # ElevenLabs V3 Model Configuration
 MODEL_ID = "eleven_v3"
 
 # ElevenLabs API Endpoint (configurable)
-ELEVENLABS_BASE_URL = "https://api.elevenlabs.io/v1/text-to-dialogue"
+ELEVENLABS_BASE_URL = os.environ.get("WIKI_TALKS_ELEVENLABS_BASE_URL", "https://api.elevenlabs.io/v1/text-to-dialogue")
 # Alternative endpoint: "https://api.in.residency.elevenlabs.io/v1/text-to-dialogue"
 
+# ElevenLabs subscription endpoint (reports character_limit / character_count)
+ELEVENLABS_SUBSCRIPTION_URL = os.environ.get("WIKI_TALKS_ELEVENLABS_SUBSCRIPTION_URL", "https://api.elevenlabs.io/v1/user/subscription")
+
+# Wikipedia and Gemini endpoints; None = the public services.
+# Set these (and the ElevenLabs URLs) to run against the loadtest.standins servers.
+WIKIPEDIA_API_URL = os.environ.get("WIKI_TALKS_WIKIPEDIA_API_URL")
+GEMINI_BASE_URL = os.environ.get("WIKI_TALKS_GEMINI_BASE_URL")
+
+# ElevenLabs Quota & Throttling (used by scheduler.TTSQuotaScheduler)
+# Character budget for this process; None = ask the subscription endpoint on the first TTS request
+# (unlimited if that lookup fails)
+ELEVENLABS_CHARACTER_QUOTA = None
+# Concurrent text-to-dialogue requests allowed at once (plan dependent)
+ELEVENLABS_MAX_CONCURRENCY = 2
+# Seconds to pause new admissions after a 429 response
+ELEVENLABS_THROTTLE_COOLDOWN = 5
+# Rough price: $0.30 per 1000 characters
+ELEVENLABS_COST_PER_1K_CHARS = 0.30
+
+# Pipelined Executor (used by pipeline.PipelineExecutor)
+# Worker threads per stage; audio is additionally capped by ELEVENLABS_MAX_CONCURRENCY
+PIPELINE_WORKERS = {"scrape": 2, "script": 2, "audio": 2}
+# Capacity of each queue between stages (small values = stronger backpressure)
+PIPELINE_QUEUE_SIZE = 4
+
+# Priority Lanes (used by scheduler.LaneScheduler)
+# Slots are shared by every process on this host through a small SQLite file, so the
+# Streamlit UI (interactive lane) and run_local.py batches (batch lane) see one pool.
+# reserved_interactive slots are never handed to batch work.
+LANE_SLOTS = {
+    "gemini": {"total": 4, "reserved_interactive": 1},
+    "elevenlabs": {"total": ELEVENLABS_MAX_CONCURRENCY, "reserved_interactive": 1},
+}
+SCHEDULER_DB_PATH = os.path.join(tempfile.gettempdir(), "wiki_talks_scheduler.sqlite")
+# A slot held longer than this (crashed process on another host) is reclaimed
+LANE_LEASE_SECONDS = 600
+
+# Adaptive Concurrency & Circuit Breaking (used by scheduler.UpstreamGuard)
+# The in-process concurrency limit for each upstream grows by one per window of
+# fast successes and halves on a failure or a call slower than latency_target.
+# failure_threshold consecutive failures open the circuit for open_seconds, after
+# which one probe request decides whether to close it again.
+UPSTREAM_GUARD = {
+    "gemini": {"latency_target": 30, "failure_threshold": 5, "open_seconds": 30},
+    "elevenlabs": {"latency_target": 60, "failure_threshold": 5, "open_seconds": 30},
+}
+
+# Preview Mode (used by ScriptGenerator with preview=True)
+# A preview asks Gemini for a few short lines instead of trimming a full script afterwards:
+# the prompt carries the word / character budget, output tokens are capped and thinking is
+# off, so both the Gemini call and the ElevenLabs request are a fraction of a full render.
+PREVIEW_BUDGET = {"lines": 3, "words": 45, "characters": 300, "source_characters": 1000, "max_output_tokens": 512}
+
+# Script Quality Gate (used by script_quality.ScriptQualityGate)
+# Local checks between Gemini and ElevenLabs, so TTS characters are not spent on a script that would
+# be thrown away. word_tolerance is the allowed deviation from the target word count (full scripts
+# only); tag density is [tags] per line; hinglish_ratio is the fraction of words that are Hindi
+# (Devanagari or in HINGLISH_WORDS); repeat_ratio is the fraction of lines repeating an earlier one.
+# A rejected script is regenerated up to max_regenerations times before the job fails.
+SCRIPT_QUALITY = {
+    "word_tolerance": 0.4,
+    "min_tag_density": 0.1,
+    "max_tag_density": 2.0,
+    "min_hinglish_ratio": 0.1,
+    "max_line_words": 80,
+    "max_repeat_ratio": 0.1,
+    "max_regenerations": 1
+}
+# Common romanized Hindi words (English homographs such as "to", "main", "the" left out)
+HINGLISH_WORDS = frozenset("""
+    hai hain ho hoga hogi tha thi hua hui hota hoti kya kyun kyon kaise kaisa kaun kab kahan nahi nahin
+    haan han toh bhi aur lekin magar pe mein mera meri mere tera teri tere apna apni apne uska uski
+    unka unki yeh ye woh wo voh iska isko usko mujhe tujhe hum humko tum aap tu yaar yar arre arey
+    bhai bhaiya didi achha acha accha achcha theek thik bas chalo chal dekho dekh suno samjha samjhe
+    bilkul sach matlab wahi yahi kuch kitna kitne bahut bohot bada badi chhota sab abhi phir fir kabhi
+    hamesha karo karna karte karta kar raha rahi rahe gaya gayi sakta sakte wala wali wale jaise waise
+    kyunki agar ji haina zara zaroor ekdum sahi galat pata kaam baat
+""".split())
+
+# Pacing Model (used by pacing.PacingModel and ScriptGenerator.target_words)
+# Every rendered episode stores its measured audio duration against its word and [tag] counts, per
+# variant and voice pair, in SCHEDULER_DB_PATH. Once a variant has PACING_MIN_SAMPLES episodes, the
+# target word count comes from a fit over the last PACING_WINDOW of them instead of the default rate.
+PACING_DEFAULT_WPM = 150
+PACING_MIN_SAMPLES = 5
+PACING_WINDOW = 200
+PACING_REFIT_SECONDS = 60
+# A fitted rate outside these words-per-minute bounds is treated as bad data and ignored
+PACING_WPM_BOUNDS = (80, 260)
+
+# Cost & Latency Estimates (used by estimator.CostEstimator, run_local.py --dry-run and POST /estimate)
+# Gemini price in dollars per million tokens (gemini-2.5-flash; thinking tokens are billed as output)
+GEMINI_COST_PER_1M_INPUT_TOKENS = 0.30
+GEMINI_COST_PER_1M_OUTPUT_TOKENS = 2.50
+# Input tokens read from a cached-content prefix (see PROMPT_CACHE)
+GEMINI_COST_PER_1M_CACHED_TOKENS = 0.075
+ESTIMATE_CHARACTERS_PER_TOKEN = 4
+# Thinking tokens a full script typically uses (previews run with thinking off)
+ESTIMATE_THINKING_TOKENS = 1500
+# Figures used until a stage has ESTIMATE_MIN_SAMPLES recorded runs: seconds = base + per_unit * units
+# (units: scraped, script JSON or TTS characters), characters per spoken word, typical article sizes
+ESTIMATE_DEFAULTS = {
+    "scrape": {"base": 1.0, "per_unit": 0.00005, "characters": {"fast": 1500, "pro": 20000}},
+    "script": {"base": 8.0, "per_unit": 0.005, "characters_per_word": 8.0},
+    "audio": {"base": 3.0, "per_unit": 0.01, "characters_per_word": 6.5},
+}
+ESTIMATE_MIN_SAMPLES = 5
+ESTIMATE_WINDOW = 200
+ESTIMATE_REFIT_SECONDS = 60
+
+# Prompt Prefix Caching (used by prompts.PromptCache and ScriptGenerator)
+# Each variant's persona / format / example block is compiled once and sent as the system instruction;
+# only the source text and target length change per request. When enabled, the block is uploaded to
+# Gemini as cached content once per key and model and referenced by handle, so it is billed at the
+# cached-token rate. Gemini refuses caches under min_tokens; shorter blocks are sent inline. A handle
+# is renewed when less than renew_fraction of its ttl is left; a failed upload is retried after
+# retry_seconds (requests go inline meanwhile).
+PROMPT_CACHE = {
+    "enabled": True,
+    "ttl_seconds": 3600,
+    "renew_fraction": 0.1,
+    "min_tokens": 1024,
+    "retry_seconds": 300,
+}
+
+# Time-to-First-Audio Streaming (used by streaming.stream_broadcast)
+# Script lines in the first TTS call (small = audio starts sooner) and in every later call
+STREAM_FIRST_BATCH_LINES = 2
+STREAM_BATCH_LINES = 4
+
+# Artifact Store (used by artifact_store.ArtifactStore)
+# Scraped text, scripts and audio live on disk; UI sessions only keep handles.
+# Least recently used files are deleted once the directory grows past the limit.
+ARTIFACT_STORE_DIR = os.environ.get("WIKI_TALKS_ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "wiki_talks_artifacts"))
+ARTIFACT_STORE_MAX_BYTES = 512 * 1024 * 1024
+# Each process tracks the size from its own writes; the directory is rescanned this often to count other processes'
+ARTIFACT_STORE_RESCAN_SECONDS = 60
+# Memoized Wikipedia scrapes older than this are fetched again, so edited articles are picked up.
+# Scripts and audio are keyed by the scraped text and follow a changed article automatically.
+SCRAPE_MAX_AGE_SECONDS = 24 * 3600
+
+# Cache Prewarming (used by prewarm.PrewarmScheduler)
+# A ranked list of popular articles (file path or http(s) URL: one title or article URL per line, a JSON
+# list, or a Wikimedia "top pageviews" response) is re-read every PREWARM_REFRESH_SECONDS. Inside the
+# off-peak windows (local "HH:MM-HH:MM", may wrap past midnight) the top PREWARM_TOP_N titles are generated
+# for each of PREWARM_VARIANTS in rank order, in the batch lane, into the artifact store the UI reads, until
+# PREWARM_BUDGET dollars (estimator.CostEstimator figures for the stages not cached yet) are spent per window.
+PREWARM_SOURCE = os.environ.get("WIKI_TALKS_PREWARM_SOURCE")
+PREWARM_WINDOWS = ["01:00-06:00"]
+PREWARM_VARIANTS = ["RJ"]
+PREWARM_MODE = "pro"
+PREWARM_TOP_N = 200
+PREWARM_BUDGET = 25.0
+PREWARM_WORKERS = 2
+PREWARM_REFRESH_SECONDS = 900
+# Seconds between checks while outside a window or after a pass
+PREWARM_POLL_SECONDS = 60
+# Titles are turned into article URLs with this prefix (the form users paste into the UI)
+PREWARM_ARTICLE_BASE = "https://en.wikipedia.org/wiki/"
+
+# Background UI Generation (used by background.BackgroundExecutor and app.py)
+# Generations run on a shared thread pool; the page polls their progress every UI_POLL_SECONDS
+UI_BACKGROUND_WORKERS = 4
+UI_POLL_SECONDS = 1.0
+# Finished generations stay available this long for the session that started them
+UI_TASK_KEEP_SECONDS = 600
+# Rough words per dialogue line, used to estimate script progress
+UI_WORDS_PER_LINE = 20
+
+# Telemetry (used by telemetry.Tracer)
+# Spans around scrape / script / audio stages feed latency histograms and counters,
+# exported as OpenMetrics text. Each finished span can also be written as one JSON
+# line to TELEMETRY_TRACE_SINK: a file path (appended) or an http(s) URL (batched POSTs).
+TELEMETRY_ENABLED = os.environ.get("WIKI_TALKS_TELEMETRY", "1") != "0"
+TELEMETRY_TRACE_SINK = os.environ.get("WIKI_TALKS_TRACE_SINK")
+TELEMETRY_TRACE_BATCH = 50
+# URL sinks: spans waiting for the background sender (more are dropped) and the idle time before a partial batch is sent
+TELEMETRY_TRACE_QUEUE = 2000
+TELEMETRY_TRACE_FLUSH_SECONDS = 5.0
+# When set, app.py serves /metrics on this port (job_service.py serves it on its own port)
+TELEMETRY_METRICS_PORT = int(os.environ.get("WIKI_TALKS_METRICS_PORT", "0")) or None
+TELEMETRY_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0, 160.0)
+
+# Benchmarks (used by benchmarks.bench_core and benchmarks.bench_startup)
+# Each benchmark runs BENCHMARK_REPEAT rounds of at least BENCHMARK_MIN_TIME seconds; a result
+# slower or larger than the stored baseline by more than these fractions is flagged as a regression
+BENCHMARK_REPEAT = 5
+BENCHMARK_MIN_TIME = 0.05
+BENCHMARK_TIME_TOLERANCE = 0.25
+BENCHMARK_MEMORY_TOLERANCE = 0.10
+# Flagged benchmarks are re-measured this many times before being reported
+BENCHMARK_RETRIES = 2
+# Entry points timed by the cold-start benchmark, and libraries none of them may import eagerly
+STARTUP_MODULES = ["config", "core_logic", "pipeline", "job_service", "run_local", "prewarm"]
+STARTUP_HEAVY_MODULES = ["streamlit", "google.genai", "wikipediaapi", "requests"]
+
+# Profiling (used by profiling.PipelineProfiler, enabled with run_local.py --profile)
+# Rows per hotspot / allocation table, and stack depth tracemalloc keeps per allocation
+# (deep enough to find this repo's line under requests / urllib3 / json frames; deeper is slower)
+PROFILE_TOP = 15
+PROFILE_TRACEMALLOC_FRAMES = 8
+# Seconds between RSS samples while a job's stages run (its peak RSS is the highest sample)
+PROFILE_RSS_INTERVAL = 0.05
+
+# Load Testing (used by loadtest.standins, loadtest.cassette and loadtest.driver)
+# Stand-in upstream behaviour. Latency is lognormal with the given median / p95 in seconds, plus
+# per_unit seconds per unit of work (Gemini: script line, ElevenLabs: character). error_rate is the
+# fraction answered with a 503; rate_limit (requests/second) and max_concurrency trigger 429s.
+LOADTEST_PROFILES = {
+    "wikipedia": {"median": 0.15, "p95": 0.6, "per_unit": 0.0, "error_rate": 0.0, "rate_limit": None, "max_concurrency": None},
+    "gemini": {"median": 1.5, "p95": 5.0, "per_unit": 0.25, "error_rate": 0.01, "rate_limit": 10, "max_concurrency": None},
+    "elevenlabs": {"median": 1.0, "p95": 3.0, "per_unit": 0.002, "error_rate": 0.01, "rate_limit": None, "max_concurrency": 5},
+}
+# Dialogue lines in each stand-in Gemini script
+LOADTEST_SCRIPT_LINES = 12
+# Record / replay cassettes (loadtest.cassette): response chunks arriving within this many seconds
+# are stored as one, and the recording proxy waits this long for an upstream answer
+CASSETTE_MERGE_SECONDS = 0.02
+CASSETTE_PROXY_TIMEOUT = 300
+
+# Job Service (used by job_service.py)
+# SQLite file holding job state and artifacts
+JOB_DB_PATH = os.environ.get("WIKI_TALKS_JOB_DB", "wiki_talks_jobs.sqlite")
+# When set, app.py submits generations to this service instead of running them in-process
+JOB_SERVICE_URL = os.environ.get("WIKI_TALKS_JOB_SERVICE_URL")
+# Seconds a worker's claim on a job lasts without a heartbeat (renewed every third)
+JOB_LEASE_SECONDS = 60
+# Claims per job before a job whose workers keep dying is marked failed
+JOB_MAX_ATTEMPTS = 3
+
+# Rate Limits & Key Pools (used by ratelimit.KeyPool)
+# Per-key budget shared by every process on this host (token bucket in SCHEDULER_DB_PATH).
+# Units: Gemini = requests, ElevenLabs = characters. burst_seconds sets bucket capacity.
+RATE_LIMITS = {
+    "gemini": {"per_key_per_minute": 60, "burst_seconds": 10},
+    "elevenlabs": {"per_key_per_minute": 20000, "burst_seconds": 30},
+}
+
 # Speaker Names Mapping for each variant
 SPEAKER_NAMES = {
     "RJ": {"Person A": "Ravi", "Person B": "Priya"},
@@ -238,6 +477,24 @@ Do NOT include markdown formatting (```json).
 **Target Length:** Approximately {target_words} words total."""
 }
 
+# Streamlit Secrets Helper Function
+def _streamlit_secret(key_name):
+    """
+    Value from st.secrets, or None
+    
+    Only consulted when streamlit is already imported (the UI); config never
+    imports it, so CLIs and workers don't pay for loading streamlit.
+    """
+    st = sys.modules.get("streamlit")
+    if st is None:
+        return None
+    try:
+        if hasattr(st, 'secrets') and key_name in st.secrets:
+            return st.secrets[key_name]
+    except Exception:
+        pass  # Not in Streamlit context
+    return None
+
 # API Key Helper Function
 def get_api_key(service_name):
     """
@@ -253,13 +510,9 @@ def get_api_key(service_name):
         API key string or None
     """
     # Priority 1: Check Streamlit secrets
-    try:
-        if hasattr(st, 'secrets'):
-            key_name = f"{service_name.upper()}_API_KEY"
-            if key_name in st.secrets:
-                return st.secrets[key_name]
-    except Exception:
-        pass  # Not in Streamlit context
+    secret = _streamlit_secret(f"{service_name.upper()}_API_KEY")
+    if secret:
+        return secret
     
     # Priority 2: Check environment variables
     env_key = f"{service_name.upper()}_API_KEY"
@@ -270,7 +523,46 @@ def get_api_key(service_name):
     # Priority 3: Return None (user will be prompted in UI)
     return None
 
-# API Key Constants (for direct access)
-GEMINI_API_KEY = get_api_key("gemini")
-ELEVEN_API_KEY = get_api_key("elevenlabs")
+# API Key Pool Helper Function
+def get_api_keys(service_name):
+    """
+    Get every configured key for a service with its rate (see RATE_LIMITS for units)
+    
+    Keys come from {SERVICE}_API_KEYS in st.secrets or os.environ, written as
+    "key1=60,key2=30" (rate after "=" is optional). Falls back to the single
+    key from get_api_key with the default rate.
+    
+    Args:
+        service_name: "gemini" or "elevenlabs"
+    
+    Returns:
+        List of (api_key, rate_per_minute) tuples, empty if no key is configured
+    """
+    default_rate = RATE_LIMITS.get(service_name, {}).get("per_key_per_minute", 60)
+    raw = _streamlit_secret(f"{service_name.upper()}_API_KEYS")
+    if raw is None:
+        raw = os.environ.get(f"{service_name.upper()}_API_KEYS")
+    
+    keys = []
+    if raw:
+        entries = raw if isinstance(raw, (list, tuple)) else raw.split(',')
+        for entry in entries:
+            entry = entry.strip()
+            if not entry:
+                continue
+            key, _, rate = entry.partition('=')
+            keys.append((key.strip(), float(rate) if rate else default_rate))
+    if not keys:
+        single = get_api_key(service_name)
+        if single:
+            keys.append((single, default_rate))
+    return keys
+
+# API Key Constants (for direct access), resolved when first read rather than at import
+_KEY_CONSTANTS = {"GEMINI_API_KEY": "gemini", "ELEVEN_API_KEY": "elevenlabs"}
+
+def __getattr__(name):
+    if name in _KEY_CONSTANTS:
+        return get_api_key(_KEY_CONSTANTS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
@@ -3,24 +3,50 @@ Core business logic for The Synthetic Radio Host - Wiki-talks
 Contains WikiScraper, ScriptGenerator, and AudioEngine classes
 """
 
+import base64
+import difflib
+import hashlib
+import itertools
 import json
 import re
-import requests
-from google import genai
-import wikipediaapi  # Package: wikipedia-api (install via: pip install wikipedia-api)
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Iterator, Callable
+import audio_utils
 import config
+import telemetry
+from lazy_import import LazyModule
+from pacing import get_pacing_model
+from prompts import CompiledPrompt, compile_prompt, get_prompt_cache, cache_missing
+
+# Client libraries load on first use; importing core_logic stays cheap for CLIs and workers
+requests = LazyModule("requests")
+genai = LazyModule("google.genai")
+wikipediaapi = LazyModule("wikipediaapi")  # Package: wikipedia-api (install via: pip install wikipedia-api)
 
 
 class WikiScraper:
     """Handles Wikipedia content extraction with error handling"""
     
-    def __init__(self):
+    def __init__(self, api_url: Optional[str] = None):
+        """
+        Initialize WikiScraper
+        
+        Args:
+            api_url: MediaWiki API endpoint (defaults to config.WIKIPEDIA_API_URL, else en.wikipedia.org)
+        """
         self.wiki = wikipediaapi.Wikipedia(
             user_agent='wiki-talks/1.0 (https://github.com/purugoyal-ril/wiki-talks)',
             language='en'
         )
+        api_url = api_url or config.WIKIPEDIA_API_URL
+        if api_url:
+            # wikipediaapi builds https://<language>.wikipedia.org/w/api.php per request in a private
+            # hook; versions without it would silently query the public site instead
+            if not hasattr(type(self.wiki), "_build_url"):
+                raise RuntimeError(f"This wikipedia-api version cannot use a custom API URL ({api_url}); "
+                                   "upgrade it with: pip install -U wikipedia-api")
+            self.wiki._build_url = lambda language: api_url
     
+    @telemetry.traced("scrape", measure=telemetry.text_size)
     def scrape(self, url: str, mode: str = "fast") -> Tuple[Optional[str], Optional[str]]:
         """
         Scrape Wikipedia content from URL
@@ -32,6 +58,7 @@ class WikiScraper:
         Returns:
             Tuple of (content, error_message). content is None if error occurred.
         """
+        telemetry.current_span().set(mode=mode.lower())
         try:
             # Extract page title from URL
             page_title = self._extract_title_from_url(url)
@@ -143,17 +170,76 @@ class WikiScraper:
         return '\n'.join(content_parts)
 
 
+class _JSONArrayStream:
+    """Incremental parser that returns each element of a streamed top-level JSON array once it is complete"""
+    
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._finished = False
+    
+    def feed(self, text: str) -> List:
+        """Add streamed text; returns the array elements completed by it"""
+        self._buffer += text
+        items = []
+        if not self._started:
+            # Skip anything before the array, e.g. a ```json fence
+            start = self._buffer.find("[")
+            if start < 0:
+                return items
+            self._pos = start + 1
+            self._started = True
+        while not self._finished:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\r\n,":
+                self._pos += 1
+            if self._pos >= len(self._buffer):
+                break
+            if self._buffer[self._pos] == "]":
+                self._finished = True
+                break
+            try:
+                item, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                break  # Element not complete yet
+            items.append(item)
+            self._pos = end
+        # Drop consumed text so the buffer only holds the element being written
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        return items
+    
+    def close(self) -> Optional[str]:
+        """Error message if the stream ended before the array was complete"""
+        if not self._started:
+            return "JSON parsing error: response contains no JSON array"
+        if not self._finished:
+            return f"JSON parsing error: incomplete array near: {self._buffer[:80]!r}"
+        return None
+
+
 class ScriptGenerator:
     """Generates Hinglish conversation scripts using Google Gemini"""
     
-    def __init__(self, api_key: str):
+    # Characters of the article put into a full script's prompt (limits tokens)
+    SOURCE_CHARACTERS = 3000
+    
+    def __init__(self, api_key: str, base_url: Optional[str] = None):
         """
         Initialize ScriptGenerator with Gemini API key
         
         Args:
             api_key: Google Gemini API key
+            base_url: Gemini API endpoint (defaults to config.GEMINI_BASE_URL, else Google's)
         """
-        self.client = genai.Client(api_key=api_key)
+        base_url = base_url or config.GEMINI_BASE_URL
+        # Cached prompt prefixes belong to the key's project, so handles are kept per key and endpoint
+        self._cache_scope = hashlib.sha256(f"{api_key}|{base_url}".encode('utf-8')).hexdigest()[:16]
+        if base_url:
+            self.client = genai.Client(api_key=api_key, http_options={"base_url": base_url})
+        else:
+            self.client = genai.Client(api_key=api_key)
         self.model_name = 'gemini-2.5-flash'
         # Store generation config for use in generate_content
         self.generation_config = {
@@ -161,7 +247,9 @@ class ScriptGenerator:
             "temperature": 0.8
         }
     
-    def generate_script(self, text: str, variant: str = "RJ", duration: int = 120) -> Tuple[Optional[List[Dict]], Optional[str]]:
+    @telemetry.traced("script", measure=telemetry.script_size)
+    def generate_script(self, text: str, variant: str = "RJ", duration: int = 120,
+                        preview: bool = False) -> Tuple[Optional[List[Dict]], Optional[str]]:
         """
         Generate Hinglish conversation script from Wikipedia content
 
@@ -169,63 +257,54 @@ class ScriptGenerator:
             text: Wikipedia content text
             variant: "RJ", "Business", or "Teams"
             duration: Target duration in seconds (default 120 for 2 minutes)
+            preview: Generate a short preview within config.PREVIEW_BUDGET instead of a full script
 
         Returns:
             Tuple of (script_json, error_message). script_json is None if error occurred.
         """
+        telemetry.current_span().set(variant=variant, preview=preview)
         try:
-            # Get variant-specific prompt template
-            prompt_template = config.VARIANTS.get(variant, config.VARIANTS["RJ"])
-            
-            # Get speaker names for this variant
-            speaker_names = config.SPEAKER_NAMES.get(variant, config.SPEAKER_NAMES["RJ"])
-            speaker_a = speaker_names["Person A"]
-            speaker_b = speaker_names["Person B"]
-            
-            # Calculate target word count (~150 WPM for conversational)
-            target_words = int((duration / 60) * 150)  # ~300 words for 2 minutes
-            
-            # Format the prompt template with actual values
-            # Limit text to avoid token limits
-            formatted_prompt = prompt_template.format(
-                text=text[:3000],
-                speaker_a=speaker_a,
-                speaker_b=speaker_b,
-                target_words=target_words
-            )
+            with telemetry.span("script.prompt") as span:
+                compiled, prompt = self._build_prompt(text, variant, duration, preview)
+                expected_speakers = compiled.speakers
+                request_config = self._prompt_config(compiled, preview)
+                span.set(input_characters=len(text), prompt_characters=len(compiled.static) + len(prompt),
+                         prompt_cached="cached_content" in request_config)
             
             # Generate script
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=formatted_prompt,
-                config=self.generation_config
-            )
-            
-            # Extract JSON from response
-            script_text = response.text
+            with telemetry.span("script.api", model=self.model_name) as span:
+                response = self._call(self.client.models.generate_content, prompt, compiled, request_config)
+                span.set(**self._token_usage(response))
             
-            # Strip markdown code fences if present
-            script_text = self._strip_markdown(script_text)
-            
-            # Parse JSON
-            script_json = json.loads(script_text)
-            
-            # Validate structure
-            if not isinstance(script_json, list):
-                return None, "Script must be a JSON array"
-            
-            # Get expected speaker names for validation
-            expected_speakers = [speaker_a, speaker_b]
-            
-            # Validate each entry
-            for entry in script_json:
-                if not isinstance(entry, dict):
-                    return None, "Each script entry must be a dictionary"
-                if "speaker" not in entry or "text" not in entry:
-                    return None, "Each entry must have 'speaker' and 'text' fields"
-                if entry["speaker"] not in expected_speakers:
-                    return None, f"Speaker must be '{speaker_a}' or '{speaker_b}' for variant '{variant}', got: {entry['speaker']}"
+            with telemetry.span("script.parse") as span:
+                # Extract JSON from response
+                script_text = response.text
+                span.set(response_characters=len(script_text))
+                
+                # Strip markdown code fences if present
+                script_text = self._strip_markdown(script_text)
+                
+                # Parse JSON
+                if preview:
+                    # A preview may hit max_output_tokens mid-array; keep the lines that are complete
+                    script_json = self._parse_partial(script_text)
+                else:
+                    script_json = json.loads(script_text)
+                
+                # Validate structure
+                if not isinstance(script_json, list):
+                    span.fail("Script must be a JSON array")
+                    return None, "Script must be a JSON array"
+                
+                # Validate each entry
+                for entry in script_json:
+                    error = self._validate_entry(entry, expected_speakers, variant)
+                    if error:
+                        span.fail(error)
+                        return None, error
             
+            if preview:
+                script_json = self._fit_preview_budget(script_json)
             return script_json, None
             
         except json.JSONDecodeError as e:
@@ -233,6 +312,168 @@ class ScriptGenerator:
         except Exception as e:
             return None, f"Error generating script: {str(e)}"
     
+    def stream_script(self, text: str, variant: str = "RJ", duration: int = 120,
+                      preview: bool = False) -> Iterator[Tuple[Optional[Dict], Optional[str]]]:
+        """
+        Generate a script like generate_script, but yield each dialogue line as soon as Gemini has written it
+        
+        Args:
+            text: Wikipedia content text
+            variant: "RJ", "Business", or "Teams"
+            duration: Target duration in seconds (default 120 for 2 minutes)
+            preview: Generate a short preview within config.PREVIEW_BUDGET instead of a full script
+        
+        Yields:
+            Tuples of (line, error_message). After a tuple with an error the stream stops.
+        """
+        # Not a current span: the consumer may resume this generator on another thread
+        span = telemetry.get_tracer().start("script.stream", model=self.model_name, variant=variant, preview=preview)
+        count = 0
+        try:
+            compiled, prompt = self._build_prompt(text, variant, duration, preview)
+            expected_speakers = compiled.speakers
+            request_config = self._prompt_config(compiled, preview)
+            span.set(input_characters=len(text), prompt_characters=len(compiled.static) + len(prompt),
+                     prompt_cached="cached_content" in request_config)
+            parser = _JSONArrayStream()
+            for chunk in self._call(self._open_stream, prompt, compiled, request_config):
+                span.set(**self._token_usage(chunk))
+                for entry in parser.feed(chunk.text or ""):
+                    error = self._validate_entry(entry, expected_speakers, variant)
+                    if error:
+                        span.fail(error)
+                        yield None, error
+                        return
+                    if preview and count >= config.PREVIEW_BUDGET["lines"]:
+                        return
+                    if count == 0:
+                        span.set(first_line_seconds=span.elapsed())
+                    count += 1
+                    yield entry, None
+            error = parser.close()
+            if error and not (preview and count):
+                span.fail(error)
+                yield None, error
+            elif count == 0:
+                span.fail("Script must be a non-empty JSON array")
+                yield None, "Script must be a non-empty JSON array"
+        except Exception as e:
+            span.fail(f"Error generating script: {str(e)}")
+            yield None, f"Error generating script: {str(e)}"
+        finally:
+            span.set(lines=count)
+            telemetry.get_tracer().finish(span)
+    
+    def _build_prompt(self, text: str, variant: str, duration: int, preview: bool = False) -> Tuple[CompiledPrompt, str]:
+        """Variant's precompiled static block and the per-request part; returns (compiled, prompt)"""
+        compiled = compile_prompt(variant)
+        
+        target_words = self.target_words(duration, variant)
+        source_characters = self.SOURCE_CHARACTERS
+        if preview:
+            budget = config.PREVIEW_BUDGET
+            target_words = budget["words"]
+            source_characters = budget["source_characters"]
+        
+        # Limit text to avoid token limits
+        prompt = compiled.render(text[:source_characters], target_words)
+        if preview:
+            prompt += (
+                f"\n\n**Preview Budget:** This is a short preview. Write exactly {budget['lines']} short lines, "
+                f"about {budget['words']} words and under {budget['characters']} characters of dialogue in total."
+            )
+        return compiled, prompt
+    
+    def _prompt_config(self, compiled: CompiledPrompt, preview: bool = False) -> Dict:
+        """Request config carrying the static block: by cached-content handle, or inline as the system instruction"""
+        handle = get_prompt_cache().handle(self.client, self.model_name, self._cache_scope, compiled)
+        if handle:
+            return {**self._request_config(preview), "cached_content": handle}
+        return {**self._request_config(preview), "system_instruction": compiled.static}
+    
+    def _call(self, method: Callable, prompt: str, compiled: CompiledPrompt, request_config: Dict):
+        """Call Gemini; if the cached prefix has expired or was deleted, forget it and resend the block inline"""
+        try:
+            return method(model=self.model_name, contents=prompt, config=request_config)
+        except Exception as e:
+            if "cached_content" not in request_config or not cache_missing(e):
+                raise
+            get_prompt_cache().invalidate(self.model_name, self._cache_scope, compiled)
+            request_config = {key: value for key, value in request_config.items() if key != "cached_content"}
+            return method(model=self.model_name, contents=prompt,
+                          config={**request_config, "system_instruction": compiled.static})
+    
+    def _open_stream(self, **request) -> Iterator:
+        """generate_content_stream that raises request errors here rather than on the first iteration"""
+        stream = iter(self.client.models.generate_content_stream(**request))
+        first = next(stream, None)
+        return stream if first is None else itertools.chain([first], stream)
+    
+    @staticmethod
+    def target_words(duration: int, variant: str = "RJ") -> int:
+        """Words asked for in a full script of duration seconds, at the variant's measured pace (see pacing.PacingModel)"""
+        return get_pacing_model().target_words(variant, duration)  # ~300 words for 2 minutes at 150 WPM
+    
+    @staticmethod
+    def _token_usage(response) -> Dict:
+        """Prompt / output token counts reported by Gemini, for tracing"""
+        usage = getattr(response, "usage_metadata", None)
+        counts = {}
+        for field, name in (("prompt_token_count", "prompt_tokens"), ("candidates_token_count", "output_tokens"),
+                            ("thoughts_token_count", "thinking_tokens"), ("cached_content_token_count", "cached_tokens")):
+            value = getattr(usage, field, None)
+            if isinstance(value, int):
+                counts[name] = value
+        return counts
+    
+    def _request_config(self, preview: bool = False) -> Dict:
+        """Generation config for a request; previews cap output tokens and skip thinking"""
+        if not preview:
+            return self.generation_config
+        return {
+            **self.generation_config,
+            "max_output_tokens": config.PREVIEW_BUDGET["max_output_tokens"],
+            "thinking_config": {"thinking_budget": 0}
+        }
+    
+    @staticmethod
+    def _parse_partial(script_text: str) -> List:
+        """Parse a JSON array, keeping the complete elements of an array cut off by the token cap"""
+        try:
+            return json.loads(script_text)
+        except json.JSONDecodeError:
+            parser = _JSONArrayStream()
+            items = parser.feed(script_text)
+            if not items:
+                raise
+            return items
+    
+    @staticmethod
+    def _fit_preview_budget(script_json: List[Dict]) -> List[Dict]:
+        """Hold a preview to the line and character budget so the TTS request stays preview-sized"""
+        budget = config.PREVIEW_BUDGET
+        fitted = []
+        characters = 0
+        for entry in script_json[:budget["lines"]]:
+            characters += len(entry.get("text", ""))
+            if fitted and characters > budget["characters"]:
+                break
+            fitted.append(entry)
+        return fitted
+    
+    @staticmethod
+    def _validate_entry(entry, expected_speakers: List[str], variant: str) -> Optional[str]:
+        """Error message for a malformed script entry, or None"""
+        if not isinstance(entry, dict):
+            return "Each script entry must be a dictionary"
+        if "speaker" not in entry or "text" not in entry:
+            return "Each entry must have 'speaker' and 'text' fields"
+        if not isinstance(entry["text"], str):
+            return "Each entry's 'text' must be a string"
+        if entry["speaker"] not in expected_speakers:
+            return f"Speaker must be '{expected_speakers[0]}' or '{expected_speakers[1]}' for variant '{variant}', got: {entry['speaker']}"
+        return None
+    
     def _strip_markdown(self, text: str) -> str:
         """Strip markdown code fences from JSON response"""
         # Remove ```json and ``` markers
@@ -249,7 +490,80 @@ class AudioEngine:
         """Initialize AudioEngine"""
         pass
     
-    def generate_dialogue_v3(self, script_json: List[Dict], api_key: str, base_url: Optional[str] = None) -> Tuple[Optional[bytes], Optional[str]]:
+    @staticmethod
+    def character_cost(script_json: List[Dict]) -> int:
+        """
+        Count billable characters for a script (ElevenLabs bills by text characters)
+        
+        Args:
+            script_json: List of dicts with "speaker" and "text" keys
+        
+        Returns:
+            Total number of characters across all lines
+        """
+        return sum(len(line.get("text", "")) for line in script_json)
+    
+    def get_remaining_characters(self, api_key: str) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Ask ElevenLabs how many characters are left on the subscription
+        
+        Args:
+            api_key: ElevenLabs API key
+        
+        Returns:
+            Tuple of (remaining_characters, error_message). remaining_characters is None if error occurred.
+        """
+        try:
+            headers = {"xi-api-key": api_key}
+            response = requests.get(config.ELEVENLABS_SUBSCRIPTION_URL, headers=headers, timeout=30)
+            if response.status_code != 200:
+                return None, f"ElevenLabs API error: {response.status_code}"
+            data = response.json()
+            remaining = int(data.get("character_limit", 0)) - int(data.get("character_count", 0))
+            return max(remaining, 0), None
+        except requests.exceptions.RequestException as e:
+            return None, f"Network error: {str(e)}"
+        except Exception as e:
+            return None, f"Error reading subscription: {str(e)}"
+    
+    @staticmethod
+    def _read_body(response, on_bytes, chunk_size: int = 64 * 1024) -> bytes:
+        """Body of a stream=True response, reporting download progress to on_bytes if given"""
+        if not on_bytes:
+            return response.content
+        total = response.headers.get("Content-Length")
+        total = int(total) if total and str(total).isdigit() else None
+        chunks = []
+        received = 0
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            chunks.append(chunk)
+            received += len(chunk)
+            on_bytes(received, total)
+        return b"".join(chunks)
+    
+    def _build_dialogue_inputs(self, script_json: List[Dict]) -> Tuple[Optional[List[Dict]], Optional[str]]:
+        """Map script lines to ElevenLabs dialogue inputs (text + voice_id)"""
+        dialogue_inputs = []
+        
+        for line in script_json:
+            speaker = line.get("speaker", "Host")
+            text = line.get("text", "")
+            
+            # Look up voice_id from VOICE_CAST
+            voice_id = config.VOICE_CAST.get(speaker)
+            if not voice_id:
+                return None, f"Voice ID not found for speaker: {speaker}"
+            
+            dialogue_inputs.append({
+                "text": text,
+                "voice_id": voice_id
+            })
+        
+        return dialogue_inputs, None
+    
+    @telemetry.traced("audio", measure=telemetry.audio_size)
+    def generate_dialogue_v3(self, script_json: List[Dict], api_key: str, base_url: Optional[str] = None,
+                             on_bytes: Optional[Callable[[int, Optional[int]], None]] = None) -> Tuple[Optional[bytes], Optional[str]]:
         """
         Generate audio using ElevenLabs V3 text-to-dialogue endpoint
         
@@ -257,6 +571,7 @@ class AudioEngine:
             script_json: List of dicts with "speaker" and "text" keys
             api_key: ElevenLabs API key
             base_url: Optional custom base URL (defaults to config.ELEVENLABS_BASE_URL)
+            on_bytes: Optional callback(bytes_received, total_bytes_or_None) while the audio downloads
         
         Returns:
             Tuple of (audio_bytes, error_message). audio_bytes is None if error occurred.
@@ -266,21 +581,9 @@ class AudioEngine:
             url = base_url or config.ELEVENLABS_BASE_URL
             
             # Build dialogue_inputs array
-            dialogue_inputs = []
-            
-            for line in script_json:
-                speaker = line.get("speaker", "Host")
-                text = line.get("text", "")
-                
-                # Look up voice_id from VOICE_CAST
-                voice_id = config.VOICE_CAST.get(speaker)
-                if not voice_id:
-                    return None, f"Voice ID not found for speaker: {speaker}"
-                
-                dialogue_inputs.append({
-                    "text": text,
-                    "voice_id": voice_id
-                })
+            dialogue_inputs, error = self._build_dialogue_inputs(script_json)
+            if error:
+                return None, error
             
             # Prepare API request
             headers = {
@@ -293,8 +596,11 @@ class AudioEngine:
                 "model_id": config.MODEL_ID
             }
             
-            # Make API call
-            response = requests.post(url, json=body, headers=headers, timeout=120)
+            # Make API call; the body is downloaded separately so request and download are timed apart
+            telemetry.current_span().set(lines=len(script_json), characters=self.character_cost(script_json))
+            with telemetry.span("audio.request") as span:
+                response = requests.post(url, json=body, headers=headers, timeout=120, stream=True)
+                span.set(status_code=str(response.status_code))
             
             # Check response
             if response.status_code != 200:
@@ -307,11 +613,150 @@ class AudioEngine:
                 return None, error_msg
             
             # Return binary audio content
-            audio_bytes = response.content
+            with telemetry.span("audio.download") as span:
+                audio_bytes = self._read_body(response, on_bytes)
+                span.set(bytes=len(audio_bytes))
             return audio_bytes, None
             
         except requests.exceptions.RequestException as e:
             return None, f"Network error: {str(e)}"
         except Exception as e:
             return None, f"Error generating audio: {str(e)}"
-
+    
+    @telemetry.traced("audio.segments", measure=telemetry.audio_size)
+    def generate_dialogue_segments(self, script_json: List[Dict], api_key: str, base_url: Optional[str] = None,
+                                   on_bytes: Optional[Callable[[int, Optional[int]], None]] = None) -> Tuple[Optional[List[bytes]], Optional[str]]:
+        """
+        Generate audio in one dialogue call and split it into one MP3 segment per script line
+        
+        Uses the text-to-dialogue/with-timestamps endpoint, whose voice_segments
+        tell where each dialogue input starts and ends. Joining the segments
+        gives the full episode; keeping them lets an edited script be re-rendered
+        line by line (see rerender_dialogue).
+        
+        Args:
+            script_json: List of dicts with "speaker" and "text" keys
+            api_key: ElevenLabs API key
+            base_url: Optional custom base URL (defaults to config.ELEVENLABS_BASE_URL)
+            on_bytes: Optional callback(bytes_received, total_bytes_or_None) while the response downloads
+        
+        Returns:
+            Tuple of (segments, error_message). segments is None if error occurred.
+        """
+        try:
+            if not script_json:
+                return [], None
+            
+            url = (base_url or config.ELEVENLABS_BASE_URL).rstrip("/") + "/with-timestamps"
+            
+            dialogue_inputs, error = self._build_dialogue_inputs(script_json)
+            if error:
+                return None, error
+            
+            headers = {
+                "xi-api-key": api_key,
+                "Content-Type": "application/json"
+            }
+            body = {
+                "inputs": dialogue_inputs,
+                "model_id": config.MODEL_ID
+            }
+            
+            telemetry.current_span().set(lines=len(script_json), characters=self.character_cost(script_json))
+            with telemetry.span("audio.request") as span:
+                response = requests.post(url, json=body, headers=headers, timeout=120, stream=True)
+                span.set(status_code=str(response.status_code))
+            
+            if response.status_code != 200:
+                error_msg = f"ElevenLabs API error: {response.status_code}"
+                try:
+                    error_detail = response.json()
+                    error_msg += f" - {error_detail}"
+                except:
+                    error_msg += f" - {response.text[:200]}"
+                return None, error_msg
+            
+            with telemetry.span("audio.download"):
+                data = json.loads(self._read_body(response, on_bytes)) if on_bytes else response.json()
+            audio_bytes = base64.b64decode(data.get("audio_base64", ""))
+            
+            # Earliest start / latest end of every dialogue input
+            starts, ends = {}, {}
+            for segment in data.get("voice_segments", []):
+                index = segment.get("dialogue_input_index")
+                if index is None:
+                    continue
+                starts[index] = min(starts.get(index, segment["start_time_seconds"]), segment["start_time_seconds"])
+                ends[index] = max(ends.get(index, segment["end_time_seconds"]), segment["end_time_seconds"])
+            
+            # Cut halfway through the gap between consecutive lines
+            boundaries = []
+            for i in range(1, len(script_json)):
+                if i not in starts:
+                    return None, f"ElevenLabs response has no timing for line {i + 1}"
+                previous_end = ends.get(i - 1, starts[i])
+                boundaries.append((previous_end + starts[i]) / 2)
+            
+            return audio_utils.split_mp3(audio_bytes, boundaries), None
+            
+        except requests.exceptions.RequestException as e:
+            return None, f"Network error: {str(e)}"
+        except Exception as e:
+            return None, f"Error generating audio: {str(e)}"
+    
+    @staticmethod
+    def diff_scripts(old_script: List[Dict], new_script: List[Dict]) -> List[Tuple[str, int, int, int, int]]:
+        """
+        Line-by-line diff of two scripts
+        
+        Returns:
+            difflib opcodes (tag, old_start, old_end, new_start, new_end); tag is
+            'equal', 'replace', 'insert' or 'delete'
+        """
+        old_lines = [(line.get("speaker"), line.get("text")) for line in old_script]
+        new_lines = [(line.get("speaker"), line.get("text")) for line in new_script]
+        return difflib.SequenceMatcher(a=old_lines, b=new_lines, autojunk=False).get_opcodes()
+    
+    @staticmethod
+    def changed_lines(old_script: List[Dict], new_script: List[Dict]) -> List[Dict]:
+        """Lines of new_script that must be synthesized again after an edit"""
+        changed = []
+        for tag, _, _, j1, j2 in AudioEngine.diff_scripts(old_script, new_script):
+            if tag in ("replace", "insert"):
+                changed.extend(new_script[j1:j2])
+        return changed
+    
+    def rerender_dialogue(self, old_script: List[Dict], new_script: List[Dict], old_segments: List[bytes],
+                          api_key: str, base_url: Optional[str] = None) -> Tuple[Optional[bytes], Optional[List[bytes]], Optional[str]]:
+        """
+        Re-render an edited script, synthesizing only changed or inserted lines
+        
+        Unchanged lines reuse their segment from the previous render, deleted
+        lines are dropped and every changed block is synthesized with one
+        dialogue call, then everything is spliced back in script order.
+        
+        Args:
+            old_script: Script the old_segments were rendered from
+            new_script: Edited script
+            old_segments: One MP3 segment per line of old_script
+            api_key: ElevenLabs API key
+            base_url: Optional custom base URL (defaults to config.ELEVENLABS_BASE_URL)
+        
+        Returns:
+            Tuple of (audio_bytes, new_segments, error_message). audio_bytes is None if error occurred.
+        """
+        if len(old_segments) != len(old_script):
+            return None, None, "Segments do not match the previous script"
+        
+        new_segments = []
+        for tag, i1, i2, j1, j2 in self.diff_scripts(old_script, new_script):
+            if tag == "equal":
+                new_segments.extend(old_segments[i1:i2])
+            elif tag in ("replace", "insert"):
+                segments, error = self.generate_dialogue_segments(new_script[j1:j2], api_key, base_url)
+                if error:
+                    return None, None, error
+                new_segments.extend(segments)
+            # 'delete': old lines are simply not carried over
+        
+        return audio_utils.join_mp3(new_segments), new_segments, None
@@ -0,0 +1,297 @@
+"""
+Pre-admission cost and latency estimates for The Synthetic Radio Host - Wiki-talks
+Predicts Gemini tokens, ElevenLabs characters, dollars and seconds per stage of a job before any
+upstream call, from the variant, mode, target length and the stage timings of earlier jobs
+
+Usage:
+    python run_local.py --url https://en.wikipedia.org/wiki/Mumbai_Indians --dry-run
+    python run_local.py --batch urls.txt --dry-run
+    curl -X POST localhost:8765/estimate -d '{"url": "...", "variant": "RJ"}'
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Optional, Tuple, Union
+import config
+from artifact_store import ArtifactStore, get_artifact_store
+from coalesce import scrape_key
+from core_logic import ScriptGenerator, AudioEngine
+from pacing import script_counts
+from prompts import compile_prompt, get_prompt_cache
+from scheduler import estimate_tts_cost
+
+
+def _fit_line(samples: List[Tuple[float, float]]) -> Tuple[float, float]:
+    """Least-squares seconds = base + per_unit * units over (units, seconds); flat mean if units do not explain it"""
+    n = len(samples)
+    mean_units = sum(units for units, _ in samples) / n
+    mean_seconds = sum(seconds for _, seconds in samples) / n
+    variance = sum((units - mean_units) ** 2 for units, _ in samples)
+    if variance > 0:
+        per_unit = sum((units - mean_units) * (seconds - mean_seconds) for units, seconds in samples) / variance
+        if per_unit >= 0:
+            return mean_seconds - per_unit * mean_units, per_unit
+    return mean_seconds, 0.0
+
+
+class CostEstimator:
+    """
+    Stage history shared through SQLite, and estimates built from it
+
+    Every finished stage adds one row: stage, kind (scraping mode for
+    scrape, variant for script and audio), units (scraped / script / TTS
+    characters), spoken words and seconds. With config.ESTIMATE_MIN_SAMPLES
+    rows a stage's time is predicted by a line fitted over the last
+    config.ESTIMATE_WINDOW of them; before that config.ESTIMATE_DEFAULTS
+    applies. Seconds are upstream time only, not time spent queueing.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialize CostEstimator
+
+        Args:
+            db_path: SQLite file shared by all processes (defaults to config.SCHEDULER_DB_PATH when used)
+        """
+        self._db_path = db_path
+        self._lock = threading.Lock()
+        self._fits = {}  # (db_path, stage, kind) -> (fitted_at, fit or None)
+
+    @property
+    def db_path(self) -> str:
+        return self._db_path or config.SCHEDULER_DB_PATH
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS stage_history "
+                     "(stage TEXT, kind TEXT, units REAL, words INTEGER, seconds REAL, recorded REAL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS stage_history_recent ON stage_history (stage, kind, recorded)")
+        return conn
+
+    def record(self, stage: str, kind: str, units: float, seconds: float, words: Optional[int] = None):
+        """
+        Add one finished stage to the history
+
+        Args:
+            stage: "scrape", "script" or "audio"
+            kind: Scraping mode for scrape, variant for script and audio
+            units: Scraped characters, script JSON characters or TTS characters
+            seconds: Time the upstream call took
+            words: Spoken words in the script (script and audio)
+        """
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("INSERT INTO stage_history VALUES (?, ?, ?, ?, ?, ?)",
+                             (stage, kind, units, words, seconds, time.time()))
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return  # estimates are advisory; never fail a generation over them
+        with self._lock:
+            self._fits.pop((self.db_path, stage, kind), None)
+
+    def record_result(self, stage: str, kind: str, result: Union[str, List[Dict]], seconds: float):
+        """
+        Add a finished stage from its output
+
+        Args:
+            stage: "scrape" (result: scraped text), "script" or "audio" (result: the script)
+            kind: Scraping mode for scrape, variant for script and audio
+            seconds: Time the upstream call took
+        """
+        if stage == "scrape":
+            self.record(stage, kind, len(result), seconds)
+            return
+        words, _ = script_counts(result)
+        if stage == "script":
+            units = len(json.dumps(result, ensure_ascii=False))
+        else:
+            units = AudioEngine.character_cost(result)
+        self.record(stage, kind, units, seconds, words)
+
+    def fit(self, stage: str, kind: str) -> Optional[Dict]:
+        """
+        Fitted history of a stage (cached for config.ESTIMATE_REFIT_SECONDS)
+
+        Returns:
+            Dict with base, per_unit, mean_units, units_per_word (None without word counts)
+            and samples; None with fewer than config.ESTIMATE_MIN_SAMPLES rows
+        """
+        key = (self.db_path, stage, kind)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._fits.get(key)
+        if cached and now - cached[0] < config.ESTIMATE_REFIT_SECONDS:
+            return cached[1]
+        fitted = None
+        try:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT units, words, seconds FROM stage_history WHERE stage = ? AND kind = ? "
+                    "ORDER BY recorded DESC LIMIT ?",
+                    (stage, kind, config.ESTIMATE_WINDOW)
+                ).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            rows = []
+        if len(rows) >= config.ESTIMATE_MIN_SAMPLES:
+            base, per_unit = _fit_line([(units, seconds) for units, _, seconds in rows])
+            worded = [(units, words) for units, words, _ in rows if words]
+            fitted = {
+                "base": base,
+                "per_unit": per_unit,
+                "mean_units": sum(units for units, _, _ in rows) / len(rows),
+                "units_per_word": sum(u for u, _ in worded) / sum(w for _, w in worded) if worded else None,
+                "samples": len(rows)
+            }
+        with self._lock:
+            self._fits[key] = (now, fitted)
+        return fitted
+
+    def _seconds(self, stage: str, kind: str, units: float) -> Tuple[float, str]:
+        """Predicted seconds for a stage and where the figure came from ("history" or "default")"""
+        fitted = self.fit(stage, kind)
+        if fitted:
+            return max(0.0, fitted["base"] + fitted["per_unit"] * units), "history"
+        default = config.ESTIMATE_DEFAULTS[stage]
+        return default["base"] + default["per_unit"] * units, "default"
+
+    def _units_per_word(self, stage: str, kind: str) -> float:
+        fitted = self.fit(stage, kind)
+        if fitted and fitted["units_per_word"]:
+            return fitted["units_per_word"]
+        return config.ESTIMATE_DEFAULTS[stage]["characters_per_word"]
+
+    def estimate(self, variant: str = "RJ", mode: str = "pro", duration: int = 120, preview: bool = False,
+                 content_length: Optional[int] = None) -> Dict:
+        """
+        Predict what a job will cost and how long each stage will take, without calling any upstream
+
+        Args:
+            variant: "RJ", "Business", or "Teams"
+            mode: "fast" (summary) or "pro" (sections)
+            duration: Target duration in seconds
+            preview: Estimate a preview instead of a full script
+            content_length: Scraped characters, if the article was already scraped (else predicted)
+
+        Returns:
+            Dict with per-stage figures under "stages" and totals: input / output tokens,
+            TTS characters, cost (dollars) and seconds (stages back to back, no queueing)
+        """
+        # Scrape: size of the article (known or typical for the mode) and time to fetch it
+        scraped = self.fit("scrape", mode)
+        if content_length is None:
+            content_length = int(scraped["mean_units"]) if scraped else config.ESTIMATE_DEFAULTS["scrape"]["characters"][mode]
+        scrape_seconds, scrape_basis = self._seconds("scrape", mode, content_length)
+
+        # Script: the variant's static block plus the source text it is cut to; output sized by the target words
+        words = config.PREVIEW_BUDGET["words"] if preview else ScriptGenerator.target_words(duration, variant)
+        source = config.PREVIEW_BUDGET["source_characters"] if preview else ScriptGenerator.SOURCE_CHARACTERS
+        compiled = compile_prompt(variant)
+        prompt_characters = len(compiled.static) + min(content_length, source)
+        script_characters = words * self._units_per_word("script", variant)
+        input_tokens = int(prompt_characters / config.ESTIMATE_CHARACTERS_PER_TOKEN)
+        # A static block held in Gemini's cached content is billed at the cached rate
+        cached_tokens = compiled.static_tokens if get_prompt_cache().applies(compiled) else 0
+        output_tokens = int(script_characters / config.ESTIMATE_CHARACTERS_PER_TOKEN)
+        # Previews run with thinking off
+        thinking_tokens = 0 if preview else config.ESTIMATE_THINKING_TOKENS
+        script_cost = ((input_tokens - cached_tokens) * config.GEMINI_COST_PER_1M_INPUT_TOKENS
+                       + cached_tokens * config.GEMINI_COST_PER_1M_CACHED_TOKENS
+                       + (output_tokens + thinking_tokens) * config.GEMINI_COST_PER_1M_OUTPUT_TOKENS) / 1_000_000
+        script_seconds, script_basis = self._seconds("script", variant, script_characters)
+
+        # Audio: characters ElevenLabs bills for the same words
+        characters = int(words * self._units_per_word("audio", variant))
+        if preview:
+            characters = min(characters, config.PREVIEW_BUDGET["characters"])
+        audio_cost = estimate_tts_cost(characters)
+        audio_seconds, audio_basis = self._seconds("audio", variant, characters)
+
+        stages = {
+            "scrape": {"characters": content_length, "seconds": round(scrape_seconds, 2), "basis": scrape_basis},
+            "script": {"input_tokens": input_tokens, "cached_tokens": cached_tokens, "output_tokens": output_tokens,
+                       "thinking_tokens": thinking_tokens, "cost": round(script_cost, 5), "seconds": round(script_seconds, 2), "basis": script_basis},
+            "audio": {"characters": characters, "cost": round(audio_cost, 5), "seconds": round(audio_seconds, 2),
+                      "basis": audio_basis},
+        }
+        return {
+            "variant": variant,
+            "mode": mode,
+            "duration": duration,
+            "preview": preview,
+            "words": words,
+            "stages": stages,
+            "tokens": input_tokens + output_tokens + thinking_tokens,
+            "characters": characters,
+            "cost": round(script_cost + audio_cost, 5),
+            "seconds": round(scrape_seconds + script_seconds + audio_seconds, 2)
+        }
+
+
+def check_budget(estimate: Dict, max_cost: Optional[float] = None, max_seconds: Optional[float] = None) -> Optional[str]:
+    """Error message if an estimate is over a cost or time limit, else None"""
+    if max_cost is not None and estimate["cost"] > max_cost:
+        return f"Estimated cost ${estimate['cost']:.4f} exceeds the limit of ${max_cost:.4f}"
+    if max_seconds is not None and estimate["seconds"] > max_seconds:
+        return f"Estimated time {estimate['seconds']:.0f}s exceeds the limit of {max_seconds:.0f}s"
+    return None
+
+
+def format_estimate(estimate: Dict) -> str:
+    """Per-stage table for one estimate"""
+    stages = estimate["stages"]
+    script, audio = stages["script"], stages["audio"]
+    cached = f" ({script['cached_tokens']:,} cached)" if script["cached_tokens"] else ""
+    lines = [
+        f"   {'stage':<8} {'seconds':>8} {'cost':>9}  usage",
+        f"   {'scrape':<8} {stages['scrape']['seconds']:>8.1f} {'':>9}  {stages['scrape']['characters']:,} characters "
+        f"({stages['scrape']['basis']})",
+        f"   {'script':<8} {script['seconds']:>8.1f} {'$' + format(script['cost'], '.4f'):>9}  "
+        f"{script['input_tokens']:,} in{cached} / {script['output_tokens'] + script['thinking_tokens']:,} out tokens ({script['basis']})",
+        f"   {'audio':<8} {audio['seconds']:>8.1f} {'$' + format(audio['cost'], '.4f'):>9}  "
+        f"{audio['characters']:,} TTS characters ({audio['basis']})",
+        f"   {'total':<8} {estimate['seconds']:>8.1f} {'$' + format(estimate['cost'], '.4f'):>9}  "
+        f"~{estimate['words']} words",
+    ]
+    return "\n".join(lines)
+
+
+def scraped_length(url: str, mode: str = "pro", store: Optional[ArtifactStore] = None) -> Optional[int]:
+    """
+    Characters of an article already scraped into the artifact store
+
+    Read from the length ArtifactStore.cached keeps beside the memoized scrape,
+    so the article itself is not loaded (the UI asks on every rerun).
+
+    Args:
+        url: Wikipedia URL
+        mode: "fast" or "pro"
+        store: ArtifactStore holding memoized scrapes (defaults to get_artifact_store())
+
+    Returns:
+        Length of the memoized scrape (for CostEstimator.estimate's content_length), or None if it was not scraped yet
+    """
+    if not url:
+        return None
+    meta = (store or get_artifact_store()).metadata(scrape_key(url, mode), max_age=config.SCRAPE_MAX_AGE_SECONDS)
+    return None if meta is None else meta.get("length")
+
+
+_estimator = None
+_estimator_lock = threading.Lock()
+
+
+def get_estimator() -> CostEstimator:
+    """Process-wide CostEstimator on config.SCHEDULER_DB_PATH"""
+    global _estimator
+    with _estimator_lock:
+        if _estimator is None:
+            _estimator = CostEstimator()
+        return _estimator
@@ -0,0 +1,740 @@
+"""
+Asynchronous job service for The Synthetic Radio Host - Wiki-talks
+Small HTTP API (submit, poll, fetch results) in front of a pool of warm pipeline workers.
+Job state and artifacts live in SQLite, so jobs survive browser refreshes and restarts.
+
+Several processes or hosts can share one job database: workers claim jobs with a
+lease that they keep alive with heartbeats, and a job whose worker died is handed
+to another worker once its lease expires.
+
+Usage:
+    python job_service.py --port 8765 --workers 4
+    python job_service.py --worker-only --db /shared/jobs.sqlite --workers 2 --node-limit 4
+    python job_service.py --enqueue urls.txt --db /shared/jobs.sqlite
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Optional, Tuple
+import config
+from lazy_import import LazyModule
+from pipeline import PipelineJob, make_default_stages, run_job_coalesced
+from scheduler import INTERACTIVE, BATCH, get_lane_scheduler, _pid_alive
+from estimator import get_estimator, check_budget, scraped_length
+from telemetry import get_tracer, start_metrics_server, OPENMETRICS_CONTENT_TYPE
+
+# Only JobServiceClient (the UI side) makes HTTP calls
+requests = LazyModule("requests")
+
+
+# Job status values
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    priority TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    lease_owner TEXT,
+    lease_node TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority, created);
+CREATE TABLE IF NOT EXISTS artifacts (
+    job_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (job_id, name)
+);
+"""
+
+# Columns added after the first release of the job store
+_LEASE_COLUMNS = {
+    "lease_owner": "TEXT",
+    "lease_node": "TEXT",
+    "lease_expires": "REAL",
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+}
+
+# Artifact names and the content type they are served with
+ARTIFACT_TYPES = {
+    "content": "text/plain; charset=utf-8",
+    "script": "application/json",
+    "audio": "audio/mpeg",
+}
+
+
+class JobStore:
+    """
+    SQLite-backed job queue and artifact store
+
+    Jobs are claimed with a lease (owner, node, expiry). Results are committed
+    in one transaction that only succeeds while the caller still owns the
+    lease, so even if a slow worker and its replacement both finish a job,
+    exactly one set of artifacts is stored.
+
+    The database may live on a shared filesystem as long as it provides
+    working POSIX locks; otherwise run one SQLite host and point workers at it
+    via the mount of a filesystem that does.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, lease_seconds: Optional[float] = None,
+                 max_attempts: Optional[int] = None):
+        """
+        Initialize JobStore
+
+        Args:
+            db_path: SQLite file (defaults to config.JOB_DB_PATH)
+            lease_seconds: Lease length for claimed jobs (defaults to config.JOB_LEASE_SECONDS)
+            max_attempts: Claims allowed per job before it is failed (defaults to config.JOB_MAX_ATTEMPTS)
+        """
+        self.db_path = db_path or config.JOB_DB_PATH
+        self.lease_seconds = lease_seconds or config.JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or config.JOB_MAX_ATTEMPTS
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        self._migrate(conn)
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """Add lease columns to job stores created before leases existed"""
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, definition in _LEASE_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_lease ON jobs (status, lease_expires)")
+
+    def submit(self, url: str, variant: str = "RJ", mode: str = "pro", duration: int = 120,
+               priority: str = INTERACTIVE) -> str:
+        """
+        Queue a new job
+
+        Returns:
+            The new job id
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO jobs (job_id, url, variant, mode, duration, priority, status, created, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, url, variant, mode, duration, priority, QUEUED, now, now)
+        )
+        conn.close()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Job row plus the names of its stored artifacts (None if unknown)"""
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        names = [r["name"] for r in conn.execute("SELECT name FROM artifacts WHERE job_id = ?", (job_id,))]
+        conn.close()
+        if row is None:
+            return None
+        job = dict(row)
+        job["artifacts"] = sorted(names)
+        return job
+
+    def _expire_leases(self, conn: sqlite3.Connection, now: float):
+        """Re-queue jobs whose worker stopped heartbeating (or fail them after max_attempts)"""
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = 'Lease expired too many times', lease_owner = NULL, updated = ? "
+            "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+            (FAILED, now, RUNNING, now, self.max_attempts)
+        )
+        conn.execute(
+            "UPDATE jobs SET status = ?, lease_owner = NULL, lease_node = NULL, lease_expires = NULL, updated = ? "
+            "WHERE status = ? AND lease_expires < ?",
+            (QUEUED, now, RUNNING, now)
+        )
+
+    def claim_next(self, owner: Optional[str] = None, node: Optional[str] = None,
+                   node_limit: Optional[int] = None) -> Optional[Dict]:
+        """
+        Atomically lease the oldest queued job (interactive jobs first)
+
+        Args:
+            owner: Unique worker id holding the lease
+            node: Host / node name, used for per-node concurrency limits
+            node_limit: Maximum jobs this node may run at once (None = no limit)
+
+        Returns:
+            The claimed job row, or None if nothing may be claimed right now
+        """
+        owner = owner or uuid.uuid4().hex
+        node = node or socket.gethostname()
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._expire_leases(conn, now)
+            if node_limit is not None:
+                running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ? AND lease_node = ?",
+                                       (RUNNING, node)).fetchone()[0]
+                if running >= node_limit:
+                    conn.execute("COMMIT")
+                    return None
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY priority = ? DESC, created LIMIT 1",
+                (QUEUED, INTERACTIVE)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = ?, lease_node = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? WHERE job_id = ?",
+                (RUNNING, owner, node, now + self.lease_seconds, now, row["job_id"])
+            )
+            conn.execute("COMMIT")
+            job = dict(row)
+            job.update(status=RUNNING, lease_owner=owner, lease_node=node, attempts=row["attempts"] + 1)
+            return job
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, job_id: str, owner: str) -> bool:
+        """
+        Extend a lease
+
+        Returns:
+            False if the lease was lost (expired and re-queued, or claimed by someone else)
+        """
+        now = time.time()
+        conn = self._connect()
+        updated = conn.execute(
+            "UPDATE jobs SET lease_expires = ?, updated = ? WHERE job_id = ? AND status = ? AND lease_owner = ?",
+            (now + self.lease_seconds, now, job_id, RUNNING, owner)
+        ).rowcount
+        conn.close()
+        return updated == 1
+
+    def set_stage(self, job_id: str, stage: str, owner: Optional[str] = None):
+        conn = self._connect()
+        if owner:
+            conn.execute("UPDATE jobs SET stage = ?, updated = ? WHERE job_id = ? AND lease_owner = ?",
+                         (stage, time.time(), job_id, owner))
+        else:
+            conn.execute("UPDATE jobs SET stage = ?, updated = ? WHERE job_id = ?", (stage, time.time(), job_id))
+        conn.close()
+
+    def put_artifact(self, job_id: str, name: str, data: bytes):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?)", (job_id, name, sqlite3.Binary(data)))
+        conn.close()
+
+    def get_artifact(self, job_id: str, name: str) -> Optional[bytes]:
+        conn = self._connect()
+        row = conn.execute("SELECT data FROM artifacts WHERE job_id = ? AND name = ?", (job_id, name)).fetchone()
+        conn.close()
+        return bytes(row["data"]) if row else None
+
+    def iter_artifact(self, job_id: str, name: str, chunk_size: int = 65536):
+        """Yield an artifact in chunks without loading the whole blob into memory"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT length(data) AS size FROM artifacts WHERE job_id = ? AND name = ?",
+                               (job_id, name)).fetchone()
+            if row is None:
+                return
+            for offset in range(0, row["size"], chunk_size):
+                chunk = conn.execute("SELECT substr(data, ?, ?) FROM artifacts WHERE job_id = ? AND name = ?",
+                                     (offset + 1, chunk_size, job_id, name)).fetchone()[0]
+                yield bytes(chunk)
+        finally:
+            conn.close()
+
+    def commit(self, job_id: str, owner: str, artifacts: Dict[str, bytes], error: Optional[str] = None,
+               stage: Optional[str] = None) -> bool:
+        """
+        Store a job's artifacts and final status in one transaction, if owner still holds the lease
+
+        Args:
+            job_id: Job to complete
+            owner: Worker id that claimed the job
+            artifacts: Artifact name → bytes (may be partial for failed jobs)
+            error: Error message, or None if the job succeeded
+            stage: Stage that failed
+
+        Returns:
+            True if committed, False if the lease was lost and the result was discarded
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT status, lease_owner FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None or row["status"] != RUNNING or row["lease_owner"] != owner:
+                conn.execute("ROLLBACK")
+                return False
+            for name, data in artifacts.items():
+                conn.execute("INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?)", (job_id, name, sqlite3.Binary(data)))
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, stage = COALESCE(?, stage), lease_owner = NULL, "
+                "lease_expires = NULL, updated = ? WHERE job_id = ?",
+                (FAILED if error else DONE, error, stage, time.time(), job_id)
+            )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def requeue_running(self, node: Optional[str] = None) -> int:
+        """
+        Put jobs left running by a previous (crashed) service back in the queue
+
+        Args:
+            node: Only re-queue jobs leased by this node whose worker process is gone, leaving jobs of
+                  live processes on the same host (e.g. --worker-only) running; None = all running jobs
+        """
+        conn = self._connect()
+        if node:
+            count = 0
+            for row in conn.execute("SELECT job_id, lease_owner FROM jobs WHERE status = ? AND lease_node = ?",
+                                    (RUNNING, node)).fetchall():
+                # Owners are node:pid:worker; anything else is left to lease expiry
+                parts = (row["lease_owner"] or "").rsplit(":", 2)
+                if len(parts) != 3 or not parts[1].isdigit() or _pid_alive(int(parts[1])):
+                    continue
+                count += conn.execute(
+                    "UPDATE jobs SET status = ?, lease_owner = NULL, lease_node = NULL, lease_expires = NULL, "
+                    "updated = ? WHERE job_id = ? AND status = ? AND lease_owner = ?",
+                    (QUEUED, time.time(), row["job_id"], RUNNING, row["lease_owner"])
+                ).rowcount
+        else:
+            count = conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_node = NULL, lease_expires = NULL, updated = ? "
+                "WHERE status = ?",
+                (QUEUED, time.time(), RUNNING)
+            ).rowcount
+        conn.close()
+        return count
+
+    def counts(self) -> Dict[str, int]:
+        conn = self._connect()
+        rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        conn.close()
+        return {row["status"]: row["n"] for row in rows}
+
+
+class JobWorkerPool:
+    """Worker threads that lease jobs from a JobStore and run the pipeline"""
+
+    def __init__(self, store: JobStore, stages: List, workers: int = 2, poll_interval: float = 0.2,
+                 node: Optional[str] = None, node_limit: Optional[int] = None):
+        """
+        Initialize JobWorkerPool
+
+        Args:
+            store: JobStore to claim jobs from
+            stages: Pipeline stages (see pipeline.make_default_stages), built once and kept warm
+            workers: Number of worker threads in this process
+            poll_interval: Seconds to sleep when the queue is empty
+            node: Node name shared by every process on this host (defaults to the hostname)
+            node_limit: Jobs allowed at once across all processes of this node (None = no limit)
+        """
+        self.store = store
+        self.stages = stages
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.node = node or socket.gethostname()
+        self.node_limit = node_limit
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _tracked_stages(self, job_id: str, owner: str) -> List:
+        """Wrap stages so the store shows which stage a job is in"""
+        def wrap(name, fn):
+            def stage(job):
+                self.store.set_stage(job_id, name, owner)
+                return fn(job)
+            return stage
+        return [(name, wrap(name, fn), workers) for name, fn, workers in self.stages]
+
+    def _heartbeat(self, job_id: str, owner: str, done: threading.Event):
+        """Renew the lease every third of its length until the job finishes"""
+        interval = self.store.lease_seconds / 3
+        while not done.wait(interval):
+            if not self.store.heartbeat(job_id, owner):
+                return
+
+    def run_one(self, owner: Optional[str] = None) -> bool:
+        """
+        Claim and run a single job
+
+        Args:
+            owner: Worker id (defaults to node:pid:thread)
+
+        Returns:
+            True if a job was processed, False if nothing could be claimed
+        """
+        owner = owner or f"{self.node}:{os.getpid()}:{threading.get_ident()}"
+        row = self.store.claim_next(owner, self.node, self.node_limit)
+        if row is None:
+            return False
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(row["job_id"], owner, done), daemon=True)
+        heartbeat.start()
+        try:
+            job = PipelineJob(row["url"], row["variant"], row["mode"], job_id=row["job_id"],
+                              duration=row["duration"], priority=row["priority"])
+            run_job_coalesced(job, self._tracked_stages(row["job_id"], owner))
+        finally:
+            done.set()
+            heartbeat.join()
+
+        # Store whatever was produced, even for failed jobs (e.g. the script when audio failed)
+        artifacts = {}
+        if job.content is not None:
+            artifacts["content"] = job.content.encode('utf-8')
+        if job.script_json is not None:
+            artifacts["script"] = json.dumps(job.script_json, ensure_ascii=False).encode('utf-8')
+        if job.audio_bytes is not None:
+            artifacts["audio"] = job.audio_bytes
+        if not self.store.commit(job.job_id, owner, artifacts, job.error, job.failed_stage):
+            print(f"❌ Lease on job {job.job_id} was lost; result discarded")
+        return True
+
+    def _loop(self, index: int):
+        owner = f"{self.node}:{os.getpid()}:{index}"
+        while not self._stop.is_set():
+            try:
+                if not self.run_one(owner):
+                    self._stop.wait(self.poll_interval)
+            except Exception as e:
+                print(f"❌ Job worker error: {str(e)}")
+                self._stop.wait(self.poll_interval)
+
+    def start(self):
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._loop, args=(n,), name=f"job-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def run_until_empty(self):
+        """Run worker threads until no job can be claimed (useful for one-shot batch workers)"""
+        def drain(index: int):
+            owner = f"{self.node}:{os.getpid()}:{index}"
+            while self.run_one(owner):
+                pass
+
+        threads = [threading.Thread(target=drain, args=(n,)) for n in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+def make_handler(store: JobStore):
+    """Build a request handler class bound to a JobStore"""
+
+    class JobRequestHandler(BaseHTTPRequestHandler):
+        """
+        POST /jobs                   {"url", "variant", "mode", "duration", "priority"} → 202 {"job_id"}
+                                     optional "max_cost" (dollars) / "max_seconds": 422 if the estimate is over
+                                     optional "content_length": scraped characters, if the caller knows them
+        POST /estimate               same fields → predicted tokens, characters, cost and seconds per stage
+        GET  /jobs/<id>              → job status JSON
+        GET  /jobs/<id>/<artifact>   → content | script | audio (streamed)
+        GET  /health                 → queue counts and upstream circuit state
+        GET  /metrics                → per-stage latency histograms and counters (OpenMetrics)
+        """
+
+        def _send_json(self, status: int, payload: Dict):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            path = self.path.rstrip('/')
+            if path not in ("/jobs", "/estimate"):
+                self._send_json(404, {"error": "Not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except (ValueError, json.JSONDecodeError) as e:
+                self._send_json(400, {"error": f"Invalid JSON: {str(e)}"})
+                return
+            url = payload.get("url")
+            variant = payload.get("variant", "RJ")
+            mode = payload.get("mode", "pro")
+            priority = payload.get("priority", INTERACTIVE)
+            if not url:
+                self._send_json(400, {"error": "url is required"})
+                return
+            if variant not in config.VARIANTS or mode not in ("fast", "pro") or priority not in (INTERACTIVE, BATCH):
+                self._send_json(400, {"error": "Invalid variant, mode or priority"})
+                return
+            try:
+                duration = int(payload.get("duration", 120))
+                content_length = payload.get("content_length")
+                content_length = None if content_length is None else int(content_length)
+                limits = {name: None if payload.get(name) is None else float(payload[name])
+                          for name in ("max_cost", "max_seconds")}
+            except (TypeError, ValueError):
+                self._send_json(400, {"error": "duration, content_length, max_cost and max_seconds must be numbers"})
+                return
+            if path == "/estimate" or any(limit is not None for limit in limits.values()):
+                # Priced before anything is queued or any upstream is called, from the article's real
+                # length when the caller knows it or it was scraped before
+                if content_length is None:
+                    content_length = scraped_length(url, mode)
+                estimate = get_estimator().estimate(variant, mode, duration, content_length=content_length)
+                if path == "/estimate":
+                    self._send_json(200, estimate)
+                    return
+                error = check_budget(estimate, limits["max_cost"], limits["max_seconds"])
+                if error:
+                    self._send_json(422, {"error": error, "estimate": estimate})
+                    return
+            job_id = store.submit(url, variant, mode, duration, priority)
+            self._send_json(202, {"job_id": job_id, "status": QUEUED})
+
+        def do_GET(self):
+            parts = [part for part in self.path.split('?')[0].split('/') if part]
+            if parts == ["health"]:
+                upstreams = {upstream: get_lane_scheduler(upstream).guard.snapshot() for upstream in ("gemini", "elevenlabs")}
+                self._send_json(200, {"status": "ok", "jobs": store.counts(), "upstreams": upstreams})
+                return
+            if parts == ["metrics"]:
+                body = get_tracer().render_openmetrics().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if len(parts) < 2 or parts[0] != "jobs":
+                self._send_json(404, {"error": "Not found"})
+                return
+            job = store.get(parts[1])
+            if job is None:
+                self._send_json(404, {"error": "Unknown job"})
+                return
+            if len(parts) == 2:
+                self._send_json(200, job)
+                return
+            name = parts[2]
+            if name not in ARTIFACT_TYPES or name not in job["artifacts"]:
+                self._send_json(404, {"error": f"Artifact '{name}' not available", "status": job["status"]})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ARTIFACT_TYPES[name])
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for chunk in store.iter_artifact(job["job_id"], name):
+                self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def log_message(self, format, *args):
+            pass  # keep stdout for job progress
+
+    return JobRequestHandler
+
+
+class JobServiceClient:
+    """Thin HTTP client used by the UI (or scripts) to talk to a running job service"""
+
+    def __init__(self, base_url: str, timeout: float = 10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def submit(self, url: str, variant: str = "RJ", mode: str = "pro", duration: int = 120,
+               priority: str = INTERACTIVE, max_cost: Optional[float] = None,
+               content_length: Optional[int] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Args:
+            max_cost: Reject the job (without queueing it) if its estimated cost in dollars is higher
+            content_length: Scraped characters of the article, if known (sharpens the estimate)
+
+        Returns:
+            Tuple of (job_id, error_message)
+        """
+        payload = {"url": url, "variant": variant, "mode": mode, "duration": duration, "priority": priority}
+        if max_cost is not None:
+            payload["max_cost"] = max_cost
+        if content_length is not None:
+            payload["content_length"] = content_length
+        try:
+            response = requests.post(f"{self.base_url}/jobs", json=payload, timeout=self.timeout)
+            if response.status_code == 422:
+                return None, response.json()["error"]
+            if response.status_code != 202:
+                return None, f"Job service error: {response.status_code} - {response.text[:200]}"
+            return response.json()["job_id"], None
+        except requests.exceptions.RequestException as e:
+            return None, f"Network error: {str(e)}"
+
+    def estimate(self, url: str, variant: str = "RJ", mode: str = "pro", duration: int = 120,
+                 content_length: Optional[int] = None) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Args:
+            content_length: Scraped characters of the article, if known
+
+        Returns:
+            Tuple of (estimate, error_message); see estimator.CostEstimator.estimate
+        """
+        payload = {"url": url, "variant": variant, "mode": mode, "duration": duration}
+        if content_length is not None:
+            payload["content_length"] = content_length
+        try:
+            response = requests.post(f"{self.base_url}/estimate", json=payload, timeout=self.timeout)
+            if response.status_code != 200:
+                return None, f"Job service error: {response.status_code} - {response.text[:200]}"
+            return response.json(), None
+        except requests.exceptions.RequestException as e:
+            return None, f"Network error: {str(e)}"
+
+    def status(self, job_id: str) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Returns:
+            Tuple of (job_status, error_message)
+        """
+        try:
+            response = requests.get(f"{self.base_url}/jobs/{job_id}", timeout=self.timeout)
+            if response.status_code != 200:
+                return None, f"Job service error: {response.status_code}"
+            return response.json(), None
+        except requests.exceptions.RequestException as e:
+            return None, f"Network error: {str(e)}"
+
+    def artifact(self, job_id: str, name: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        Returns:
+            Tuple of (artifact_bytes, error_message)
+        """
+        try:
+            response = requests.get(f"{self.base_url}/jobs/{job_id}/{name}", timeout=120)
+            if response.status_code != 200:
+                return None, f"Job service error: {response.status_code}"
+            return response.content, None
+        except requests.exceptions.RequestException as e:
+            return None, f"Network error: {str(e)}"
+
+
+def _get_keys() -> Tuple[str, str]:
+    gemini_key = config.get_api_key("gemini")
+    eleven_key = config.get_api_key("elevenlabs")
+    if not gemini_key or not eleven_key:
+        raise SystemExit("❌ GEMINI_API_KEY and ELEVENLABS_API_KEY must be set for job workers")
+    return gemini_key, eleven_key
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, workers: int = 2, db_path: Optional[str] = None,
+          node: Optional[str] = None, node_limit: Optional[int] = None):
+    """Start the worker pool and the HTTP API (blocks until interrupted)"""
+    gemini_key, eleven_key = _get_keys()
+
+    store = JobStore(db_path)
+    node = node or socket.gethostname()
+    requeued = store.requeue_running(node)
+    if requeued:
+        print(f"✓ Re-queued {requeued} job(s) interrupted by the last shutdown")
+
+    pool = JobWorkerPool(store, make_default_stages(gemini_key, eleven_key), workers=workers,
+                         node=node, node_limit=node_limit)
+    if workers:
+        pool.start()
+
+    server = ThreadingHTTPServer((host, port), make_handler(store))
+    print(f"✓ Job service listening on http://{host}:{port} with {workers} worker(s), db: {store.db_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.stop(timeout=5)
+
+
+def work(workers: int = 2, db_path: Optional[str] = None, node: Optional[str] = None,
+         node_limit: Optional[int] = None, exit_when_empty: bool = False, metrics_port: Optional[int] = None):
+    """Run only the worker pool against a (shared) job store (blocks until interrupted)"""
+    gemini_key, eleven_key = _get_keys()
+    store = JobStore(db_path)
+    if metrics_port:
+        start_metrics_server(metrics_port)
+        print(f"✓ Metrics on http://127.0.0.1:{metrics_port}/metrics")
+    pool = JobWorkerPool(store, make_default_stages(gemini_key, eleven_key), workers=workers,
+                         node=node, node_limit=node_limit)
+    print(f"✓ Worker node {pool.node} (pid {os.getpid()}) with {workers} worker(s), db: {store.db_path}")
+    if exit_when_empty:
+        pool.run_until_empty()
+        return
+    pool.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop(timeout=5)
+
+
+if __name__ == "__main__":
+    import argparse
+    from pipeline import read_batch_file
+
+    parser = argparse.ArgumentParser(description="The Synthetic Radio Host - Wiki-talks - Job service")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Bind address")
+    parser.add_argument("--port", type=int, default=8765, help="Port")
+    parser.add_argument("--workers", type=int, default=2, help="Pipeline worker threads in this process")
+    parser.add_argument("--db", type=str, default=None, help="SQLite job store (default: config.JOB_DB_PATH)")
+    parser.add_argument("--worker-only", action="store_true", help="Run workers against the job store, no HTTP API")
+    parser.add_argument("--exit-when-empty", action="store_true", help="Worker mode: stop once the queue is drained")
+    parser.add_argument("--node", type=str, default=None, help="Node name for per-node limits (default: hostname)")
+    parser.add_argument("--node-limit", type=int, default=None, help="Jobs this node may run at once across processes")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Worker mode: serve /metrics on this port")
+    parser.add_argument("--enqueue", type=str, default=None, help="Queue every row of a batch file and exit")
+    parser.add_argument("--priority", type=str, choices=[INTERACTIVE, BATCH], default=BATCH,
+                        help="Priority for --enqueue")
+    args = parser.parse_args()
+
+    if args.enqueue:
+        store = JobStore(args.db)
+        count = 0
+        for job in read_batch_file(args.enqueue):
+            store.submit(job.url, job.variant, job.mode, job.duration, args.priority)
+            count += 1
+        print(f"✓ Queued {count} job(s) in {store.db_path}")
+    elif args.worker_only:
+        work(args.workers, args.db, args.node, args.node_limit, args.exit_when_empty, args.metrics_port)
+    else:
+        serve(args.host, args.port, args.workers, args.db, args.node, args.node_limit)
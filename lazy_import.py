@@ -0,0 +1,58 @@
+"""
+Lazy module imports for The Synthetic Radio Host - Wiki-talks
+Heavy client libraries (google.genai, wikipediaapi, requests) are imported on first use, so
+run_local.py --help, forked workers and the tests start without paying for them
+"""
+
+import importlib
+import threading
+
+
+class LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access
+
+    Setting or deleting an attribute is forwarded to the real module, so
+    patch("core_logic.requests.post") patches requests.post exactly as it
+    did when core_logic imported requests eagerly.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize LazyModule
+
+        Args:
+            name: Absolute module name, e.g. "google.genai"
+        """
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    object.__setattr__(self, "_module", importlib.import_module(self._name))
+                module = self._module
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
@@ -0,0 +1,5 @@
+"""
+Load testing for The Synthetic Radio Host - Wiki-talks
+Local stand-ins for Wikipedia, Gemini and ElevenLabs, and a driver that runs episodes against them
+Run with: python -m loadtest.driver
+"""
@@ -0,0 +1,311 @@
+"""
+Record / replay of upstream API traffic for The Synthetic Radio Host - Wiki-talks
+Records real Wikipedia, Gemini and ElevenLabs request / response pairs with their timings into a
+compact cassette file, and serves them back deterministically for offline performance runs
+
+Both modes run local servers that the real clients are pointed at through the endpoint overrides
+in config (like loadtest.standins), so WikiScraper, ScriptGenerator and AudioEngine run unchanged.
+
+Usage:
+    python run_local.py --record cassettes/mumbai.jsonl.gz      # real run, captured
+    python run_local.py --replay cassettes/mumbai.jsonl.gz      # same run, offline
+    python -m loadtest.driver --cassette cassettes/mumbai.jsonl.gz --rate 30
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import List, Dict, Optional
+from urllib.parse import urlencode, urlparse
+import requests
+import config
+from loadtest.standins import StandIns, StandInServer, UpstreamProfile
+
+# Query parameters that carry credentials; never recorded and not part of the match key
+_SECRET_PARAMS = {"key", "api_key", "xi-api-key"}
+# Query parameters naming the article; ignored when a replay falls back to a same-route response
+_SUBJECT_PARAMS = {"titles", "title", "pageids", "page"}
+# Request headers not forwarded upstream (hop-by-hop or rewritten by requests)
+_SKIP_REQUEST_HEADERS = {"host", "content-length", "connection", "accept-encoding", "keep-alive", "transfer-encoding"}
+# Response headers kept in the cassette and replayed
+_KEEP_RESPONSE_HEADERS = {"content-type", "retry-after"}
+
+_DEFAULT_ORIGINS = {
+    "wikipedia": "https://en.wikipedia.org",
+    "gemini": "https://generativelanguage.googleapis.com",
+}
+
+
+def _origin(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def _arrivals(response: requests.Response):
+    """Response body in the pieces it arrives in (iter_content waits for a full buffer on unchunked bodies)"""
+    raw = response.raw
+    if hasattr(raw, "read1"):  # urllib3 >= 2
+        while True:
+            data = raw.read1(65536, decode_content=True)
+            if not data:
+                return
+            yield data
+    else:
+        yield from response.iter_content(chunk_size=None)
+
+
+def _public_query(query: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    return {name: values for name, values in sorted(query.items()) if name.lower() not in _SECRET_PARAMS}
+
+
+class Cassette:
+    """
+    Recorded interactions, stored as gzipped JSON lines
+
+    Each interaction holds the upstream, method, path, public query, a hash
+    of the request body (prompts and scripts are not stored), the status,
+    content type and the response body as timed chunks: [seconds since the
+    request was sent, base64 data]. Chunks arriving close together are
+    merged, so a streamed MP3 is a handful of chunks rather than thousands.
+    """
+
+    def __init__(self, path: str, load: bool = True):
+        """
+        Initialize Cassette
+
+        Args:
+            path: Cassette file (".gz" suffix recommended)
+            load: Read the file if it exists
+        """
+        self.path = path
+        self.interactions = []
+        self._lock = threading.Lock()
+        self._by_key = {}     # match key -> interactions, in recorded order
+        self._by_route = {}   # route key -> interactions, in recorded order
+        self._served = {}     # key -> times served (replays cycle through repeats)
+        if load and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def match_key(upstream: str, method: str, path: str, query: Dict[str, List[str]], body: bytes) -> str:
+        """Exact match: same upstream, method, path, public query and request body"""
+        request = json.dumps([upstream, method, path, _public_query(query)], sort_keys=True)
+        return hashlib.sha256(request.encode('utf-8') + b"\0" + (body or b"")).hexdigest()
+
+    @staticmethod
+    def route_key(upstream: str, method: str, path: str, query: Dict[str, List[str]]) -> str:
+        """Loose match: same endpoint and query shape, any article or request body"""
+        shape = {name: values for name, values in _public_query(query).items() if name.lower() not in _SUBJECT_PARAMS}
+        return json.dumps([upstream, method, path, shape], sort_keys=True)
+
+    def add(self, interaction: Dict):
+        """Append one recorded interaction"""
+        with self._lock:
+            self.interactions.append(interaction)
+            self._index(interaction)
+
+    def _index(self, interaction: Dict):
+        self._by_key.setdefault(interaction["key"], []).append(interaction)
+        route = self.route_key(interaction["upstream"], interaction["method"], interaction["path"], interaction["query"])
+        self._by_route.setdefault(route, []).append(interaction)
+
+    def find(self, upstream: str, method: str, path: str, query: Dict[str, List[str]], body: bytes,
+             strict: bool = True) -> Optional[Dict]:
+        """
+        Recorded response for a request
+
+        Repeats of the same request are answered in recorded order, cycling
+        when the recording runs out, so a replay is deterministic.
+
+        Args:
+            strict: Only exact matches; otherwise fall back to responses recorded for the same endpoint
+                    (lets a load test replay one recorded article under many titles)
+
+        Returns:
+            Interaction dict, or None if nothing matches
+        """
+        key = self.match_key(upstream, method, path, query, body)
+        with self._lock:
+            candidates = self._by_key.get(key)
+            if not candidates and not strict:
+                key = self.route_key(upstream, method, path, query)
+                candidates = self._by_route.get(key)
+            if not candidates:
+                return None
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            return candidates[served % len(candidates)]
+
+    def load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") if self.path.endswith(".gz") else open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self.add(json.loads(line))
+
+    def save(self):
+        """Write every interaction (creates parent directories)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            lines = [json.dumps(interaction, separators=(",", ":")) + "\n" for interaction in self.interactions]
+        with gzip.open(self.path, "wt", encoding="utf-8") if self.path.endswith(".gz") else open(self.path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+
+
+class RecordingProxy(StandInServer):
+    """Forwards requests to the real upstream, streams the answer back and records it with its timing"""
+
+    def __init__(self, name: str, target: str, cassette: Cassette, **kwargs):
+        """
+        Initialize RecordingProxy
+
+        Args:
+            name: Upstream name ("wikipedia", "gemini" or "elevenlabs")
+            target: Upstream origin, e.g. https://api.elevenlabs.io
+            cassette: Cassette receiving the interactions
+        """
+        super().__init__(UpstreamProfile(median=0), **kwargs)
+        self.name = name
+        self.target = target.rstrip("/")
+        self.cassette = cassette
+
+    def respond(self, handler, method, path, query, body) -> bool:
+        headers = {key: value for key, value in handler.headers.items() if key.lower() not in _SKIP_REQUEST_HEADERS}
+        url = self.target + path + (f"?{urlencode(query, doseq=True)}" if query else "")
+        start = time.perf_counter()
+        try:
+            response = requests.request(method, url, data=body or None, headers=headers, stream=True,
+                                        timeout=config.CASSETTE_PROXY_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            self.send_json(handler, 502, self.error_payload(502, f"proxy_error: {e}"))
+            return False
+
+        kept = {key: value for key, value in response.headers.items() if key.lower() in _KEEP_RESPONSE_HEADERS}
+        handler.send_response(response.status_code)
+        for key, value in kept.items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        chunks = []
+        for data in _arrivals(response):
+            handler.wfile.write(data)
+            handler.wfile.flush()
+            offset = time.perf_counter() - start
+            if chunks and offset - chunks[-1][0] < config.CASSETTE_MERGE_SECONDS:
+                chunks[-1][1] += data
+            else:
+                chunks.append([offset, data])
+        handler.close_connection = True
+
+        self.cassette.add({
+            "upstream": self.name,
+            "method": method,
+            "path": path,
+            "query": _public_query(query),
+            "key": Cassette.match_key(self.name, method, path, query, body),
+            "status": response.status_code,
+            "headers": kept,
+            "chunks": [[round(offset, 4), base64.b64encode(data).decode("ascii")] for offset, data in chunks],
+            "elapsed": round(time.perf_counter() - start, 4)
+        })
+        return response.status_code < 400
+
+
+class ReplayServer(StandInServer):
+    """Answers requests from a cassette, optionally at the recorded pace"""
+
+    def __init__(self, name: str, cassette: Cassette, latency: bool = True, time_scale: float = 1.0,
+                 strict: bool = True, profile: Optional[UpstreamProfile] = None, **kwargs):
+        """
+        Initialize ReplayServer
+
+        Args:
+            name: Upstream name ("wikipedia", "gemini" or "elevenlabs")
+            cassette: Recorded interactions
+            latency: Wait the recorded time before each chunk (False = answer immediately)
+            time_scale: Multiplier on recorded delays
+            strict: Only exact request matches (see Cassette.find)
+            profile: Optional extra behaviour on top (rate limits, injected errors)
+        """
+        super().__init__(profile or UpstreamProfile(median=0), **kwargs)
+        self.name = name
+        self.cassette = cassette
+        self.latency = latency
+        self.time_scale = time_scale
+        self.strict = strict
+        self.stats["missed"] = 0
+
+    def respond(self, handler, method, path, query, body) -> bool:
+        interaction = self.cassette.find(self.name, method, path, query, body, strict=self.strict)
+        if interaction is None:
+            with self._lock:
+                self.stats["missed"] += 1
+            self.send_json(handler, 501, self.error_payload(501, "not_recorded"))
+            return False
+
+        start = time.perf_counter()
+        handler.send_response(interaction["status"])
+        for key, value in interaction["headers"].items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        for offset, data in interaction["chunks"]:
+            if self.latency:
+                delay = start + offset * self.time_scale - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            handler.wfile.write(base64.b64decode(data))
+            handler.wfile.flush()
+        handler.close_connection = True
+        return interaction["status"] < 400
+
+
+class CassetteServers(StandIns):
+    """
+    Recording proxies or replay servers for all three upstreams, pointed to by config
+
+    Use as a context manager; in record mode the cassette is saved on exit.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", latency: bool = True, time_scale: float = 1.0,
+                 strict: bool = True, profiles: Optional[Dict[str, UpstreamProfile]] = None):
+        """
+        Initialize CassetteServers
+
+        Args:
+            path: Cassette file
+            mode: "record" (forward to the endpoints currently in config) or "replay"
+            latency: Replay at the recorded pace
+            time_scale: Multiplier on recorded delays
+            strict: Replay exact matches only
+            profiles: Optional rate-limit / error profile per upstream on top of the replay
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if mode == "replay" and not os.path.exists(path):
+            raise FileNotFoundError(f"No cassette at {path}; record one first")
+        self.mode = mode
+        # Recording starts fresh: appending to an old cassette would mix runs
+        self.cassette = Cassette(path, load=mode == "replay")
+        if mode == "record":
+            targets = {
+                "wikipedia": _origin(config.WIKIPEDIA_API_URL) if config.WIKIPEDIA_API_URL else _DEFAULT_ORIGINS["wikipedia"],
+                "gemini": (config.GEMINI_BASE_URL or _DEFAULT_ORIGINS["gemini"]).rstrip("/"),
+                "elevenlabs": _origin(config.ELEVENLABS_BASE_URL)
+            }
+            self.wikipedia, self.gemini, self.elevenlabs = (
+                RecordingProxy(name, targets[name], self.cassette) for name in ("wikipedia", "gemini", "elevenlabs"))
+        else:
+            profiles = profiles or {}
+            self.wikipedia, self.gemini, self.elevenlabs = (
+                ReplayServer(name, self.cassette, latency, time_scale, strict, profiles.get(name))
+                for name in ("wikipedia", "gemini", "elevenlabs"))
+        self._saved = None
+
+    def stop(self):
+        super().stop()
+        if self.mode == "record":
+            self.cassette.save()
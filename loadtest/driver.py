@@ -0,0 +1,313 @@
+"""
+End-to-end load driver for The Synthetic Radio Host - Wiki-talks
+Runs scrape → script → audio episodes at a target rate against the local stand-ins and reports
+throughput, per-stage latency percentiles, upstream throttling and resource usage
+
+Usage:
+    python -m loadtest.driver --rate 30 --duration 60
+    python -m loadtest.driver --sweep 10,20,40,80 --duration 30 --time-scale 0.2
+    python -m loadtest.driver --cassette cassettes/mumbai.jsonl.gz --rate 30 --duration 60
+"""
+
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
+import config
+from loadtest.cassette import CassetteServers
+from loadtest.standins import StandIns, UpstreamProfile
+from pipeline import PipelineJob, make_default_stages, run_job
+from profiling import rss_bytes
+from ratelimit import KeyPool
+from scheduler import get_lane_scheduler, BATCH
+from telemetry import get_tracer
+
+STAGES = ("scrape", "script", "audio")
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0..100), or None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+class ResourceSampler:
+    """Samples this process's CPU use, resident memory and thread count in the background"""
+
+    def __init__(self, interval: float = 0.5):
+        """
+        Initialize ResourceSampler
+
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        last_wall, last_cpu = time.perf_counter(), time.process_time()
+        while not self._stop.wait(self.interval):
+            wall, cpu = time.perf_counter(), time.process_time()
+            self.samples.append({
+                "cpu_percent": 100 * (cpu - last_cpu) / max(wall - last_wall, 1e-9),
+                "rss_bytes": rss_bytes(),
+                "threads": threading.active_count()
+            })
+            last_wall, last_cpu = wall, cpu
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Dict:
+        """Stop sampling and summarize"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        cpu = [s["cpu_percent"] for s in self.samples]
+        return {
+            "cpu_percent_mean": sum(cpu) / len(cpu) if cpu else 0.0,
+            "cpu_percent_max": max(cpu, default=0.0),
+            "rss_peak_bytes": max((s["rss_bytes"] for s in self.samples), default=rss_bytes()),
+            "threads_max": max((s["threads"] for s in self.samples), default=threading.active_count())
+        }
+
+
+class LoadDriver:
+    """
+    Open-loop load generator: episodes arrive at a target rate whether or not
+    earlier ones have finished, the way independent users would. Each episode
+    runs the production stages (make_default_stages: key pools, priority
+    lanes, circuit breakers, coalescing) on a worker thread, so queueing in
+    front of a saturated upstream shows up as latency and failures.
+    """
+
+    def __init__(self, rate_per_minute: float, duration: float, max_in_flight: int = 64, variant: str = "RJ",
+                 mode: str = "pro", keys: int = 1, arrivals: str = "poisson", seed: Optional[int] = None):
+        """
+        Initialize LoadDriver
+
+        Args:
+            rate_per_minute: Offered episodes per minute
+            duration: Seconds during which new episodes arrive
+            max_in_flight: Worker threads running episodes (later arrivals queue)
+            variant: Script variant for every episode
+            mode: "fast" or "pro" scraping
+            keys: Fake API keys per service (each with the config.RATE_LIMITS budget)
+            arrivals: "poisson" (random gaps) or "uniform" (fixed gaps)
+            seed: Random seed for arrival times
+        """
+        self.rate_per_minute = rate_per_minute
+        self.duration = duration
+        self.max_in_flight = max_in_flight
+        self.variant = variant
+        self.mode = mode
+        self.keys = keys
+        self.arrivals = arrivals
+        self._rng = random.Random(seed)
+
+    def _pool(self, service: str) -> KeyPool:
+        per_minute = config.RATE_LIMITS[service]["per_key_per_minute"]
+        return KeyPool(service, [(f"loadtest-{service}-{i}", per_minute) for i in range(self.keys)])
+
+    def _arrival_times(self) -> List[float]:
+        interval = 60.0 / self.rate_per_minute
+        times, t = [], 0.0
+        while True:
+            t += self._rng.expovariate(1 / interval) if self.arrivals == "poisson" else interval
+            if t > self.duration:
+                return times
+            times.append(t)
+
+    def run(self) -> Dict:
+        """
+        Offer load for the configured duration and wait for every episode to finish
+
+        Returns:
+            Report dict (see format_report)
+        """
+        stages = make_default_stages("loadtest", "loadtest", gemini_pool=self._pool("gemini"),
+                                     eleven_pool=self._pool("elevenlabs"))
+        results = []
+        results_lock = threading.Lock()
+        run_id = f"{time.time():.0f}"
+
+        def episode(index: int, scheduled: float):
+            # Unique titles, so coalescing never merges two episodes
+            job = PipelineJob(f"https://en.wikipedia.org/wiki/Loadtest_{run_id}_{index}", self.variant, self.mode,
+                              priority=BATCH)
+            started = time.perf_counter()
+            run_job(job, stages)
+            finished = time.perf_counter()
+            with results_lock:
+                results.append({
+                    "ok": job.ok,
+                    "failed_stage": job.failed_stage,
+                    "error": job.error,
+                    "queued": started - scheduled,
+                    "latency": finished - scheduled,
+                    "finished": finished,
+                    "timings": dict(job.timings)
+                })
+
+        get_tracer().reset()
+        sampler = ResourceSampler()
+        sampler.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="episode") as pool:
+            for index, offset in enumerate(self._arrival_times()):
+                delay = start + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(episode, index, start + offset)
+        resources = sampler.stop()
+        return self._report(results, start, resources)
+
+    def _report(self, results: List[Dict], start: float, resources: Dict) -> Dict:
+        ok = [r for r in results if r["ok"]]
+        end = max((r["finished"] for r in results), default=start)
+        elapsed = max(end - start, 1e-9)
+        errors = {}
+        for r in results:
+            if not r["ok"]:
+                key = f"{r['failed_stage']}: {(r['error'] or '')[:60]}"
+                errors[key] = errors.get(key, 0) + 1
+
+        def summarize(values: List[float]) -> Dict:
+            return {"p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99),
+                    "max": max(values, default=None)}
+
+        spans = get_tracer().summary()
+        return {
+            "offered_per_minute": self.rate_per_minute,
+            "episodes": len(results),
+            "completed": len(ok),
+            "failed": len(results) - len(ok),
+            "elapsed_seconds": elapsed,
+            "throughput_per_minute": 60 * len(ok) / elapsed,
+            "latency": summarize([r["latency"] for r in ok]),
+            "queued": summarize([r["queued"] for r in results]),
+            "stages": {stage: summarize([r["timings"][stage] for r in ok if stage in r["timings"]]) for stage in STAGES},
+            "spans": {name: {"count": s["count"], "errors": s["errors"], "p50": s["p50"], "p95": s["p95"], "p99": s["p99"]}
+                      for name, s in sorted(spans.items())},
+            "errors": dict(sorted(errors.items(), key=lambda item: -item[1])),
+            "circuits": {upstream: get_lane_scheduler(upstream).guard.snapshot() for upstream in ("gemini", "elevenlabs")},
+            "resources": resources
+        }
+
+
+def _seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}s"
+
+
+def format_report(report: Dict) -> str:
+    """Human-readable summary of one LoadDriver report"""
+    lines = [
+        f"Offered {report['offered_per_minute']:g}/min → completed {report['completed']}/{report['episodes']} "
+        f"in {report['elapsed_seconds']:.1f}s = {report['throughput_per_minute']:.1f} episodes/min",
+        f"  end-to-end  p50 {_seconds(report['latency']['p50'])}  p95 {_seconds(report['latency']['p95'])}  "
+        f"p99 {_seconds(report['latency']['p99'])}  (waiting for a worker p95 {_seconds(report['queued']['p95'])})",
+    ]
+    for stage, stats in report["stages"].items():
+        lines.append(f"  {stage:<10}  p50 {_seconds(stats['p50'])}  p95 {_seconds(stats['p95'])}  p99 {_seconds(stats['p99'])}")
+    for name, stats in report["spans"].items():
+        lines.append(f"    span {name:<16} x{stats['count']:<5} p50 {_seconds(stats['p50'])}  p95 {_seconds(stats['p95'])}  "
+                     f"p99 {_seconds(stats['p99'])}" + (f"  {stats['errors']} failed" if stats["errors"] else ""))
+    for upstream, stats in report.get("upstreams", {}).items():
+        lines.append(f"  {upstream:<10}  requests {stats['requests']}  429s {stats['throttled']}  5xx {stats['errors']}  "
+                     f"peak concurrency {stats['max_in_flight']}"
+                     + (f"  not in cassette {stats['missed']}" if stats.get("missed") else ""))
+    for upstream, guard in report["circuits"].items():
+        lines.append(f"  {upstream:<10}  circuit {guard['state']} (opened {guard['stats'].get('opened', 0)}x), "
+                     f"concurrency limit {guard['limit']:g}/{guard['max_limit']}")
+    resources = report["resources"]
+    lines.append(f"  resources   CPU mean {resources['cpu_percent_mean']:.0f}% / max {resources['cpu_percent_max']:.0f}%  "
+                 f"RSS peak {resources['rss_peak_bytes'] / 2**20:.0f} MiB  threads max {resources['threads_max']}")
+    for error, count in list(report["errors"].items())[:5]:
+        lines.append(f"  ❌ {count}x {error}")
+    return "\n".join(lines)
+
+
+def run_load(rates: List[float], duration: float, time_scale: float = 1.0, max_in_flight: int = 64,
+             variant: str = "RJ", mode: str = "pro", keys: int = 1, seed: Optional[int] = None,
+             profiles: Optional[Dict[str, UpstreamProfile]] = None, cassette: Optional[str] = None) -> List[Dict]:
+    """
+    Start the stand-ins and run one LoadDriver per offered rate
+
+    Lane slots and rate-limit buckets go to a temporary scheduler database,
+    so a load test never takes capacity from a real app on the same host.
+
+    Args:
+        cassette: Replay this recording (loadtest.cassette) instead of synthetic stand-ins; every
+                  episode gets the recorded responses at the recorded latencies times time_scale
+
+    Returns:
+        One report per rate, each with the stand-ins' request / 429 / 5xx counts for that run
+    """
+    config.SCHEDULER_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="wiki_talks_loadtest-"), "scheduler.sqlite")
+    if cassette:
+        # Episodes use their own titles, so replay falls back to responses recorded for the same endpoint
+        servers = CassetteServers(cassette, "replay", time_scale=time_scale, strict=False, profiles=profiles)
+    else:
+        servers = StandIns(profiles or {name: UpstreamProfile.from_config(name, time_scale=time_scale, seed=seed)
+                                        for name in config.LOADTEST_PROFILES})
+    reports = []
+    with servers as standins:
+        for rate in rates:
+            before = standins.snapshot()
+            report = LoadDriver(rate, duration, max_in_flight, variant, mode, keys, seed=seed).run()
+            after = standins.snapshot()
+            # Counters for this rate only; peak concurrency is since start
+            report["upstreams"] = {name: {key: value if key == "max_in_flight" else value - before[name].get(key, 0)
+                                          for key, value in stats.items() if key != "in_flight"}
+                                   for name, stats in after.items()}
+            reports.append(report)
+    return reports
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="The Synthetic Radio Host - Wiki-talks - Load driver")
+    parser.add_argument("--rate", type=float, default=30, help="Offered episodes per minute")
+    parser.add_argument("--sweep", type=str, default=None, help="Comma-separated rates to run one after another")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of arrivals per rate")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplier on every stand-in delay")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Episodes running at once")
+    parser.add_argument("--keys", type=int, default=1, help="Fake API keys per service")
+    parser.add_argument("--variant", type=str, choices=list(config.VARIANTS), default="RJ")
+    parser.add_argument("--mode", type=str, choices=["fast", "pro"], default="pro")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed (arrivals and stand-in behaviour)")
+    parser.add_argument("--cassette", type=str, default=None,
+                        help="Replay recorded traffic (python run_local.py --record ...) instead of synthetic stand-ins")
+    parser.add_argument("--json", type=str, default=None, help="Write the full reports to this file")
+    args = parser.parse_args()
+
+    rates = [float(rate) for rate in args.sweep.split(",")] if args.sweep else [args.rate]
+    print("=" * 60)
+    print(f"The Synthetic Radio Host - Wiki-talks - Load Test ({'replayed cassette' if args.cassette else 'stand-in upstreams'})")
+    print("=" * 60)
+    reports = run_load(rates, args.duration, args.time_scale, args.max_in_flight, args.variant, args.mode,
+                       args.keys, args.seed, cassette=args.cassette)
+    for report in reports:
+        print(format_report(report))
+        print("-" * 60)
+    if len(reports) > 1:
+        # Saturation: the first rate where completed throughput falls clearly behind the offered rate
+        saturated = next((r for r in reports if r["throughput_per_minute"] < 0.9 * r["offered_per_minute"] or r["failed"]), None)
+        best = max(reports, key=lambda r: r["throughput_per_minute"])
+        print(f"Peak throughput: {best['throughput_per_minute']:.1f} episodes/min at {best['offered_per_minute']:g}/min offered")
+        if saturated:
+            print(f"Saturates at ~{saturated['offered_per_minute']:g}/min offered")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2, default=str)
+        print(f"✓ Reports written to: {args.json}")
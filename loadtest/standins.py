@@ -0,0 +1,503 @@
+"""
+Local stand-ins for the upstream APIs used by The Synthetic Radio Host - Wiki-talks
+Imitate the MediaWiki extracts API, Gemini generateContent / streamGenerateContent / cachedContents and
+ElevenLabs text-to-dialogue with configurable latency, error rates and 429 behaviour
+
+Point the real clients at them with config.WIKIPEDIA_API_URL, config.GEMINI_BASE_URL and
+config.ELEVENLABS_BASE_URL (see loadtest.driver), so load tests burn no quota.
+
+Usage:
+    python -m loadtest.standins            # serve all three until interrupted
+"""
+
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+import config
+from benchmarks import fixtures
+
+# One MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, 417 bytes, 1152 samples
+_MP3_FRAME = b"\xff\xfb\x90\x00" + bytes(413)
+_FRAME_SECONDS = 1152 / 44100
+# Spoken characters per second of generated audio (~150 words per minute)
+_CHARACTERS_PER_SECOND = 15
+# Openers that give stand-in lines enough Hindi to pass the script quality gate
+_HINGLISH_OPENERS = ["Arre yaar, sach mein,", "Haan bhai, bilkul sahi,", "Achha suno, yeh dekho,", "Matlab kya hai yaar,"]
+
+
+class UpstreamProfile:
+    """How a stand-in behaves: latency distribution, random failures and rate / concurrency limits"""
+
+    def __init__(self, median: float = 0.1, p95: Optional[float] = None, per_unit: float = 0.0,
+                 error_rate: float = 0.0, rate_limit: Optional[float] = None,
+                 max_concurrency: Optional[int] = None, time_scale: float = 1.0, seed: Optional[int] = None):
+        """
+        Initialize UpstreamProfile
+
+        Args:
+            median: Median base latency in seconds (lognormal)
+            p95: 95th percentile of the base latency (defaults to 2x median)
+            per_unit: Extra seconds per unit of work (Gemini: script line, ElevenLabs: character)
+            error_rate: Fraction of admitted requests answered with a 5xx
+            rate_limit: Requests per second before answering 429 (None = unlimited)
+            max_concurrency: Requests in flight before answering 429 (None = unlimited)
+            time_scale: Multiplier on every delay (e.g. 0.1 for quick runs)
+            seed: Random seed for reproducible runs
+        """
+        self.median = median
+        self.p95 = p95 or median * 2
+        self.per_unit = per_unit
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.max_concurrency = max_concurrency
+        self.time_scale = time_scale
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, upstream: str, **overrides) -> "UpstreamProfile":
+        """Profile from config.LOADTEST_PROFILES[upstream] with keyword overrides"""
+        return cls(**{**config.LOADTEST_PROFILES[upstream], **overrides})
+
+    def latency(self, units: float = 0) -> float:
+        """Sample one response time in seconds"""
+        # Lognormal with the given median and p95: p95 = median * exp(1.645 * sigma)
+        sigma = math.log(max(self.p95 / self.median, 1.0)) / 1.645 if self.median > 0 else 0.0
+        with self._lock:
+            base = self.median * math.exp(self._rng.gauss(0, sigma)) if self.median > 0 else 0.0
+        return (base + self.per_unit * units) * self.time_scale
+
+    def fails(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+
+class StandInServer:
+    """
+    Base class for a stand-in upstream on a local port
+
+    Every request passes admission first: over the concurrency limit or out
+    of rate-limit tokens it gets a 429 with Retry-After, a random fraction
+    gets a 5xx after a short delay, the rest are handed to respond().
+    """
+
+    name = "upstream"
+
+    def __init__(self, profile: Optional[UpstreamProfile] = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Initialize StandInServer
+
+        Args:
+            profile: Behaviour (defaults to UpstreamProfile.from_config(self.name))
+            host: Bind address
+            port: Port (0 = any free port)
+        """
+        self.profile = profile or UpstreamProfile.from_config(self.name)
+        self.host = host
+        self.port = port
+        self._server = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._tokens = self.profile.rate_limit or 0.0
+        self._refilled = time.monotonic()
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0, "max_in_flight": 0}
+
+    # Lifecycle
+
+    def start(self) -> str:
+        """Start serving from a daemon thread; returns the base URL"""
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                standin._dispatch(self, "GET")
+
+            def do_POST(self):
+                standin._dispatch(self, "POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_port
+        threading.Thread(target=self._server.serve_forever, name=f"standin-{self.name}", daemon=True).start()
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "in_flight": self._in_flight}
+
+    # Admission
+
+    def _admit(self) -> Optional[str]:
+        """None if the request may proceed, otherwise the 429 reason"""
+        profile = self.profile
+        with self._lock:
+            self.stats["requests"] += 1
+            if profile.max_concurrency is not None and self._in_flight >= profile.max_concurrency:
+                self.stats["throttled"] += 1
+                return "too_many_concurrent_requests"
+            if profile.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(profile.rate_limit, self._tokens + (now - self._refilled) * profile.rate_limit)
+                self._refilled = now
+                if self._tokens < 1:
+                    self.stats["throttled"] += 1
+                    return "rate_limit_exceeded"
+                self._tokens -= 1
+            self._in_flight += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+        return None
+
+    def _release(self, ok: bool):
+        with self._lock:
+            self._in_flight -= 1
+            self.stats["ok" if ok else "errors"] += 1
+
+    def _dispatch(self, handler: BaseHTTPRequestHandler, method: str):
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+        parsed = urlparse(handler.path)
+        throttled = self._admit()
+        if throttled:
+            self.send_json(handler, 429, self.error_payload(429, throttled), {"Retry-After": "1"})
+            return
+        ok = False
+        try:
+            if self.profile.fails():
+                time.sleep(self.profile.latency())
+                self.send_json(handler, 503, self.error_payload(503, "service_unavailable"))
+                return
+            ok = self.respond(handler, method, parsed.path, parse_qs(parsed.query), body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client gave up (timeout); nothing to answer
+        finally:
+            self._release(ok)
+
+    # Responses
+
+    @staticmethod
+    def send_json(handler: BaseHTTPRequestHandler, status: int, payload: Dict, headers: Optional[Dict] = None):
+        StandInServer.send_bytes(handler, status, json.dumps(payload).encode('utf-8'), "application/json", headers)
+
+    @staticmethod
+    def send_bytes(handler: BaseHTTPRequestHandler, status: int, data: bytes, content_type: str,
+                   headers: Optional[Dict] = None):
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def error_payload(self, status: int, reason: str) -> Dict:
+        return {"error": {"code": status, "status": reason}}
+
+    def respond(self, handler: BaseHTTPRequestHandler, method: str, path: str, query: Dict[str, List[str]],
+                body: bytes) -> bool:
+        """Answer an admitted request; returns True for a successful response"""
+        raise NotImplementedError
+
+
+def article_text(title: str, size: str = "long") -> str:
+    """Deterministic article for a title, in the wiki extract format (== Section == headings)"""
+    page = fixtures.make_article(size)
+    digest = int(hashlib.sha256(title.encode('utf-8')).hexdigest()[:8], 16)
+    parts = [f"{title} {page.summary}"]
+
+    def add(sections, level):
+        for section in sections:
+            marks = "=" * level
+            parts.append(f"\n\n{marks} {section.title} {digest % 97} {marks}\n{section.text}")
+            add(section.sections, level + 1)
+
+    add(page.sections, 2)
+    return "".join(parts)
+
+
+class WikipediaStandIn(StandInServer):
+    """MediaWiki action API: query with prop=extracts / info for any title"""
+
+    name = "wikipedia"
+
+    def __init__(self, profile: Optional[UpstreamProfile] = None, article_size: str = "long", **kwargs):
+        super().__init__(profile, **kwargs)
+        self.article_size = article_size
+
+    def respond(self, handler, method, path, query, body) -> bool:
+        time.sleep(self.profile.latency())
+        titles = (query.get("titles") or [""])[0]
+        pages = {}
+        for i, title in enumerate(filter(None, titles.split("|"))):
+            page_id = int(hashlib.sha256(title.encode('utf-8')).hexdigest()[:6], 16)
+            pages[str(page_id)] = {
+                "pageid": page_id,
+                "ns": 0,
+                "title": title,
+                "extract": article_text(title, self.article_size),
+                "contentmodel": "wikitext",
+                "pagelanguage": "en",
+                "touched": "2026-01-01T00:00:00Z",
+                "lastrevid": page_id,
+                "length": 50000,
+                "fullurl": f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}",
+            }
+        self.send_json(handler, 200, {"batchcomplete": "", "query": {"pages": pages}})
+        return True
+
+
+class GeminiStandIn(StandInServer):
+    """
+    Gemini generateContent and streamGenerateContent (SSE) returning a valid dialogue script
+
+    cachedContents uploads are kept in memory until their ttl runs out; a
+    request naming an unknown or expired one gets Gemini's 404.
+    """
+
+    name = "gemini"
+    _PATH = re.compile(r"/models/([^/:]+):(generateContent|streamGenerateContent)$")
+    _CACHE_PATH = re.compile(r"/cachedContents(?:/([^/:]+))?$")
+
+    def __init__(self, profile: Optional[UpstreamProfile] = None, lines: Optional[int] = None, **kwargs):
+        super().__init__(profile, **kwargs)
+        self.lines = lines or config.LOADTEST_SCRIPT_LINES
+        self._caches = {}  # name -> (text, expires_at)
+        self.stats.update(caches_created=0, cached_requests=0)
+
+    @staticmethod
+    def _text(content) -> str:
+        if isinstance(content, str):
+            return content
+        return "".join(part.get("text", "") for part in (content or {}).get("parts", []))
+
+    def _cache(self, handler, method, name, body) -> bool:
+        if method != "POST" or name:
+            self.send_json(handler, 404, self.error_payload(404, "NOT_FOUND"))
+            return False
+        request = json.loads(body or b"{}")
+        text = self._text(request.get("systemInstruction")) + "".join(
+            self._text(content) for content in request.get("contents", []))
+        ttl = float(str(request.get("ttl", "3600s")).rstrip("s"))
+        time.sleep(self.profile.latency())
+        name = f"cachedContents/{hashlib.sha1(f'{text}{time.time()}'.encode('utf-8')).hexdigest()[:12]}"
+        with self._lock:
+            self._caches[name] = (text, time.time() + ttl)
+            self.stats["caches_created"] += 1
+        expires = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + ttl))
+        self.send_json(handler, 200, {"name": name, "model": request.get("model"), "expireTime": expires,
+                                      "displayName": request.get("displayName", ""),
+                                      "usageMetadata": {"totalTokenCount": len(text) // 4}})
+        return True
+
+    def error_payload(self, status, reason):
+        statuses = {429: "RESOURCE_EXHAUSTED", 503: "UNAVAILABLE"}
+        return {"error": {"code": status, "message": reason, "status": statuses.get(status, "INTERNAL")}}
+
+    def script_for(self, prompt: str) -> List[Dict]:
+        """Dialogue lines between the speakers named in the prompt"""
+        speakers = next((pair for pair in config.SPEAKER_NAMES.values()
+                         if pair["Person A"] in prompt and pair["Person B"] in prompt), config.SPEAKER_NAMES["RJ"])
+        lines = config.PREVIEW_BUDGET["lines"] if "Preview Budget" in prompt else self.lines
+        script = fixtures.make_script("long")
+        # Different articles get different scripts, so audio is not served from the artifact cache
+        episode = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        texts = [f"Namaste doston, episode {episode} mein aapka swagat hai!"] + [
+            f"{_HINGLISH_OPENERS[i % len(_HINGLISH_OPENERS)]} {line['text']}" for i, line in enumerate(script)]
+        return [{"speaker": speakers["Person A"] if i % 2 == 0 else speakers["Person B"], "text": texts[i % len(texts)]}
+                for i in range(lines)]
+
+    def respond(self, handler, method, path, query, body) -> bool:
+        cache_match = self._CACHE_PATH.search(path)
+        if cache_match:
+            return self._cache(handler, method, cache_match.group(1), body)
+        match = self._PATH.search(path)
+        if method != "POST" or not match:
+            self.send_json(handler, 404, self.error_payload(404, "NOT_FOUND"))
+            return False
+        model, action = match.groups()
+        request = json.loads(body or b"{}")
+        cached = ""
+        if request.get("cachedContent"):
+            with self._lock:
+                cached, expires = self._caches.get(request["cachedContent"], ("", 0))
+                if expires > time.time():
+                    self.stats["cached_requests"] += 1
+            if expires <= time.time():
+                self.send_json(handler, 404, {"error": {"code": 404, "status": "NOT_FOUND",
+                                                        "message": "CachedContent not found (or permission denied)"}})
+                return False
+        prompt = cached + self._text(request.get("systemInstruction")) + "".join(
+            self._text(content) for content in request.get("contents", []))
+        script = self.script_for(prompt)
+        text = json.dumps(script, ensure_ascii=False)
+        usage = {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4,
+                 "totalTokenCount": (len(prompt) + len(text)) // 4}
+        if cached:
+            usage["cachedContentTokenCount"] = len(cached) // 4
+
+        def chunk(piece: str, final: bool) -> Dict:
+            candidate = {"content": {"parts": [{"text": piece}], "role": "model"}, "index": 0}
+            if final:
+                candidate["finishReason"] = "STOP"
+            return {"candidates": [candidate], "usageMetadata": usage, "modelVersion": model}
+
+        if action == "generateContent":
+            time.sleep(self.profile.latency(len(script)))
+            self.send_json(handler, 200, chunk(text, True))
+            return True
+
+        # Streaming: first chunk after the base latency, then one line per per_unit seconds
+        time.sleep(self.profile.latency())
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.end_headers()
+        pieces = ["["] + [json.dumps(line, ensure_ascii=False) + ("," if i < len(script) - 1 else "")
+                          for i, line in enumerate(script)] + ["]"]
+        for i, piece in enumerate(pieces):
+            if 0 < i < len(pieces) - 1:
+                time.sleep(self.profile.per_unit * self.profile.time_scale)
+            handler.wfile.write(b"data: " + json.dumps(chunk(piece, i == len(pieces) - 1)).encode('utf-8') + b"\r\n\r\n")
+            handler.wfile.flush()
+        handler.close_connection = True
+        return True
+
+
+class ElevenLabsStandIn(StandInServer):
+    """ElevenLabs text-to-dialogue (+ /with-timestamps) and user/subscription"""
+
+    name = "elevenlabs"
+
+    def __init__(self, profile: Optional[UpstreamProfile] = None, character_limit: int = 10**9, **kwargs):
+        super().__init__(profile, **kwargs)
+        self.character_limit = character_limit
+        self.characters = 0
+
+    def error_payload(self, status, reason):
+        return {"detail": {"status": reason, "message": f"Stand-in {reason}"}}
+
+    def respond(self, handler, method, path, query, body) -> bool:
+        if path.rstrip("/").endswith("/user/subscription"):
+            self.send_json(handler, 200, {"character_count": self.characters, "character_limit": self.character_limit})
+            return True
+        if method != "POST" or "text-to-dialogue" not in path:
+            self.send_json(handler, 404, self.error_payload(404, "not_found"))
+            return False
+        inputs = json.loads(body or b"{}").get("inputs", [])
+        if not inputs:
+            self.send_json(handler, 422, self.error_payload(422, "invalid_request"))
+            return False
+        characters = sum(len(item.get("text", "")) for item in inputs)
+        with self._lock:
+            self.characters += characters
+        time.sleep(self.profile.latency(characters))
+
+        frames = [max(1, round(len(item.get("text", "")) / _CHARACTERS_PER_SECOND / _FRAME_SECONDS)) for item in inputs]
+        audio = _MP3_FRAME * sum(frames)
+        if not path.rstrip("/").endswith("/with-timestamps"):
+            self.send_bytes(handler, 200, audio, "audio/mpeg")
+            return True
+        segments = []
+        start = 0
+        for index, count in enumerate(frames):
+            segments.append({"dialogue_input_index": index, "voice_id": inputs[index].get("voice_id"),
+                             "start_time_seconds": start * _FRAME_SECONDS,
+                             "end_time_seconds": (start + count) * _FRAME_SECONDS})
+            start += count
+        self.send_json(handler, 200, {"audio_base64": base64.b64encode(audio).decode(), "voice_segments": segments})
+        return True
+
+
+class StandIns:
+    """
+    All three stand-ins, started together and pointed to by config
+
+    Use as a context manager; the previous config endpoints are restored on exit.
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, UpstreamProfile]] = None, **options):
+        """
+        Initialize StandIns
+
+        Args:
+            profiles: Optional profile per upstream ("wikipedia", "gemini", "elevenlabs")
+            **options: article_size for Wikipedia, lines for Gemini
+        """
+        profiles = profiles or {}
+        self.wikipedia = WikipediaStandIn(profiles.get("wikipedia"), article_size=options.get("article_size", "long"))
+        self.gemini = GeminiStandIn(profiles.get("gemini"), lines=options.get("lines"))
+        self.elevenlabs = ElevenLabsStandIn(profiles.get("elevenlabs"))
+        self._saved = None
+
+    def start(self) -> Dict[str, str]:
+        """Start the servers and point config at them; returns the endpoint per upstream"""
+        self._saved = (config.WIKIPEDIA_API_URL, config.GEMINI_BASE_URL, config.ELEVENLABS_BASE_URL,
+                       config.ELEVENLABS_SUBSCRIPTION_URL)
+        config.WIKIPEDIA_API_URL = self.wikipedia.start() + "/w/api.php"
+        config.GEMINI_BASE_URL = self.gemini.start()
+        eleven = self.elevenlabs.start()
+        config.ELEVENLABS_BASE_URL = eleven + "/v1/text-to-dialogue"
+        config.ELEVENLABS_SUBSCRIPTION_URL = eleven + "/v1/user/subscription"
+        return self.endpoints()
+
+    def endpoints(self) -> Dict[str, str]:
+        return {"wikipedia": config.WIKIPEDIA_API_URL, "gemini": config.GEMINI_BASE_URL,
+                "elevenlabs": config.ELEVENLABS_BASE_URL}
+
+    def stop(self):
+        for server in (self.wikipedia, self.gemini, self.elevenlabs):
+            server.stop()
+        if self._saved is not None:
+            (config.WIKIPEDIA_API_URL, config.GEMINI_BASE_URL, config.ELEVENLABS_BASE_URL,
+             config.ELEVENLABS_SUBSCRIPTION_URL) = self._saved
+            self._saved = None
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {server.name: server.snapshot() for server in (self.wikipedia, self.gemini, self.elevenlabs)}
+
+    def __enter__(self) -> "StandIns":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="The Synthetic Radio Host - Wiki-talks - Upstream stand-ins")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplier on every simulated delay")
+    args = parser.parse_args()
+
+    standins = StandIns({name: UpstreamProfile.from_config(name, time_scale=args.time_scale)
+                         for name in config.LOADTEST_PROFILES})
+    endpoints = standins.start()
+    print("✓ Stand-ins running. Point the app at them with:")
+    print(f"  export WIKI_TALKS_WIKIPEDIA_API_URL=\"{endpoints['wikipedia']}\"")
+    print(f"  export WIKI_TALKS_GEMINI_BASE_URL=\"{endpoints['gemini']}\"")
+    print(f"  export WIKI_TALKS_ELEVENLABS_BASE_URL=\"{endpoints['elevenlabs']}\"")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        standins.stop()
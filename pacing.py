@@ -0,0 +1,210 @@
+"""
+Speech pacing model for The Synthetic Radio Host - Wiki-talks
+Records how long generated episodes actually run (from the MP3 frames) against their word and [tag]
+counts, and fits a per-variant speaking rate that sets the target word count of the next script
+
+Usage:
+    python pacing.py            # fitted words per minute per variant
+"""
+
+import re
+import sqlite3
+import string
+import threading
+import time
+from typing import List, Dict, Optional, Tuple, Union
+import config
+from audio_utils import mp3_duration
+
+TAG = re.compile(r"\[[^\[\]]+\]")
+_PUNCTUATION = string.punctuation + "…“”‘’।"
+
+
+def spoken_words(text: str) -> List[str]:
+    """Spoken words of a line: tags removed, punctuation stripped, lower case"""
+    words = (word.strip(_PUNCTUATION).lower() for word in TAG.sub(" ", text).split())
+    return [word for word in words if word]
+
+
+def script_counts(script_json: List[Dict]) -> Tuple[int, int]:
+    """(spoken words, [tags]) in a script"""
+    words = tags = 0
+    for entry in script_json:
+        text = entry.get("text", "")
+        words += len(spoken_words(text))
+        tags += len(TAG.findall(text))
+    return words, tags
+
+
+def voices_for(variant: str) -> str:
+    """Voice ids that read a variant, as one key (a recast invalidates the old samples)"""
+    speakers = config.SPEAKER_NAMES.get(variant, config.SPEAKER_NAMES["RJ"])
+    return "+".join(sorted(config.VOICE_CAST.get(name, "") for name in speakers.values()))
+
+
+class PacingModel:
+    """
+    Measured speaking rate per variant and voice pair, shared through SQLite
+
+    Each rendered episode adds one sample (words, tags, seconds). A variant
+    with enough recent samples gets a least-squares fit of
+    seconds = words * seconds_per_word + tags * seconds_per_tag, so tag
+    heavy variants (pauses, laughter) are asked for fewer words. Until
+    then, and whenever the fit looks implausible, config.PACING_DEFAULT_WPM
+    applies. Fits are cached for config.PACING_REFIT_SECONDS.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialize PacingModel
+
+        Args:
+            db_path: SQLite file shared by all processes (defaults to config.SCHEDULER_DB_PATH when used)
+        """
+        self._db_path = db_path
+        self._lock = threading.Lock()
+        self._fits = {}  # (db_path, variant, voices) -> (fitted_at, fit or None)
+
+    @property
+    def db_path(self) -> str:
+        return self._db_path or config.SCHEDULER_DB_PATH
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS pacing_samples "
+                     "(variant TEXT, voices TEXT, words INTEGER, tags INTEGER, seconds REAL, recorded REAL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS pacing_samples_recent ON pacing_samples (variant, voices, recorded)")
+        return conn
+
+    def record(self, variant: str, script_json: List[Dict], audio: Union[bytes, List[bytes]]) -> Optional[float]:
+        """
+        Add the measured duration of a rendered script
+
+        Args:
+            variant: Variant the script was written for
+            script_json: The script that was voiced
+            audio: MP3 bytes, or a list of per-line MP3 segments
+
+        Returns:
+            Audio duration in seconds, or None if nothing was recorded (no audio frames, or the database failed)
+        """
+        parts = audio if isinstance(audio, list) else [audio]
+        seconds = sum(mp3_duration(part) for part in parts if part)
+        words, tags = script_counts(script_json or [])
+        if seconds <= 0 or words == 0:
+            return None
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("INSERT INTO pacing_samples VALUES (?, ?, ?, ?, ?, ?)",
+                             (variant, voices_for(variant), words, tags, seconds, time.time()))
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            # Pacing is advisory; it must never fail a generation
+            return None
+        with self._lock:
+            self._fits.pop((self.db_path, variant, voices_for(variant)), None)
+        return seconds
+
+    def samples(self, variant: str) -> List[Tuple[int, int, float]]:
+        """Most recent (words, tags, seconds) samples for the variant's current voices"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT words, tags, seconds FROM pacing_samples WHERE variant = ? AND voices = ? "
+                "ORDER BY recorded DESC LIMIT ?",
+                (variant, voices_for(variant), config.PACING_WINDOW)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [tuple(row) for row in rows]
+
+    @staticmethod
+    def fit_samples(samples: List[Tuple[int, int, float]]) -> Optional[Dict]:
+        """
+        Least-squares fit of seconds = words * seconds_per_word + tags * seconds_per_tag
+
+        Returns:
+            Dict with seconds_per_word, seconds_per_tag, tags_per_word, wpm (effective, at the
+            samples' average tag density) and samples; None with too few or implausible samples
+        """
+        if len(samples) < config.PACING_MIN_SAMPLES:
+            return None
+        ww = sum(w * w for w, _, _ in samples)
+        wt = sum(w * t for w, t, _ in samples)
+        tt = sum(t * t for _, t, _ in samples)
+        ws = sum(w * s for w, _, s in samples)
+        ts = sum(t * s for _, t, s in samples)
+        det = ww * tt - wt * wt
+        per_word = per_tag = None
+        if det > 1e-9 * ww * tt:
+            per_word = (ws * tt - ts * wt) / det
+            per_tag = (ww * ts - wt * ws) / det
+        if per_word is None or per_word <= 0 or per_tag < 0:
+            # Tag counts too uniform (or noisy) to separate: words alone
+            per_word, per_tag = ws / ww, 0.0
+        tags_per_word = sum(t for _, t, _ in samples) / sum(w for w, _, _ in samples)
+        wpm = 60 / (per_word + per_tag * tags_per_word)
+        low, high = config.PACING_WPM_BOUNDS
+        if not low <= wpm <= high:
+            return None
+        return {"seconds_per_word": per_word, "seconds_per_tag": per_tag, "tags_per_word": tags_per_word,
+                "wpm": wpm, "samples": len(samples)}
+
+    def fit(self, variant: str) -> Optional[Dict]:
+        """Current fit for a variant (cached), or None while the default rate applies"""
+        key = (self.db_path, variant, voices_for(variant))
+        now = time.monotonic()
+        with self._lock:
+            cached = self._fits.get(key)
+        if cached and now - cached[0] < config.PACING_REFIT_SECONDS:
+            return cached[1]
+        try:
+            fitted = self.fit_samples(self.samples(variant))
+        except sqlite3.Error:
+            fitted = None
+        with self._lock:
+            self._fits[key] = (now, fitted)
+        return fitted
+
+    def wpm(self, variant: str) -> float:
+        """Words per minute to plan a variant's script with"""
+        fitted = self.fit(variant)
+        return fitted["wpm"] if fitted else config.PACING_DEFAULT_WPM
+
+    def target_words(self, variant: str, duration: int) -> int:
+        """Words a script of the variant needs to run duration seconds"""
+        return int((duration / 60) * self.wpm(variant))
+
+
+_pacing_model = None
+_pacing_model_lock = threading.Lock()
+
+
+def get_pacing_model() -> PacingModel:
+    """Process-wide PacingModel on config.SCHEDULER_DB_PATH"""
+    global _pacing_model
+    with _pacing_model_lock:
+        if _pacing_model is None:
+            _pacing_model = PacingModel()
+        return _pacing_model
+
+
+def main():
+    """Print the fitted rate of every variant"""
+    model = get_pacing_model()
+    print(f"{'variant':<10} {'samples':>7} {'wpm':>6} {'s/word':>7} {'s/tag':>6}")
+    for variant in config.VARIANTS:
+        fitted = model.fit(variant)
+        if fitted is None:
+            count = len(model.samples(variant))
+            print(f"{variant:<10} {count:>7} {config.PACING_DEFAULT_WPM:>6.0f}  (default until {config.PACING_MIN_SAMPLES} samples fit)")
+            continue
+        print(f"{variant:<10} {fitted['samples']:>7} {fitted['wpm']:>6.0f} {fitted['seconds_per_word']:>7.3f} "
+              f"{fitted['seconds_per_tag']:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
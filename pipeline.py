@@ -0,0 +1,580 @@
+"""
+Pipelined execution for The Synthetic Radio Host - Wiki-talks
+Runs scrape → script → audio for many jobs at once with bounded queues between stages
+"""
+
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from typing import List, Dict, Optional, Tuple, Callable, Iterable, Iterator
+import config
+from core_logic import WikiScraper, ScriptGenerator, AudioEngine
+from scheduler import get_tts_scheduler, get_lane_scheduler, BATCH
+from coalesce import SingleFlight, get_single_flight, scrape_key, script_key, audio_key, pipeline_key, scoped_key
+from ratelimit import KeyPool, get_key_pool
+from script_quality import ScriptQualityGate, get_script_quality_gate
+from pacing import get_pacing_model
+from estimator import get_estimator
+
+
+class PipelineJob:
+    """One Wikipedia URL travelling through the pipeline"""
+
+    def __init__(self, url: str, variant: str = "RJ", mode: str = "pro", job_id: Optional[str] = None,
+                 duration: int = 120, priority: str = BATCH):
+        """
+        Initialize PipelineJob
+
+        Args:
+            url: Wikipedia article URL
+            variant: "RJ", "Business", or "Teams"
+            mode: "fast" (summary) or "pro" (sections)
+            job_id: Caller-chosen identifier (defaults to the URL)
+            duration: Target duration in seconds
+            priority: Scheduling lane, scheduler.INTERACTIVE or scheduler.BATCH
+        """
+        self.job_id = job_id or url
+        self.url = url
+        self.variant = variant
+        self.mode = mode
+        self.duration = duration
+        self.priority = priority
+        self.content = None
+        self.script_json = None
+        self.audio_bytes = None
+        self.error = None
+        self.failed_stage = None
+        self.timings = {}
+        self.artifacts = {}  # stage name -> file path (batch mode)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        return f"PipelineJob({self.job_id!r}, variant={self.variant!r}, mode={self.mode!r}, error={self.error!r})"
+
+
+# A stage function takes a job, fills in its output and returns an error message (or None)
+StageFn = Callable[[PipelineJob], Optional[str]]
+
+
+def make_default_stages(gemini_key: str, eleven_key: str, workers: Optional[Dict[str, int]] = None,
+                        single_flight: Optional[SingleFlight] = None, gemini_pool: Optional[KeyPool] = None,
+                        eleven_pool: Optional[KeyPool] = None,
+                        quality_gate: Optional[ScriptQualityGate] = None) -> List[Tuple[str, StageFn, int]]:
+    """
+    Build the standard scrape / script / audio stages
+
+    Each upstream call goes through a SingleFlight group, so identical
+    requests in flight at the same time (from any thread) share one call.
+    Gemini and ElevenLabs calls take a slot in the job's priority lane and
+    draw their API key from the service's rate-limited key pool. A script
+    has to pass the quality gate before any ElevenLabs characters are spent
+    on it; one that fails is regenerated in the same lane slot. Every
+    upstream call's time is added to the estimator's stage history.
+
+    Args:
+        gemini_key: Google Gemini API key (used when no GEMINI_API_KEYS pool is configured)
+        eleven_key: ElevenLabs API key (used when no ELEVENLABS_API_KEYS pool is configured)
+        workers: Optional per-stage worker counts (defaults to config.PIPELINE_WORKERS)
+        single_flight: Coalescing group (defaults to the process-wide one)
+        gemini_pool: Gemini key pool (defaults to get_key_pool("gemini", gemini_key))
+        eleven_pool: ElevenLabs key pool (defaults to get_key_pool("elevenlabs", eleven_key))
+        quality_gate: Script checks between the script and audio stages (defaults to get_script_quality_gate())
+
+    Returns:
+        List of (stage_name, stage_fn, worker_count) for PipelineExecutor
+    """
+    workers = {**config.PIPELINE_WORKERS, **(workers or {})}
+    flight = single_flight or get_single_flight()
+    scraper = WikiScraper()
+    audio_engine = AudioEngine()
+    tts_scheduler = get_tts_scheduler(eleven_key)
+    gemini_lanes = get_lane_scheduler("gemini")
+    elevenlabs_lanes = get_lane_scheduler("elevenlabs")
+    gemini_pool = gemini_pool or get_key_pool("gemini", gemini_key)
+    eleven_pool = eleven_pool or get_key_pool("elevenlabs", eleven_key)
+    quality_gate = quality_gate or get_script_quality_gate()
+    pacing = get_pacing_model()
+    estimator = get_estimator()
+    script_gens = {}
+    script_gens_lock = threading.Lock()
+
+    def script_gen_for(api_key: str) -> ScriptGenerator:
+        with script_gens_lock:
+            if api_key not in script_gens:
+                script_gens[api_key] = ScriptGenerator(api_key)
+            return script_gens[api_key]
+
+    def scrape_page(job: PipelineJob):
+        start = time.perf_counter()
+        content, error = scraper.scrape(job.url, job.mode)
+        if content:
+            estimator.record_result("scrape", job.mode, content, time.perf_counter() - start)
+        return content, error
+
+    def generate_script(job: PipelineJob):
+        api_key, error = gemini_pool.acquire(1)
+        if error:
+            return None, error
+        start = time.perf_counter()
+        script_json, error = script_gen_for(api_key).generate_script(job.content, job.variant, duration=job.duration)
+        gemini_pool.settle(api_key, 1, error)
+        if script_json:
+            estimator.record_result("script", job.variant, script_json, time.perf_counter() - start)
+        return script_json, error
+
+    def generate_audio(job: PipelineJob):
+        cost = AudioEngine.character_cost(job.script_json)
+        api_key, error = eleven_pool.acquire(cost)
+        if error:
+            return None, error
+        start = time.perf_counter()
+        audio_bytes, error = tts_scheduler.generate(audio_engine, job.script_json, api_key,
+                                                    on_retry=lambda: eleven_pool.charge(api_key, cost))
+        # A TTS quota rejection spent nothing upstream
+        eleven_pool.settle(api_key, cost, error)
+        if audio_bytes:
+            estimator.record_result("audio", job.variant, job.script_json, time.perf_counter() - start)
+            # Measured duration feeds the target word count of later scripts
+            pacing.record(job.variant, job.script_json, audio_bytes)
+        return audio_bytes, error
+
+    def scrape(job: PipelineJob) -> Optional[str]:
+        (job.content, error), _ = flight.do(
+            scrape_key(job.url, job.mode),
+            lambda: scrape_page(job)
+        )
+        return error
+
+    def script(job: PipelineJob) -> Optional[str]:
+        (job.script_json, error), _ = flight.do(
+            scoped_key(script_key(job.content, job.variant, job.duration), gemini_pool.scope),
+            lambda: gemini_lanes.run(
+                job.priority,
+                lambda: quality_gate.generate(lambda: generate_script(job), job.duration, variant=job.variant)
+            )
+        )
+        return error
+
+    def audio(job: PipelineJob) -> Optional[str]:
+        (job.audio_bytes, error), _ = flight.do(
+            scoped_key(audio_key(job.script_json), eleven_pool.scope),
+            lambda: elevenlabs_lanes.run(job.priority, lambda: generate_audio(job))
+        )
+        return error
+
+    return [
+        ("scrape", scrape, workers["scrape"]),
+        ("script", script, workers["script"]),
+        ("audio", audio, workers["audio"]),
+    ]
+
+
+def run_job(job: PipelineJob, stages: List[Tuple[str, StageFn, int]]) -> PipelineJob:
+    """
+    Run one job through the stages on the calling thread
+
+    Returns:
+        The same job, with outputs or error filled in
+    """
+    for name, fn, _ in stages:
+        start = time.perf_counter()
+        try:
+            error = fn(job)
+        except Exception as e:
+            error = f"Unexpected error in {name} stage: {str(e)}"
+        job.timings[name] = time.perf_counter() - start
+        if error:
+            job.error = error
+            job.failed_stage = name
+            break
+    return job
+
+
+def run_job_coalesced(job: PipelineJob, stages: List[Tuple[str, StageFn, int]],
+                      single_flight: Optional[SingleFlight] = None) -> PipelineJob:
+    """
+    Run one job, attaching to an identical job (same url / variant / mode / duration) already in flight
+
+    Returns:
+        The same job, with the outputs of whichever call did the work
+    """
+    flight = single_flight or get_single_flight()
+    done, shared = flight.do(
+        pipeline_key(job.url, job.variant, job.mode, job.duration),
+        lambda: run_job(job, stages)
+    )
+    if shared:
+        for field in ("content", "script_json", "audio_bytes", "error", "failed_stage"):
+            setattr(job, field, getattr(done, field))
+    return job
+
+
+_DONE = object()
+
+
+class PipelineExecutor:
+    """
+    Staged executor: every stage has its own worker threads and a bounded
+    input queue, so job N's audio, job N+1's script and job N+2's scrape run
+    at the same time. A full queue blocks the stage in front of it
+    (backpressure), which keeps memory flat and lets batch throughput
+    approach that of the slowest stage.
+    """
+
+    def __init__(self, stages: List[Tuple[str, StageFn, int]], queue_size: Optional[int] = None):
+        """
+        Initialize PipelineExecutor
+
+        Args:
+            stages: List of (stage_name, stage_fn, worker_count) in pipeline order
+            queue_size: Capacity of each inter-stage queue (defaults to config.PIPELINE_QUEUE_SIZE)
+        """
+        if not stages:
+            raise ValueError("PipelineExecutor needs at least one stage")
+        self.stages = stages
+        self.queue_size = queue_size or config.PIPELINE_QUEUE_SIZE
+
+    def run(self, jobs: Iterable[PipelineJob]) -> Iterator[PipelineJob]:
+        """
+        Push jobs through all stages
+
+        Jobs are pulled from the iterable lazily, only as fast as the first
+        stage accepts them. A job that fails in any stage skips the rest; one
+        that arrives with its error already set skips every stage. An
+        exception raised by the iterable is re-raised here after the jobs
+        taken before it have finished.
+
+        Args:
+            jobs: Iterable of PipelineJob
+
+        Yields:
+            Finished PipelineJob objects (successful or failed) in completion order
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        # Finished jobs are handed back to the caller through a bounded queue too
+        results = queue.Queue(maxsize=self.queue_size)
+        remaining = [workers for _, _, workers in self.stages]
+        remaining_lock = threading.Lock()
+
+        feed_errors = []
+
+        def feed():
+            try:
+                for job in jobs:
+                    if job.error:
+                        # Rejected before the first stage (e.g. a malformed batch row)
+                        results.put(job)
+                    else:
+                        queues[0].put(job)
+            except Exception as e:
+                # Re-raised in the caller once the jobs already queued have drained
+                feed_errors.append(e)
+            finally:
+                for _ in range(self.stages[0][2]):
+                    queues[0].put(_DONE)
+
+        def work(index: int):
+            name, fn, _ = self.stages[index]
+            in_queue = queues[index]
+            last = index == len(self.stages) - 1
+            while True:
+                job = in_queue.get()
+                if job is _DONE:
+                    break
+                start = time.perf_counter()
+                try:
+                    error = fn(job)
+                except Exception as e:
+                    error = f"Unexpected error in {name} stage: {str(e)}"
+                job.timings[name] = time.perf_counter() - start
+                if error:
+                    job.error = error
+                    job.failed_stage = name
+                    results.put(job)
+                elif last:
+                    results.put(job)
+                else:
+                    queues[index + 1].put(job)
+
+            # The last worker of a stage tells the next stage that no more jobs are coming
+            with remaining_lock:
+                remaining[index] -= 1
+                stage_done = remaining[index] == 0
+            if stage_done:
+                if last:
+                    results.put(_DONE)
+                else:
+                    for _ in range(self.stages[index + 1][2]):
+                        queues[index + 1].put(_DONE)
+
+        threads = [threading.Thread(target=feed, name="pipeline-feed", daemon=True)]
+        for index, (name, _, workers) in enumerate(self.stages):
+            for n in range(workers):
+                threads.append(threading.Thread(target=work, args=(index,), name=f"pipeline-{name}-{n}", daemon=True))
+        for thread in threads:
+            thread.start()
+
+        while True:
+            job = results.get()
+            if job is _DONE:
+                break
+            yield job
+
+        for thread in threads:
+            thread.join()
+        if feed_errors:
+            raise feed_errors[0]
+
+
+# Batch rows name one of these scraping modes
+BATCH_MODES = ("fast", "pro")
+
+# File written for each stage in batch mode
+STAGE_ARTIFACTS = {"scrape": "content.txt", "script": "script.json", "audio": "audio.mp3"}
+
+
+def make_job_id(url: str, variant: str, mode: str) -> str:
+    """Stable, filesystem-safe job id for a (url, variant, mode) row"""
+    title = url.rstrip('/').rsplit('/', 1)[-1].split('?')[0].split('#')[0]
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', title).strip('_')[:60] or "page"
+    # Short hash keeps ids unique when non-ASCII titles collapse to the same slug
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]
+    return f"{slug}-{digest}__{variant}__{mode}"
+
+
+def read_batch_file(path: str, default_variant: str = "RJ", default_mode: str = "pro") -> Iterator[PipelineJob]:
+    """
+    Lazily read batch rows
+
+    Each non-empty line is either a JSON object ({"url": ..., "variant": ..., "mode": ...})
+    or comma-separated "url[,variant[,mode]]". Lines starting with # are comments.
+    Rows that repeat an earlier (url, variant, mode) are skipped. A row that
+    cannot be parsed or names an unknown variant or mode is yielded as a job
+    that already failed in the "read" stage, so the rest of the file still runs.
+
+    Yields:
+        PipelineJob per row
+    """
+    seen = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            job, error = _parse_batch_row(line, default_variant, default_mode)
+            if error:
+                job = job or PipelineJob(line, default_variant, default_mode, job_id=f"line-{number}")
+                job.error = f"Invalid batch row {number}: {error}"
+                job.failed_stage = "read"
+                yield job
+                continue
+            if job.job_id in seen:
+                continue
+            seen.add(job.job_id)
+            yield job
+
+
+def _parse_batch_row(line: str, default_variant: str, default_mode: str) -> Tuple[Optional[PipelineJob], Optional[str]]:
+    """Parse one batch row; returns (job, error) with job set whenever the url is known"""
+    if line.startswith('{'):
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            return None, f"malformed JSON ({e.msg})"
+        if not isinstance(row, dict) or not isinstance(row.get("url"), str) or not row["url"].strip():
+            return None, "JSON row needs a \"url\" string"
+        url = row["url"].strip()
+        variant = row.get("variant") or default_variant
+        mode = row.get("mode") or default_mode
+    else:
+        parts = [part.strip() for part in line.split(',')]
+        url = parts[0]
+        variant = parts[1] if len(parts) > 1 and parts[1] else default_variant
+        mode = parts[2] if len(parts) > 2 and parts[2] else default_mode
+    job = PipelineJob(url, variant, mode, job_id=make_job_id(url, str(variant), str(mode)))
+    if not isinstance(variant, str) or variant not in config.VARIANTS:
+        return job, f"unknown variant {variant!r}"
+    if not isinstance(mode, str) or mode not in BATCH_MODES:
+        return job, f"unknown mode {mode!r}"
+    return job, None
+
+
+class BatchManifest:
+    """
+    Append-only JSONL record of finished stages
+
+    Every line is one event: {"job_id", "stage", "status", "artifact", "error", "time"}.
+    Replaying the file on start-up tells which stages already have an artifact
+    on disk, so an interrupted batch resumes without redoing completed work.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize BatchManifest
+
+        Args:
+            path: Manifest file (created if missing)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._done = {}  # job_id -> {stage: artifact_path}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a half-written last line; ignore it
+                    continue
+                stages = self._done.setdefault(record["job_id"], {})
+                if record.get("status") == "done":
+                    stages[record["stage"]] = record.get("artifact")
+                else:
+                    stages.pop(record["stage"], None)
+
+    def artifact(self, job_id: str, stage: str) -> Optional[str]:
+        """Artifact path of a completed stage, or None if the stage has to run"""
+        with self._lock:
+            path = self._done.get(job_id, {}).get(stage)
+        if path and os.path.exists(path):
+            return path
+        return None
+
+    def is_done(self, job_id: str, stage: str) -> bool:
+        return self.artifact(job_id, stage) is not None
+
+    def record(self, job_id: str, stage: str, status: str, artifact: Optional[str] = None, error: Optional[str] = None):
+        """Append one event and flush it to disk before returning"""
+        entry = {"job_id": job_id, "stage": stage, "status": status, "artifact": artifact,
+                 "error": error, "time": time.time()}
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            stages = self._done.setdefault(job_id, {})
+            if status == "done":
+                stages[stage] = artifact
+            else:
+                stages.pop(stage, None)
+
+
+def _write_atomic(path: str, data: bytes):
+    """Write a file so that readers never see a partial artifact"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _save_artifact(job: PipelineJob, stage: str, path: str):
+    if stage == "scrape":
+        _write_atomic(path, job.content.encode('utf-8'))
+    elif stage == "script":
+        _write_atomic(path, json.dumps(job.script_json, indent=2, ensure_ascii=False).encode('utf-8'))
+    elif stage == "audio":
+        _write_atomic(path, job.audio_bytes)
+
+
+def _load_artifact(job: PipelineJob, stage: str, path: str):
+    if stage == "scrape":
+        with open(path, 'r', encoding='utf-8') as f:
+            job.content = f.read()
+    elif stage == "script":
+        with open(path, 'r', encoding='utf-8') as f:
+            job.script_json = json.load(f)
+
+
+def _release_memory(job: PipelineJob, stage: str):
+    """Drop inputs no later stage needs; the artifacts on disk are the source of truth"""
+    if stage == "script":
+        job.content = None
+    elif stage == "audio":
+        job.script_json = None
+        job.audio_bytes = None
+
+
+def checkpoint_stages(stages: List[Tuple[str, StageFn, int]], manifest: BatchManifest, output_dir: str) -> List[Tuple[str, StageFn, int]]:
+    """
+    Wrap stages so results stream to disk and completed stages are skipped on resume
+
+    Artifacts go to output_dir/<job_id>/<STAGE_ARTIFACTS[stage]>.
+    """
+    def wrap(name: str, fn: StageFn) -> StageFn:
+        filename = STAGE_ARTIFACTS.get(name, f"{name}.out")
+
+        def stage(job: PipelineJob) -> Optional[str]:
+            path = manifest.artifact(job.job_id, name)
+            if path:
+                _load_artifact(job, name, path)
+                job.artifacts[name] = path
+                _release_memory(job, name)
+                return None
+            error = fn(job)
+            if error:
+                manifest.record(job.job_id, name, "failed", error=error)
+                return error
+            path = os.path.join(output_dir, job.job_id, filename)
+            _save_artifact(job, name, path)
+            manifest.record(job.job_id, name, "done", artifact=path)
+            job.artifacts[name] = path
+            _release_memory(job, name)
+            return None
+        return stage
+
+    return [(name, wrap(name, fn), workers) for name, fn, workers in stages]
+
+
+def run_batch(jobs: Iterable[PipelineJob], stages: List[Tuple[str, StageFn, int]], manifest: BatchManifest,
+              output_dir: str, queue_size: Optional[int] = None, skipped: Optional[List[PipelineJob]] = None,
+              profiler=None) -> Iterator[PipelineJob]:
+    """
+    Resumable batch run on top of PipelineExecutor
+
+    Jobs whose last stage is already in the manifest are not started again
+    (they are appended to skipped, if given); partly finished jobs restart
+    from their first missing stage. Rows read_batch_file rejected are
+    recorded as failed in the manifest and yielded without running.
+
+    Args:
+        profiler: Optional profiling.PipelineProfiler; stage calls are profiled
+                  and memory is recorded as each job finishes
+
+    Yields:
+        Finished PipelineJob objects, holding artifact paths instead of payloads
+    """
+    last_stage = stages[-1][0]
+
+    def pending():
+        for job in jobs:
+            if job.error:
+                manifest.record(job.job_id, job.failed_stage, "failed", error=job.error)
+                yield job
+                continue
+            if manifest.is_done(job.job_id, last_stage):
+                if skipped is not None:
+                    skipped.append(job)
+                continue
+            yield job
+
+    if profiler is not None:
+        # Inside the checkpointing, so payload sizes are taken before they are released
+        stages = profiler.wrap_stages(stages)
+    executor = PipelineExecutor(checkpoint_stages(stages, manifest, output_dir), queue_size=queue_size)
+    for job in executor.run(pending()):
+        if profiler is not None:
+            profiler.job_finished(job.job_id, job.ok)
+        yield job
@@ -0,0 +1,447 @@
+"""
+Off-peak cache prewarming for The Synthetic Radio Host - Wiki-talks
+Generates scrape, script and audio for the most popular articles into the artifact store during
+off-peak windows, within a spend budget, so peak-hour requests for them are served from cache
+
+Usage:
+    python prewarm.py --titles trending.txt                  # keep warming inside config.PREWARM_WINDOWS
+    python prewarm.py --titles trending.txt --once --now     # one pass right away
+    python prewarm.py --titles trending.txt --dry-run        # what a pass would generate, and what it would cost
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple, Callable
+from urllib.parse import unquote
+import config
+import telemetry
+from artifact_store import ArtifactStore, get_artifact_store, TEXT, JSON, PARTS
+from background import GenerationTask, generate_broadcast
+from coalesce import scrape_key, script_key, audio_key
+from core_logic import WikiScraper, AudioEngine
+from estimator import CostEstimator, get_estimator
+from lazy_import import LazyModule
+from scheduler import BATCH
+
+requests = LazyModule("requests")
+
+# Target duration of prewarmed episodes (the UI's default, so its requests share the cache keys)
+DURATION = 120
+# Entries of "top pageviews" lists that are not articles
+_NON_ARTICLES = ("Main_Page", "Special:", "Wikipedia:", "Portal:", "Help:", "File:", "Category:", "Template:",
+                 "Talk:", "User:")
+
+
+def normalize_title(entry: str) -> str:
+    """Article title in URL form ("Mumbai_Indians") from a title or an article URL"""
+    entry = entry.strip()
+    if "/wiki/" in entry:
+        entry = unquote(entry.split("/wiki/", 1)[1].split("#")[0].split("?")[0])
+    return entry.replace(" ", "_")
+
+
+def article_url(title: str) -> str:
+    """URL a user would paste for the title"""
+    return config.PREWARM_ARTICLE_BASE + title
+
+
+def read_ranking(source: str) -> List[str]:
+    """
+    Ranked article titles from a file or an http(s) URL, most popular first
+
+    Accepts one title or article URL per line (# starts a comment), a JSON list of titles or of
+    objects with "title" / "article" / "url" (sorted by "rank" when every entry has one), or a
+    Wikimedia top-pageviews response ({"items": [{"articles": [...]}]}). Non-article pages and
+    repeats are dropped.
+
+    Args:
+        source: File path or URL
+
+    Returns:
+        List of titles in URL form
+    """
+    if source.startswith(("http://", "https://")):
+        response = requests.get(source, timeout=30, headers={"User-Agent": "wiki-talks/1.0 (prewarm)"})
+        response.raise_for_status()
+        text = response.text
+    else:
+        with open(source, "r", encoding="utf-8") as f:
+            text = f.read()
+
+    if text.lstrip().startswith(("[", "{")):
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = [article for item in data.get("items", []) for article in item.get("articles", [])]
+        if data and all(isinstance(entry, dict) and "rank" in entry for entry in data):
+            data = sorted(data, key=lambda entry: entry["rank"])
+        entries = [entry if isinstance(entry, str) else entry.get("title") or entry.get("article") or entry.get("url")
+                   for entry in data]
+    else:
+        entries = [line for line in (line.strip() for line in text.splitlines()) if line and not line.startswith("#")]
+
+    titles = []
+    seen = set()
+    for entry in entries:
+        title = normalize_title(entry) if entry else ""
+        if title and title not in seen and not title.startswith(_NON_ARTICLES):
+            seen.add(title)
+            titles.append(title)
+    return titles
+
+
+def parse_window(spec: str) -> Tuple[int, int]:
+    """(start, end) minutes after midnight of an "HH:MM-HH:MM" window"""
+    try:
+        start, end = (int(hours) * 60 + int(minutes)
+                      for hours, minutes in (part.strip().split(":") for part in spec.split("-")))
+    except ValueError:
+        raise ValueError(f"Invalid prewarm window {spec!r}, expected HH:MM-HH:MM")
+    return start, end
+
+
+def window_start(now: datetime, windows: List[str]) -> Optional[datetime]:
+    """Start of the off-peak window now falls in (windows may wrap past midnight), or None outside all of them"""
+    minute = now.hour * 60 + now.minute
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    for spec in windows:
+        start, end = parse_window(spec)
+        if start <= end:
+            if start <= minute < end:
+                return midnight + timedelta(minutes=start)
+        elif minute >= start:
+            return midnight + timedelta(minutes=start)
+        elif minute < end:
+            return midnight - timedelta(days=1) + timedelta(minutes=start)
+    return None
+
+
+def broadcast_generator(gemini_key: str, eleven_key: str,
+                        store: Optional[ArtifactStore] = None) -> Callable[[Dict], Optional[str]]:
+    """
+    Generate function for PrewarmScheduler that runs the UI's own generation path
+
+    background.generate_broadcast memoizes under the keys UI requests look up, so a prewarmed
+    article is a cache hit for every session.
+
+    Args:
+        gemini_key: Google Gemini API key (used when no GEMINI_API_KEYS pool is configured)
+        eleven_key: ElevenLabs API key (used when no ELEVENLABS_API_KEYS pool is configured)
+        store: ArtifactStore to fill (defaults to get_artifact_store())
+
+    Returns:
+        Callable taking a request dict and returning an error message or None
+    """
+    scraper = WikiScraper()
+    audio_engine = AudioEngine()
+    store = store or get_artifact_store()
+
+    def generate(request: Dict) -> Optional[str]:
+        task = GenerationTask(request)
+        generate_broadcast(task, scraper, audio_engine, store, gemini_key, eleven_key)
+        return task.error
+
+    return generate
+
+
+class PrewarmScheduler:
+    """
+    Keeps the most popular articles warm in the artifact store
+
+    Each pass re-reads the ranked list when it is due, works out which
+    stages of every (title, variant) are not cached yet and generates the
+    missing ones in rank order, in the batch lane, while the clock is inside
+    an off-peak window. Every item is charged its estimated cost (uncached
+    stages only) before it starts; an item that does not fit in what is left
+    of the window's budget is skipped. Spend per window is kept in SQLite,
+    so a restart does not reset it. When the list changes mid-pass the
+    remaining work is re-ranked.
+    """
+
+    def __init__(self, generate: Callable[[Dict], Optional[str]], source: Optional[str] = None,
+                 windows: Optional[List[str]] = None, variants: Optional[List[str]] = None,
+                 mode: Optional[str] = None, top_n: Optional[int] = None, budget: Optional[float] = None,
+                 workers: Optional[int] = None, store: Optional[ArtifactStore] = None,
+                 estimator: Optional[CostEstimator] = None, db_path: Optional[str] = None):
+        """
+        Initialize PrewarmScheduler
+
+        Args:
+            generate: Callable(request) -> error message or None that fills the store (see broadcast_generator)
+            source: Ranked list file or URL (defaults to config.PREWARM_SOURCE)
+            windows: Off-peak windows as "HH:MM-HH:MM" (defaults to config.PREWARM_WINDOWS)
+            variants: Variants generated per title (defaults to config.PREWARM_VARIANTS)
+            mode: Scraping mode (defaults to config.PREWARM_MODE)
+            top_n: Titles from the top of the list to keep warm (defaults to config.PREWARM_TOP_N)
+            budget: Dollars per window (defaults to config.PREWARM_BUDGET)
+            workers: Items generated at once (defaults to config.PREWARM_WORKERS)
+            store: ArtifactStore checked for cached stages (defaults to get_artifact_store())
+            estimator: CostEstimator for the budget (defaults to get_estimator())
+            db_path: SQLite file holding spend per window (defaults to config.SCHEDULER_DB_PATH when used)
+        """
+        self.generate = generate
+        self.source = source or config.PREWARM_SOURCE
+        if not self.source:
+            raise ValueError("PrewarmScheduler needs a ranked list (source or config.PREWARM_SOURCE)")
+        self.windows = windows or config.PREWARM_WINDOWS
+        for spec in self.windows:
+            parse_window(spec)
+        self.variants = variants or config.PREWARM_VARIANTS
+        self.mode = mode or config.PREWARM_MODE
+        self.top_n = top_n or config.PREWARM_TOP_N
+        self.budget = config.PREWARM_BUDGET if budget is None else budget
+        self.workers = workers or config.PREWARM_WORKERS
+        self.store = store or get_artifact_store()
+        self.estimator = estimator or get_estimator()
+        self._db_path = db_path
+        self.ranking = []
+        self._refreshed = None
+        self._lock = threading.Lock()
+        self.stats = {"warmed": 0, "failed": 0, "already_warm": 0, "over_budget": 0, "refreshes": 0}
+
+    @property
+    def db_path(self) -> str:
+        return self._db_path or config.SCHEDULER_DB_PATH
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS prewarm_spend (period TEXT PRIMARY KEY, dollars REAL)")
+        return conn
+
+    def spent(self, window: str) -> float:
+        """Dollars charged in a window so far"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT dollars FROM prewarm_spend WHERE period = ?", (window,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else 0.0
+
+    def _charge(self, window: str, dollars: float) -> bool:
+        """Add dollars to a window's spend if they fit in the budget; False (nothing charged) otherwise"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT dollars FROM prewarm_spend WHERE period = ?", (window,)).fetchone()
+            spent = row[0] if row else 0.0
+            if spent + dollars > self.budget:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute("INSERT OR REPLACE INTO prewarm_spend VALUES (?, ?)", (window, spent + dollars))
+            conn.execute("COMMIT")
+            return True
+        finally:
+            conn.close()
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Re-read the ranked list if config.PREWARM_REFRESH_SECONDS have passed
+
+        Returns:
+            True if the ranking changed. A list that cannot be read keeps the previous ranking.
+        """
+        now = time.monotonic()
+        if not force and self._refreshed is not None and now - self._refreshed < config.PREWARM_REFRESH_SECONDS:
+            return False
+        self._refreshed = now
+        with telemetry.span("prewarm.refresh") as span:
+            try:
+                ranking = read_ranking(self.source)[:self.top_n]
+            except Exception as e:
+                span.fail(f"Error reading ranked list: {str(e)}")
+                print(f"❌ Could not read ranked list {self.source}: {str(e)}")
+                return False
+            span.set(titles=len(ranking))
+        self.stats["refreshes"] += 1
+        changed = ranking != self.ranking
+        self.ranking = ranking
+        return changed
+
+    def missing(self, title: str, variant: str) -> List[str]:
+        """Stages of a (title, variant) that are not in the artifact store under the UI's keys"""
+        content = self.store.lookup(scrape_key(article_url(title), self.mode), TEXT, max_age=config.SCRAPE_MAX_AGE_SECONDS)
+        if content is None:
+            return ["scrape", "script", "audio"]
+        script_json = self.store.lookup(script_key(content, variant, DURATION) + (False,), JSON)
+        if script_json is None:
+            return ["script", "audio"]
+        if not self.store.contains(audio_key(script_json) + ("segments",), PARTS):
+            return ["audio"]
+        return []
+
+    def cost(self, variant: str, missing: List[str]) -> float:
+        """Estimated dollars to generate the missing stages (scraping is free)"""
+        stages = self.estimator.estimate(variant, self.mode, DURATION)["stages"]
+        return round(sum(stages[stage]["cost"] for stage in missing if "cost" in stages[stage]), 5)
+
+    def plan(self) -> List[Dict]:
+        """
+        Items that need work, in rank order (each rank's variants in configured order)
+
+        Returns:
+            List of dicts with rank, title, url, variant, missing (stages) and cost (estimated dollars)
+        """
+        items = []
+        for rank, title in enumerate(self.ranking, 1):
+            for variant in self.variants:
+                missing = self.missing(title, variant)
+                if missing:
+                    items.append({"rank": rank, "title": title, "url": article_url(title), "variant": variant,
+                                  "missing": missing, "cost": self.cost(variant, missing)})
+        return items
+
+    def _warm(self, item: Dict) -> Optional[str]:
+        request = {"url": item["url"], "variant": item["variant"], "mode": self.mode, "duration": DURATION,
+                   "preview": False, "fast_start": False, "priority": BATCH}
+        with telemetry.span("prewarm.item", variant=item["variant"], stages=len(item["missing"])) as span:
+            try:
+                error = self.generate(request)
+            except Exception as e:
+                error = f"Unexpected error: {str(e)}"
+            span.set(cost=item["cost"])
+            if error:
+                span.fail(error)
+        return error
+
+    def run_once(self, now: Optional[datetime] = None, force: bool = False) -> Dict:
+        """
+        One pass over the ranked list
+
+        Args:
+            now: Local time to schedule against (defaults to the clock, read again before every item)
+            force: Run outside the off-peak windows too (spend is then kept under the current hour)
+
+        Returns:
+            Dict with window (None outside all windows), warmed, failed, already_warm, over_budget and spent
+        """
+        clock = (lambda: now) if now is not None else datetime.now
+        self.refresh()
+        start = window_start(clock(), self.windows)
+        summary = {"window": None, "warmed": 0, "failed": 0, "already_warm": 0, "over_budget": 0, "spent": 0.0}
+        if start is None and not force:
+            return summary
+        window = (start or clock().replace(minute=0, second=0, microsecond=0)).isoformat(timespec="minutes")
+        summary["window"] = window
+
+        def count(name: str):
+            summary[name] += 1
+            with self._lock:
+                self.stats[name] += 1
+
+        queue = self.plan()
+        started = set()
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prewarm") as pool:
+            while queue or in_flight:
+                while queue and len(in_flight) < self.workers and (force or window_start(clock(), self.windows)):
+                    item = queue.pop(0)
+                    started.add((item["title"], item["variant"]))
+                    # Another process may have warmed it since the plan was made
+                    item["missing"] = self.missing(item["title"], item["variant"])
+                    if not item["missing"]:
+                        count("already_warm")
+                        continue
+                    item["cost"] = self.cost(item["variant"], item["missing"])
+                    if not self._charge(window, item["cost"]):
+                        count("over_budget")
+                        continue
+                    summary["spent"] = round(summary["spent"] + item["cost"], 5)
+                    in_flight[pool.submit(self._warm, item)] = item
+                if not in_flight:
+                    break  # Window over, or nothing left that fits
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = in_flight.pop(future)
+                    error = future.result()
+                    count("failed" if error else "warmed")
+                    if error:
+                        print(f"❌ Prewarm {item['title']} ({item['variant']}) failed: {error}")
+                if self.refresh():
+                    # The list moved: continue with the new order, skipping what this pass already took
+                    queue = [item for item in self.plan() if (item["title"], item["variant"]) not in started]
+        return summary
+
+    def run_forever(self, stop: Optional[threading.Event] = None, force: bool = False):
+        """Run passes until stop is set, checking every config.PREWARM_POLL_SECONDS (force: ignore the windows)"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            summary = self.run_once(force=force)
+            if summary["window"] and (summary["warmed"] or summary["failed"]):
+                print(f"✓ Window {summary['window']}: warmed {summary['warmed']}, failed {summary['failed']}, "
+                      f"over budget {summary['over_budget']}, spent ~${summary['spent']:.2f}")
+            stop.wait(config.PREWARM_POLL_SECONDS)
+
+
+def format_plan(plan: List[Dict], budget: float) -> str:
+    """Table of a plan, with where the budget runs out"""
+    lines = [f"   {'rank':>4}  {'variant':<9} {'cost':>8}  {'missing':<20} title"]
+    total = 0.0
+    for item in plan:
+        total += item["cost"]
+        marker = "" if total <= budget else "  (over budget)"
+        lines.append(f"   {item['rank']:>4}  {item['variant']:<9} {'$' + format(item['cost'], '.4f'):>8}  "
+                     f"{','.join(item['missing']):<20} {item['title']}{marker}")
+    lines.append(f"   {len(plan)} item(s), ~${total:.2f} estimated, budget ${budget:.2f} per window")
+    return "\n".join(lines)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="The Synthetic Radio Host - Wiki-talks - Cache prewarming")
+    parser.add_argument("--titles", type=str, default=None,
+                        help="Ranked list: file or URL (default: config.PREWARM_SOURCE)")
+    parser.add_argument("--variants", type=str, default=None, help="Comma-separated variants (default: config.PREWARM_VARIANTS)")
+    parser.add_argument("--mode", type=str, choices=["fast", "pro"], default=None, help="Scraping mode")
+    parser.add_argument("--top", type=int, default=None, help="Titles from the top of the list to keep warm")
+    parser.add_argument("--budget", type=float, default=None, help="Dollars per window")
+    parser.add_argument("--windows", type=str, default=None, help="Comma-separated HH:MM-HH:MM off-peak windows")
+    parser.add_argument("--workers", type=int, default=None, help="Items generated at once")
+    parser.add_argument("--once", action="store_true", help="Run one pass and exit")
+    parser.add_argument("--now", action="store_true", help="Ignore the windows (with --once: warm right away)")
+    parser.add_argument("--dry-run", action="store_true", help="Print what a pass would generate and its cost; no API calls")
+    args = parser.parse_args()
+
+    options = {
+        "source": args.titles,
+        "windows": args.windows.split(",") if args.windows else None,
+        "variants": args.variants.split(",") if args.variants else None,
+        "mode": args.mode,
+        "top_n": args.top,
+        "budget": args.budget,
+        "workers": args.workers,
+    }
+    if args.dry_run:
+        scheduler = PrewarmScheduler(lambda request: "dry run", **options)
+        scheduler.refresh(force=True)
+        print(f"📈 {len(scheduler.ranking)} title(s) from {scheduler.source}")
+        print(format_plan(scheduler.plan(), scheduler.budget))
+        return
+
+    gemini_key = config.get_api_key("gemini")
+    eleven_key = config.get_api_key("elevenlabs")
+    if not gemini_key or not eleven_key:
+        raise SystemExit("❌ GEMINI_API_KEY and ELEVENLABS_API_KEY must be set to prewarm")
+    scheduler = PrewarmScheduler(broadcast_generator(gemini_key, eleven_key), **options)
+    print(f"✓ Prewarming top {scheduler.top_n} of {scheduler.source} ({', '.join(scheduler.variants)}) "
+          f"in {', '.join(scheduler.windows)}, ${scheduler.budget:.2f} per window")
+    if args.once:
+        summary = scheduler.run_once(force=args.now)
+        if summary["window"] is None:
+            print("Outside the off-peak windows; nothing to do (use --now to run anyway)")
+            return
+        print(f"✓ Warmed {summary['warmed']}, failed {summary['failed']}, already warm {summary['already_warm']}, "
+              f"over budget {summary['over_budget']}, spent ~${summary['spent']:.2f}")
+        return
+    try:
+        scheduler.run_forever(force=args.now)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
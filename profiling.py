@@ -0,0 +1,372 @@
+"""
+Opt-in CPU and memory profiling for The Synthetic Radio Host - Wiki-talks
+Per-stage cProfile dumps, tracemalloc growth between jobs and RSS per job, written to a profile
+directory, plus a report that summarizes the hotspots
+
+Usage:
+    python run_local.py --batch urls.txt --profile profile_out
+    python profiling.py report profile_out
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple, Callable, Iterator
+import config
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+JOBS_FILE = "jobs.jsonl"
+CPU_PREFIX = "cpu-"
+
+
+def rss_bytes() -> int:
+    """Current resident set size (peak RSS where /proc is not available)"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    """Highest resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def payload_bytes(job, stage: str) -> int:
+    """Size of what a stage left on the job (scraped text, script list or audio)"""
+    if stage == "scrape":
+        return len((job.content or "").encode('utf-8'))
+    if stage == "script":
+        return len(json.dumps(job.script_json or [], ensure_ascii=False).encode('utf-8'))
+    if stage == "audio":
+        return len(job.audio_bytes or b"")
+    return 0
+
+
+def _site(traceback: tracemalloc.Traceback) -> Optional[str]:
+    """Innermost frame in this repository (else the innermost frame) as file:line; None for the profiler's own"""
+    frames = list(traceback)
+    for frame in reversed(frames):
+        if frame.filename.startswith(ROOT) and "site-packages" not in frame.filename:
+            # Stage calls pass through this module's wrappers; what it allocates itself is not the pipeline's
+            return None if frame.filename == __file__ else f"{os.path.relpath(frame.filename, ROOT)}:{frame.lineno}"
+    return f"{frames[-1].filename}:{frames[-1].lineno}" if frames else "?"
+
+
+class PipelineProfiler:
+    """
+    Collects per-stage CPU profiles and per-job memory figures for a batch run
+
+    Every stage call runs under its own cProfile.Profile, merged into one
+    profile per stage and dumped as cpu-<stage>.prof (pstats format). After
+    each job a tracemalloc snapshot is compared with the previous one and the
+    largest growth, attributed to the innermost line of this repository, is
+    written to jobs.jsonl with current RSS, the job's peak RSS (the highest
+    sample taken while its stages ran, not the process-lifetime maximum) and
+    the bytes each stage left on the job. Allocation tracking starts after the first job, so the
+    one-off cost of importing client libraries and building clients is
+    neither traced nor reported as growth. With several workers per stage,
+    allocations of overlapping jobs fall into whichever job finishes first,
+    and overlapping jobs share their RSS samples.
+    """
+
+    def __init__(self, output_dir: str, cpu: bool = True, memory: bool = True, top: Optional[int] = None):
+        """
+        Initialize PipelineProfiler
+
+        Args:
+            output_dir: Directory for the .prof files and jobs.jsonl
+            cpu: Profile stage calls with cProfile
+            memory: Track allocations with tracemalloc (slows allocation-heavy code)
+            top: Allocation sites kept per job (defaults to config.PROFILE_TOP)
+        """
+        self.output_dir = output_dir
+        self.cpu = cpu
+        self.memory = memory
+        self.top = top or config.PROFILE_TOP
+        self._lock = threading.Lock()
+        self._stats = {}      # stage -> pstats.Stats
+        self._pending = {}    # job_id -> {stage: figures}
+        self._sites = None    # site -> (size, count) at the previous job
+        self._started_tracemalloc = False
+        self._running = {}    # job_id -> stages running now
+        self._rss_peaks = {}  # job_id -> highest RSS sampled while its stages ran
+        self._sampler = None
+        self._sampler_stop = threading.Event()
+        self.stats = {"jobs": 0, "stage_calls": 0, "cpu_skipped": 0}
+
+    # Lifecycle
+
+    def start(self) -> "PipelineProfiler":
+        os.makedirs(self.output_dir, exist_ok=True)
+        open(os.path.join(self.output_dir, JOBS_FILE), "w").close()
+        self._sampler_stop.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name="rss-sampler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        """Write jobs that never finished and dump the per-stage CPU profiles"""
+        if self._sampler is not None:
+            self._sampler_stop.set()
+            self._sampler.join()
+            self._sampler = None
+        for job_id in list(self._pending):
+            self.job_finished(job_id, ok=False)
+        with self._lock:
+            for stage, stats in self._stats.items():
+                stats.dump_stats(os.path.join(self.output_dir, f"{CPU_PREFIX}{stage}.prof"))
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def __enter__(self) -> "PipelineProfiler":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # RSS
+
+    def _sample_rss(self):
+        """Raise the peak of every job with a stage running to the current RSS"""
+        rss = rss_bytes()
+        with self._lock:
+            for job_id in self._running:
+                self._rss_peaks[job_id] = max(self._rss_peaks.get(job_id, 0), rss)
+
+    def _sample_loop(self):
+        while not self._sampler_stop.wait(config.PROFILE_RSS_INTERVAL):
+            self._sample_rss()
+
+    # Stages
+
+    @contextmanager
+    def stage(self, name: str, job_id: str = "") -> Iterator[Dict]:
+        """
+        Profile one stage call; the yielded dict may be given extra figures (e.g. output_bytes)
+        """
+        figures = {"seconds": 0.0}
+        profile = cProfile.Profile() if self.cpu else None
+        if profile is not None:
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ allows one active profiler at a time; overlapping calls go unprofiled
+                profile = None
+                with self._lock:
+                    self.stats["cpu_skipped"] += 1
+        tracing = self.memory and tracemalloc.is_tracing()
+        traced_before = tracemalloc.get_traced_memory()[0] if tracing else 0
+        with self._lock:
+            self._running[job_id] = self._running.get(job_id, 0) + 1
+        self._sample_rss()
+        start = time.perf_counter()
+        try:
+            yield figures
+        finally:
+            figures["seconds"] = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+            if tracing:
+                figures["traced_delta_bytes"] = tracemalloc.get_traced_memory()[0] - traced_before
+            self._sample_rss()
+            with self._lock:
+                self._running[job_id] -= 1
+                if not self._running[job_id]:
+                    del self._running[job_id]
+                self.stats["stage_calls"] += 1
+                if profile is not None:
+                    if name in self._stats:
+                        self._stats[name].add(profile)
+                    else:
+                        self._stats[name] = pstats.Stats(profile)
+                self._pending.setdefault(job_id, {})[name] = figures
+
+    def wrap_stages(self, stages: List[Tuple[str, Callable, int]]) -> List[Tuple[str, Callable, int]]:
+        """Profile every call of each (name, fn, workers) stage (wrap before checkpoint_stages)"""
+        def wrap(name: str, fn: Callable) -> Callable:
+            def stage(job) -> Optional[str]:
+                with self.stage(name, job.job_id) as figures:
+                    error = fn(job)
+                figures["output_bytes"] = payload_bytes(job, name)
+                return error
+            return stage
+
+        return [(name, wrap(name, fn), workers) for name, fn, workers in stages]
+
+    # Jobs
+
+    @staticmethod
+    def _live_sites() -> Dict[str, Tuple[int, int]]:
+        """Live traced memory as site -> (bytes, blocks)"""
+        sites = {}
+        for statistic in tracemalloc.take_snapshot().statistics("traceback"):
+            site = _site(statistic.traceback)
+            if site is None:
+                continue
+            size, count = sites.get(site, (0, 0))
+            sites[site] = (size + statistic.size, count + statistic.count)
+        return sites
+
+    def _growth(self) -> List[Dict]:
+        """Largest allocation growth since the previous job, by repository line"""
+        sites, previous = self._live_sites(), self._sites or {}
+        self._sites = sites
+        growth = [{"site": site, "size_diff": size - previous.get(site, (0, 0))[0],
+                   "count_diff": count - previous.get(site, (0, 0))[1]}
+                  for site, (size, count) in sites.items()]
+        return sorted((entry for entry in growth if entry["size_diff"] > 0), key=lambda entry: -entry["size_diff"])[:self.top]
+
+    def job_finished(self, job_id: str, ok: bool = True):
+        """Record memory figures for a finished job and append them to jobs.jsonl"""
+        with self._lock:
+            stages = self._pending.pop(job_id, {})
+            rss = rss_bytes()
+            record = {"job_id": job_id, "ok": ok, "finished": time.time(), "rss_bytes": rss,
+                      "peak_rss_bytes": max(self._rss_peaks.pop(job_id, 0), rss), "stages": stages}
+            if self.memory and tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                record["traced_bytes"], record["traced_peak_bytes"] = current, peak
+                tracemalloc.reset_peak()
+                record["growth"] = self._growth()
+            elif self.memory:
+                # First job done: imports and clients are warm, start tracking from here
+                tracemalloc.start(config.PROFILE_TRACEMALLOC_FRAMES)
+                self._started_tracemalloc = True
+                self._sites = self._live_sites()
+            self.stats["jobs"] += 1
+            with open(os.path.join(self.output_dir, JOBS_FILE), "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+# Report
+
+def _size(n: float) -> str:
+    sign = "-" if n < 0 else ""
+    n = abs(n)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024 or unit == "GiB":
+            return f"{sign}{n:.0f} {unit}" if unit == "B" else f"{sign}{n:.1f} {unit}"
+        n /= 1024
+
+
+def load_jobs(output_dir: str) -> List[Dict]:
+    path = os.path.join(output_dir, JOBS_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def cpu_hotspots(output_dir: str, top: Optional[int] = None) -> Dict[str, List[Dict]]:
+    """
+    Functions with the most own time per stage
+
+    Returns:
+        Dict of stage -> [{"function", "calls", "own_seconds", "cumulative_seconds"}]
+    """
+    top = top or config.PROFILE_TOP
+    hotspots = {}
+    for filename in sorted(os.listdir(output_dir)):
+        if not (filename.startswith(CPU_PREFIX) and filename.endswith(".prof")):
+            continue
+        stats = pstats.Stats(os.path.join(output_dir, filename))
+        rows = []
+        for (path, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+            if path == "~":  # built-in
+                name = function
+            else:
+                name = f"{function} ({os.path.relpath(path, ROOT) if path.startswith(ROOT) else os.path.basename(path)}:{line})"
+            rows.append({"function": name, "calls": calls,
+                         "own_seconds": own, "cumulative_seconds": cumulative})
+        rows.sort(key=lambda row: -row["own_seconds"])
+        hotspots[filename[len(CPU_PREFIX):-len(".prof")]] = rows[:top]
+    return hotspots
+
+
+def memory_summary(jobs: List[Dict], top: Optional[int] = None) -> Dict:
+    """
+    RSS trend, per-stage output / allocation figures and the sites that grew most across jobs
+    """
+    top = top or config.PROFILE_TOP
+    if not jobs:
+        return {"jobs": 0}
+    rss = [job["rss_bytes"] for job in jobs]
+    stages = {}
+    for job in jobs:
+        for name, figures in job["stages"].items():
+            entry = stages.setdefault(name, {"calls": 0, "traced_calls": 0, "seconds": 0.0, "output_bytes": 0,
+                                             "traced_delta_bytes": 0})
+            entry["calls"] += 1
+            entry["traced_calls"] += "traced_delta_bytes" in figures
+            for key in ("seconds", "output_bytes", "traced_delta_bytes"):
+                entry[key] += figures.get(key, 0)
+    sites = {}
+    for job in jobs:
+        for entry in job.get("growth", []):
+            total = sites.setdefault(entry["site"], {"site": entry["site"], "size_diff": 0, "count_diff": 0})
+            total["size_diff"] += entry["size_diff"]
+            total["count_diff"] += entry["count_diff"]
+    return {
+        "jobs": len(jobs),
+        "rss_first_bytes": rss[0],
+        "rss_last_bytes": rss[-1],
+        "rss_growth_per_job_bytes": (rss[-1] - rss[0]) / (len(rss) - 1) if len(rss) > 1 else 0,
+        "peak_rss_bytes": max(job["peak_rss_bytes"] for job in jobs),
+        "stages": {name: {"calls": entry["calls"], "mean_seconds": entry["seconds"] / entry["calls"],
+                          "mean_output_bytes": entry["output_bytes"] / entry["calls"],
+                          "mean_traced_delta_bytes": entry["traced_delta_bytes"] / max(entry["traced_calls"], 1)}
+                   for name, entry in stages.items()},
+        "growth": sorted(sites.values(), key=lambda entry: -entry["size_diff"])[:top]
+    }
+
+
+def format_report(output_dir: str, top: Optional[int] = None) -> str:
+    """Human-readable hotspot summary of a profile directory"""
+    top = top or config.PROFILE_TOP
+    lines = [f"Profile: {output_dir}"]
+    for stage, rows in cpu_hotspots(output_dir, top).items():
+        lines.append(f"\nCPU [{stage}] (own time / cumulative / calls)")
+        for row in rows:
+            lines.append(f"  {row['own_seconds']:8.3f}s {row['cumulative_seconds']:8.3f}s {row['calls']:>8}  {row['function']}")
+    summary = memory_summary(load_jobs(output_dir), top)
+    if summary["jobs"]:
+        lines.append(f"\nMemory over {summary['jobs']} jobs: RSS {_size(summary['rss_first_bytes'])} → "
+                     f"{_size(summary['rss_last_bytes'])} ({_size(summary['rss_growth_per_job_bytes'])}/job), "
+                     f"peak {_size(summary['peak_rss_bytes'])}")
+        for name, stage in summary["stages"].items():
+            lines.append(f"  {name:<8} x{stage['calls']:<5} {stage['mean_seconds']:.2f}s  output {_size(stage['mean_output_bytes'])}  "
+                         f"allocated during call {_size(stage['mean_traced_delta_bytes'])}")
+        if summary["growth"]:
+            lines.append("  Largest growth between jobs (from the second job on):")
+            for entry in summary["growth"]:
+                lines.append(f"    {_size(entry['size_diff']):>10} {entry['count_diff']:>+8} blocks  {entry['site']}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="The Synthetic Radio Host - Wiki-talks - Profile report")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report = subparsers.add_parser("report", help="Summarize CPU hotspots and memory growth of a profile directory")
+    report.add_argument("output_dir", type=str, help="Directory written by run_local.py --profile")
+    report.add_argument("--top", type=int, default=None, help="Rows per table (default: config.PROFILE_TOP)")
+    report.add_argument("--json", action="store_true", help="Print machine-readable JSON instead")
+    args = parser.parse_args()
+
+    if args.json:
+        print(json.dumps({"cpu": cpu_hotspots(args.output_dir, args.top),
+                          "memory": memory_summary(load_jobs(args.output_dir), args.top)}, indent=2))
+    else:
+        print(format_report(args.output_dir, args.top))
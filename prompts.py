@@ -0,0 +1,192 @@
+"""
+Precompiled prompts for The Synthetic Radio Host - Wiki-talks
+Splits each variant's template once into a static block (persona, format rules, examples, speaker names)
+and a small per-request part (source text, target length), and keeps the static block in Gemini's
+cached content so it is uploaded once per key and referenced by handle
+"""
+
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+import config
+import telemetry
+from coalesce import SingleFlight
+
+# Stand-ins for the dynamic fields while a template is compiled
+_TEXT = "\x00text\x00"
+_WORDS = "\x00target_words\x00"
+# Where the static block points for the source text, which now follows it
+SOURCE_REFERENCE = "(the SOURCE TEXT at the end of this prompt)"
+_DEFAULT_LENGTH = ("**Target Length:** Approximately ", " words total.")
+
+
+class CompiledPrompt:
+    """
+    One variant's template, split at its per-request fields
+
+    static is the template with the speaker names filled in, the source text
+    replaced by SOURCE_REFERENCE and the target length line taken out; it is
+    identical for every request of the variant. render() builds the rest
+    without running str.format over the whole template again.
+    """
+
+    def __init__(self, variant: str, template: str, speaker_a: str, speaker_b: str):
+        """
+        Initialize CompiledPrompt
+
+        Args:
+            variant: Variant name (for display names and telemetry)
+            template: Prompt template with {text}, {speaker_a}, {speaker_b} and {target_words} fields
+            speaker_a: Name of the first speaker
+            speaker_b: Name of the second speaker
+        """
+        self.variant = variant
+        self.speakers = [speaker_a, speaker_b]
+        filled = template.format(text=_TEXT, speaker_a=speaker_a, speaker_b=speaker_b, target_words=_WORDS)
+        self._length = _DEFAULT_LENGTH
+        static_lines = []
+        for line in filled.split("\n"):
+            if _WORDS in line:
+                self._length = tuple(line.replace(_TEXT, "").split(_WORDS, 1))
+            else:
+                static_lines.append(line.replace(_TEXT, SOURCE_REFERENCE))
+        self.static = "\n".join(static_lines).strip()
+        self.digest = hashlib.sha256(self.static.encode('utf-8')).hexdigest()[:16]
+
+    @property
+    def static_tokens(self) -> int:
+        """Rough token count of the static block"""
+        return len(self.static) // config.ESTIMATE_CHARACTERS_PER_TOKEN
+
+    def render(self, text: str, target_words: int) -> str:
+        """Per-request part of the prompt: the source text and the target length"""
+        return f"### SOURCE TEXT\n{text}\n\n{self._length[0]}{target_words}{self._length[1]}"
+
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def compile_prompt(variant: str) -> CompiledPrompt:
+    """
+    Compiled prompt of a variant (unknown variants use RJ), built once per template
+
+    Args:
+        variant: "RJ", "Business", or "Teams"
+
+    Returns:
+        CompiledPrompt for the variant's current template and speaker names
+    """
+    template = config.VARIANTS.get(variant, config.VARIANTS["RJ"])
+    speaker_names = config.SPEAKER_NAMES.get(variant, config.SPEAKER_NAMES["RJ"])
+    key = (variant, template, speaker_names["Person A"], speaker_names["Person B"])
+    with _compiled_lock:
+        compiled = _compiled.get(key)
+    if compiled is None:
+        compiled = CompiledPrompt(*key)
+        with _compiled_lock:
+            _compiled[key] = compiled
+    return compiled
+
+
+class PromptCache:
+    """
+    Gemini cached-content handles for compiled static blocks
+
+    One handle per account scope (API key and endpoint), model and block,
+    created on first use (concurrent callers share one upload) and renewed
+    when little of its ttl is left. A failed upload is remembered for
+    retry_seconds, so requests go inline instead of retrying on every call.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None):
+        """
+        Initialize PromptCache
+
+        Args:
+            settings: Overrides for config.PROMPT_CACHE
+        """
+        self.settings = {**config.PROMPT_CACHE, **(settings or {})}
+        self._lock = threading.Lock()
+        self._handles = {}  # (scope, model, digest) -> (name or None, valid_until)
+        self._flight = SingleFlight()
+        self.stats = {"created": 0, "hits": 0, "inline": 0, "failures": 0, "invalidated": 0}
+
+    def applies(self, compiled: CompiledPrompt) -> bool:
+        """Whether the block is worth caching (enabled, and long enough for Gemini to accept)"""
+        return bool(self.settings["enabled"]) and compiled.static_tokens >= self.settings["min_tokens"]
+
+    def handle(self, client, model: str, scope: str, compiled: CompiledPrompt) -> Optional[str]:
+        """
+        Cached-content name holding the compiled block, uploading it if needed
+
+        Args:
+            client: genai.Client of the key the request will use
+            model: Model the request will use (caches are per model)
+            scope: Identity of the client's key and endpoint (caches are per project)
+            compiled: The variant's compiled prompt
+
+        Returns:
+            Name such as "cachedContents/abc", or None to send the block inline
+        """
+        if not self.applies(compiled):
+            self._count("inline")
+            return None
+        key = (scope, model, compiled.digest)
+        with self._lock:
+            entry = self._handles.get(key)
+        if entry is None or time.monotonic() >= entry[1]:
+            entry, _ = self._flight.do(key, lambda: self._create(client, model, key, compiled))
+        else:
+            self._count("hits" if entry[0] else "inline")
+        return entry[0]
+
+    def invalidate(self, model: str, scope: str, compiled: CompiledPrompt):
+        """Forget a handle Gemini no longer knows (expired or deleted)"""
+        with self._lock:
+            if self._handles.pop((scope, model, compiled.digest), None):
+                self.stats["invalidated"] += 1
+
+    def _create(self, client, model: str, key: Tuple, compiled: CompiledPrompt) -> Tuple[Optional[str], float]:
+        ttl = self.settings["ttl_seconds"]
+        with telemetry.span("script.cache", model=model, variant=compiled.variant,
+                            static_tokens=compiled.static_tokens) as span:
+            try:
+                cached = client.caches.create(model=model, config={
+                    "system_instruction": compiled.static,
+                    "ttl": f"{ttl}s",
+                    "display_name": f"wiki-talks {compiled.variant} {compiled.digest}"
+                })
+                entry = (cached.name, time.monotonic() + ttl * (1 - self.settings["renew_fraction"]))
+                self._count("created")
+            except Exception as e:
+                span.fail(f"Error caching prompt: {str(e)}")
+                entry = (None, time.monotonic() + self.settings["retry_seconds"])
+                self._count("failures")
+        with self._lock:
+            self._handles[key] = entry
+        return entry
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+
+def cache_missing(error: Exception) -> bool:
+    """Whether a Gemini error means the referenced cached content is gone"""
+    return getattr(error, "code", None) in (403, 404) and "cache" in str(error).lower()
+
+
+_prompt_cache = None
+_prompt_cache_lock = threading.Lock()
+
+
+def get_prompt_cache() -> PromptCache:
+    """Process-wide PromptCache shared by every ScriptGenerator"""
+    global _prompt_cache
+    with _prompt_cache_lock:
+        if _prompt_cache is None:
+            _prompt_cache = PromptCache()
+            telemetry.register_collector("prompt_cache", lambda: dict(_prompt_cache.stats))
+        return _prompt_cache
@@ -0,0 +1,239 @@
+"""
+Cross-process rate limiting for The Synthetic Radio Host - Wiki-talks
+Token buckets stored in SQLite and per-service API key pools built on top of them
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Optional, Tuple
+import config
+
+
+# Errors of requests that were never sent: an open circuit, a lane, guard or TTS slot wait that gave up,
+# or not enough TTS quota. A 429 did reach the upstream and counts against its rate limit.
+_NOT_SPENT = re.compile(r"circuit open|^Timed out waiting for|^Insufficient ElevenLabs quota")
+
+
+def never_reached_upstream(error: Optional[str]) -> bool:
+    """True if a request failed without spending anything upstream, so its rate-limit units can be refunded"""
+    return bool(error) and bool(_NOT_SPENT.search(error))
+
+
+class TokenBucket:
+    """
+    Token buckets shared by every process that opens the same SQLite file
+
+    Each bucket refills continuously at rate tokens/second up to capacity.
+    Refill and spend happen inside one IMMEDIATE transaction, so concurrent
+    workers on a host always see one consistent budget.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialize TokenBucket
+
+        Args:
+            db_path: SQLite file shared by all processes (defaults to config.SCHEDULER_DB_PATH)
+        """
+        self.db_path = db_path or config.SCHEDULER_DB_PATH
+        conn = self._connect()
+        conn.execute("CREATE TABLE IF NOT EXISTS token_buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @staticmethod
+    def _refill(row, rate: float, capacity: float, now: float) -> float:
+        if row is None:
+            return capacity
+        tokens, updated = row
+        return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+    def try_take(self, buckets: List[Tuple[str, float, float]], cost: float) -> Tuple[Optional[str], float]:
+        """
+        Spend cost tokens from the fullest bucket that can afford it
+
+        Args:
+            buckets: List of (name, rate_per_second, capacity)
+            cost: Tokens to spend (clamped to a bucket's capacity, so oversized jobs wait for a full bucket)
+
+        Returns:
+            Tuple of (bucket_name, wait_seconds). bucket_name is None if no bucket
+            can pay now; wait_seconds is then the time until the first one can.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            best = None
+            wait = float("inf")
+            for name, rate, capacity in buckets:
+                row = conn.execute("SELECT tokens, updated FROM token_buckets WHERE name = ?", (name,)).fetchone()
+                tokens = self._refill(row, rate, capacity, now)
+                needed = min(cost, capacity)
+                if tokens >= needed:
+                    # Prefer the bucket with the most headroom relative to its size
+                    score = tokens / capacity
+                    if best is None or score > best[0]:
+                        best = (score, name, tokens - needed)
+                else:
+                    wait = min(wait, (needed - tokens) / rate if rate > 0 else float("inf"))
+            if best is not None:
+                _, name, remaining = best
+                conn.execute("INSERT OR REPLACE INTO token_buckets VALUES (?, ?, ?)", (name, remaining, now))
+                conn.execute("COMMIT")
+                return name, 0.0
+            conn.execute("COMMIT")
+            return None, wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def refund(self, name: str, amount: float, capacity: float):
+        """Give back tokens that were not used (e.g. a request that failed before reaching the API)"""
+        conn = self._connect()
+        conn.execute("UPDATE token_buckets SET tokens = MIN(?, tokens + ?) WHERE name = ?", (capacity, amount, name))
+        conn.close()
+
+    def level(self, name: str, rate: float, capacity: float) -> float:
+        """Tokens currently available in a bucket"""
+        conn = self._connect()
+        row = conn.execute("SELECT tokens, updated FROM token_buckets WHERE name = ?", (name,)).fetchone()
+        conn.close()
+        return self._refill(row, rate, capacity, time.time())
+
+
+class KeyPool:
+    """
+    Rotates requests across several API keys of one service, weighted by each
+    key's quota, with the remaining budget of every key shared across processes.
+    """
+
+    def __init__(self, service: str, keys: List[Tuple[str, float]], burst_seconds: Optional[float] = None,
+                 bucket: Optional[TokenBucket] = None):
+        """
+        Initialize KeyPool
+
+        Args:
+            service: "gemini" or "elevenlabs"
+            keys: List of (api_key, units_per_minute); see config.RATE_LIMITS for units
+            burst_seconds: Bucket capacity in seconds of refill (defaults to config.RATE_LIMITS)
+            bucket: TokenBucket store (defaults to one on config.SCHEDULER_DB_PATH)
+        """
+        if not keys:
+            raise ValueError(f"No API keys configured for {service}")
+        limits = config.RATE_LIMITS.get(service, {})
+        burst_seconds = burst_seconds or limits.get("burst_seconds", 10)
+        self.service = service
+        self.bucket = bucket or TokenBucket()
+        self._keys = {}
+        self._buckets = []
+        for key, per_minute in keys:
+            # Bucket names never contain the key itself
+            name = f"{service}:{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}"
+            rate = per_minute / 60.0
+            capacity = max(1.0, rate * burst_seconds)
+            self._keys[name] = key
+            self._buckets.append((name, rate, capacity))
+
+    @classmethod
+    def from_config(cls, service: str, fallback_key: Optional[str] = None, **kwargs) -> "KeyPool":
+        """
+        Build a pool from config.get_api_keys, or from a single key (e.g. typed into the UI)
+
+        Args:
+            service: "gemini" or "elevenlabs"
+            fallback_key: Key to use if no {SERVICE}_API_KEYS pool is configured
+        """
+        keys = config.get_api_keys(service)
+        if fallback_key and len(keys) <= 1 and fallback_key not in [key for key, _ in keys]:
+            keys = [(fallback_key, config.RATE_LIMITS.get(service, {}).get("per_key_per_minute", 60))]
+        return cls(service, keys, **kwargs)
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def scope(self) -> str:
+        """Identity of the pool's keys (derived from the bucket names, never from the keys themselves)"""
+        return hashlib.sha256("|".join(sorted(self._keys)).encode('utf-8')).hexdigest()[:16]
+
+    def acquire(self, cost: float = 1, timeout: Optional[float] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Take cost units from the key with the most headroom, waiting if every key is exhausted
+
+        Args:
+            cost: Units to spend (1 request for Gemini, script characters for ElevenLabs)
+            timeout: Seconds to wait (None = forever)
+
+        Returns:
+            Tuple of (api_key, error_message). api_key is None if the wait timed out.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            name, wait = self.bucket.try_take(self._buckets, cost)
+            if name is not None:
+                return self._keys[name], None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or wait > remaining:
+                    return None, f"Rate limit: no {self.service} key has budget for {cost:g} units"
+                wait = min(wait, remaining)
+            # Another process may refill or refund in the meantime, so re-check at least every second
+            time.sleep(min(max(wait, 0.01), 1.0))
+
+    def refund(self, api_key: str, cost: float):
+        """Return units for a request that never reached the upstream API"""
+        for name, rate, capacity in self._buckets:
+            if self._keys[name] == api_key:
+                self.bucket.refund(name, min(cost, capacity), capacity)
+                return
+
+    def charge(self, api_key: str, cost: float):
+        """Spend cost more units of one key, waiting for its budget (e.g. for a retry of a request it already paid for)"""
+        for name, rate, capacity in self._buckets:
+            if self._keys[name] == api_key:
+                while True:
+                    taken, wait = self.bucket.try_take([(name, rate, capacity)], cost)
+                    if taken is not None:
+                        return
+                    time.sleep(min(max(wait, 0.01), 1.0))
+
+    def settle(self, api_key: Optional[str], cost: float, error: Optional[str]):
+        """Refund a finished request's units if its error shows it never reached the upstream API"""
+        if api_key and never_reached_upstream(error):
+            self.refund(api_key, cost)
+
+    def snapshot(self) -> List[Dict]:
+        """Remaining budget per key (keys identified by bucket name, never by value)"""
+        return [
+            {"bucket": name, "available": self.bucket.level(name, rate, capacity), "capacity": capacity,
+             "per_minute": rate * 60}
+            for name, rate, capacity in self._buckets
+        ]
+
+
+_key_pools = {}
+_key_pools_lock = threading.Lock()
+
+
+def get_key_pool(service: str, fallback_key: Optional[str] = None) -> KeyPool:
+    """
+    Process-wide KeyPool for a service
+
+    Pools are cached per (service, fallback_key), so a key typed into the UI
+    gets its own pool while configured pools are shared.
+    """
+    with _key_pools_lock:
+        cache_key = (service, fallback_key)
+        if cache_key not in _key_pools:
+            _key_pools[cache_key] = KeyPool.from_config(service, fallback_key)
+        return _key_pools[cache_key]
@@ -4,12 +4,25 @@ Run this on your local machine without Colab
 
 Usage:
     python run_local.py
+    python run_local.py --batch urls.txt --parallel 4 --output-dir batch_output
+    python run_local.py --trace traces.jsonl --metrics-out metrics.txt
+    python run_local.py --record cassettes/mumbai.jsonl.gz   # later: --replay cassettes/mumbai.jsonl.gz
+    python run_local.py --batch urls.txt --profile profile_out  # then: python profiling.py report profile_out
+    python run_local.py --batch urls.txt --dry-run             # predicted cost and time, no API calls
 """
 
 import json
 import os
 import sys
+from contextlib import nullcontext
 from core_logic import WikiScraper, ScriptGenerator, AudioEngine
+from scheduler import get_tts_scheduler, get_lane_scheduler, estimate_tts_cost, INTERACTIVE
+from ratelimit import get_key_pool
+from pipeline import PipelineJob, BatchManifest, make_default_stages, read_batch_file, run_batch
+from script_quality import get_script_quality_gate
+from pacing import get_pacing_model
+from estimator import get_estimator, format_estimate, scraped_length
+from telemetry import get_tracer
 import config
 
 
@@ -33,7 +46,8 @@ def get_api_keys():
     return gemini_key, eleven_key
 
 
-def generate_wiki_talk(wikipedia_url: str, variant: str = "RJ", mode: str = "pro", output_file: str = "wiki_talk_output.mp3"):
+def generate_wiki_talk(wikipedia_url: str, variant: str = "RJ", mode: str = "pro", output_file: str = "wiki_talk_output.mp3",
+                       preview: bool = False, profiler=None):
     """
     Complete pipeline: Wikipedia URL → Script → Audio
     
@@ -42,10 +56,15 @@ def generate_wiki_talk(wikipedia_url: str, variant: str = "RJ", mode: str = "pro
         variant: "RJ", "Business", or "Teams"
         mode: "fast" (summary) or "pro" (sections)
         output_file: Output MP3 filename
+        preview: Generate a short preview within config.PREVIEW_BUDGET
+        profiler: Optional profiling.PipelineProfiler recording each step as a stage
     
     Returns:
         Tuple of (success: bool, message: str, script_json: list, audio_path: str)
     """
+    def stage(name):
+        return profiler.stage(name, wikipedia_url) if profiler else nullcontext({})
+    
     print("=" * 60)
     print("The Synthetic Radio Host - Wiki-talks - Generating Hinglish Conversation")
     print("=" * 60)
@@ -58,7 +77,8 @@ def generate_wiki_talk(wikipedia_url: str, variant: str = "RJ", mode: str = "pro
     print("[1/3] Step 1: Scraping Wikipedia...")
     print("=" * 60)
     scraper = WikiScraper()
-    content, error = scraper.scrape(wikipedia_url, mode)
+    with stage("scrape"):
+        content, error = scraper.scrape(wikipedia_url, mode)
     if error:
         return False, f"Wikipedia scraping failed: {error}", None, None
     print(f"✓ Scraped {len(content)} characters from Wikipedia")
@@ -78,8 +98,24 @@ def generate_wiki_talk(wikipedia_url: str, variant: str = "RJ", mode: str = "pro
     print("\n" + "=" * 60)
     print("[2/3] Step 2: Generating Hinglish conversation script...")
     print("=" * 60)
-    script_gen = ScriptGenerator(gemini_key)
-    script_json, error = script_gen.generate_script(content, variant, duration=120)
+    def generate_script():
+        # Draw from the host-wide key pool so concurrent runs share one rate limit
+        gemini_pool = get_key_pool("gemini", gemini_key)
+        pooled_key, error = gemini_pool.acquire(1)
+        if error:
+            return None, error
+        script_json, error = ScriptGenerator(pooled_key).generate_script(content, variant, duration=120, preview=preview)
+        gemini_pool.settle(pooled_key, 1, error)
+        return script_json, error
+    
+    # A single local run is someone waiting at the terminal: interactive lane.
+    # The quality gate regenerates a script not worth voicing before any TTS characters are spent.
+    quality_gate = get_script_quality_gate()
+    with stage("script"):
+        script_json, error = get_lane_scheduler("gemini").run(
+            INTERACTIVE,
+            lambda: quality_gate.generate(generate_script, duration=120, preview=preview, variant=variant)
+        )
     if error:
         return False, f"Script generation failed: {error}", None, None
     print(f"✓ Generated script with {len(script_json)} dialogue entries")
@@ -98,14 +134,29 @@ def generate_wiki_talk(wikipedia_url: str, variant: str = "RJ", mode: str = "pro
     print("[3/3] Step 3: Generating audio with ElevenLabs V3...")
     print("=" * 60)
     audio_engine = AudioEngine()
-    audio_bytes, error = audio_engine.generate_dialogue_v3(script_json, eleven_key)
+    tts_scheduler = get_tts_scheduler(eleven_key)
+    characters = AudioEngine.character_cost(script_json)
+    print(f"✓ Script needs {characters} characters (~${estimate_tts_cost(characters):.4f})")
+    eleven_pool = get_key_pool("elevenlabs", eleven_key)
+    pooled_key, error = eleven_pool.acquire(characters)
+    if error:
+        return False, f"Audio generation failed: {error}", script_json, None
+    with stage("audio"):
+        audio_bytes, error = get_lane_scheduler("elevenlabs").run(
+            INTERACTIVE,
+            lambda: tts_scheduler.generate(audio_engine, script_json, pooled_key,
+                                           on_retry=lambda: eleven_pool.charge(pooled_key, characters))
+        )
+    # Characters of a request stopped before ElevenLabs (open circuit, slot wait, quota) go back to the pool
+    eleven_pool.settle(pooled_key, characters, error)
     if error:
         return False, f"Audio generation failed: {error}", script_json, None
     print(f"✓ Generated audio ({len(audio_bytes)} bytes)")
     
-    # Calculate audio duration estimate (rough: ~1KB per second for MP3)
-    estimated_duration = len(audio_bytes) / 1000  # rough estimate
-    print(f"✓ Estimated duration: ~{estimated_duration:.1f} seconds")
+    # Measured from the MP3 frames; also calibrates the words-per-minute of later scripts
+    duration = get_pacing_model().record(variant, script_json, audio_bytes)
+    if duration:
+        print(f"✓ Duration: {duration:.1f} seconds")
     
     # Save audio file
     print("\n💾 Saving audio file...")
@@ -125,6 +176,99 @@ def generate_wiki_talk(wikipedia_url: str, variant: str = "RJ", mode: str = "pro
     return True, "Success", script_json, audio_path
 
 
+def generate_wiki_talk_batch(batch_file: str, variant: str = "RJ", mode: str = "pro", output_dir: str = "batch_output",
+                             manifest_path: str = None, parallel: int = 2, profiler=None):
+    """
+    Resumable batch pipeline: many Wikipedia URLs → scripts → audio files
+    
+    Every finished stage is appended to a JSONL manifest and its artifact is
+    written under output_dir/<job_id>/. Running the same command again after
+    a crash picks up where the previous run stopped.
+    
+    Args:
+        batch_file: File with one "url[,variant[,mode]]" or JSON row per line
+        variant: Default variant for rows that do not set one
+        mode: Default scraping mode for rows that do not set one
+        output_dir: Directory for artifacts
+        manifest_path: Manifest file (defaults to output_dir/manifest.jsonl)
+        parallel: Worker threads per stage
+        profiler: Optional profiling.PipelineProfiler
+    
+    Returns:
+        Tuple of (completed, skipped, failed) job counts
+    """
+    print("=" * 60)
+    print("The Synthetic Radio Host - Wiki-talks - Batch Run")
+    print("=" * 60)
+    
+    gemini_key, eleven_key = get_api_keys()
+    
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = manifest_path or os.path.join(output_dir, "manifest.jsonl")
+    manifest = BatchManifest(manifest_path)
+    print(f"✓ Manifest: {manifest_path}")
+    
+    stages = make_default_stages(gemini_key, eleven_key, workers={"scrape": parallel, "script": parallel, "audio": parallel})
+    jobs = read_batch_file(batch_file, default_variant=variant, default_mode=mode)
+    skipped = []
+    completed = failed = 0
+    
+    for job in run_batch(jobs, stages, manifest, output_dir, skipped=skipped, profiler=profiler):
+        if job.ok:
+            completed += 1
+            print(f"✓ {job.job_id} → {job.artifacts.get('audio')}")
+        else:
+            failed += 1
+            print(f"❌ {job.job_id} ({job.failed_stage}): {job.error}")
+    
+    print("\n" + "=" * 60)
+    print(f"✓ Completed: {completed} | Already done: {len(skipped)} | Failed: {failed}")
+    print("=" * 60)
+    return completed, len(skipped), failed
+
+
+def print_estimates(jobs, preview: bool = False):
+    """
+    Dry run: print the predicted tokens, characters, cost and time of each job without calling any API
+    
+    Articles already in the artifact store are priced from their scraped length.
+    
+    Args:
+        jobs: Iterable of pipeline.PipelineJob
+        preview: Estimate previews instead of full conversations
+    """
+    estimator = get_estimator()
+    total_cost = total_seconds = count = 0
+    for job in jobs:
+        if job.error:
+            print(f"\n❌ {job.job_id}: {job.error}")
+            continue
+        estimate = estimator.estimate(job.variant, job.mode, job.duration, preview,
+                                      content_length=scraped_length(job.url, job.mode))
+        print(f"\n💰 {job.url} ({job.variant}, {job.mode}{', preview' if preview else ''})")
+        print(format_estimate(estimate))
+        total_cost += estimate["cost"]
+        total_seconds += estimate["seconds"]
+        count += 1
+    if count > 1:
+        print(f"\n✓ {count} jobs: ~${total_cost:.4f}, ~{total_seconds / 60:.1f} minutes of upstream time")
+
+
+def print_stage_timings(metrics_out: str = None):
+    """Print per-stage latency recorded by the tracer and optionally write OpenMetrics text"""
+    tracer = get_tracer()
+    summary = tracer.summary()
+    if summary:
+        print("\n⏱️ Stage timings:")
+        for name, stats in sorted(summary.items()):
+            errors = f", {stats['errors']} failed" if stats['errors'] else ""
+            print(f"   {name:<16} x{stats['count']:<4} mean {stats['mean']:.2f}s  p95 {stats['p95']:.2f}s{errors}")
+    tracer.flush()
+    if metrics_out:
+        tracer.write_metrics(metrics_out)
+        print(f"✓ Metrics written to: {metrics_out}")
+
+
 if __name__ == "__main__":
     import argparse
     
@@ -160,8 +304,115 @@ if __name__ == "__main__":
         action="store_true",
         help="Save generated script JSON to file"
     )
+    parser.add_argument(
+        "--preview",
+        action="store_true",
+        help="Generate a short preview (a few lines) instead of the full conversation"
+    )
+    parser.add_argument(
+        "--batch",
+        type=str,
+        help="File with many rows (url[,variant[,mode]] or JSON per line); runs a resumable batch"
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=2,
+        help="Batch mode: worker threads per stage"
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        default="batch_output",
+        help="Batch mode: directory for scraped text, scripts and audio"
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        help="Batch mode: JSONL checkpoint manifest (default: <output-dir>/manifest.jsonl)"
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        help="Append one JSON line per stage span to this file (or POST them to an http(s) URL)"
+    )
+    parser.add_argument(
+        "--metrics-out",
+        type=str,
+        help="Write per-stage latency histograms and counters as OpenMetrics text to this file"
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help="Write per-stage cProfile dumps and per-job memory figures to this directory (see profiling.py report)"
+    )
+    parser.add_argument(
+        "--record",
+        type=str,
+        help="Capture every Wikipedia, Gemini and ElevenLabs request/response with timings into this cassette file"
+    )
+    parser.add_argument(
+        "--replay",
+        type=str,
+        help="Serve upstream calls from this cassette instead of the network (no API keys needed)"
+    )
+    parser.add_argument(
+        "--replay-fast",
+        action="store_true",
+        help="Replay mode: answer immediately instead of at the recorded latencies"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print the predicted tokens, TTS characters, cost and time per stage; no API calls"
+    )
     
     args = parser.parse_args()
+    if args.dry_run:
+        if args.batch:
+            print_estimates(read_batch_file(args.batch, default_variant=args.variant, default_mode=args.mode), args.preview)
+        else:
+            print_estimates([PipelineJob(args.url, args.variant, args.mode)], args.preview)
+        sys.exit(0)
+    if args.trace:
+        get_tracer().sink = args.trace
+    if args.record or args.replay:
+        import atexit
+        from loadtest.cassette import CassetteServers
+        if args.replay:
+            # Recorded responses do not depend on the key; placeholders skip the prompt
+            os.environ.setdefault('GEMINI_API_KEY', 'replay')
+            os.environ.setdefault('ELEVEN_API_KEY', 'replay')
+        cassette = CassetteServers(args.record or args.replay, "record" if args.record else "replay",
+                                   latency=not args.replay_fast)
+        cassette.start()
+        # Runs on sys.exit too; a recording is saved here
+        atexit.register(cassette.stop)
+        print(f"{'⏺️ Recording to' if args.record else '▶️ Replaying'} cassette: {args.record or args.replay}\n")
+    profiler = None
+    if args.profile:
+        import atexit
+        from profiling import PipelineProfiler, format_report
+        profiler = PipelineProfiler(args.profile).start()
+        
+        def finish_profile():
+            profiler.stop()
+            print("\n" + format_report(args.profile))
+        
+        atexit.register(finish_profile)
+    
+    if args.batch:
+        completed, skipped, failed = generate_wiki_talk_batch(
+            batch_file=args.batch,
+            variant=args.variant,
+            mode=args.mode,
+            output_dir=args.output_dir,
+            manifest_path=args.manifest,
+            parallel=args.parallel,
+            profiler=profiler
+        )
+        print_stage_timings(args.metrics_out)
+        sys.exit(1 if failed else 0)
     
     print("The Synthetic Radio Host - Wiki-talks - Local Runner")
     print(f"URL: {args.url}")
@@ -172,8 +423,13 @@ if __name__ == "__main__":
         wikipedia_url=args.url,
         variant=args.variant,
         mode=args.mode,
-        output_file=args.output
+        output_file=args.output,
+        preview=args.preview,
+        profiler=profiler
     )
+    if profiler:
+        profiler.job_finished(args.url, success)
+    print_stage_timings(args.metrics_out)
     
     if success:
         print(f"\n✓ Script JSON:")
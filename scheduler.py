@@ -0,0 +1,696 @@
+"""
+Scheduling helpers for The Synthetic Radio Host - Wiki-talks
+Contains TTSQuotaScheduler, which admits ElevenLabs jobs against a character budget,
+and LaneScheduler, which gives interactive work priority over batch work
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple, Callable
+import config
+import telemetry
+from core_logic import AudioEngine
+
+
+# Admission decisions
+ADMIT = "admit"
+DELAY = "delay"
+REJECT = "reject"
+
+
+class TTSQuotaScheduler:
+    """
+    Sits in front of AudioEngine.generate_dialogue_v3 and decides whether a
+    script may be synthesized now (admit), has to wait for a free slot or a
+    429 cooldown (delay), or can never fit in the remaining quota (reject).
+
+    Characters are reserved when a job is admitted and only charged once the
+    request succeeds, so a batch never starts a job it cannot finish.
+    """
+
+    def __init__(self, character_quota: Optional[int] = None, max_concurrency: Optional[int] = None,
+                 cooldown: Optional[float] = None, max_wait: float = 300.0, api_key: Optional[str] = None):
+        """
+        Initialize TTSQuotaScheduler
+
+        Args:
+            character_quota: Characters available to this scheduler (None = unlimited)
+            max_concurrency: Concurrent ElevenLabs requests (defaults to config.ELEVENLABS_MAX_CONCURRENCY)
+            cooldown: Seconds to hold admissions after a 429 (defaults to config.ELEVENLABS_THROTTLE_COOLDOWN)
+            max_wait: Longest time a delayed job waits for a slot before giving up
+            api_key: ElevenLabs API key whose subscription sets the quota on the first acquire
+                     when no character_quota is configured
+        """
+        if character_quota is None:
+            character_quota = config.ELEVENLABS_CHARACTER_QUOTA
+        self.character_quota = character_quota
+        self.api_key = api_key
+        self._quota_synced = character_quota is not None
+        self.max_concurrency = max_concurrency or config.ELEVENLABS_MAX_CONCURRENCY
+        self.cooldown = config.ELEVENLABS_THROTTLE_COOLDOWN if cooldown is None else cooldown
+        self.max_wait = max_wait
+
+        self._cond = threading.Condition()
+        self.used_characters = 0
+        self.reserved_characters = 0
+        self.active = 0
+        self.cooldown_until = 0.0
+        self.stats = {"admitted": 0, "delayed": 0, "rejected": 0, "throttled": 0, "failed": 0}
+
+    def remaining_characters(self) -> Optional[int]:
+        """Characters not yet used or reserved (None if the quota is unlimited)"""
+        with self._cond:
+            return self._remaining()
+
+    def _remaining(self) -> Optional[int]:
+        if self.character_quota is None:
+            return None
+        return self.character_quota - self.used_characters - self.reserved_characters
+
+    def sync_quota(self, api_key: str, audio_engine: Optional[AudioEngine] = None) -> Optional[str]:
+        """
+        Refresh the character quota from the ElevenLabs subscription endpoint
+
+        Args:
+            api_key: ElevenLabs API key
+            audio_engine: Optional AudioEngine to use for the lookup
+
+        Returns:
+            Error message, or None on success
+        """
+        audio_engine = audio_engine or AudioEngine()
+        remaining, error = audio_engine.get_remaining_characters(api_key)
+        if error:
+            return error
+        with self._cond:
+            # Reservations in flight have not been billed yet, keep them on top
+            self.character_quota = remaining + self.used_characters + self.reserved_characters
+            self._cond.notify_all()
+        return None
+
+    def _sync_quota_once(self):
+        """Read the quota from the subscription endpoint on first use (a failed lookup leaves it unlimited)"""
+        with self._cond:
+            if self._quota_synced or not self.api_key:
+                return
+            self._quota_synced = True
+        self.sync_quota(self.api_key)
+
+    def check(self, script_json: List[Dict]) -> Tuple[str, int]:
+        """
+        Decide what would happen to a script right now without reserving anything
+
+        Args:
+            script_json: List of dicts with "speaker" and "text" keys
+
+        Returns:
+            Tuple of (decision, character_cost). decision is ADMIT, DELAY or REJECT.
+        """
+        cost = AudioEngine.character_cost(script_json)
+        with self._cond:
+            return self._decide(cost), cost
+
+    def _decide(self, cost: int) -> str:
+        remaining = self._remaining()
+        if remaining is not None and cost > remaining:
+            # Waiting cannot help if the reserved jobs would all succeed anyway
+            return REJECT
+        if self.active >= self.max_concurrency or time.monotonic() < self.cooldown_until:
+            return DELAY
+        return ADMIT
+
+    def acquire(self, script_json: List[Dict], timeout: Optional[float] = None) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Reserve characters and a concurrency slot, waiting while the decision is DELAY
+
+        Args:
+            script_json: List of dicts with "speaker" and "text" keys
+            timeout: Seconds to wait for a slot (defaults to max_wait)
+
+        Returns:
+            Tuple of (reserved_cost, error_message). reserved_cost is None if the job was rejected.
+        """
+        self._sync_quota_once()
+        cost = AudioEngine.character_cost(script_json)
+        deadline = time.monotonic() + (self.max_wait if timeout is None else timeout)
+        waited = False
+        with self._cond:
+            while True:
+                decision = self._decide(cost)
+                if decision == REJECT:
+                    self.stats["rejected"] += 1
+                    return None, f"Insufficient ElevenLabs quota: job needs {cost} characters, {self._remaining()} remaining"
+                if decision == ADMIT:
+                    break
+                now = time.monotonic()
+                if now >= deadline:
+                    self.stats["rejected"] += 1
+                    return None, "Timed out waiting for an ElevenLabs slot"
+                if not waited:
+                    self.stats["delayed"] += 1
+                    waited = True
+                # Wake up for a released slot or the end of a cooldown
+                wait_for = deadline - now
+                if self.cooldown_until > now:
+                    wait_for = min(wait_for, self.cooldown_until - now)
+                self._cond.wait(wait_for)
+
+            self.active += 1
+            self.reserved_characters += cost
+            self.stats["admitted"] += 1
+            return cost, None
+
+    def release(self, cost: int, success: bool, throttled: bool = False):
+        """
+        Return a slot and either charge or refund the reserved characters
+
+        Args:
+            cost: Value returned by acquire
+            success: True if ElevenLabs produced audio (characters are billed)
+            throttled: True if the request was answered with 429
+        """
+        with self._cond:
+            self.active -= 1
+            self.reserved_characters -= cost
+            if success:
+                self.used_characters += cost
+            else:
+                self.stats["failed"] += 1
+            if throttled:
+                self.stats["throttled"] += 1
+                self.cooldown_until = max(self.cooldown_until, time.monotonic() + self.cooldown)
+            self._cond.notify_all()
+
+    def call(self, script_json: List[Dict], fn, max_retries: int = 2, result_size: int = 2,
+             on_retry: Optional[Callable[[], None]] = None):
+        """
+        Run an ElevenLabs request under quota and concurrency control
+
+        A 429 answer pauses admissions for the cooldown and the call is retried
+        up to max_retries times.
+
+        Args:
+            script_json: Lines the request will synthesize (used for the character cost)
+            fn: Zero-argument callable returning a tuple whose last item is an error message or None
+            max_retries: Retries after a 429 answer
+            result_size: Length of the tuple fn returns
+            on_retry: Called before each retried attempt, e.g. to charge the key pool for it
+
+        Returns:
+            Whatever fn returns; if the job is rejected, a tuple of Nones ending in the error
+        """
+        attempt = 0
+        while True:
+            cost, error = self.acquire(script_json)
+            if error:
+                return (None,) * (result_size - 1) + (error,)
+
+            result = fn()
+            error = result[-1]
+            throttled = bool(error) and error.startswith("ElevenLabs API error: 429")
+            self.release(cost, success=error is None, throttled=throttled)
+
+            if throttled and attempt < max_retries:
+                attempt += 1
+                if on_retry is not None:
+                    on_retry()
+                continue
+            return result
+
+    def generate(self, audio_engine: AudioEngine, script_json: List[Dict], api_key: str,
+                 base_url: Optional[str] = None, max_retries: int = 2,
+                 on_retry: Optional[Callable[[], None]] = None) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        Run AudioEngine.generate_dialogue_v3 under quota and concurrency control (see call)
+
+        Returns:
+            Tuple of (audio_bytes, error_message), same contract as generate_dialogue_v3
+        """
+        return self.call(script_json, lambda: audio_engine.generate_dialogue_v3(script_json, api_key, base_url),
+                         max_retries=max_retries, on_retry=on_retry)
+
+    def snapshot(self) -> Dict:
+        """Current quota, slot and decision counters (for UIs and metrics)"""
+        with self._cond:
+            return {
+                "character_quota": self.character_quota,
+                "used_characters": self.used_characters,
+                "reserved_characters": self.reserved_characters,
+                "remaining_characters": self._remaining(),
+                "active": self.active,
+                "max_concurrency": self.max_concurrency,
+                "cooling_down": time.monotonic() < self.cooldown_until,
+                **self.stats
+            }
+
+
+_tts_scheduler = None
+_tts_scheduler_lock = threading.Lock()
+
+
+def get_tts_scheduler(api_key: Optional[str] = None) -> TTSQuotaScheduler:
+    """
+    Process-wide TTSQuotaScheduler shared by the UI and the local runner
+
+    Args:
+        api_key: ElevenLabs API key; the first one given sets the quota from its subscription
+                 on the first acquire (see TTSQuotaScheduler)
+    """
+    global _tts_scheduler
+    with _tts_scheduler_lock:
+        if _tts_scheduler is None:
+            _tts_scheduler = TTSQuotaScheduler()
+            telemetry.register_collector("tts_quota", _tts_scheduler.snapshot)
+        if api_key and not _tts_scheduler.api_key:
+            _tts_scheduler.api_key = api_key
+        return _tts_scheduler
+
+
+# Circuit states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Errors that say the upstream itself is unhealthy: a network failure, a 429 or a 5xx. Wrapped client
+# exceptions ("Error generating ...") count only when they carry one of those; a 401/403, a bad script or
+# voice ID, a local bug and our own waits ("Timed out waiting for ...", quota, rate limit) do not.
+_UPSTREAM_FAILURE = re.compile(
+    r"^Network error: |API error: (429|5\d\d)\b|"
+    r"^Error generating \w+: (?:(429|5\d\d) [A-Z_]+\b|"
+    r".*(?i:timed out|connection (?:reset|refused|aborted)|server disconnected|remote end closed))"
+)
+
+
+def is_upstream_failure(error: Optional[str]) -> bool:
+    """True if an error message points at the upstream API rather than at the request"""
+    return bool(error) and bool(_UPSTREAM_FAILURE.search(error))
+
+
+class UpstreamGuard:
+    """
+    Adaptive concurrency limit and circuit breaker for one upstream, per process
+
+    The limit follows AIMD: it grows by roughly one after a full window of
+    fast successes and halves on a failure or a call slower than
+    latency_target, so throughput backs off smoothly during a partial outage.
+    After failure_threshold consecutive failures the circuit opens and calls
+    fail immediately; after open_seconds a single probe is let through, and
+    its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, upstream: str, max_limit: int, min_limit: int = 1, latency_target: Optional[float] = None,
+                 failure_threshold: Optional[int] = None, open_seconds: Optional[float] = None):
+        """
+        Initialize UpstreamGuard
+
+        Args:
+            upstream: Name of the upstream API ("gemini" or "elevenlabs")
+            max_limit: Highest concurrency the limit may reach (the upstream's lane slots)
+            min_limit: Lowest concurrency the limit may fall to
+            latency_target: Seconds above which a successful call counts as congestion
+            failure_threshold: Consecutive failures that open the circuit
+            open_seconds: Seconds the circuit stays open before probing
+        """
+        defaults = config.UPSTREAM_GUARD.get(upstream, {"latency_target": 30, "failure_threshold": 5, "open_seconds": 30})
+        self.upstream = upstream
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.latency_target = latency_target or defaults["latency_target"]
+        self.failure_threshold = failure_threshold or defaults["failure_threshold"]
+        self.open_seconds = defaults["open_seconds"] if open_seconds is None else open_seconds
+        self.limit = float(self.max_limit)
+        self.state = CLOSED
+        self._in_flight = 0
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._last_decrease = float("-inf")
+        self._cond = threading.Condition()
+        self.stats = {"successes": 0, "failures": 0, "slow": 0, "rejected": 0, "opened": 0}
+
+    def _check_circuit(self, now: float) -> bool:
+        """Whether a new call may start; moves OPEN to HALF_OPEN once open_seconds pass"""
+        if self.state == OPEN and now - self._opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == OPEN:
+            return False
+        if self.state == HALF_OPEN:
+            return not self._probing
+        return True
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Wait until the adaptive limit admits one more call
+
+        Args:
+            timeout: Seconds to wait (None = forever)
+
+        Returns:
+            Error message if the circuit is open or no capacity freed up in time, otherwise None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if not self._check_circuit(time.monotonic()):
+                    if self.state == OPEN:
+                        self.stats["rejected"] += 1
+                        retry_in = self.open_seconds - (time.monotonic() - self._opened_at)
+                        return f"{self.upstream} circuit open after repeated failures, retry in {max(0.0, retry_in):.0f}s"
+                elif self._in_flight < int(self.limit):
+                    self._in_flight += 1
+                    if self.state == HALF_OPEN:
+                        self._probing = True
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.stats["rejected"] += 1
+                    return f"Timed out waiting for {self.upstream} capacity (limit {int(self.limit)})"
+                # Wake up periodically so an expired open period is noticed without a release
+                self._cond.wait(0.5 if remaining is None else min(remaining, 0.5))
+
+    def release(self, latency: float, failed: bool):
+        """
+        Record the outcome of a call admitted by acquire
+
+        Args:
+            latency: Seconds the call took
+            failed: True if the upstream failed (see is_upstream_failure)
+        """
+        now = time.monotonic()
+        with self._cond:
+            self._in_flight -= 1
+            slow = not failed and latency > self.latency_target
+            if failed:
+                self.stats["failures"] += 1
+                self._consecutive_failures += 1
+            else:
+                self.stats["successes"] += 1
+                self._consecutive_failures = 0
+                if slow:
+                    self.stats["slow"] += 1
+
+            if failed or slow:
+                # Calls already in flight at the last decrease saw the old limit, so a
+                # burst of failures from one window halves the limit only once
+                if now - latency >= self._last_decrease:
+                    self.limit = max(float(self.min_limit), self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+            if self.state == HALF_OPEN and self._probing:
+                self._probing = False
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+            elif failed and self.state == CLOSED and self._consecutive_failures >= self.failure_threshold:
+                self._open(now)
+            self._cond.notify_all()
+
+    def cancel(self):
+        """Give back a call admitted by acquire that never reached the upstream"""
+        with self._cond:
+            self._in_flight -= 1
+            if self.state == HALF_OPEN:
+                self._probing = False
+            self._cond.notify_all()
+
+    def _open(self, now: float):
+        self.state = OPEN
+        self._opened_at = now
+        self.stats["opened"] += 1
+
+    def run(self, fn, result_size: int = 2, timeout: Optional[float] = None):
+        """
+        Call fn under the adaptive limit and record its outcome
+
+        Args:
+            fn: Zero-argument callable returning a (result..., error) tuple
+            result_size: Length of the tuple fn returns
+            timeout: Seconds to wait for capacity
+
+        Returns:
+            Whatever fn returns, or a tuple of Nones ending in the error if the call was not admitted
+        """
+        error = self.acquire(timeout)
+        if error:
+            return (None,) * (result_size - 1) + (error,)
+        start = time.monotonic()
+        failed = True
+        try:
+            result = fn()
+            failed = is_upstream_failure(result[-1])
+            return result
+        finally:
+            self.release(time.monotonic() - start, failed)
+
+    def snapshot(self) -> Dict:
+        """Circuit state, current limit and outcome counters"""
+        with self._cond:
+            self._check_circuit(time.monotonic())
+            return {
+                "state": self.state,
+                "limit": round(self.limit, 2),
+                "max_limit": self.max_limit,
+                "in_flight": self._in_flight,
+                "consecutive_failures": self._consecutive_failures,
+                "stats": dict(self.stats)
+            }
+
+
+# Priority lanes
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class LaneScheduler:
+    """
+    Concurrency slots for one upstream (Gemini or ElevenLabs) split into two
+    priority lanes and shared by every process on the host.
+
+    - Interactive work may use any free slot.
+    - Batch work may use at most total - reserved_interactive slots, and it
+      is deferred whenever an interactive request is waiting, so a nightly
+      batch never queues ahead of a user in the UI.
+
+    Batch requests already in flight are not interrupted (an HTTP call cannot
+    be taken back); they are preempted at the next slot boundary instead.
+    State lives in a SQLite file: slots held by a dead process are reclaimed
+    by pid check, and by lease expiry as a last resort.
+    """
+
+    def __init__(self, upstream: str, total: Optional[int] = None, reserved_interactive: Optional[int] = None,
+                 db_path: Optional[str] = None, poll_interval: float = 0.02, lease_seconds: Optional[float] = None):
+        """
+        Initialize LaneScheduler
+
+        Args:
+            upstream: Name of the upstream API ("gemini" or "elevenlabs")
+            total: Slots for this upstream (defaults to config.LANE_SLOTS)
+            reserved_interactive: Slots batch work may never take (defaults to config.LANE_SLOTS)
+            db_path: SQLite file shared by all processes (defaults to config.SCHEDULER_DB_PATH)
+            poll_interval: Seconds between admission checks while waiting
+            lease_seconds: Age after which a slot is reclaimed (defaults to config.LANE_LEASE_SECONDS)
+        """
+        defaults = config.LANE_SLOTS.get(upstream, {"total": 2, "reserved_interactive": 1})
+        self.upstream = upstream
+        self.total = total or defaults["total"]
+        self.reserved_interactive = defaults["reserved_interactive"] if reserved_interactive is None else reserved_interactive
+        # Batch must always have at least one slot or it would starve forever
+        self.batch_slots = max(1, self.total - self.reserved_interactive)
+        self.db_path = db_path or config.SCHEDULER_DB_PATH
+        self.poll_interval = poll_interval
+        self.lease_seconds = config.LANE_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self.stats = {lane: {"acquired": 0, "timeouts": 0, "wait_seconds": 0.0} for lane in (INTERACTIVE, BATCH)}
+        self._stats_lock = threading.Lock()
+        self.guard = UpstreamGuard(upstream, self.total)
+        conn = self._connect()
+        conn.execute("CREATE TABLE IF NOT EXISTS lane_slots (token TEXT PRIMARY KEY, upstream TEXT, lane TEXT, pid INTEGER, expires REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS lane_waiters (token TEXT PRIMARY KEY, upstream TEXT, lane TEXT, pid INTEGER, expires REAL)")
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _reap(self, conn: sqlite3.Connection, now: float):
+        """Drop expired rows and rows owned by processes that no longer exist"""
+        for table in ("lane_slots", "lane_waiters"):
+            conn.execute(f"DELETE FROM {table} WHERE expires < ?", (now,))
+            for token, pid in conn.execute(f"SELECT token, pid FROM {table} WHERE upstream = ?", (self.upstream,)).fetchall():
+                if pid != os.getpid() and not _pid_alive(pid):
+                    conn.execute(f"DELETE FROM {table} WHERE token = ?", (token,))
+
+    def _try_acquire(self, conn: sqlite3.Connection, token: str, lane: str) -> bool:
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._reap(conn, now)
+            active, active_batch = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(lane = ?), 0) FROM lane_slots WHERE upstream = ?",
+                (BATCH, self.upstream)
+            ).fetchone()
+            if lane == INTERACTIVE:
+                admitted = active < self.total
+                if not admitted:
+                    # Heartbeat the waiter row so batch work keeps deferring to us
+                    conn.execute("INSERT OR REPLACE INTO lane_waiters VALUES (?, ?, ?, ?, ?)",
+                                 (token, self.upstream, lane, os.getpid(), now + max(1.0, self.poll_interval * 50)))
+            else:
+                waiting = conn.execute(
+                    "SELECT COUNT(*) FROM lane_waiters WHERE upstream = ? AND lane = ?",
+                    (self.upstream, INTERACTIVE)
+                ).fetchone()[0]
+                admitted = active < self.total and active_batch < self.batch_slots and waiting == 0
+            if admitted:
+                conn.execute("DELETE FROM lane_waiters WHERE token = ?", (token,))
+                conn.execute("INSERT INTO lane_slots VALUES (?, ?, ?, ?, ?)",
+                             (token, self.upstream, lane, os.getpid(), now + self.lease_seconds))
+            conn.execute("COMMIT")
+            return admitted
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def acquire(self, lane: str = INTERACTIVE, timeout: Optional[float] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Wait for a slot in the given lane
+
+        Args:
+            lane: INTERACTIVE or BATCH
+            timeout: Seconds to wait (None = forever)
+
+        Returns:
+            Tuple of (token, error_message). token is None if no slot was granted in time.
+        """
+        if lane not in (INTERACTIVE, BATCH):
+            return None, f"Unknown lane: {lane}"
+        token = uuid.uuid4().hex
+        start = time.monotonic()
+        conn = self._connect()
+        try:
+            while not self._try_acquire(conn, token, lane):
+                if timeout is not None and time.monotonic() - start >= timeout:
+                    conn.execute("DELETE FROM lane_waiters WHERE token = ?", (token,))
+                    with self._stats_lock:
+                        self.stats[lane]["timeouts"] += 1
+                    return None, f"Timed out waiting for a {self.upstream} slot ({lane} lane)"
+                time.sleep(self.poll_interval)
+        finally:
+            conn.close()
+        with self._stats_lock:
+            self.stats[lane]["acquired"] += 1
+            self.stats[lane]["wait_seconds"] += time.monotonic() - start
+        return token, None
+
+    def release(self, token: str):
+        """Give a slot back"""
+        conn = self._connect()
+        conn.execute("DELETE FROM lane_slots WHERE token = ?", (token,))
+        conn.close()
+
+    @contextmanager
+    def slot(self, lane: str = INTERACTIVE, timeout: Optional[float] = None):
+        """
+        Context manager around acquire / release
+
+        Yields:
+            Error message if no slot was granted, otherwise None
+        """
+        token, error = self.acquire(lane, timeout)
+        try:
+            yield error
+        finally:
+            if token:
+                self.release(token)
+
+    def run(self, lane: str, fn, result_size: int = 2, timeout: Optional[float] = None):
+        """
+        Call fn while holding a slot, under this process's adaptive limit and circuit breaker
+
+        Args:
+            lane: INTERACTIVE or BATCH
+            fn: Zero-argument callable returning a (result..., error) tuple
+            result_size: Length of the tuple fn returns
+            timeout: Seconds to wait for a slot
+
+        Returns:
+            Whatever fn returns, or a tuple of Nones ending in the error if the
+            circuit is open or no slot was granted
+        """
+        # The guard goes first so an open circuit fails fast instead of queueing for a slot
+        error = self.guard.acquire(timeout)
+        if error:
+            return (None,) * (result_size - 1) + (error,)
+        start = None
+        failed = False
+        try:
+            with self.slot(lane, timeout) as error:
+                if error:
+                    return (None,) * (result_size - 1) + (error,)
+                start = time.monotonic()
+                failed = True
+                result = fn()
+                failed = is_upstream_failure(result[-1])
+                return result
+        finally:
+            if start is None:
+                self.guard.cancel()
+            else:
+                self.guard.release(time.monotonic() - start, failed)
+
+    def snapshot(self) -> Dict:
+        """Slots in use and waiting per lane, plus this process's wait statistics"""
+        conn = self._connect()
+        self._reap(conn, time.time())
+        active = dict(conn.execute("SELECT lane, COUNT(*) FROM lane_slots WHERE upstream = ? GROUP BY lane",
+                                   (self.upstream,)).fetchall())
+        waiting = dict(conn.execute("SELECT lane, COUNT(*) FROM lane_waiters WHERE upstream = ? GROUP BY lane",
+                                    (self.upstream,)).fetchall())
+        conn.close()
+        with self._stats_lock:
+            stats = {lane: dict(values) for lane, values in self.stats.items()}
+        return {
+            "upstream": self.upstream,
+            "total": self.total,
+            "batch_slots": self.batch_slots,
+            "active": active,
+            "waiting": waiting,
+            "stats": stats,
+            "guard": self.guard.snapshot()
+        }
+
+
+_lane_schedulers = {}
+
+
+def get_lane_scheduler(upstream: str) -> LaneScheduler:
+    """Process-wide LaneScheduler for an upstream ("gemini" or "elevenlabs")"""
+    with _tts_scheduler_lock:
+        if upstream not in _lane_schedulers:
+            _lane_schedulers[upstream] = LaneScheduler(upstream)
+            telemetry.register_collector(f"lanes_{upstream}", _lane_schedulers[upstream].snapshot)
+        return _lane_schedulers[upstream]
+
+
+def estimate_tts_cost(characters: int) -> float:
+    """Dollar estimate for a number of ElevenLabs characters"""
+    return (characters / 1000) * config.ELEVENLABS_COST_PER_1K_CHARS
@@ -0,0 +1,151 @@
+"""
+Script quality gate for The Synthetic Radio Host - Wiki-talks
+Cheap local scoring of a generated script before any ElevenLabs characters are spent on it:
+length against the target, [tag] density, Hinglish ratio, line length and repeated lines
+"""
+
+import re
+import threading
+from typing import List, Dict, Optional, Tuple, Callable
+import config
+import telemetry
+from core_logic import ScriptGenerator
+from pacing import TAG, spoken_words
+
+_DEVANAGARI = re.compile(r"[ऀ-ॿ]")
+
+
+class ScriptQualityGate:
+    """
+    Scores a script against config.SCRIPT_QUALITY and rejects the ones not worth voicing
+
+    Every check is local string work (well under a millisecond for a full
+    script), so it costs nothing next to the Gemini call before it and the
+    ElevenLabs call it can save. Each decision is recorded as a
+    "script.quality" span: passed / rejected counts, the scores as
+    attributes and a regenerated flag.
+    """
+
+    def __init__(self, thresholds: Optional[Dict] = None, hinglish_words: Optional[frozenset] = None):
+        """
+        Initialize ScriptQualityGate
+
+        Args:
+            thresholds: Overrides for config.SCRIPT_QUALITY
+            hinglish_words: Romanized Hindi vocabulary (defaults to config.HINGLISH_WORDS)
+        """
+        self.thresholds = {**config.SCRIPT_QUALITY, **(thresholds or {})}
+        self.hinglish_words = hinglish_words if hinglish_words is not None else config.HINGLISH_WORDS
+
+    def score(self, script_json: List[Dict], duration: int = 120, preview: bool = False, variant: str = "RJ") -> Dict:
+        """
+        Measure a script
+
+        Args:
+            script_json: Validated script (list of {"speaker", "text"})
+            duration: Target duration in seconds the script was asked for
+            preview: Preview scripts are trimmed to PREVIEW_BUDGET, so their length is not checked
+            variant: Variant the script was written for (its measured pace sets the target word count)
+
+        Returns:
+            Dict of scores plus "problems", a list of the thresholds the script misses (empty = passed)
+        """
+        limits = self.thresholds
+        lines = [entry.get("text", "") for entry in script_json]
+        line_words = [spoken_words(text) for text in lines]
+        words = sum(len(w) for w in line_words)
+        tags = sum(len(TAG.findall(text)) for text in lines)
+        hindi = sum(1 for w in line_words for word in w if word in self.hinglish_words or _DEVANAGARI.search(word))
+        seen = set()
+        repeated = 0
+        for w in line_words:
+            key = " ".join(w)
+            if key in seen:
+                repeated += 1
+            seen.add(key)
+
+        count = max(len(lines), 1)
+        scores = {
+            "lines": len(lines),
+            "words": words,
+            "target_words": None if preview else ScriptGenerator.target_words(duration, variant),
+            "tag_density": round(tags / count, 3),
+            "hinglish_ratio": round(hindi / max(words, 1), 3),
+            "longest_line_words": max((len(w) for w in line_words), default=0),
+            "repeat_ratio": round(repeated / count, 3)
+        }
+        problems = []
+        if scores["target_words"]:
+            deviation = (words - scores["target_words"]) / scores["target_words"]
+            scores["word_deviation"] = round(deviation, 3)
+            if abs(deviation) > limits["word_tolerance"]:
+                problems.append(f"{words} words for a target of {scores['target_words']}")
+        if scores["tag_density"] < limits["min_tag_density"]:
+            problems.append(f"too few [tags] ({tags} in {len(lines)} lines)")
+        elif scores["tag_density"] > limits["max_tag_density"]:
+            problems.append(f"too many [tags] ({tags} in {len(lines)} lines)")
+        if scores["hinglish_ratio"] < limits["min_hinglish_ratio"]:
+            problems.append(f"almost no Hindi ({scores['hinglish_ratio']:.0%} of words)")
+        if scores["longest_line_words"] > limits["max_line_words"]:
+            problems.append(f"a {scores['longest_line_words']}-word line")
+        if scores["repeat_ratio"] > limits["max_repeat_ratio"]:
+            problems.append(f"{repeated} repeated lines")
+        scores["problems"] = problems
+        return scores
+
+    def check(self, script_json: List[Dict], duration: int = 120, preview: bool = False,
+              attempt: int = 1, variant: str = "RJ") -> Tuple[Dict, Optional[str]]:
+        """
+        Score a script and record the decision
+
+        Returns:
+            Tuple of (scores, error_message). error_message is None if the script may be voiced.
+        """
+        with telemetry.span("script.quality", attempt=attempt, preview=preview, variant=variant) as span:
+            scores = self.score(script_json, duration, preview, variant)
+            span.set(passed=not scores["problems"], regenerated=attempt > 1,
+                     **{name: value for name, value in scores.items() if isinstance(value, (int, float))})
+            if not scores["problems"]:
+                return scores, None
+            error = f"Script failed quality gate: {'; '.join(scores['problems'])}"
+            span.fail(error)
+            return scores, error
+
+    def generate(self, generate: Callable[[], Tuple[Optional[List[Dict]], Optional[str]]], duration: int = 120,
+                 preview: bool = False, variant: str = "RJ") -> Tuple[Optional[List[Dict]], Optional[str]]:
+        """
+        Generate a script and regenerate it while it fails the gate
+
+        Args:
+            generate: Zero-argument callable returning (script_json, error_message), e.g. a
+                      ScriptGenerator.generate_script call
+            duration: Target duration in seconds
+            preview: Whether generate writes a preview
+            variant: Variant being written
+
+        Returns:
+            Tuple of (script_json, error_message). Generation errors are returned as they are;
+            a script still failing after max_regenerations is returned as an error.
+        """
+        error = None
+        for attempt in range(1, self.thresholds["max_regenerations"] + 2):
+            script_json, error = generate()
+            if error:
+                return None, error
+            _, error = self.check(script_json, duration, preview, attempt, variant)
+            if error is None:
+                return script_json, None
+        return None, error
+
+
+_gate = None
+_gate_lock = threading.Lock()
+
+
+def get_script_quality_gate() -> ScriptQualityGate:
+    """Process-wide ScriptQualityGate configured from config.SCRIPT_QUALITY"""
+    global _gate
+    with _gate_lock:
+        if _gate is None:
+            _gate = ScriptQualityGate()
+        return _gate
@@ -0,0 +1,181 @@
+"""
+Time-to-first-audio streaming for The Synthetic Radio Host - Wiki-talks
+Sends small batches of script lines to TTS while Gemini is still writing the rest
+"""
+
+import queue
+import threading
+import time
+from typing import List, Dict, Optional, Tuple, Callable, Iterable, Iterator
+import config
+from scheduler import is_upstream_failure
+
+# Turns a batch of script lines into audio: (audio_bytes, error_message)
+SynthesizeFn = Callable[[List[Dict]], Tuple[Optional[bytes], Optional[str]]]
+
+_DONE = object()
+
+
+class StreamChunk:
+    """One synthesized batch of consecutive script lines"""
+
+    def __init__(self, index: int, lines: List[Dict], audio_bytes: Optional[bytes] = None,
+                 error: Optional[str] = None, elapsed: float = 0.0):
+        """
+        Initialize StreamChunk
+
+        Args:
+            index: Position of the batch in the broadcast (0 = first audio heard)
+            lines: Script lines voiced in this chunk
+            audio_bytes: MP3 audio for the lines
+            error: Error message if the script or the audio failed
+            elapsed: Seconds from the start of the stream until this chunk was ready
+        """
+        self.index = index
+        self.lines = lines
+        self.audio_bytes = audio_bytes
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        return f"StreamChunk({self.index}, lines={len(self.lines)}, elapsed={self.elapsed:.2f}, error={self.error!r})"
+
+
+def batch_lines(lines: Iterable[Tuple[Optional[Dict], Optional[str]]], first_batch: Optional[int] = None,
+                batch_size: Optional[int] = None) -> Iterator[Tuple[List[Dict], Optional[str]]]:
+    """
+    Group streamed (line, error) tuples into batches
+
+    The first batch is small so the listener hears something quickly; later
+    batches are larger so each TTS call carries more conversational context.
+
+    Yields:
+        Tuples of (lines, error_message). A tuple with an error carries the
+        lines collected before the error and ends the stream.
+    """
+    first_batch = first_batch or config.STREAM_FIRST_BATCH_LINES
+    batch_size = batch_size or config.STREAM_BATCH_LINES
+    batch = []
+    limit = first_batch
+    for line, error in lines:
+        if error:
+            yield batch, error
+            return
+        batch.append(line)
+        if len(batch) >= limit:
+            yield batch, None
+            batch = []
+            limit = batch_size
+    if batch:
+        yield batch, None
+
+
+def stream_broadcast(lines: Iterable[Tuple[Optional[Dict], Optional[str]]], synthesize: SynthesizeFn,
+                     first_batch: Optional[int] = None, batch_size: Optional[int] = None,
+                     queue_size: int = 2) -> Iterator[StreamChunk]:
+    """
+    Synthesize a script batch by batch while it is still being generated
+
+    A background thread reads the script stream (e.g. ScriptGenerator.stream_script)
+    and queues batches; the calling thread synthesizes them in order and yields
+    each chunk as soon as its audio is ready. Script generation and TTS
+    therefore overlap, and the first chunk arrives after roughly one small
+    script batch plus one short TTS call.
+
+    Args:
+        lines: Iterable of (line, error_message) tuples
+        synthesize: Function turning a list of lines into (audio_bytes, error_message)
+        first_batch: Lines in the first batch (defaults to config.STREAM_FIRST_BATCH_LINES)
+        batch_size: Lines in later batches (defaults to config.STREAM_BATCH_LINES)
+        queue_size: Batches the script thread may run ahead of TTS
+
+    Yields:
+        StreamChunk in broadcast order. The stream ends after the first chunk with an error.
+    """
+    batches = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    start = time.perf_counter()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for batch, error in batch_lines(lines, first_batch, batch_size):
+                if not put((batch, error)) or error:
+                    return
+        except Exception as e:
+            put(([], f"Error generating script: {str(e)}"))
+        finally:
+            put(_DONE)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    index = 0
+    try:
+        while True:
+            item = batches.get()
+            if item is _DONE:
+                return
+            batch, error = item
+            audio_bytes = None
+            if batch:
+                audio_bytes, audio_error = synthesize(batch)
+                # A script error still lets the lines before it play
+                if audio_error:
+                    error = audio_error
+            if batch or error:
+                yield StreamChunk(index, batch, audio_bytes, error, time.perf_counter() - start)
+                index += 1
+            if error:
+                return
+    finally:
+        # Consumer gone (finished, failed or closed early): let the producer exit
+        stop.set()
+
+
+def hold_slot(lane_scheduler, lane: str, lines: Iterable[Tuple[Optional[Dict], Optional[str]]]) -> Iterator[Tuple[Optional[Dict], Optional[str]]]:
+    """
+    Wrap a script stream so it holds one lane slot (see scheduler.LaneScheduler) until the script is finished
+
+    Like LaneScheduler.run, the stream also goes through the scheduler's
+    UpstreamGuard: an open circuit fails it before a slot is taken, and its
+    time to the first line and any upstream error feed the adaptive limit.
+    The slot is released as soon as the last line arrives, while TTS for
+    the remaining batches may still be running.
+    """
+    guard = lane_scheduler.guard
+    error = guard.acquire()
+    if error:
+        yield None, error
+        return
+    start = None
+    latency = None
+    failed = False
+    try:
+        with lane_scheduler.slot(lane) as error:
+            if error:
+                yield None, error
+                return
+            start = time.monotonic()
+            for line, error in lines:
+                if latency is None:
+                    latency = time.monotonic() - start
+                if error and is_upstream_failure(error):
+                    failed = True
+                yield line, error
+    finally:
+        if start is None:
+            guard.cancel()
+        else:
+            guard.release(time.monotonic() - start if latency is None else latency, failed)
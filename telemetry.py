@@ -0,0 +1,540 @@
+"""
+Tracing and metrics for The Synthetic Radio Host - Wiki-talks
+Spans around pipeline stages, OpenMetrics export and JSONL trace files
+"""
+
+import atexit
+import functools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple, Callable, Iterator
+import config
+from lazy_import import LazyModule
+
+# Only needed for URL sinks and the /metrics server; most processes never load them
+urllib_request = LazyModule("urllib.request")
+http_server = LazyModule("http.server")
+
+OK = "ok"
+ERROR = "error"
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class Span:
+    """One timed operation with attributes (counts, sizes, flags) and an outcome"""
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict] = None):
+        """
+        Initialize Span
+
+        Args:
+            name: Stage name, e.g. "scrape" or "script.api"
+            trace_id: Trace this span belongs to (a new trace if None)
+            parent_id: span_id of the enclosing span
+            attributes: Initial attributes
+        """
+        self.name = name
+        self.trace_id = trace_id or _new_id()
+        self.span_id = _new_id()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.status = OK
+        self.error = None
+        self.start = time.time()
+        self.duration = None
+        self._t0 = time.perf_counter()
+
+    def set(self, **attributes) -> "Span":
+        """Add or overwrite attributes"""
+        self.attributes.update(attributes)
+        return self
+
+    def fail(self, error: str) -> "Span":
+        """Mark the span as failed"""
+        self.status = ERROR
+        self.error = error
+        return self
+
+    def elapsed(self) -> float:
+        """Seconds since the span started"""
+        return time.perf_counter() - self._t0
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration": None if self.duration is None else round(self.duration, 6),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name
+        }
+
+
+class _NoopSpan(Span):
+    """Returned when telemetry is disabled or no span is active; accepts and drops everything"""
+
+    def __init__(self):
+        super().__init__("noop")
+
+    def set(self, **attributes) -> "Span":
+        return self
+
+    def fail(self, error: str) -> "Span":
+        return self
+
+
+_NOOP = _NoopSpan()
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _record_result(span: Span, result, measure: Optional[Callable[[object], Dict]]):
+    if isinstance(result, tuple) and len(result) >= 2:
+        value, error = result[0], result[-1]
+        if error:
+            span.fail(error)
+        elif measure is not None and value is not None:
+            span.set(**measure(value))
+    return result
+
+
+def _flatten(values: Dict, prefix: str = "") -> Iterator[Tuple[str, object]]:
+    for key, value in values.items():
+        field = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, field + "_")
+        else:
+            yield field, value
+
+
+class Tracer:
+    """
+    Records spans and aggregates them into per-stage metrics
+
+    Every finished span adds its duration to a latency histogram labelled by
+    span name and status, adds its numeric attributes (bytes, characters,
+    tokens, lines) to per-stage counters and counts its boolean attributes
+    (cache_hit, coalesced, preview) by value. Components such as the lane
+    schedulers and the artifact store register snapshot functions whose
+    numbers are exported as gauges at scrape time.
+
+    Spans opened with span() nest per thread. Finished spans are optionally
+    written as JSON lines to a file or POSTed in batches to a URL. URL
+    exports go through a bounded queue drained by a background thread, so a
+    slow collector never holds up generation; spans that do not fit in the
+    queue are dropped.
+    """
+
+    def __init__(self, sink: Optional[str] = None, buckets: Optional[Tuple[float, ...]] = None,
+                 enabled: Optional[bool] = None, batch_size: Optional[int] = None, recent: int = 256):
+        """
+        Initialize Tracer
+
+        Args:
+            sink: JSONL file path or http(s) URL for finished spans (defaults to config.TELEMETRY_TRACE_SINK)
+            buckets: Histogram bucket bounds in seconds (defaults to config.TELEMETRY_LATENCY_BUCKETS)
+            enabled: Record spans at all (defaults to config.TELEMETRY_ENABLED)
+            batch_size: Spans per POST when the sink is a URL (defaults to config.TELEMETRY_TRACE_BATCH)
+            recent: Durations kept per span name for summary() percentiles
+        """
+        self.sink = sink if sink is not None else config.TELEMETRY_TRACE_SINK
+        self.buckets = tuple(sorted(buckets or config.TELEMETRY_LATENCY_BUCKETS))
+        self.enabled = config.TELEMETRY_ENABLED if enabled is None else enabled
+        self.batch_size = batch_size or config.TELEMETRY_TRACE_BATCH
+        self._recent_size = recent
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sink_lock = threading.Lock()
+        self._histograms = {}   # (name, status) -> [bucket counts..., +Inf count, sum]
+        self._sums = {}         # (name, attribute) -> total
+        self._flags = {}        # (name, flag, value) -> count
+        self._recent = {}       # name -> deque of recent durations
+        self._errors = {}       # name -> error count
+        self._collectors = {}   # component -> snapshot function
+        self._pending = []
+        self._outbox = None  # queue of JSON lines for the URL sender thread, created on first export
+        self.stats = {"spans": 0, "exported": 0, "dropped": 0}
+
+    # Spans
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self) -> Span:
+        """Innermost open span on this thread (a no-op span if there is none)"""
+        stack = self._stack()
+        return stack[-1] if stack and self.enabled else _NOOP
+
+    def start(self, name: str, **attributes) -> Span:
+        """
+        Start a span without making it current (for generators that yield across threads)
+
+        Args:
+            name: Stage name
+            **attributes: Initial attributes
+
+        Returns:
+            Span to pass to finish()
+        """
+        if not self.enabled:
+            return _NOOP
+        parent = self._stack()[-1] if self._stack() else None
+        return Span(name, parent.trace_id if parent else None, parent.span_id if parent else None, attributes)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """
+        Time a block as a child of the current span
+
+        An exception escaping the block marks the span failed and is re-raised.
+        """
+        span = self.start(name, **attributes)
+        if span is _NOOP:
+            yield span
+            return
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.fail(f"{type(e).__name__}: {str(e)}")
+            raise
+        finally:
+            # Remove this span even if a generator left another one above it
+            if span in stack:
+                stack.remove(span)
+            self.finish(span)
+
+    def finish(self, span: Span):
+        """Record a finished span in the metrics and export it"""
+        if span is _NOOP or span.duration is not None:
+            return
+        span.duration = span.elapsed()
+        with self._lock:
+            self.stats["spans"] += 1
+            histogram = self._histograms.setdefault((span.name, span.status), [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if span.duration <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += span.duration
+            recent = self._recent.setdefault(span.name, deque(maxlen=self._recent_size))
+            recent.append(span.duration)
+            if span.status == ERROR:
+                self._errors[span.name] = self._errors.get(span.name, 0) + 1
+            for key, value in span.attributes.items():
+                if isinstance(value, bool):
+                    flag = (span.name, key, "true" if value else "false")
+                    self._flags[flag] = self._flags.get(flag, 0) + 1
+                elif isinstance(value, (int, float)):
+                    self._sums[(span.name, key)] = self._sums.get((span.name, key), 0) + value
+        if self.sink:
+            self._export(span)
+
+    def traced(self, name: str, measure: Optional[Callable[[object], Dict]] = None):
+        """
+        Decorator for functions returning (value, error_message)
+
+        The call runs in a span named name; an error message marks it failed
+        and measure(value) adds attributes describing a successful result.
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name) as span:
+                    return _record_result(span, fn(*args, **kwargs), measure)
+            return wrapper
+        return decorator
+
+    # Export
+
+    def _export(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        if self.sink.startswith(("http://", "https://")):
+            try:
+                self._sender().put_nowait(line)
+            except queue.Full:
+                with self._sink_lock:
+                    self.stats["dropped"] += 1
+            return
+        with self._sink_lock:
+            try:
+                with open(self.sink, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+                self.stats["exported"] += 1
+            except OSError:
+                self.stats["dropped"] += 1
+
+    def _sender(self) -> queue.Queue:
+        """Queue drained by the URL sender thread (started on first use)"""
+        with self._sink_lock:
+            if self._outbox is None:
+                self._outbox = queue.Queue(maxsize=config.TELEMETRY_TRACE_QUEUE)
+                threading.Thread(target=self._send_loop, name="telemetry-sender", daemon=True).start()
+            return self._outbox
+
+    def _send_loop(self):
+        while True:
+            try:
+                item = self._outbox.get(timeout=config.TELEMETRY_TRACE_FLUSH_SECONDS)
+            except queue.Empty:
+                # Idle: do not hold a partial batch back indefinitely
+                self._post_pending()
+                continue
+            if isinstance(item, threading.Event):
+                # flush() marker: everything queued before it is in _pending now
+                self._post_pending()
+                item.set()
+                continue
+            self._pending.append(item)
+            if len(self._pending) >= self.batch_size:
+                self._post_pending()
+
+    def _post_pending(self):
+        # Only called from the sender thread
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        request = urllib_request.Request(self.sink, data=("\n".join(batch) + "\n").encode('utf-8'),
+                                        headers={"Content-Type": "application/x-ndjson"}, method="POST")
+        try:
+            with urllib_request.urlopen(request, timeout=2) as response:
+                response.read()
+            exported, dropped = len(batch), 0
+        except OSError:
+            # Tracing must never fail a generation
+            exported, dropped = 0, len(batch)
+        with self._sink_lock:
+            self.stats["exported"] += exported
+            self.stats["dropped"] += dropped
+
+    def flush(self, timeout: float = 5.0):
+        """Send spans still queued or waiting for a full batch (URL sinks), waiting up to timeout seconds"""
+        if self._outbox is None:
+            return
+        done = threading.Event()
+        try:
+            self._outbox.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    # Metrics
+
+    def register_collector(self, component: str, snapshot: Callable[[], Dict]):
+        """
+        Export a component's snapshot() numbers as gauges
+
+        Args:
+            component: Name used as the component label, e.g. "lanes_gemini"
+            snapshot: Zero-argument callable returning a (nested) dict
+        """
+        with self._lock:
+            self._collectors[component] = snapshot
+
+    def reset(self):
+        """Forget recorded spans and metrics (collectors stay registered), e.g. between load test runs"""
+        with self._lock:
+            self._histograms.clear()
+            self._sums.clear()
+            self._flags.clear()
+            self._recent.clear()
+            self._errors.clear()
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per span name: count, errors, mean / p50 / p95 / p99 of recent durations and the last duration"""
+        with self._lock:
+            recent = {name: list(durations) for name, durations in self._recent.items()}
+            errors = dict(self._errors)
+            counts = {}
+            for (name, _), histogram in self._histograms.items():
+                counts[name] = counts.get(name, 0) + histogram[-2]
+        summary = {}
+        for name, durations in recent.items():
+            ordered = sorted(durations)
+            summary[name] = {
+                "count": counts.get(name, 0),
+                "errors": errors.get(name, 0),
+                "mean": sum(ordered) / len(ordered),
+                "p50": ordered[len(ordered) // 2],
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+                "last": durations[-1]
+            }
+        return summary
+
+    def render_openmetrics(self) -> str:
+        """All metrics in OpenMetrics text format"""
+        with self._lock:
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+            sums = dict(self._sums)
+            flags = dict(self._flags)
+            collectors = dict(self._collectors)
+
+        lines = [
+            "# TYPE wikitalks_span_duration_seconds histogram",
+            "# UNIT wikitalks_span_duration_seconds seconds",
+            "# HELP wikitalks_span_duration_seconds Duration of pipeline stages"
+        ]
+        for (name, status), histogram in sorted(histograms.items()):
+            # finish() counts a span in every bucket it fits, so bucket counts are already cumulative
+            for bound, count in zip(self.buckets, histogram):
+                lines.append(f"wikitalks_span_duration_seconds_bucket{_labels(span=name, status=status, le=_number(float(bound)))} {count}")
+            lines.append(f"wikitalks_span_duration_seconds_bucket{_labels(span=name, status=status, le='+Inf')} {histogram[-2]}")
+            lines.append(f"wikitalks_span_duration_seconds_count{_labels(span=name, status=status)} {histogram[-2]}")
+            lines.append(f"wikitalks_span_duration_seconds_sum{_labels(span=name, status=status)} {_number(float(histogram[-1]))}")
+
+        lines += ["# TYPE wikitalks_span_attribute counter",
+                  "# HELP wikitalks_span_attribute Sum of numeric span attributes (bytes, characters, tokens, lines)"]
+        for (name, attribute), total in sorted(sums.items()):
+            lines.append(f"wikitalks_span_attribute_total{_labels(span=name, attribute=attribute)} {_number(total)}")
+
+        lines += ["# TYPE wikitalks_span_flag counter",
+                  "# HELP wikitalks_span_flag Spans by value of a boolean attribute (cache_hit, coalesced, preview)"]
+        for (name, flag, value), count in sorted(flags.items()):
+            lines.append(f"wikitalks_span_flag_total{_labels(span=name, flag=flag, value=value)} {count}")
+
+        gauges, states = [], []
+        for component, snapshot in sorted(collectors.items()):
+            try:
+                values = snapshot()
+            except Exception:
+                continue  # a broken collector must not break the scrape
+            for field, value in _flatten(values):
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    gauges.append(f"wikitalks_component{_labels(component=component, field=field)} {_number(value)}")
+                elif isinstance(value, str):
+                    states.append(f"wikitalks_component_state{_labels(component=component, field=field, state=value)} 1")
+        lines += ["# TYPE wikitalks_component gauge",
+                  "# HELP wikitalks_component Scheduler, circuit breaker and artifact store statistics"] + gauges
+        lines += ["# TYPE wikitalks_component_state gauge",
+                  "# HELP wikitalks_component_state Current state of a component, e.g. circuit state"] + states
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path: str):
+        """Write render_openmetrics() to a file (atomically replaced)"""
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_openmetrics())
+        os.replace(tmp_path, path)
+
+
+def make_metrics_handler(tracer: Tracer):
+    """Build a request handler class serving GET /metrics for a Tracer"""
+
+    class MetricsHandler(http_server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0].rstrip('/') != "/metrics":
+                self.send_error(404)
+                return
+            body = tracer.render_openmetrics().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", tracer: Optional[Tracer] = None) -> "http.server.ThreadingHTTPServer":
+    """
+    Serve /metrics from a daemon thread (for processes without their own HTTP server)
+
+    Returns:
+        The running server (call shutdown() to stop it)
+    """
+    server = http_server.ThreadingHTTPServer((host, port), make_metrics_handler(tracer or get_tracer()))
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Process-wide Tracer configured from config.TELEMETRY_*"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+            atexit.register(_tracer.flush)
+        return _tracer
+
+
+def span(name: str, **attributes):
+    """get_tracer().span(...)"""
+    return get_tracer().span(name, **attributes)
+
+
+def current_span() -> Span:
+    """get_tracer().current()"""
+    return get_tracer().current()
+
+
+def traced(name: str, measure: Optional[Callable[[object], Dict]] = None):
+    """Like Tracer.traced, resolving the process-wide tracer at call time"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(name) as span:
+                return _record_result(span, fn(*args, **kwargs), measure)
+        return wrapper
+    return decorator
+
+
+def register_collector(component: str, snapshot: Callable[[], Dict]):
+    """get_tracer().register_collector(...)"""
+    get_tracer().register_collector(component, snapshot)
+
+
+# measure functions for traced()
+
+def text_size(text: str) -> Dict:
+    return {"characters": len(text), "words": len(text.split())}
+
+
+def script_size(script_json: List[Dict]) -> Dict:
+    return {"lines": len(script_json), "characters": sum(len(line.get("text", "")) for line in script_json)}
+
+
+def audio_size(audio) -> Dict:
+    parts = audio if isinstance(audio, list) else [audio]
+    return {"bytes": sum(len(part) for part in parts), "segments": len(parts)}
@@ -0,0 +1,30 @@
+"""
+Shared fixtures for the unit tests
+"""
+
+import pytest
+import config
+import artifact_store
+import estimator
+import pacing
+import ratelimit
+import scheduler
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """
+    Point the shared SQLite database and the artifact store at tmp_path
+
+    ScriptGenerator.target_words, the estimator and the lane schedulers read
+    process-wide singletons on config.SCHEDULER_DB_PATH, so without this a
+    test's outcome depends on what other runs left in the host's database.
+    """
+    monkeypatch.setattr(config, "SCHEDULER_DB_PATH", str(tmp_path / "scheduler.sqlite"))
+    monkeypatch.setattr(config, "ARTIFACT_STORE_DIR", str(tmp_path / "artifacts"))
+    monkeypatch.setattr(pacing, "_pacing_model", None)
+    monkeypatch.setattr(estimator, "_estimator", None)
+    monkeypatch.setattr(artifact_store, "_artifact_store", None)
+    monkeypatch.setattr(scheduler, "_tts_scheduler", None)
+    monkeypatch.setattr(scheduler, "_lane_schedulers", {})
+    monkeypatch.setattr(ratelimit, "_key_pools", {})
@@ -0,0 +1,110 @@
+"""
+Unit tests for ArtifactStore class
+"""
+
+import os
+import time
+import pytest
+from artifact_store import ArtifactStore, TEXT, JSON, BYTES, PARTS
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path / "artifacts"), max_bytes=1000)
+
+
+class TestArtifactStore:
+    """Test cases for ArtifactStore"""
+
+    def test_round_trip_every_kind(self, store):
+        """Test saving and loading text, JSON, bytes and segment lists"""
+        script = [{"speaker": "Ravi", "text": "Arre yaar!"}]
+        assert store.load(store.save("Wikipedia text", TEXT), TEXT) == "Wikipedia text"
+        assert store.load(store.save(script, JSON), JSON) == script
+        assert store.load(store.save(b"\xff\xfb audio", BYTES), BYTES) == b"\xff\xfb audio"
+        assert store.load(store.save([b"one", b"two"], PARTS), PARTS) == [b"one", b"two"]
+        assert store.load(None, TEXT) is None
+
+    def test_identical_content_shares_one_file(self, store):
+        """Test that handles are content-addressed"""
+        assert store.save("same", TEXT) == store.save("same", TEXT)
+        assert store.snapshot()["files"] == 1
+
+    def test_lru_eviction(self, store):
+        """Test that the least recently read blob is evicted first"""
+        first = store.put(b"a" * 400)
+        second = store.put(b"b" * 400)
+        old = time.time() - 100
+        os.utime(os.path.join(store.root, "blobs", first), (old, old))
+        os.utime(os.path.join(store.root, "blobs", second), (old - 10, old - 10))
+        store.get(second)  # second is now the most recently used
+
+        store.put(b"c" * 400)
+        assert store.get(first) is None
+        assert store.get(second) == b"b" * 400
+        assert store.snapshot()["bytes"] <= 1000
+        assert store.stats["evictions"] == 1
+
+    def test_cached_memoizes_results_not_errors(self, store):
+        """Test memoization by request key"""
+        calls = []
+
+        def scrape():
+            calls.append(1)
+            return "content", None
+
+        assert store.cached(("scrape", "url", "fast"), scrape, TEXT) == ("content", None)
+        assert store.cached(("scrape", "url", "fast"), scrape, TEXT) == ("content", None)
+        assert len(calls) == 1
+        assert store.stats == {"hits": 1, "misses": 1, "evictions": 0}
+
+        assert store.cached(("scrape", "bad"), lambda: (None, "Page error"), TEXT) == (None, "Page error")
+        assert store.lookup(("scrape", "bad"), TEXT) is None
+
+    def test_memo_shared_between_instances(self, store):
+        """Test that another process (a second instance on the same directory) sees memoized work"""
+        store.cached(("script", "digest", "RJ", 120), lambda: ([{"speaker": "Ravi", "text": "Hi"}], None), JSON)
+        other = ArtifactStore(store.root, max_bytes=1000)
+        value, error = other.cached(("script", "digest", "RJ", 120), lambda: (None, "should not run"), JSON)
+        assert value == [{"speaker": "Ravi", "text": "Hi"}]
+
+    def test_evicted_memo_misses(self, store):
+        """Test that a key whose blob was evicted is recomputed"""
+        store.cached(("audio", "x"), lambda: (b"a" * 600, None), BYTES)
+        blobs = os.path.join(store.root, "blobs")
+        old = time.time() - 100
+        for name in os.listdir(blobs):
+            os.utime(os.path.join(blobs, name), (old, old))
+        store.put(b"b" * 600)  # evicts the memoized audio
+        value, _ = store.cached(("audio", "x"), lambda: (b"fresh", None), BYTES)
+        assert value == b"fresh"
+
+    def test_write_under_limit_does_not_scan(self, store, monkeypatch):
+        """Test that the size is tracked per write and the directory is only scanned near the limit"""
+        store.put(b"a" * 300)
+        scans = []
+        entries = store._entries
+        monkeypatch.setattr(store, "_entries", lambda directory: scans.append(directory) or entries(directory))
+        store.put(b"b" * 300)
+        store.put(b"c" * 300)
+        assert scans == []
+        store.put(b"d" * 300)  # past max_bytes: evict scans and deletes the oldest blob
+        assert scans
+        assert store.stats["evictions"] == 1
+        assert store.snapshot()["bytes"] <= 1000
+
+    def test_stale_memo_is_recomputed(self, store):
+        """Test that a result memoized longer than max_age ago is not served"""
+        store.cached(("scrape", "url", "pro"), lambda: ("old article", None), TEXT)
+        key_file = os.path.join(store.root, "keys", os.listdir(os.path.join(store.root, "keys"))[0])
+        old = time.time() - 100
+        os.utime(key_file, (old, old))
+        assert store.cached(("scrape", "url", "pro"), lambda: ("unused", None), TEXT) == ("old article", None)
+        assert store.cached(("scrape", "url", "pro"), lambda: ("new article", None), TEXT,
+                            max_age=60) == ("new article", None)
+        assert store.lookup(("scrape", "url", "pro"), TEXT, max_age=60) == "new article"
+
+    def test_rejects_path_handles(self, store):
+        """Test that handles cannot point outside the store"""
+        with pytest.raises(ValueError):
+            store.get("../secrets.toml")
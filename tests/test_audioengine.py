@@ -167,3 +167,120 @@ class TestAudioEngine:
         body = call_args[1]["json"]
         assert body["inputs"] == []
 
+    
+    @staticmethod
+    def _mp3(frames: int, fill: int = 0) -> bytes:
+        """Build MPEG-1 Layer III frames (128 kbps, 44.1 kHz, 417 bytes, ~26 ms each)"""
+        frame = b"\xff\xfb\x90\x00" + bytes([fill]) * 413
+        return frame * frames
+    
+    @patch('core_logic.requests.post')
+    def test_generate_dialogue_segments(self, mock_post):
+        """Test splitting timestamped dialogue audio into per-line segments"""
+        import base64
+        audio = self._mp3(10, fill=1) + self._mp3(10, fill=2)
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            "audio_base64": base64.b64encode(audio).decode(),
+            "voice_segments": [
+                {"dialogue_input_index": 0, "start_time_seconds": 0.0, "end_time_seconds": 0.25},
+                {"dialogue_input_index": 1, "start_time_seconds": 0.27, "end_time_seconds": 0.52}
+            ]
+        }
+        mock_post.return_value = mock_response
+        
+        script_json = [
+            {"speaker": "Ravi", "text": "Arre Priya!"},
+            {"speaker": "Priya", "text": "Haan bhai."}
+        ]
+        
+        audio_engine = AudioEngine()
+        segments, error = audio_engine.generate_dialogue_segments(script_json, "test_key")
+        
+        assert error is None
+        assert len(segments) == 2
+        assert b"".join(segments) == audio
+        assert segments[0] == self._mp3(10, fill=1)
+        assert mock_post.call_args[0][0] == config.ELEVENLABS_BASE_URL + "/with-timestamps"
+
+    @patch('core_logic.requests.post')
+    def test_download_progress(self, mock_post):
+        """Test that on_bytes streams the body and reports bytes received"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "6"}
+        mock_response.iter_content.return_value = iter([b"abc", b"def"])
+        mock_post.return_value = mock_response
+
+        progress = []
+        audio_engine = AudioEngine()
+        audio_bytes, error = audio_engine.generate_dialogue_v3(
+            [{"speaker": "Ravi", "text": "Namaste"}], "test_key",
+            on_bytes=lambda received, total: progress.append((received, total))
+        )
+
+        assert error is None
+        assert audio_bytes == b"abcdef"
+        assert progress == [(3, 6), (6, 6)]
+        assert mock_post.call_args[1]["stream"] is True
+
+    def test_rerender_only_changed_lines(self):
+        """Test that an edit resynthesizes only changed and inserted lines"""
+        old_script = [
+            {"speaker": "Ravi", "text": "Line one"},
+            {"speaker": "Priya", "text": "Line two"},
+            {"speaker": "Ravi", "text": "Line three"}
+        ]
+        new_script = [
+            {"speaker": "Ravi", "text": "Line one"},
+            {"speaker": "Priya", "text": "Line two, edited"},
+            {"speaker": "Ravi", "text": "Line three"},
+            {"speaker": "Priya", "text": "Brand new line"}
+        ]
+        old_segments = [b"A", b"B", b"C"]
+        
+        audio_engine = AudioEngine()
+        audio_engine.generate_dialogue_segments = Mock(side_effect=[([b"B2"], None), ([b"D"], None)])
+        
+        audio_bytes, segments, error = audio_engine.rerender_dialogue(old_script, new_script, old_segments, "test_key")
+        
+        assert error is None
+        assert segments == [b"A", b"B2", b"C", b"D"]
+        assert audio_bytes == b"AB2CD"
+        synthesized = [call[0][0] for call in audio_engine.generate_dialogue_segments.call_args_list]
+        assert synthesized == [[new_script[1]], [new_script[3]]]
+        assert AudioEngine.changed_lines(old_script, new_script) == [new_script[1], new_script[3]]
+    
+    def test_rerender_deleted_line(self):
+        """Test that deleting a line needs no synthesis"""
+        old_script = [{"speaker": "Ravi", "text": "Keep"}, {"speaker": "Priya", "text": "Drop"}]
+        new_script = [{"speaker": "Ravi", "text": "Keep"}]
+        
+        audio_engine = AudioEngine()
+        audio_engine.generate_dialogue_segments = Mock()
+        
+        audio_bytes, segments, error = audio_engine.rerender_dialogue(old_script, new_script, [b"K", b"D"], "test_key")
+        
+        assert error is None
+        assert audio_bytes == b"K"
+        audio_engine.generate_dialogue_segments.assert_not_called()
+    
+    def test_rerender_join_silences_borrowed_reservoir(self):
+        """Test that a spliced segment's first frame cannot read bit-reservoir bytes from the previous segment"""
+        frame = b"\xff\xfb\x90\x00" + bytes(413)
+        # main_data_begin = 100: the frame's data starts 100 bytes back, in a frame of another segment
+        borrowing = frame[:4] + bytes([100 >> 1, (100 & 1) << 7]) + frame[6:]
+        old_script = [{"speaker": "Ravi", "text": "Keep"}, {"speaker": "Priya", "text": "Edit"}]
+        new_script = [old_script[0], {"speaker": "Priya", "text": "Edited"}]
+        
+        audio_engine = AudioEngine()
+        audio_engine.generate_dialogue_segments = Mock(return_value=([borrowing + borrowing], None))
+        
+        audio_bytes, segments, error = audio_engine.rerender_dialogue(old_script, new_script, [frame * 2, frame], "key")
+        
+        assert error is None
+        assert len(audio_bytes) == 4 * len(frame)
+        # The first new frame is silenced, the second one borrows from it and stays as it was
+        assert audio_bytes[2 * len(frame):3 * len(frame)] == frame
+        assert audio_bytes[3 * len(frame):] == borrowing
@@ -0,0 +1,189 @@
+"""
+Unit tests for BackgroundExecutor and generate_broadcast
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from unittest.mock import Mock, patch
+import pytest
+from artifact_store import ArtifactStore
+from background import BackgroundExecutor, GenerationTask, generate_broadcast, join_task_audio, RUNNING, DONE, FAILED
+from script_quality import ScriptQualityGate
+
+SCRIPT = [{"speaker": "Ravi", "text": "Arre yaar!"}, {"speaker": "Priya", "text": "Haan bilkul."},
+          {"speaker": "Ravi", "text": "Chalo shuru karte hain."}]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path / "artifacts"))
+
+
+@pytest.fixture
+def upstreams():
+    """Key pools, lanes, the TTS scheduler and the quality gate reduced to pass-throughs"""
+    @contextmanager
+    def slot(lane):
+        yield None
+
+    with patch('background.get_key_pool') as get_pool, patch('background.get_lane_scheduler') as get_lanes, \
+            patch('background.get_tts_scheduler') as get_tts, patch('background.get_script_quality_gate') as get_gate:
+        get_pool.return_value.acquire.return_value = ("key", None)
+        get_lanes.return_value.run.side_effect = lambda lane, fn: fn()
+        get_lanes.return_value.slot.side_effect = slot
+        get_lanes.return_value.guard.acquire.return_value = None
+        get_tts.return_value.call.side_effect = lambda script, fn, **kwargs: fn()
+        get_gate.return_value.generate.side_effect = lambda generate, *args, **kwargs: generate()
+        yield
+
+
+def _clients(release=None):
+    scraper = Mock()
+    scraper.scrape.return_value = ("Mumbai Indians content " * 5, None)
+    script_gen = Mock()
+
+    def stream_script(*args, **kwargs):
+        for i, line in enumerate(SCRIPT):
+            if release is not None and i == 1:
+                release.wait(2)
+            yield line, None
+
+    script_gen.stream_script.side_effect = stream_script
+    audio_engine = Mock()
+
+    def segments(script, key, base_url, on_bytes=None):
+        on_bytes(100, 200)
+        on_bytes(200, 200)
+        return [line["text"].encode() for line in script], None
+
+    audio_engine.generate_dialogue_segments.side_effect = segments
+    audio_engine.generate_dialogue_v3.side_effect = lambda lines, key: (b"|".join(l["text"].encode() for l in lines), None)
+    return scraper, script_gen, audio_engine
+
+
+class TestBackgroundExecutor:
+    """Test cases for BackgroundExecutor"""
+
+    def test_task_progress_is_monotonic(self):
+        """Test that progress reflects scraped content, lines and audio bytes"""
+        task = GenerationTask({"url": "u", "variant": "RJ", "mode": "fast", "preview": True})
+        fractions = [task.snapshot()["fraction"]]
+        task.emit("scrape", "scraped", content="text")
+        fractions.append(task.snapshot()["fraction"])
+        for line in SCRIPT[:2]:
+            task.emit("script", "line", line=line)
+            fractions.append(task.snapshot()["fraction"])
+        task.emit("script", "done", lines=SCRIPT)
+        fractions.append(task.snapshot()["fraction"])
+        task.emit("audio", "bytes", received=50, total=100)
+        fractions.append(task.snapshot()["fraction"])
+        task.finish()
+        fractions.append(task.snapshot()["fraction"])
+        assert fractions == sorted(fractions)
+        assert fractions[0] == 0 and fractions[-1] == 1.0
+        assert fractions[-2] == pytest.approx(0.8)
+
+    def test_submit_runs_off_thread_and_reports_errors(self):
+        """Test that submit returns at once and exceptions become failed tasks"""
+        executor = BackgroundExecutor(max_workers=2)
+        release = threading.Event()
+        slow = executor.submit(lambda task: release.wait(2), {})
+        broken = executor.submit(lambda task: 1 / 0, {})
+        assert slow.status == RUNNING
+        time.sleep(0.1)
+        assert executor.active() == 1
+        assert broken.status == FAILED and "Unexpected error" in broken.error
+        release.set()
+        time.sleep(0.1)
+        assert executor.get(slow.task_id).status == DONE
+
+    def test_finished_tasks_are_pruned(self):
+        """Test that finished tasks are dropped after keep_seconds"""
+        executor = BackgroundExecutor(max_workers=1, keep_seconds=0)
+        task = executor.submit(lambda task: None, {})
+        time.sleep(0.05)
+        assert executor.get(task.task_id) is None
+
+    def test_generate_broadcast_streams_partial_results(self, store, upstreams):
+        """Test that lines are visible while the script is still being written"""
+        release = threading.Event()
+        scraper, script_gen, audio_engine = _clients(release)
+        executor = BackgroundExecutor(max_workers=1)
+        task = executor.submit(
+            lambda task: generate_broadcast(task, scraper, audio_engine, store, "g", "e", lambda key: script_gen),
+            {"url": "https://en.wikipedia.org/wiki/Mumbai_Indians", "variant": "RJ", "mode": "fast"}
+        )
+        time.sleep(0.1)
+        partial = task.snapshot()
+        assert partial["status"] == RUNNING
+        assert partial["content"].startswith("Mumbai Indians")
+        assert partial["script_lines"] == SCRIPT[:1]
+
+        release.set()
+        time.sleep(0.1)
+        final = task.snapshot()
+        assert final["status"] == DONE
+        assert final["script_lines"] == SCRIPT
+        assert final["audio_received"] == 200
+        assert join_task_audio(final) == b"Arre yaar!Haan bilkul.Chalo shuru karte hain."
+
+    def test_generate_broadcast_reuses_memoized_script(self, store, upstreams):
+        """Test that a second run reuses scrape and script from the artifact store"""
+        scraper, script_gen, audio_engine = _clients()
+        request = {"url": "https://en.wikipedia.org/wiki/Mumbai_Indians", "variant": "RJ", "mode": "fast"}
+        for _ in range(2):
+            task = GenerationTask(request)
+            generate_broadcast(task, scraper, audio_engine, store, "g", "e", lambda key: script_gen)
+            assert task.status == DONE
+        assert scraper.scrape.call_count == 1
+        assert script_gen.stream_script.call_count == 1
+        assert audio_engine.generate_dialogue_segments.call_count == 1
+
+    def test_generate_broadcast_coalesces_script_stream(self, store, upstreams):
+        """Test that concurrent requests for the same script share one Gemini stream"""
+        release = threading.Event()
+        scraper, script_gen, audio_engine = _clients(release)
+        executor = BackgroundExecutor(max_workers=2)
+        request = {"url": "https://en.wikipedia.org/wiki/Mumbai_Indians", "variant": "RJ", "mode": "fast"}
+        tasks = [executor.submit(lambda task: generate_broadcast(task, scraper, audio_engine, store, "g", "e",
+                                                                 lambda key: script_gen), request)
+                 for _ in range(2)]
+        time.sleep(0.1)
+        release.set()
+        time.sleep(0.2)
+        assert [task.snapshot()["status"] for task in tasks] == [DONE, DONE]
+        assert all(task.snapshot()["script_lines"] == SCRIPT for task in tasks)
+        assert script_gen.stream_script.call_count == 1
+
+    def test_generate_broadcast_quality_gate(self, store, upstreams):
+        """Test that a script failing the quality gate is rewritten and never voiced"""
+        scraper, script_gen, audio_engine = _clients()
+        gate = ScriptQualityGate({"max_regenerations": 1})
+        with patch('background.get_script_quality_gate', return_value=gate):
+            task = GenerationTask({"url": "https://en.wikipedia.org/wiki/Mumbai_Indians", "variant": "RJ", "mode": "fast"})
+            generate_broadcast(task, scraper, audio_engine, store, "g", "e", lambda key: script_gen)
+        assert task.status == FAILED and "quality gate" in task.error
+        assert script_gen.stream_script.call_count == 2
+        assert task.snapshot()["script_lines"] == SCRIPT
+        assert audio_engine.generate_dialogue_segments.call_count == 0
+
+    def test_generate_broadcast_fast_start(self, store, upstreams):
+        """Test that fast start voices batches and reports each chunk"""
+        scraper, script_gen, audio_engine = _clients()
+        task = GenerationTask({"url": "https://en.wikipedia.org/wiki/Mumbai_Indians", "variant": "RJ",
+                               "mode": "fast", "fast_start": True})
+        generate_broadcast(task, scraper, audio_engine, store, "g", "e", lambda key: script_gen)
+        snap = task.snapshot()
+        assert snap["status"] == DONE
+        assert snap["audio_chunks"] == [b"Arre yaar!|Haan bilkul.", b"Chalo shuru karte hain."]
+        assert snap["script_lines"] == SCRIPT
+
+    def test_generate_broadcast_scrape_failure(self, store, upstreams):
+        """Test that a failed stage ends the task with its error"""
+        scraper, script_gen, audio_engine = _clients()
+        scraper.scrape.return_value = (None, "Page error: missing")
+        task = GenerationTask({"url": "https://en.wikipedia.org/wiki/Nope", "variant": "RJ", "mode": "fast"})
+        generate_broadcast(task, scraper, audio_engine, store, "g", "e", lambda key: script_gen)
+        assert task.status == FAILED
+        assert task.error == "Wikipedia scraping failed: Page error: missing"
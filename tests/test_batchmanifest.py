@@ -0,0 +1,131 @@
+"""
+Unit tests for BatchManifest class and resumable batch runs
+"""
+
+import json
+import os
+import pytest
+from pipeline import BatchManifest, PipelineJob, read_batch_file, run_batch
+
+
+def _stages(calls, fail=None):
+    """Fake scrape / script / audio stages that count calls per (stage, job)"""
+    def scrape(job):
+        calls.append(("scrape", job.job_id))
+        job.content = f"content of {job.url}"
+        return None
+
+    def script(job):
+        calls.append(("script", job.job_id))
+        assert job.content.startswith("content of")
+        job.script_json = [{"speaker": "Ravi", "text": job.content}]
+        return None
+
+    def audio(job):
+        calls.append(("audio", job.job_id))
+        if fail and fail(job):
+            return "ElevenLabs API error: 500"
+        job.audio_bytes = b"mp3:" + job.script_json[0]["text"].encode()
+        return None
+
+    return [("scrape", scrape, 2), ("script", script, 2), ("audio", audio, 2)]
+
+
+class TestBatchManifest:
+    """Test cases for BatchManifest"""
+
+    def test_record_and_reload(self, tmp_path):
+        """Test that completed stages survive a restart"""
+        artifact = tmp_path / "content.txt"
+        artifact.write_text("hello")
+        path = str(tmp_path / "manifest.jsonl")
+
+        manifest = BatchManifest(path)
+        manifest.record("job1", "scrape", "done", artifact=str(artifact))
+        manifest.record("job1", "script", "failed", error="boom")
+
+        reloaded = BatchManifest(path)
+        assert reloaded.is_done("job1", "scrape")
+        assert not reloaded.is_done("job1", "script")
+        assert reloaded.artifact("job1", "scrape") == str(artifact)
+
+    def test_truncated_last_line_is_ignored(self, tmp_path):
+        """Test recovery from a crash in the middle of a write"""
+        artifact = tmp_path / "a.txt"
+        artifact.write_text("x")
+        path = tmp_path / "manifest.jsonl"
+        path.write_text(json.dumps({"job_id": "j", "stage": "scrape", "status": "done", "artifact": str(artifact)})
+                        + "\n{\"job_id\": \"j\", \"sta")
+
+        manifest = BatchManifest(str(path))
+        assert manifest.is_done("j", "scrape")
+
+    def test_read_batch_file(self, tmp_path):
+        """Test CSV and JSON rows, defaults, comments and duplicates"""
+        batch = tmp_path / "batch.txt"
+        batch.write_text(
+            "# comment\n"
+            "https://en.wikipedia.org/wiki/Mumbai_Indians\n"
+            "https://en.wikipedia.org/wiki/Mumbai_Indians,Teams,fast\n"
+            '{"url": "https://en.wikipedia.org/wiki/Bengaluru", "variant": "Business"}\n'
+            "https://en.wikipedia.org/wiki/Mumbai_Indians\n"
+        )
+
+        jobs = list(read_batch_file(str(batch)))
+
+        assert [(j.variant, j.mode) for j in jobs] == [("RJ", "pro"), ("Teams", "fast"), ("Business", "pro")]
+        assert jobs[0].job_id.startswith("Mumbai_Indians-")
+        assert len({j.job_id for j in jobs}) == 3
+
+    def test_bad_rows_fail_without_stopping_the_batch(self, tmp_path):
+        """Test that malformed rows and unknown variants or modes are recorded as failed"""
+        batch = tmp_path / "batch.txt"
+        batch.write_text(
+            '{"url": "https://en.wikipedia.org/wiki/Broken"\n'
+            "https://en.wikipedia.org/wiki/Mumbai_Indians,Opera\n"
+            "https://en.wikipedia.org/wiki/Mumbai_Indians,RJ,slow\n"
+            "https://en.wikipedia.org/wiki/Bengaluru\n"
+        )
+        manifest_path = str(tmp_path / "manifest.jsonl")
+
+        calls = []
+        jobs = list(run_batch(read_batch_file(str(batch)), _stages(calls), BatchManifest(manifest_path),
+                              str(tmp_path / "out")))
+
+        failed = [job for job in jobs if not job.ok]
+        assert [job.failed_stage for job in failed] == ["read"] * 3
+        assert "malformed JSON" in failed[0].error and failed[0].job_id == "line-1"
+        assert "unknown variant 'Opera'" in failed[1].error
+        assert "unknown mode 'slow'" in failed[2].error
+        assert [job.url for job in jobs if job.ok] == ["https://en.wikipedia.org/wiki/Bengaluru"]
+        with open(manifest_path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        assert sum(1 for r in records if r["stage"] == "read" and r["status"] == "failed") == 3
+
+    def test_resume_skips_completed_work(self, tmp_path):
+        """Test that a second run only redoes what failed"""
+        output_dir = str(tmp_path / "out")
+        manifest_path = str(tmp_path / "manifest.jsonl")
+        urls = [f"https://en.wikipedia.org/wiki/Page_{i}" for i in range(4)]
+
+        calls = []
+        first = list(run_batch([PipelineJob(u, job_id=str(i)) for i, u in enumerate(urls)],
+                               _stages(calls, fail=lambda job: job.job_id == "2"),
+                               BatchManifest(manifest_path), output_dir))
+        assert sum(1 for job in first if job.ok) == 3
+        assert os.path.exists(os.path.join(output_dir, "0", "audio.mp3"))
+        # Finished jobs only carry artifact paths, not payloads
+        assert all(job.audio_bytes is None and job.content is None for job in first if job.ok)
+
+        calls = []
+        skipped = []
+        second = list(run_batch([PipelineJob(u, job_id=str(i)) for i, u in enumerate(urls)],
+                                _stages(calls), BatchManifest(manifest_path), output_dir, skipped=skipped))
+
+        assert [job.job_id for job in second] == ["2"]
+        assert second[0].ok
+        assert sorted(job.job_id for job in skipped) == ["0", "1", "3"]
+        # Scrape and script of job 2 were loaded from disk, only audio ran again
+        assert calls == [("audio", "2")]
+        with open(os.path.join(output_dir, "2", "audio.mp3"), 'rb') as f:
+            assert f.read() == b"mp3:content of " + urls[2].encode()
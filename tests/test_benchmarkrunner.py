@@ -0,0 +1,72 @@
+"""
+Unit tests for BenchmarkRunner and the core_logic benchmark suite
+"""
+
+import time
+from benchmarks import fixtures
+from benchmarks.bench_core import BenchmarkRunner, compare, confirm, core_benchmarks, load_baseline, save_baseline
+
+
+class TestBenchmarkRunner:
+    """Test cases for BenchmarkRunner"""
+
+    def test_measure_time_and_memory(self):
+        """Test that a benchmark reports time per call and peak allocation"""
+        runner = BenchmarkRunner(repeat=2, min_time=0.005)
+        result = runner.measure(lambda: bytearray(200_000))
+        assert result["seconds"] > 0
+        assert result["calls"] >= 1
+        assert result["seconds"] <= result["median"]
+        assert result["peak_bytes"] >= 200_000
+
+    def test_compare_flags_regressions(self):
+        """Test time and memory tolerances, including the small-allocation slack"""
+        baseline = {"a": {"seconds": 1.0, "peak_bytes": 100_000}, "b": {"seconds": 1.0, "peak_bytes": 1_000}}
+        results = {
+            "a": {"seconds": 1.2, "peak_bytes": 120_000},
+            "b": {"seconds": 1.5, "peak_bytes": 4_000},
+            "new": {"seconds": 9.0, "peak_bytes": 9}
+        }
+        regressions = compare(results, baseline, time_tolerance=0.25, memory_tolerance=0.10)
+        assert [(r["name"], r["metric"]) for r in regressions] == [("a", "peak_bytes"), ("b", "seconds")]
+        assert regressions[1]["ratio"] == 1.5
+
+    def test_confirm_ignores_noisy_rounds(self):
+        """Test that a regression seen once is re-measured before being reported"""
+        runner = BenchmarkRunner(repeat=1, min_time=0.001)
+        runner.add("steady", lambda: None)
+        baseline = {"steady": {"seconds": 1.0, "peak_bytes": 0}}
+        results = {"steady": {"seconds": 5.0, "peak_bytes": 0}}
+        assert confirm(runner, results, baseline, time_tolerance=0.25, retries=1) == []
+        assert results["steady"]["seconds"] < 1.0
+
+        runner.add("slow", lambda: time.sleep(0.002))
+        baseline["slow"] = {"seconds": 0.0001, "peak_bytes": 10**6}
+        regressions = confirm(runner, {"slow": runner.measure(runner.benchmarks["slow"])}, baseline, retries=1)
+        assert [r["name"] for r in regressions] == ["slow"]
+
+    def test_baseline_round_trip(self, tmp_path):
+        """Test that saved baselines load back without run details"""
+        path = str(tmp_path / "baseline.json")
+        assert load_baseline(path) == {}
+        save_baseline({"x": {"seconds": 0.5, "median": 0.6, "calls": 10, "peak_bytes": 42}}, path)
+        assert load_baseline(path) == {"x": {"seconds": 0.5, "peak_bytes": 42}}
+
+    def test_fixtures_are_deterministic(self):
+        """Test that fixture articles and scripts are identical on every build"""
+        assert fixtures.make_article("long").summary == fixtures.make_article("long").summary
+        assert fixtures.make_script("small") == fixtures.make_script("small")
+        assert fixtures.make_article("small").word_count() < 4000 < fixtures.make_article("huge").word_count()
+        assert len(fixtures.make_script("huge")) == fixtures.SCRIPT_SIZES["huge"]
+
+    def test_core_benchmarks_run(self):
+        """Test that every registered core_logic benchmark runs on its fixture"""
+        runner = core_benchmarks(BenchmarkRunner(repeat=1))
+        names = set(runner.benchmarks)
+        assert {"extract_sections[huge]", "extract_title_from_url[5 urls]", "strip_markdown[long]",
+                "build_prompt[Teams]", "generate_script[small]"} <= names
+        for name, fn in runner.benchmarks.items():
+            result = fn()
+            if name.startswith("generate_script"):
+                script, error = result
+                assert error is None and len(script) == fixtures.SCRIPT_SIZES[name[16:-1]]
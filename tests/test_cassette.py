@@ -0,0 +1,76 @@
+"""
+Unit tests for Cassette record / replay
+"""
+
+import time
+import pytest
+import config
+from core_logic import WikiScraper, ScriptGenerator, AudioEngine
+from loadtest.cassette import Cassette, CassetteServers
+from loadtest.standins import StandIns, UpstreamProfile
+
+
+def _episode():
+    content, error = WikiScraper().scrape("https://en.wikipedia.org/wiki/Mumbai_Indians", "pro")
+    assert error is None
+    script, error = ScriptGenerator("test-key").generate_script(content, "RJ", 120)
+    assert error is None
+    audio, error = AudioEngine().generate_dialogue_v3(script, "test-key")
+    assert error is None
+    return content, script, audio
+
+
+class TestCassette:
+    """Test cases for Cassette and CassetteServers"""
+
+    def test_match_keys_ignore_secrets(self):
+        """Test that credentials never affect matching and article titles only affect exact matches"""
+        query = {"action": ["query"], "titles": ["Mumbai"]}
+        assert Cassette.match_key("gemini", "POST", "/p", {**query, "key": ["a"]}, b"x") == \
+            Cassette.match_key("gemini", "POST", "/p", {**query, "key": ["b"]}, b"x")
+        assert Cassette.match_key("gemini", "POST", "/p", query, b"x") != Cassette.match_key("gemini", "POST", "/p", query, b"y")
+        assert Cassette.route_key("wikipedia", "GET", "/w/api.php", query) == \
+            Cassette.route_key("wikipedia", "GET", "/w/api.php", {"action": ["query"], "titles": ["Delhi"]})
+
+    def test_find_cycles_and_round_trips(self, tmp_path):
+        """Test that repeats are served in recorded order and the file loads back identically"""
+        path = str(tmp_path / "c.jsonl.gz")
+        cassette = Cassette(path)
+        for n in range(2):
+            cassette.add({"upstream": "gemini", "method": "POST", "path": "/p", "query": {},
+                          "key": Cassette.match_key("gemini", "POST", "/p", {}, b"same"), "status": 200,
+                          "headers": {}, "chunks": [[0.1, ""]], "elapsed": n})
+        cassette.save()
+        loaded = Cassette(path)
+        assert loaded.interactions == cassette.interactions
+        served = [loaded.find("gemini", "POST", "/p", {}, b"same")["elapsed"] for _ in range(3)]
+        assert served == [0, 1, 0]
+        assert loaded.find("gemini", "POST", "/p", {}, b"other") is None
+        assert loaded.find("gemini", "POST", "/p", {}, b"other", strict=False) is not None
+
+    def test_record_then_replay(self, tmp_path):
+        """Test that a recorded episode replays byte-for-byte without the upstreams, at recorded or zero latency"""
+        path = str(tmp_path / "episode.jsonl.gz")
+        profiles = {name: UpstreamProfile.from_config(name, time_scale=0.2, error_rate=0.0, seed=3)
+                    for name in config.LOADTEST_PROFILES}
+        with StandIns(profiles):
+            with CassetteServers(path, "record"):
+                recorded = _episode()
+        assert {i["upstream"] for i in Cassette(path).interactions} == {"wikipedia", "gemini", "elevenlabs"}
+
+        start = time.perf_counter()
+        with CassetteServers(path, "replay") as servers:
+            assert _episode() == recorded
+        paced = time.perf_counter() - start
+        assert all(stats["missed"] == 0 for stats in servers.snapshot().values())
+        assert paced >= 0.9 * sum(i["elapsed"] for i in Cassette(path).interactions)
+
+        start = time.perf_counter()
+        with CassetteServers(path, "replay", latency=False):
+            assert _episode() == recorded
+        assert time.perf_counter() - start < paced
+
+    def test_replay_requires_cassette(self, tmp_path):
+        """Test that replaying a missing cassette fails clearly"""
+        with pytest.raises(FileNotFoundError):
+            CassetteServers(str(tmp_path / "missing.jsonl.gz"), "replay")
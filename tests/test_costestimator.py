@@ -0,0 +1,75 @@
+"""
+Unit tests for CostEstimator
+"""
+
+import pytest
+from unittest.mock import patch
+import config
+from artifact_store import ArtifactStore, TEXT
+from coalesce import scrape_key
+from estimator import CostEstimator, check_budget, format_estimate, scraped_length
+
+
+def _script(words: int) -> list:
+    return [{"speaker": "Ravi", "text": " ".join(["yaar"] * words)}]
+
+
+@pytest.fixture
+def estimator(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SCHEDULER_DB_PATH", str(tmp_path / "shared.sqlite"))
+    monkeypatch.setattr(config, "ESTIMATE_MIN_SAMPLES", 3)
+    return CostEstimator(str(tmp_path / "estimates.sqlite"))
+
+
+class TestCostEstimator:
+    """Test cases for CostEstimator"""
+
+    def test_defaults_without_history(self, estimator):
+        """Test that a fresh estimator predicts from config defaults and previews cost less"""
+        full = estimator.estimate("RJ", "pro", 120)
+        assert full["words"] == 2 * config.PACING_DEFAULT_WPM
+        assert {stage["basis"] for stage in full["stages"].values()} == {"default"}
+        assert full["stages"]["scrape"]["characters"] == config.ESTIMATE_DEFAULTS["scrape"]["characters"]["pro"]
+        assert full["characters"] == int(full["words"] * config.ESTIMATE_DEFAULTS["audio"]["characters_per_word"])
+        assert full["cost"] == pytest.approx(full["stages"]["script"]["cost"] + full["stages"]["audio"]["cost"], abs=1e-4)
+        preview = estimator.estimate("RJ", "pro", 120, preview=True)
+        assert preview["characters"] <= config.PREVIEW_BUDGET["characters"]
+        assert preview["stages"]["script"]["thinking_tokens"] == 0
+        assert preview["cost"] < full["cost"] and preview["seconds"] < full["seconds"]
+        assert "total" in format_estimate(full)
+
+    def test_history_replaces_defaults(self, estimator):
+        """Test that recorded stages fit the time per unit and the characters per word"""
+        for words, seconds in ((100, 12), (200, 22), (300, 32)):
+            estimator.record_result("audio", "Teams", _script(words), seconds)
+        fitted = estimator.fit("audio", "Teams")
+        assert fitted["samples"] == 3
+        assert fitted["units_per_word"] == pytest.approx(5.0, abs=0.01)  # "yaar" plus a space
+        assert fitted["per_unit"] == pytest.approx(0.02) and fitted["base"] == pytest.approx(2.02)
+        audio = estimator.estimate("Teams", "pro", 120)["stages"]["audio"]
+        assert audio["basis"] == "history"
+        assert audio["characters"] == int(fitted["units_per_word"] * 2 * config.PACING_DEFAULT_WPM)
+        assert audio["seconds"] == pytest.approx(2.02 + 0.02 * audio["characters"], abs=0.01)
+        # Other variants and stages keep their defaults
+        assert estimator.estimate("RJ")["stages"]["audio"]["basis"] == "default"
+        for length in (1000, 2000, 3000):
+            estimator.record_result("scrape", "fast", "x" * length, 1.0)
+        assert estimator.estimate("RJ", "fast")["stages"]["scrape"]["characters"] == 2000
+
+    def test_check_budget(self, estimator):
+        """Test that an estimate over the cost or time limit is reported"""
+        estimate = estimator.estimate("RJ", "pro", 120)
+        assert check_budget(estimate) is None
+        assert check_budget(estimate, max_cost=estimate["cost"] * 2, max_seconds=estimate["seconds"] + 1) is None
+        assert check_budget(estimate, max_cost=0.01).startswith("Estimated cost")
+        assert check_budget(estimate, max_seconds=1).startswith("Estimated time")
+
+    def test_scraped_length_reads_metadata_only(self, tmp_path):
+        """Test that the scraped length comes from the store's metadata, not from loading the article"""
+        store = ArtifactStore(str(tmp_path / "artifacts"))
+        url = "https://en.wikipedia.org/wiki/Mumbai_Indians"
+        assert scraped_length(url, "pro", store) is None
+        store.cached(scrape_key(url, "pro"), lambda: ("Mumbai Indians " * 100, None), TEXT)
+        with patch.object(store, "load", side_effect=AssertionError("article was loaded")):
+            assert scraped_length(url, "pro", store) == 1500
+        assert scraped_length(url, "fast", store) is None
@@ -0,0 +1,291 @@
+"""
+Unit tests for JobStore, JobWorkerPool and the job service HTTP API
+"""
+
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+import pytest
+import config
+from http.server import ThreadingHTTPServer
+from artifact_store import get_artifact_store, TEXT
+from coalesce import scrape_key
+from job_service import JobStore, JobWorkerPool, JobServiceClient, make_handler, QUEUED, RUNNING, DONE, FAILED
+
+
+def _fake_stages(fail_audio=False):
+    def scrape(job):
+        job.content = "Mumbai Indians is a cricket team."
+        return None
+
+    def script(job):
+        job.script_json = [{"speaker": "Ravi", "text": "Arre!"}]
+        return None
+
+    def audio(job):
+        if fail_audio:
+            return "ElevenLabs API error: 500"
+        job.audio_bytes = b"ID3fake-mp3" * 10000
+        return None
+
+    return [("scrape", scrape, 1), ("script", script, 1), ("audio", audio, 1)]
+
+
+def _worker_process(db_path, log_path, node):
+    """Entry point for worker processes in the multi-process test"""
+    def audio(job):
+        with open(log_path, 'a') as f:
+            f.write(job.job_id + "\n")
+        job.audio_bytes = b"mp3"
+        return None
+
+    stages = _fake_stages()[:2] + [("audio", audio, 1)]
+    JobWorkerPool(JobStore(db_path), stages, workers=2, node=node).run_until_empty()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite"))
+
+
+class TestJobStore:
+    """Test cases for JobStore"""
+
+    def test_submit_and_claim(self, store):
+        """Test queue ordering with interactive jobs first"""
+        batch_id = store.submit("https://en.wikipedia.org/wiki/A", priority="batch")
+        interactive_id = store.submit("https://en.wikipedia.org/wiki/B", priority="interactive")
+
+        assert store.claim_next()["job_id"] == interactive_id
+        assert store.claim_next()["job_id"] == batch_id
+        assert store.claim_next() is None
+        assert store.get(batch_id)["status"] == RUNNING
+
+    def test_jobs_survive_restart(self, store):
+        """Test that running jobs are re-queued by a new service instance"""
+        job_id = store.submit("https://en.wikipedia.org/wiki/A")
+        store.claim_next()
+
+        restarted = JobStore(store.db_path)
+        assert restarted.requeue_running() == 1
+        assert restarted.get(job_id)["status"] == QUEUED
+
+    def test_restart_keeps_live_workers_jobs(self, store):
+        """Test that a restarted service re-queues only jobs of dead worker processes on its node"""
+        finished = subprocess.Popen([sys.executable, "-c", "pass"])
+        finished.wait()
+        live_id = store.submit("https://en.wikipedia.org/wiki/A")
+        dead_id = store.submit("https://en.wikipedia.org/wiki/B")
+        other_id = store.submit("https://en.wikipedia.org/wiki/C")
+        store.claim_next(owner=f"node-a:{os.getpid()}:0", node="node-a")
+        store.claim_next(owner=f"node-a:{finished.pid}:0", node="node-a")
+        store.claim_next(owner=f"node-b:{finished.pid}:0", node="node-b")
+
+        assert JobStore(store.db_path).requeue_running("node-a") == 1
+        assert [store.get(job_id)["status"] for job_id in (live_id, dead_id, other_id)] == [RUNNING, QUEUED, RUNNING]
+
+    def test_artifacts_stream_in_chunks(self, store):
+        """Test chunked artifact reads"""
+        job_id = store.submit("https://en.wikipedia.org/wiki/A")
+        data = bytes(range(256)) * 1000
+        store.put_artifact(job_id, "audio", data)
+
+        chunks = list(store.iter_artifact(job_id, "audio", chunk_size=4096))
+        assert b"".join(chunks) == data
+        assert len(chunks) == 63
+        assert store.get(job_id)["artifacts"] == ["audio"]
+
+
+class TestJobWorkerPool:
+    """Test cases for JobWorkerPool"""
+
+    def test_run_one_success(self, store):
+        """Test that a worker runs the pipeline and stores artifacts"""
+        job_id = store.submit("https://en.wikipedia.org/wiki/Mumbai_Indians")
+        pool = JobWorkerPool(store, _fake_stages())
+
+        assert pool.run_one() is True
+        job = store.get(job_id)
+        assert job["status"] == DONE
+        assert job["stage"] == "audio"
+        assert job["artifacts"] == ["audio", "content", "script"]
+        assert json.loads(store.get_artifact(job_id, "script"))[0]["speaker"] == "Ravi"
+        assert pool.run_one() is False
+
+    def test_run_one_failure_keeps_partial_artifacts(self, store):
+        """Test that a failed job records its error and keeps earlier outputs"""
+        job_id = store.submit("https://en.wikipedia.org/wiki/Mumbai_Indians")
+        JobWorkerPool(store, _fake_stages(fail_audio=True)).run_one()
+
+        job = store.get(job_id)
+        assert job["status"] == FAILED
+        assert job["stage"] == "audio"
+        assert "500" in job["error"]
+        assert "script" in job["artifacts"]
+
+
+class TestJobServiceAPI:
+    """Test cases for the HTTP API and JobServiceClient"""
+
+    def test_submit_poll_fetch(self, store):
+        """Test the full submit → poll → fetch flow over HTTP"""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(store))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            client = JobServiceClient(f"http://127.0.0.1:{server.server_address[1]}")
+
+            job_id, error = client.submit("https://en.wikipedia.org/wiki/Mumbai_Indians", "Teams", "fast")
+            assert error is None
+            status, _ = client.status(job_id)
+            assert status["status"] == QUEUED
+            assert status["variant"] == "Teams"
+
+            JobWorkerPool(store, _fake_stages()).run_one()
+
+            status, _ = client.status(job_id)
+            assert status["status"] == DONE
+            audio, error = client.artifact(job_id, "audio")
+            assert error is None
+            assert audio == b"ID3fake-mp3" * 10000
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_invalid_requests(self, store, tmp_path, monkeypatch):
+        """Test validation, unknown ids and jobs over their cost limit"""
+        monkeypatch.setattr(config, "SCHEDULER_DB_PATH", str(tmp_path / "history.sqlite"))
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(store))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            client = JobServiceClient(f"http://127.0.0.1:{server.server_address[1]}")
+
+            job_id, error = client.submit("https://en.wikipedia.org/wiki/A", variant="Unknown")
+            assert job_id is None
+            assert "400" in error
+            status, error = client.status("does-not-exist")
+            assert status is None
+            assert "404" in error
+
+            estimate, error = client.estimate("https://en.wikipedia.org/wiki/A", variant="Teams", mode="fast")
+            assert error is None
+            assert estimate["variant"] == "Teams" and estimate["cost"] > 0
+            job_id, error = client.submit("https://en.wikipedia.org/wiki/A", max_cost=estimate["cost"] / 2)
+            assert job_id is None
+            assert error.startswith("Estimated cost")
+            assert store.claim_next("worker", "node") is None
+
+            # Malformed numbers are a bad request, not a crash in the handler
+            for options in ({"duration": "two minutes"}, {"max_cost": "cheap"}, {"content_length": [1]}):
+                job_id, error = client.submit("https://en.wikipedia.org/wiki/A", **options)
+                assert job_id is None and "400" in error
+
+            # The scrape stage is priced from the article's real length: given, or memoized earlier
+            url = "https://en.wikipedia.org/wiki/B"
+            estimate, _ = client.estimate(url, mode="fast", content_length=123)
+            assert estimate["stages"]["scrape"]["characters"] == 123
+            artifacts = get_artifact_store()
+            artifacts.cached(scrape_key(url, "fast"), lambda: ("x" * 456, None), TEXT)
+            estimate, _ = client.estimate(url, mode="fast")
+            assert estimate["stages"]["scrape"]["characters"] == 456
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestLeases:
+    """Test cases for lease-based claiming across workers and nodes"""
+
+    def test_expired_lease_is_reclaimed_and_stale_commit_rejected(self, tmp_path):
+        """Test that a dead worker's job goes to another worker and only one commit wins"""
+        store = JobStore(str(tmp_path / "jobs.sqlite"), lease_seconds=0.05)
+        job_id = store.submit("https://en.wikipedia.org/wiki/A")
+
+        first = store.claim_next("worker-a", "node-1")
+        assert first["job_id"] == job_id
+        assert store.claim_next("worker-b", "node-2") is None
+
+        time.sleep(0.1)  # worker-a stops heartbeating
+        second = store.claim_next("worker-b", "node-2")
+        assert second["job_id"] == job_id
+        assert second["attempts"] == 2
+
+        assert store.commit(job_id, "worker-a", {"audio": b"stale"}) is False
+        assert store.commit(job_id, "worker-b", {"audio": b"fresh"}) is True
+        assert store.get_artifact(job_id, "audio") == b"fresh"
+        assert store.get(job_id)["status"] == DONE
+
+    def test_heartbeat_keeps_lease(self, tmp_path):
+        """Test that heartbeats prevent re-queueing"""
+        store = JobStore(str(tmp_path / "jobs.sqlite"), lease_seconds=0.1)
+        job_id = store.submit("https://en.wikipedia.org/wiki/A")
+        store.claim_next("worker-a")
+
+        for _ in range(4):
+            time.sleep(0.05)
+            assert store.heartbeat(job_id, "worker-a")
+        assert store.claim_next("worker-b") is None
+        assert store.heartbeat(job_id, "worker-b") is False
+
+    def test_job_fails_after_max_attempts(self, tmp_path):
+        """Test that a job which keeps killing workers is eventually failed"""
+        store = JobStore(str(tmp_path / "jobs.sqlite"), lease_seconds=0.01, max_attempts=2)
+        job_id = store.submit("https://en.wikipedia.org/wiki/A")
+
+        store.claim_next("a")
+        time.sleep(0.02)
+        store.claim_next("b")
+        time.sleep(0.02)
+        assert store.claim_next("c") is None
+        assert store.get(job_id)["status"] == FAILED
+
+    def test_node_limit(self, tmp_path):
+        """Test per-node concurrency limits across workers"""
+        store = JobStore(str(tmp_path / "jobs.sqlite"))
+        for i in range(3):
+            store.submit(f"https://en.wikipedia.org/wiki/{i}")
+
+        assert store.claim_next("a", "node-1", node_limit=2) is not None
+        assert store.claim_next("b", "node-1", node_limit=2) is not None
+        assert store.claim_next("c", "node-1", node_limit=2) is None
+        assert store.claim_next("d", "node-2", node_limit=2) is not None
+
+    def test_migrates_store_without_lease_columns(self, tmp_path):
+        """Test opening a job store created before leases existed"""
+        import sqlite3
+        path = str(tmp_path / "old.sqlite")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE jobs (job_id TEXT PRIMARY KEY, url TEXT NOT NULL, variant TEXT NOT NULL, "
+                     "mode TEXT NOT NULL, duration INTEGER NOT NULL, priority TEXT NOT NULL, status TEXT NOT NULL, "
+                     "stage TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)")
+        conn.commit()
+        conn.close()
+
+        store = JobStore(path)
+        store.submit("https://en.wikipedia.org/wiki/A")
+        assert store.claim_next("a")["attempts"] == 1
+
+    def test_multiple_processes_share_queue(self, tmp_path):
+        """Test several worker processes draining one queue, each job committed exactly once"""
+        db_path = str(tmp_path / "jobs.sqlite")
+        log_path = str(tmp_path / "audio.log")
+        store = JobStore(db_path)
+        job_ids = [store.submit(f"https://en.wikipedia.org/wiki/Page_{i}") for i in range(24)]
+
+        ctx = multiprocessing.get_context("fork")
+        processes = [ctx.Process(target=_worker_process, args=(db_path, log_path, f"node-{n}")) for n in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            assert process.exitcode == 0
+
+        assert store.counts() == {DONE: 24}
+        with open(log_path) as f:
+            rendered = f.read().split()
+        assert sorted(rendered) == sorted(job_ids)
@@ -0,0 +1,125 @@
+"""
+Unit tests for KeyPool class
+"""
+
+import multiprocessing
+import time
+from unittest.mock import patch
+import pytest
+from ratelimit import KeyPool, TokenBucket
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    return TokenBucket(str(tmp_path / "scheduler.sqlite"))
+
+
+def _take_process(db_path, results):
+    pool = KeyPool("gemini", [("key_a", 600)], burst_seconds=1, bucket=TokenBucket(db_path))
+    for _ in range(10):
+        key, _ = pool.acquire(1, timeout=0)
+        results.put(key is not None)
+
+
+class TestKeyPool:
+    """Test cases for KeyPool"""
+
+    def test_rotates_by_quota(self, bucket):
+        """Test that keys are used in proportion to their configured rates"""
+        pool = KeyPool("gemini", [("big", 120), ("small", 60)], burst_seconds=30, bucket=bucket)
+        used = {"big": 0, "small": 0}
+        for _ in range(90):
+            key, error = pool.acquire(1, timeout=0)
+            assert error is None
+            used[key] += 1
+        # Capacities are 60 and 30, so the whole burst is spent in that ratio
+        assert used == {"big": 60, "small": 30}
+
+    def test_waits_for_refill_then_times_out(self, bucket):
+        """Test that an exhausted pool waits for refill and reports a timeout"""
+        pool = KeyPool("gemini", [("only", 60)], burst_seconds=2, bucket=bucket)
+        assert pool.acquire(2, timeout=0)[1] is None
+
+        key, error = pool.acquire(2, timeout=0.05)
+        assert key is None
+        assert "Rate limit" in error
+
+        start = time.monotonic()
+        key, error = pool.acquire(1, timeout=2)
+        assert key == "only"
+        assert time.monotonic() - start >= 0.5
+
+    def test_oversized_cost_waits_for_full_bucket(self, bucket):
+        """Test that a request larger than the bucket is admitted once the bucket is full"""
+        pool = KeyPool("elevenlabs", [("e_key", 600)], burst_seconds=1, bucket=bucket)
+        key, error = pool.acquire(5000, timeout=0)
+        assert key == "e_key"
+        assert pool.snapshot()[0]["available"] < 1
+
+    def test_refund_and_snapshot_hide_keys(self, bucket):
+        """Test refunds and that snapshots never expose key values"""
+        pool = KeyPool("gemini", [("secret_key", 60)], burst_seconds=10, bucket=bucket)
+        pool.acquire(5, timeout=0)
+        pool.refund("secret_key", 5)
+        snapshot = pool.snapshot()
+        assert snapshot[0]["available"] == pytest.approx(10, abs=0.1)
+        assert "secret_key" not in str(snapshot)
+
+    def test_settle_refunds_requests_that_never_reached_the_api(self, bucket):
+        """Test that only failures before the upstream are refunded, not 429s"""
+        pool = KeyPool("elevenlabs", [("e_key", 600)], burst_seconds=1, bucket=bucket)
+        for error in ("elevenlabs circuit open after repeated failures, retry in 20s",
+                      "Timed out waiting for a elevenlabs slot (interactive lane)",
+                      "Insufficient ElevenLabs quota: job needs 8 characters, 2 remaining"):
+            key, _ = pool.acquire(8, timeout=0)
+            pool.settle(key, 8, error)
+            assert pool.snapshot()[0]["available"] == pytest.approx(10, abs=0.1), error
+        for error in ("ElevenLabs API error: 429 - too many requests", "ElevenLabs API error: 500"):
+            pool.acquire(4, timeout=0)
+            pool.settle("e_key", 4, error)
+        assert pool.snapshot()[0]["available"] == pytest.approx(2, abs=0.1)
+        pool.settle("e_key", 4, "Error generating script: 429 RESOURCE_EXHAUSTED. {'error': {'code': 429}}")
+        pool.settle("e_key", 4, None)
+        assert pool.snapshot()[0]["available"] == pytest.approx(2, abs=0.1)
+
+    def test_charge_spends_from_the_given_key(self, bucket):
+        """Test that a retry is charged to the key that paid for the first attempt"""
+        pool = KeyPool("gemini", [("a", 60), ("b", 60)], burst_seconds=10, bucket=bucket)
+        key, _ = pool.acquire(4, timeout=0)
+        pool.charge(key, 3)
+        levels = {entry["bucket"]: entry["available"] for entry in pool.snapshot()}
+        assert sorted(levels.values()) == [pytest.approx(3, abs=0.1), pytest.approx(10, abs=0.1)]
+
+    def test_budget_shared_between_pools(self, bucket):
+        """Test that two pools over the same keys draw from one budget"""
+        first = KeyPool("gemini", [("key", 60)], burst_seconds=3, bucket=bucket)
+        second = KeyPool("gemini", [("key", 60)], burst_seconds=3, bucket=TokenBucket(bucket.db_path))
+        assert first.acquire(2, timeout=0)[1] is None
+        assert second.acquire(2, timeout=0)[0] is None
+
+    def test_budget_shared_between_processes(self, tmp_path):
+        """Test that workers in separate processes cannot overspend a key"""
+        db_path = str(tmp_path / "scheduler.sqlite")
+        ctx = multiprocessing.get_context("fork")
+        results = ctx.Queue()
+        processes = [ctx.Process(target=_take_process, args=(db_path, results)) for _ in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(10)
+        granted = sum(results.get(timeout=1) for _ in range(30))
+        # Capacity is 10 tokens; refill during the test adds at most a few more
+        assert 10 <= granted <= 13
+
+    @patch('ratelimit.config.get_api_keys')
+    def test_from_config(self, mock_get_keys, bucket):
+        """Test building pools from configured keys and from a single UI key"""
+        mock_get_keys.return_value = [("k1", 60), ("k2", 30)]
+        assert len(KeyPool.from_config("gemini", "ui_key", bucket=bucket)) == 2
+
+        mock_get_keys.return_value = []
+        pool = KeyPool.from_config("gemini", "ui_key", bucket=bucket)
+        assert pool.acquire(1, timeout=0)[0] == "ui_key"
+
+        with pytest.raises(ValueError):
+            KeyPool.from_config("gemini", None, bucket=bucket)
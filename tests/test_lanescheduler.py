@@ -0,0 +1,95 @@
+"""
+Unit tests for LaneScheduler class
+"""
+
+import sqlite3
+import threading
+import time
+import pytest
+from scheduler import LaneScheduler, INTERACTIVE, BATCH
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "scheduler.sqlite")
+
+
+class TestLaneScheduler:
+    """Test cases for LaneScheduler"""
+
+    def test_batch_cannot_take_reserved_slots(self, db_path):
+        """Test that batch work leaves the reserved slots to interactive work"""
+        lanes = LaneScheduler("gemini", total=3, reserved_interactive=1, db_path=db_path)
+
+        batch_tokens = [lanes.acquire(BATCH, timeout=0.05)[0] for _ in range(3)]
+        assert sum(1 for token in batch_tokens if token) == 2
+
+        token, error = lanes.acquire(INTERACTIVE, timeout=0.05)
+        assert error is None
+        assert lanes.snapshot()["active"] == {BATCH: 2, INTERACTIVE: 1}
+
+    def test_interactive_can_use_every_slot(self, db_path):
+        """Test that interactive work is only limited by the total"""
+        lanes = LaneScheduler("gemini", total=2, reserved_interactive=1, db_path=db_path)
+
+        assert lanes.acquire(INTERACTIVE, timeout=0.05)[1] is None
+        assert lanes.acquire(INTERACTIVE, timeout=0.05)[1] is None
+        token, error = lanes.acquire(INTERACTIVE, timeout=0.05)
+        assert token is None
+        assert "Timed out" in error
+        assert lanes.stats[INTERACTIVE]["timeouts"] == 1
+
+    def test_batch_defers_to_waiting_interactive(self, db_path):
+        """Test that a freed slot goes to the waiting interactive request first"""
+        lanes = LaneScheduler("elevenlabs", total=1, reserved_interactive=0, db_path=db_path, poll_interval=0.005)
+        holder, _ = lanes.acquire(BATCH)
+        order = []
+
+        def request(lane):
+            with lanes.slot(lane) as error:
+                assert error is None
+                order.append(lane)
+                time.sleep(0.02)
+
+        interactive = threading.Thread(target=request, args=(INTERACTIVE,))
+        interactive.start()
+        time.sleep(0.05)  # interactive is now registered as waiting
+        batch = threading.Thread(target=request, args=(BATCH,))
+        batch.start()
+        time.sleep(0.05)
+
+        lanes.release(holder)
+        interactive.join()
+        batch.join()
+
+        assert order == [INTERACTIVE, BATCH]
+
+    def test_slots_shared_between_instances(self, db_path):
+        """Test that separate schedulers on one file (as in separate processes) share slots"""
+        ui = LaneScheduler("gemini", total=1, reserved_interactive=0, db_path=db_path)
+        batch_runner = LaneScheduler("gemini", total=1, reserved_interactive=0, db_path=db_path)
+
+        token, _ = ui.acquire(INTERACTIVE)
+        assert batch_runner.acquire(BATCH, timeout=0.05)[0] is None
+        ui.release(token)
+        assert batch_runner.acquire(BATCH, timeout=0.5)[0] is not None
+
+    def test_dead_process_slot_is_reclaimed(self, db_path):
+        """Test that a slot held by a crashed process is freed"""
+        lanes = LaneScheduler("gemini", total=1, reserved_interactive=0, db_path=db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO lane_slots VALUES ('stale', 'gemini', 'batch', 999999999, ?)", (time.time() + 600,))
+        conn.commit()
+        conn.close()
+
+        token, error = lanes.acquire(INTERACTIVE, timeout=0.5)
+        assert error is None
+
+    def test_run_returns_error_tuple_on_timeout(self, db_path):
+        """Test run() error shape when no slot is granted"""
+        lanes = LaneScheduler("gemini", total=1, reserved_interactive=0, db_path=db_path)
+        lanes.acquire(INTERACTIVE)
+
+        result = lanes.run(BATCH, lambda: ("script", None), timeout=0.02)
+        assert result[0] is None
+        assert "Timed out" in result[1]
@@ -0,0 +1,51 @@
+"""
+Unit tests for LazyModule and side-effect-free startup
+"""
+
+import sys
+from unittest.mock import patch
+import config
+import core_logic
+from benchmarks.bench_startup import StartupRunner, cold_import
+from lazy_import import LazyModule
+
+
+class TestLazyModule:
+    """Test cases for LazyModule and the startup import path"""
+
+    def test_loads_on_first_use(self):
+        """Test that the module is imported on first attribute access only"""
+        sys.modules.pop("colorsys", None)
+        lazy = LazyModule("colorsys")
+        assert not lazy.loaded and "colorsys" not in sys.modules
+        assert "not loaded" in repr(lazy)
+        assert lazy.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+        assert lazy.loaded and "colorsys" in sys.modules
+
+    def test_patch_reaches_real_module(self):
+        """Test that patching through a LazyModule patches the real module and is undone afterwards"""
+        import requests
+        original = requests.post
+        with patch('core_logic.requests.post') as mock_post:
+            assert requests.post is mock_post
+            assert core_logic.requests.post is mock_post
+        assert requests.post is original
+
+    def test_cold_import_skips_heavy_modules(self):
+        """Test that CLI and worker entry points import no heavy client library"""
+        for module in ("config", "core_logic", "run_local"):
+            assert cold_import(module)["heavy"] == [], module
+        assert cold_import("core_logic; core_logic.genai.Client")["heavy"] == ["google.genai"]
+
+    def test_api_keys_resolved_on_demand(self, monkeypatch):
+        """Test that key constants read the environment when accessed, not at import"""
+        assert not hasattr(config, "st")
+        monkeypatch.setenv("GEMINI_API_KEY", "later-key")
+        assert config.GEMINI_API_KEY == "later-key"
+        monkeypatch.delenv("ELEVENLABS_API_KEY", raising=False)
+        assert config.ELEVEN_API_KEY is None
+
+    def test_startup_runner(self):
+        """Test that the startup benchmark reports time and memory per module"""
+        result = StartupRunner(repeat=1).measure("config")
+        assert result["seconds"] > 0 and result["calls"] == 1 and result["heavy"] == []
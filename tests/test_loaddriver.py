@@ -0,0 +1,77 @@
+"""
+Unit tests for the load-test stand-ins and LoadDriver
+"""
+
+import json
+import requests
+import config
+from loadtest.driver import LoadDriver, ResourceSampler, percentile, format_report
+from loadtest.standins import StandIns, UpstreamProfile, GeminiStandIn, ElevenLabsStandIn
+
+
+class TestLoadDriver:
+    """Test cases for the stand-ins and LoadDriver"""
+
+    def test_profile_latency(self):
+        """Test that sampled latency follows the median and scales with work and time_scale"""
+        profile = UpstreamProfile(median=1.0, p95=2.0, per_unit=0.5, seed=7)
+        samples = sorted(profile.latency() for _ in range(2000))
+        assert 0.9 < samples[1000] < 1.1
+        assert 1.7 < samples[1900] < 2.3
+        fixed = UpstreamProfile(median=1.0, p95=1.0, per_unit=0.5, time_scale=0.1)
+        assert abs(fixed.latency(units=4) - 0.3) < 1e-9
+
+    def test_standin_rate_limit_and_errors(self):
+        """Test that a stand-in answers 429 with Retry-After past its rate limit and 503 at its error rate"""
+        server = GeminiStandIn(UpstreamProfile(median=0, rate_limit=2))
+        url = server.start() + "/v1beta/models/gemini-2.5-flash:generateContent"
+        try:
+            statuses = [requests.post(url, json={}, timeout=5).status_code for _ in range(4)]
+            assert statuses[:2] == [200, 200] and 429 in statuses[2:]
+            throttled = requests.post(url, json={}, timeout=5)
+            assert throttled.headers.get("Retry-After")
+        finally:
+            server.stop()
+        assert server.snapshot()["throttled"] >= 2
+
+        failing = ElevenLabsStandIn(UpstreamProfile(median=0, error_rate=1.0))
+        url = failing.start() + "/v1/text-to-dialogue"
+        try:
+            assert requests.post(url, json={"inputs": []}, timeout=5).status_code == 503
+        finally:
+            failing.stop()
+        assert failing.snapshot()["errors"] == 1
+
+    def test_standins_restore_config(self):
+        """Test that StandIns points config at the local servers and restores it on exit"""
+        before = (config.WIKIPEDIA_API_URL, config.GEMINI_BASE_URL, config.ELEVENLABS_BASE_URL)
+        with StandIns({name: UpstreamProfile(median=0) for name in config.LOADTEST_PROFILES}):
+            assert config.GEMINI_BASE_URL.startswith("http://127.0.0.1:")
+            assert config.ELEVENLABS_BASE_URL.endswith("/v1/text-to-dialogue")
+        assert (config.WIKIPEDIA_API_URL, config.GEMINI_BASE_URL, config.ELEVENLABS_BASE_URL) == before
+
+    def test_percentile_and_sampler(self):
+        """Test nearest-rank percentiles and resource sampling"""
+        assert percentile([], 50) is None
+        values = list(range(1, 101))
+        assert (percentile(values, 50), percentile(values, 95), percentile(values, 99)) == (50, 95, 99)
+        sampler = ResourceSampler(interval=0.01)
+        sampler.start()
+        sum(range(200_000))
+        resources = sampler.stop()
+        assert resources["rss_peak_bytes"] > 0 and resources["threads_max"] >= 1
+
+    def test_short_run(self, tmp_path, monkeypatch):
+        """Test a short end-to-end run through the production stages against fast stand-ins"""
+        monkeypatch.setattr(config, "SCHEDULER_DB_PATH", str(tmp_path / "scheduler.sqlite"))
+        profiles = {name: UpstreamProfile.from_config(name, time_scale=0.01, error_rate=0.0, seed=1)
+                    for name in config.LOADTEST_PROFILES}
+        with StandIns(profiles):
+            report = LoadDriver(rate_per_minute=600, duration=0.5, max_in_flight=8, arrivals="uniform", keys=4).run()
+        assert report["episodes"] == 5
+        assert report["completed"] == 5, report["errors"]
+        assert report["latency"]["p50"] > 0
+        assert set(report["stages"]) == {"scrape", "script", "audio"}
+        assert "script.api" in report["spans"]
+        json.dumps(report)
+        assert "episodes/min" in format_report(report)
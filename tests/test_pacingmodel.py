@@ -0,0 +1,74 @@
+"""
+Unit tests for PacingModel
+"""
+
+import pytest
+import config
+from core_logic import ScriptGenerator
+from pacing import PacingModel, script_counts
+
+# 417-byte MPEG1 Layer III frames at 128 kbps / 44.1 kHz, 1152 samples each
+_FRAME = b"\xff\xfb\x90\x00" + bytes(413)
+_FRAME_SECONDS = 1152 / 44100
+
+
+def _audio(seconds: float) -> bytes:
+    return _FRAME * round(seconds / _FRAME_SECONDS)
+
+
+def _script(words: int, tags: int) -> list:
+    text = " ".join(["yaar"] * words) + " [laughs]" * tags
+    return [{"speaker": "Ravi", "text": text}]
+
+
+@pytest.fixture
+def model(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PACING_MIN_SAMPLES", 3)
+    return PacingModel(str(tmp_path / "pacing.sqlite"))
+
+
+class TestPacingModel:
+    """Test cases for PacingModel"""
+
+    def test_counts_and_default_rate(self, model):
+        """Test word / tag counting and the default rate before enough samples exist"""
+        assert script_counts([{"speaker": "A", "text": "[sighs] Arre yaar... kya scene hai? [laughs]"}]) == (5, 2)
+        assert model.target_words("RJ", 120) == 2 * config.PACING_DEFAULT_WPM
+        assert model.record("RJ", _script(100, 0), b"not audio") is None
+        assert model.samples("RJ") == []
+
+    def test_fit_separates_words_and_tags(self, model):
+        """Test that recorded durations fit seconds per word and per tag, and shift target_words"""
+        # 0.5 s per word (120 WPM) plus 1.5 s per tag
+        for words, tags in ((200, 4), (260, 10), (300, 2), (180, 12)):
+            seconds = model.record("Teams", _script(words, tags), _audio(words * 0.5 + tags * 1.5))
+            assert abs(seconds - (words * 0.5 + tags * 1.5)) < _FRAME_SECONDS
+        fitted = model.fit("Teams")
+        assert abs(fitted["seconds_per_word"] - 0.5) < 0.01 and abs(fitted["seconds_per_tag"] - 1.5) < 0.2
+        assert fitted["wpm"] < 120
+        assert model.target_words("Teams", 120) < 240
+        # Other variants keep the default until they have their own samples
+        assert model.target_words("RJ", 120) == 300
+
+    def test_info_frames_not_counted(self, model):
+        """Test that the Xing/Info frame heading each per-line segment is not measured as audio"""
+        info = b"\xff\xfb\x90\x00" + bytes(32) + b"Info" + bytes(377)
+        segments = [info + _audio(2.0), info + _audio(3.0)]
+        seconds = model.record("RJ", _script(10, 0) + _script(15, 0), segments)
+        assert seconds == pytest.approx(sum(len(_audio(s)) // len(_FRAME) for s in (2.0, 3.0)) * _FRAME_SECONDS)
+
+    def test_implausible_fit_ignored(self, model):
+        """Test that a rate outside PACING_WPM_BOUNDS falls back to the default"""
+        for _ in range(3):
+            model.record("RJ", _script(1000, 0), _audio(30))
+        assert model.fit("RJ") is None
+        assert model.wpm("RJ") == config.PACING_DEFAULT_WPM
+
+    def test_prompt_uses_fitted_rate(self, model, monkeypatch):
+        """Test that ScriptGenerator asks for the variant's calibrated word count"""
+        monkeypatch.setattr("core_logic.get_pacing_model", lambda: model)
+        for words in (200, 240, 280):
+            model.record("Business", _script(words, 0), _audio(words * 0.6))  # 100 WPM
+        assert ScriptGenerator.target_words(120, "Business") == 200
+        _, prompt = ScriptGenerator.__new__(ScriptGenerator)._build_prompt("text", "Business", 120)
+        assert "Approximately 200 words" in prompt
@@ -0,0 +1,158 @@
+"""
+Unit tests for PipelineExecutor class
+"""
+
+import threading
+import time
+import pytest
+from unittest.mock import Mock, patch
+from pipeline import PipelineExecutor, PipelineJob, make_default_stages
+
+
+def _sleep_stage(name, delay, log, fail_on=None):
+    """Stage that records (stage, job_id, start, end) and optionally fails one job"""
+    def stage(job):
+        start = time.perf_counter()
+        time.sleep(delay)
+        log.append((name, job.job_id, start, time.perf_counter()))
+        if job.job_id == fail_on:
+            return f"{name} failed"
+        return None
+    return stage
+
+
+class TestPipelineExecutor:
+    """Test cases for PipelineExecutor"""
+
+    def test_all_jobs_complete(self):
+        """Test that every job comes out exactly once"""
+        log = []
+        executor = PipelineExecutor([
+            ("scrape", _sleep_stage("scrape", 0.001, log), 2),
+            ("script", _sleep_stage("script", 0.001, log), 1),
+            ("audio", _sleep_stage("audio", 0.001, log), 3),
+        ], queue_size=1)
+
+        jobs = [PipelineJob(f"https://en.wikipedia.org/wiki/Page_{i}", job_id=str(i)) for i in range(10)]
+        done = list(executor.run(jobs))
+
+        assert sorted(job.job_id for job in done) == [str(i) for i in range(10)]
+        assert all(job.ok for job in done)
+        assert set(done[0].timings) == {"scrape", "script", "audio"}
+
+    def test_stages_overlap(self):
+        """Test that different jobs run in different stages at the same time"""
+        log = []
+        delay = 0.05
+        executor = PipelineExecutor([
+            ("scrape", _sleep_stage("scrape", delay, log), 1),
+            ("script", _sleep_stage("script", delay, log), 1),
+            ("audio", _sleep_stage("audio", delay, log), 1),
+        ])
+
+        start = time.perf_counter()
+        list(executor.run([PipelineJob("u", job_id=str(i)) for i in range(4)]))
+        elapsed = time.perf_counter() - start
+
+        # Sequential would be 4 jobs * 3 stages * delay = 0.6s; pipelined is ~(4 + 2) * delay
+        assert elapsed < 4 * 3 * delay * 0.8
+
+    def test_failed_job_skips_later_stages(self):
+        """Test that a failed job is returned with its error and stage"""
+        log = []
+        executor = PipelineExecutor([
+            ("scrape", _sleep_stage("scrape", 0, log, fail_on="bad"), 1),
+            ("script", _sleep_stage("script", 0, log), 1),
+        ])
+
+        done = {job.job_id: job for job in executor.run([PipelineJob("u", job_id="bad"), PipelineJob("u", job_id="good")])}
+
+        assert done["bad"].error == "scrape failed"
+        assert done["bad"].failed_stage == "scrape"
+        assert ("script", "bad") not in [(stage, job_id) for stage, job_id, _, _ in log]
+        assert done["good"].ok
+
+    def test_stage_exception_is_captured(self):
+        """Test that an exception inside a stage becomes a job error"""
+        def boom(job):
+            raise RuntimeError("kaboom")
+
+        executor = PipelineExecutor([("scrape", boom, 1)])
+        job = next(executor.run([PipelineJob("u")]))
+
+        assert "kaboom" in job.error
+
+    def test_feeder_exception_is_reraised(self):
+        """Test that an error reading jobs ends the run with that error after queued jobs finish"""
+        def jobs():
+            yield PipelineJob("u0")
+            raise ValueError("bad batch file")
+
+        executor = PipelineExecutor([("scrape", lambda job: None, 1)])
+        finished = []
+        with pytest.raises(ValueError, match="bad batch file"):
+            for job in executor.run(jobs()):
+                finished.append(job.job_id)
+        assert finished == ["u0"]
+
+    def test_backpressure(self):
+        """Test that the feeder does not run far ahead of a slow stage"""
+        pulled = []
+        release = threading.Event()
+
+        def slow(job):
+            release.wait(1)
+            return None
+
+        def jobs():
+            for i in range(20):
+                pulled.append(i)
+                yield PipelineJob("u", job_id=str(i))
+
+        executor = PipelineExecutor([("audio", slow, 1)], queue_size=2)
+        results = executor.run(jobs())
+        thread = threading.Thread(target=lambda: list(results))
+        thread.start()
+        time.sleep(0.1)
+        # 1 job in the worker + 2 queued + 1 blocked in put()
+        assert len(pulled) <= 4
+        release.set()
+        thread.join()
+        assert len(pulled) == 20
+
+    @patch('pipeline.get_estimator')
+    @patch('pipeline.get_key_pool')
+    @patch('pipeline.get_lane_scheduler')
+    @patch('pipeline.get_tts_scheduler')
+    @patch('pipeline.AudioEngine')
+    @patch('pipeline.ScriptGenerator')
+    @patch('pipeline.WikiScraper')
+    def test_default_stages(self, mock_scraper_class, mock_script_class, mock_audio_class, mock_get_scheduler,
+                            mock_get_lanes, mock_get_pool, mock_get_estimator):
+        """Test wiring of WikiScraper, ScriptGenerator and AudioEngine"""
+        mock_get_lanes.return_value.run.side_effect = lambda lane, fn: fn()
+        mock_get_pool.return_value.acquire.return_value = ("pooled_key", None)
+        mock_scraper_class.return_value.scrape.return_value = ("content", None)
+        # Long enough, tagged and Hinglish, so it passes the script quality gate
+        script = [{"speaker": "Ravi", "text": f"[laughing] Arre yaar, part {i} mein kya hua? " + "Bilkul sahi baat hai bhai. " * 4}
+                  for i in range(12)]
+        mock_script_class.return_value.generate_script.return_value = (script, None)
+        mock_get_scheduler.return_value.generate.return_value = (b"audio", None)
+
+        executor = PipelineExecutor(make_default_stages("g_key", "e_key", workers={"audio": 1}))
+        job = next(executor.run([PipelineJob("https://en.wikipedia.org/wiki/Mumbai_Indians", "Teams", "fast")]))
+
+        assert job.ok
+        assert job.content == "content"
+        assert job.script_json == script
+        assert job.audio_bytes == b"audio"
+        mock_scraper_class.return_value.scrape.assert_called_once_with("https://en.wikipedia.org/wiki/Mumbai_Indians", "fast")
+        # API keys are drawn from the pools built from the fallback keys
+        mock_get_pool.assert_any_call("gemini", "g_key")
+        mock_script_class.assert_called_once_with("pooled_key")
+        assert mock_get_scheduler.return_value.generate.call_args[0][2] == "pooled_key"
+        # Pipeline jobs default to the batch lane
+        assert mock_get_lanes.return_value.run.call_args[0][0] == "batch"
+        # Every upstream call feeds the estimator's stage history
+        recorded = [c[0][:2] for c in mock_get_estimator.return_value.record_result.call_args_list]
+        assert recorded == [("scrape", "fast"), ("script", "Teams"), ("audio", "Teams")]
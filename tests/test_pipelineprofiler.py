@@ -0,0 +1,87 @@
+"""
+Unit tests for PipelineProfiler and the profile report
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from pipeline import BatchManifest, PipelineJob, run_batch
+from profiling import PipelineProfiler, cpu_hotspots, format_report, load_jobs, memory_summary
+
+_retained = []
+
+
+def _busy_scrape(job):
+    job.content = "".join(str(i) for i in range(20_000))
+    return None
+
+
+def _leaky_script(job):
+    # Keeps 200 KB per job alive, like a cache that never evicts
+    _retained.append(bytearray(200_000))
+    job.script_json = [{"speaker": "Ravi", "text": job.content[:50]}]
+    return None
+
+
+def _audio(job):
+    job.audio_bytes = b"\xff" * 50_000
+    return None
+
+
+class TestPipelineProfiler:
+    """Test cases for PipelineProfiler"""
+
+    def test_batch_profile(self, tmp_path):
+        """Test per-stage CPU dumps, per-job records and growth attribution in a batch run"""
+        _retained.clear()
+        profile_dir = str(tmp_path / "profile")
+        stages = [("scrape", _busy_scrape, 1), ("script", _leaky_script, 1), ("audio", _audio, 1)]
+        jobs = [PipelineJob(f"https://en.wikipedia.org/wiki/P{i}", job_id=f"p{i}") for i in range(4)]
+        with PipelineProfiler(profile_dir) as profiler:
+            finished = list(run_batch(jobs, stages, BatchManifest(str(tmp_path / "m.jsonl")), str(tmp_path / "out"),
+                                      profiler=profiler))
+        assert all(job.ok for job in finished)
+        assert not tracemalloc.is_tracing()
+        assert sorted(name for name in os.listdir(profile_dir) if name.endswith(".prof")) == \
+            ["cpu-audio.prof", "cpu-scrape.prof", "cpu-script.prof"]
+
+        records = load_jobs(profile_dir)
+        assert [record["job_id"] for record in records] == ["p0", "p1", "p2", "p3"]
+        # Payload sizes are taken before checkpointing releases them
+        assert records[0]["stages"]["audio"]["output_bytes"] == 50_000
+        assert "growth" not in records[0] and "growth" in records[1]
+
+        summary = memory_summary(records)
+        leak = summary["growth"][0]
+        assert leak["site"].startswith("tests/test_pipelineprofiler.py:") and leak["size_diff"] >= 3 * 200_000
+        assert summary["stages"]["script"]["calls"] == 4
+
+    def test_cpu_hotspots(self, tmp_path):
+        """Test that the report names the function that used the CPU"""
+        profile_dir = str(tmp_path / "profile")
+        with PipelineProfiler(profile_dir, memory=False) as profiler:
+            job = PipelineJob("https://en.wikipedia.org/wiki/X", job_id="x")
+            with profiler.stage("scrape", job.job_id):
+                _busy_scrape(job)
+            profiler.job_finished(job.job_id)
+        rows = cpu_hotspots(profile_dir)["scrape"]
+        assert any("genexpr" in row["function"] or "join" in row["function"] for row in rows)
+        report = format_report(profile_dir)
+        assert "CPU [scrape]" in report and "Memory over 1 jobs" in report
+        assert json.loads(open(os.path.join(profile_dir, "jobs.jsonl")).readline())["rss_bytes"] > 0
+
+    def test_peak_rss_is_per_job(self, tmp_path):
+        """Test that a job's peak RSS is sampled during its own stages, not the process-lifetime maximum"""
+        with PipelineProfiler(str(tmp_path / "profile"), cpu=False, memory=False) as profiler:
+            with profiler.stage("audio", "big"):
+                buffer = b"\x01" * (64 << 20)
+                time.sleep(0.2)
+                del buffer
+            profiler.job_finished("big")
+            with profiler.stage("audio", "small"):
+                time.sleep(0.1)
+            profiler.job_finished("small")
+        big, small = load_jobs(str(tmp_path / "profile"))
+        assert big["peak_rss_bytes"] - small["peak_rss_bytes"] > 32 << 20
+        assert small["peak_rss_bytes"] >= small["rss_bytes"]
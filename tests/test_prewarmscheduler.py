@@ -0,0 +1,131 @@
+"""
+Unit tests for PrewarmScheduler
+"""
+
+import json
+from datetime import datetime
+import pytest
+import config
+from artifact_store import ArtifactStore, TEXT, JSON, PARTS
+from background import GenerationTask, generate_broadcast, DONE
+from coalesce import scrape_key, script_key, audio_key
+from core_logic import WikiScraper, AudioEngine
+from estimator import CostEstimator
+from loadtest.standins import StandIns, UpstreamProfile
+from prewarm import PrewarmScheduler, broadcast_generator, read_ranking, window_start, article_url, DURATION
+
+NIGHT = datetime(2026, 10, 19, 2, 30)
+NOON = datetime(2026, 10, 19, 12, 0)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path / "artifacts"))
+
+
+@pytest.fixture
+def ranking(tmp_path):
+    path = tmp_path / "top.txt"
+    path.write_text("Mumbai_Indians\nDelhi_Capitals\nChennai_Super_Kings\n")
+    return path
+
+
+def _scheduler(store, ranking, tmp_path, generate, **options):
+    return PrewarmScheduler(generate, source=str(ranking), windows=["22:00-06:00"], workers=1, store=store,
+                            estimator=CostEstimator(str(tmp_path / "history.sqlite")),
+                            db_path=str(tmp_path / "prewarm.sqlite"), **options)
+
+
+def _fake_generate(store, calls):
+    """Fill the store under the UI's keys like background.generate_broadcast would"""
+    def generate(request):
+        calls.append((request["url"].rsplit("/", 1)[-1], request["variant"]))
+        content = f"Article {request['url']}"
+        script = [{"speaker": "Ravi", "text": f"Arre yaar, {request['url']}"}]
+        store.remember(scrape_key(request["url"], request["mode"]), store.save(content, TEXT))
+        store.remember(script_key(content, request["variant"], request["duration"]) + (False,), store.save(script, JSON))
+        store.remember(audio_key(script) + ("segments",), store.save([b"mp3"], PARTS))
+        return None
+    return generate
+
+
+class TestPrewarmScheduler:
+    """Test cases for PrewarmScheduler"""
+
+    def test_ranking_formats_and_windows(self, tmp_path):
+        """Test reading ranked lists in each format and finding the current off-peak window"""
+        lines = tmp_path / "lines.txt"
+        lines.write_text("# trending\nMain_Page\nMumbai Indians\nhttps://en.wikipedia.org/wiki/Caf%C3%A9\nMumbai_Indians\n")
+        assert read_ranking(str(lines)) == ["Mumbai_Indians", "Café"]
+        top = tmp_path / "top.json"
+        top.write_text(json.dumps({"items": [{"articles": [
+            {"article": "Delhi_Capitals", "rank": 2}, {"article": "Special:Search", "rank": 1},
+            {"article": "Mumbai_Indians", "rank": 3}]}]}))
+        assert read_ranking(str(top)) == ["Delhi_Capitals", "Mumbai_Indians"]
+
+        assert window_start(NIGHT, ["22:00-06:00"]) == datetime(2026, 10, 18, 22, 0)
+        assert window_start(datetime(2026, 10, 19, 23, 0), ["22:00-06:00"]) == datetime(2026, 10, 19, 22, 0)
+        assert window_start(NOON, ["22:00-06:00", "01:00-05:00"]) is None
+        with pytest.raises(ValueError):
+            window_start(NOON, ["noon"])
+
+    def test_warms_in_rank_order_within_budget(self, store, ranking, tmp_path):
+        """Test that a pass fills missing items in rank order, inside the window, until the budget runs out"""
+        calls = []
+        scheduler = _scheduler(store, ranking, tmp_path, _fake_generate(store, calls), variants=["RJ", "Teams"])
+        full = scheduler.cost("RJ", ["scrape", "script", "audio"])
+        scheduler.budget = full * 3.5
+
+        assert scheduler.run_once(now=NOON)["window"] is None
+        assert calls == []
+
+        summary = scheduler.run_once(now=NIGHT)
+        assert calls == [("Mumbai_Indians", "RJ"), ("Mumbai_Indians", "Teams"), ("Delhi_Capitals", "RJ")]
+        assert summary["warmed"] == 3 and summary["over_budget"] == 3
+        assert scheduler.spent(summary["window"]) == pytest.approx(full * 3, abs=1e-3)
+        assert scheduler.missing("Mumbai_Indians", "Teams") == []
+
+        # The budget is per window and survives a restart; the next window starts from zero
+        restarted = _scheduler(store, ranking, tmp_path, _fake_generate(store, calls), variants=["RJ", "Teams"],
+                               budget=full * 3.5)
+        assert restarted.run_once(now=NIGHT)["warmed"] == 0
+        summary = restarted.run_once(now=datetime(2026, 10, 19, 23, 0))
+        assert summary["warmed"] == 3 and calls[-1] == ("Chennai_Super_Kings", "Teams")
+        assert restarted.plan() == []
+
+    def test_reranks_when_list_changes(self, store, ranking, tmp_path, monkeypatch):
+        """Test that a title moving to the top of the list mid-pass is warmed next"""
+        monkeypatch.setattr(config, "PREWARM_REFRESH_SECONDS", 0)
+        calls = []
+        fill = _fake_generate(store, calls)
+
+        def generate(request):
+            if not calls:
+                ranking.write_text("Mumbai_Indians\nRajasthan_Royals\nDelhi_Capitals\nChennai_Super_Kings\n")
+            return fill(request)
+
+        scheduler = _scheduler(store, ranking, tmp_path, generate)
+        scheduler.run_once(now=NIGHT)
+        assert [title for title, _ in calls] == ["Mumbai_Indians", "Rajasthan_Royals", "Delhi_Capitals",
+                                                 "Chennai_Super_Kings"]
+
+    def test_prewarmed_article_is_a_cache_hit(self, store, ranking, tmp_path, monkeypatch):
+        """Test that a UI request for a prewarmed article makes no upstream call at all"""
+        # Stand-in audio must not become pacing samples in the host's shared scheduler database
+        monkeypatch.setattr(config, "SCHEDULER_DB_PATH", str(tmp_path / "scheduler.sqlite"))
+        profiles = {name: UpstreamProfile.from_config(name, time_scale=0.05, error_rate=0.0, seed=1)
+                    for name in config.LOADTEST_PROFILES}
+        ranking.write_text("Mumbai_Indians\n")
+        with StandIns(profiles) as upstreams:
+            scheduler = _scheduler(store, ranking, tmp_path, broadcast_generator("test-key", "test-key", store))
+            summary = scheduler.run_once(force=True)
+            assert summary["warmed"] == 1 and summary["failed"] == 0
+            before = {name: stats["requests"] for name, stats in upstreams.snapshot().items()}
+
+            for fast_start in (False, True):
+                task = GenerationTask({"url": article_url("Mumbai_Indians"), "variant": "RJ", "mode": "pro",
+                                       "duration": DURATION, "fast_start": fast_start})
+                generate_broadcast(task, WikiScraper(), AudioEngine(), store, "test-key", "test-key")
+                snapshot = task.snapshot()
+                assert snapshot["status"] == DONE and len(snapshot["audio_segments"]) == len(snapshot["script_lines"])
+            assert {name: stats["requests"] for name, stats in upstreams.snapshot().items()} == before
@@ -0,0 +1,79 @@
+"""
+Unit tests for CompiledPrompt and PromptCache
+"""
+
+from unittest.mock import patch
+import pytest
+import config
+from core_logic import ScriptGenerator
+from loadtest.standins import GeminiStandIn, UpstreamProfile
+from prompts import PromptCache, compile_prompt, SOURCE_REFERENCE
+
+
+@pytest.fixture
+def gemini():
+    standin = GeminiStandIn(UpstreamProfile(median=0.001, error_rate=0.0), lines=4)
+    standin.start()
+    yield standin
+    standin.stop()
+
+
+@pytest.fixture
+def cache():
+    fresh = PromptCache({"min_tokens": 100})
+    with patch('prompts._prompt_cache', fresh):
+        yield fresh
+
+
+class TestPromptCache:
+    """Test cases for CompiledPrompt and PromptCache"""
+
+    def test_compiled_prompt_matches_template(self):
+        """Test that the static block holds everything but the source text and target length"""
+        compiled = compile_prompt("Teams")
+        assert compile_prompt("Teams") is compiled
+        assert compiled.speakers == [config.SPEAKER_NAMES["Teams"]["Person A"], config.SPEAKER_NAMES["Teams"]["Person B"]]
+        assert "{speaker_a}" not in compiled.static and "Vikram" in compiled.static
+        assert SOURCE_REFERENCE in compiled.static and "Target Length" not in compiled.static
+        prompt = compiled.render("Mumbai Indians won again.", 240)
+        assert prompt.startswith("### SOURCE TEXT\nMumbai Indians won again.")
+        assert prompt.endswith("Approximately 240 words total.")
+        # Unknown variants fall back to RJ's template and speakers
+        assert compile_prompt("Unknown").static == compile_prompt("RJ").static
+
+    def test_static_block_uploaded_once(self, gemini, cache):
+        """Test that the static block is cached once per variant and referenced by every later request"""
+        generator = ScriptGenerator("test-key", base_url=gemini.url)
+        for _ in range(3):
+            script, error = generator.generate_script("Mumbai Indians are a cricket team.", "Business", 120)
+            assert error is None
+            assert {line["speaker"] for line in script} == set(compile_prompt("Business").speakers)
+        lines = list(generator.stream_script("Mumbai Indians are a cricket team.", "Business", 120))
+        assert len(lines) == 4 and all(error is None for _, error in lines)
+        assert gemini.snapshot()["caches_created"] == 1 and gemini.snapshot()["cached_requests"] == 4
+        assert cache.stats["created"] == 1 and cache.stats["hits"] == 3
+
+    def test_expired_handle_falls_back_inline(self, gemini, cache):
+        """Test that a request whose cached prefix is gone is resent inline and the handle renewed"""
+        generator = ScriptGenerator("test-key", base_url=gemini.url)
+        assert generator.generate_script("text", "RJ", 60)[1] is None
+        gemini._caches.clear()
+        script, error = generator.generate_script("text", "RJ", 60)
+        assert error is None and len(script) == 4
+        assert cache.stats["invalidated"] == 1
+        assert generator.generate_script("text", "RJ", 60)[1] is None
+        assert gemini.snapshot()["caches_created"] == 2
+
+    def test_short_or_disabled_blocks_stay_inline(self, gemini):
+        """Test that blocks under min_tokens, and failed uploads, are sent as the system instruction"""
+        generator = ScriptGenerator("test-key", base_url=gemini.url)
+        with patch('prompts._prompt_cache', PromptCache()) as default:
+            assert compile_prompt("RJ").static_tokens < default.settings["min_tokens"]
+            assert generator.generate_script("text", "RJ", 60)[1] is None
+            assert default.stats["inline"] == 1
+        with patch('prompts._prompt_cache', PromptCache({"min_tokens": 0})) as failing:
+            with patch.object(generator.client.caches, "create", side_effect=RuntimeError("quota")):
+                assert generator.generate_script("text", "RJ", 60)[1] is None
+                assert generator.generate_script("text", "RJ", 60)[1] is None
+            assert failing.stats["failures"] == 1 and failing.stats["inline"] == 1
+        assert gemini.snapshot()["caches_created"] == 0 and gemini.snapshot()["cached_requests"] == 0
@@ -0,0 +1,140 @@
+"""
+Unit tests for TTSQuotaScheduler class
+"""
+
+import threading
+import pytest
+from unittest.mock import Mock, patch
+from core_logic import AudioEngine
+from scheduler import TTSQuotaScheduler, ADMIT, DELAY, REJECT
+
+
+SCRIPT = [
+    {"speaker": "Ravi", "text": "Arre Priya!"},     # 11 characters
+    {"speaker": "Priya", "text": "Haan bhai."}      # 10 characters
+]
+
+
+class TestTTSQuotaScheduler:
+    """Test cases for TTSQuotaScheduler"""
+
+    def test_character_cost(self):
+        """Test character cost of a script"""
+        assert AudioEngine.character_cost(SCRIPT) == 21
+        assert AudioEngine.character_cost([]) == 0
+
+    def test_check_decisions(self):
+        """Test admit / delay / reject decisions"""
+        scheduler = TTSQuotaScheduler(character_quota=30, max_concurrency=1)
+        assert scheduler.check(SCRIPT) == (ADMIT, 21)
+
+        cost, error = scheduler.acquire(SCRIPT)
+        assert error is None
+        # Slot is busy and the 9 remaining characters are too few
+        assert scheduler.check(SCRIPT)[0] == REJECT
+        assert scheduler.check([{"speaker": "Ravi", "text": "Hi"}])[0] == DELAY
+
+        scheduler.release(cost, success=True)
+        assert scheduler.remaining_characters() == 9
+
+    def test_failed_job_is_refunded(self):
+        """Test that failed requests do not consume quota"""
+        scheduler = TTSQuotaScheduler(character_quota=21)
+        audio_engine = Mock()
+        audio_engine.generate_dialogue_v3.return_value = (None, "Network error: boom")
+
+        audio_bytes, error = scheduler.generate(audio_engine, SCRIPT, "test_key")
+
+        assert audio_bytes is None
+        assert scheduler.remaining_characters() == 21
+        assert scheduler.snapshot()["failed"] == 1
+
+    def test_reject_when_quota_exhausted(self):
+        """Test rejection before any API call"""
+        scheduler = TTSQuotaScheduler(character_quota=10)
+        audio_engine = Mock()
+
+        audio_bytes, error = scheduler.generate(audio_engine, SCRIPT, "test_key")
+
+        assert audio_bytes is None
+        assert "Insufficient ElevenLabs quota" in error
+        audio_engine.generate_dialogue_v3.assert_not_called()
+
+    def test_retry_after_429(self):
+        """Test that a 429 triggers cooldown and retry"""
+        scheduler = TTSQuotaScheduler(character_quota=100, cooldown=0.01)
+        audio_engine = Mock()
+        audio_engine.generate_dialogue_v3.side_effect = [
+            (None, "ElevenLabs API error: 429 - too_many_concurrent_requests"),
+            (b"audio", None)
+        ]
+
+        on_retry = Mock()
+
+        audio_bytes, error = scheduler.generate(audio_engine, SCRIPT, "test_key", on_retry=on_retry)
+
+        assert error is None
+        assert audio_bytes == b"audio"
+        # The retried attempt is charged again
+        on_retry.assert_called_once_with()
+        snapshot = scheduler.snapshot()
+        assert snapshot["throttled"] == 1
+        assert snapshot["used_characters"] == 21
+
+    def test_concurrency_limit(self):
+        """Test that no more than max_concurrency requests run at once"""
+        scheduler = TTSQuotaScheduler(max_concurrency=2)
+        peak = {"active": 0, "max": 0}
+        lock = threading.Lock()
+
+        def fake_generate(script_json, api_key, base_url):
+            with lock:
+                peak["active"] += 1
+                peak["max"] = max(peak["max"], peak["active"])
+            threading.Event().wait(0.02)
+            with lock:
+                peak["active"] -= 1
+            return b"audio", None
+
+        audio_engine = Mock()
+        audio_engine.generate_dialogue_v3.side_effect = fake_generate
+        threads = [threading.Thread(target=scheduler.generate, args=(audio_engine, SCRIPT, "k")) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert peak["max"] <= 2
+        assert scheduler.snapshot()["admitted"] == 6
+
+    @patch('core_logic.requests.get')
+    def test_sync_quota(self, mock_get):
+        """Test reading the remaining quota from the subscription endpoint"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"character_limit": 1000, "character_count": 400}
+        mock_get.return_value = mock_response
+
+        scheduler = TTSQuotaScheduler()
+        error = scheduler.sync_quota("test_key")
+
+        assert error is None
+        assert scheduler.remaining_characters() == 600
+
+    @patch('core_logic.requests.get')
+    def test_quota_synced_on_first_acquire(self, mock_get):
+        """Test that a scheduler with a key and no configured quota reads it once, when first used"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"character_limit": 1000, "character_count": 990}
+        mock_get.return_value = mock_response
+
+        scheduler = TTSQuotaScheduler(api_key="test_key")
+        assert scheduler.remaining_characters() is None and mock_get.call_count == 0
+        cost, error = scheduler.acquire(SCRIPT)
+        assert cost is None and error.startswith("Insufficient ElevenLabs quota")
+        scheduler.acquire(SCRIPT)
+        assert mock_get.call_count == 1
+        # A configured quota is never overwritten
+        assert TTSQuotaScheduler(character_quota=50, api_key="test_key").acquire(SCRIPT) == (21, None)
+        assert mock_get.call_count == 1
@@ -6,6 +6,7 @@ import pytest
 import json
 from unittest.mock import Mock, patch, MagicMock
 from core_logic import ScriptGenerator
+import config
 
 
 class TestScriptGenerator:
@@ -111,6 +112,13 @@ class TestScriptGenerator:
         assert script is None
         assert "must be a JSON array" in error
     
+    def test_validate_entry_text_type(self):
+        """Test that an entry whose text is not a string is rejected (as in an edited script)"""
+        speakers = ["Ravi", "Priya"]
+        assert ScriptGenerator._validate_entry({"speaker": "Ravi", "text": "Haan"}, speakers, "RJ") is None
+        assert "must be a string" in ScriptGenerator._validate_entry({"speaker": "Ravi", "text": 42}, speakers, "RJ")
+        assert "dictionary" in ScriptGenerator._validate_entry("Ravi: Haan", speakers, "RJ")
+    
     @patch('core_logic.genai.Client')
     def test_strip_markdown_helper(self, mock_client_class):
         """Test markdown stripping helper function"""
@@ -151,3 +159,85 @@ class TestScriptGenerator:
         assert "[laughs]" in script[0]["text"]
         assert "[sighs]" in script[1]["text"]
 
+    
+    @patch('core_logic.genai.Client')
+    def test_stream_script_yields_lines_as_they_complete(self, mock_client_class):
+        """Test that streamed lines are parsed incrementally across chunk boundaries"""
+        text = "```json\n" + json.dumps([
+            {"speaker": "Ravi", "text": "Arre, {curly} [laughs] baat!"},
+            {"speaker": "Priya", "text": "Haan, \"bilkul\"."}
+        ]) + "\n```"
+        chunks = [Mock(text=text[i:i + 7]) for i in range(0, len(text), 7)]
+        
+        mock_client = Mock()
+        mock_client.models.generate_content_stream.return_value = iter(chunks)
+        mock_client_class.return_value = mock_client
+        
+        script_gen = ScriptGenerator("test_api_key")
+        results = list(script_gen.stream_script("Test content", "RJ", 120))
+        
+        assert [error for _, error in results] == [None, None]
+        assert results[0][0]["text"] == "Arre, {curly} [laughs] baat!"
+        assert results[1][0]["speaker"] == "Priya"
+    
+    @patch('core_logic.genai.Client')
+    def test_stream_script_errors(self, mock_client_class):
+        """Test invalid speakers and truncated streams in streaming mode"""
+        mock_client = Mock()
+        mock_client_class.return_value = mock_client
+        script_gen = ScriptGenerator("test_api_key")
+        
+        mock_client.models.generate_content_stream.return_value = iter([
+            Mock(text='[{"speaker": "Ravi", "text": "Hi"}, {"speaker": "Host", "text": "Hello"}]')
+        ])
+        results = list(script_gen.stream_script("Test content", "RJ", 120))
+        assert results[0][1] is None
+        assert "Speaker must be" in results[1][1]
+        
+        mock_client.models.generate_content_stream.return_value = iter([
+            Mock(text='[{"speaker": "Ravi", "text": "Hi"}, {"speaker": "Priya", "te')
+        ])
+        results = list(script_gen.stream_script("Test content", "RJ", 120))
+        assert len(results) == 2
+        assert "incomplete array" in results[1][1]
+    
+    @patch('core_logic.genai.Client')
+    def test_preview_budget_in_request(self, mock_client_class):
+        """Test that preview mode shrinks the prompt and caps output tokens"""
+        mock_response = Mock()
+        mock_response.text = json.dumps([{"speaker": "Ravi", "text": "Chhota sa preview!"}])
+        mock_client = Mock()
+        mock_client.models.generate_content.return_value = mock_response
+        mock_client_class.return_value = mock_client
+        
+        script_gen = ScriptGenerator("test_api_key")
+        script, error = script_gen.generate_script("x" * 5000, "RJ", 120, preview=True)
+        
+        assert error is None
+        kwargs = mock_client.models.generate_content.call_args.kwargs
+        assert kwargs["config"]["max_output_tokens"] == config.PREVIEW_BUDGET["max_output_tokens"]
+        assert kwargs["config"]["thinking_config"] == {"thinking_budget": 0}
+        assert "Preview Budget" in kwargs["contents"]
+        assert "x" * (config.PREVIEW_BUDGET["source_characters"] + 1) not in kwargs["contents"]
+        # Full scripts keep the original config
+        assert "max_output_tokens" not in script_gen.generation_config
+    
+    @patch('core_logic.genai.Client')
+    def test_preview_keeps_lines_cut_off_by_token_cap(self, mock_client_class):
+        """Test that a preview truncated by max_output_tokens keeps its complete lines, within budget"""
+        lines = [{"speaker": "Ravi" if i % 2 == 0 else "Priya", "text": f"Line {i}"} for i in range(5)]
+        mock_response = Mock()
+        mock_response.text = json.dumps(lines)[:-20]
+        mock_client = Mock()
+        mock_client.models.generate_content.return_value = mock_response
+        mock_client_class.return_value = mock_client
+        
+        script_gen = ScriptGenerator("test_api_key")
+        script, error = script_gen.generate_script("Test content", "RJ", 120, preview=True)
+        
+        assert error is None
+        assert script == lines[:config.PREVIEW_BUDGET["lines"]]
+        
+        # Without preview the truncated response is still an error
+        script, error = script_gen.generate_script("Test content", "RJ", 120)
+        assert "JSON parsing error" in error
@@ -0,0 +1,65 @@
+"""
+Unit tests for ScriptQualityGate
+"""
+
+from unittest.mock import patch
+import pytest
+from telemetry import Tracer
+from script_quality import ScriptQualityGate
+
+
+def _script(lines: int = 12, text: str = "[laughing] Arre yaar, part {i} mein kya hua? Bilkul sahi baat hai bhai, sach mein.") -> list:
+    """A script of numbered lines (~22 words each) alternating between the RJ speakers"""
+    return [{"speaker": "Ravi" if i % 2 == 0 else "Priya", "text": text.format(i=i) + " Yeh toh kamaal hai." * 2}
+            for i in range(lines)]
+
+
+@pytest.fixture
+def tracer():
+    fresh = Tracer(sink="", buckets=(0.1, 1.0), enabled=True)
+    with patch('telemetry._tracer', fresh):
+        yield fresh
+
+
+class TestScriptQualityGate:
+    """Test cases for ScriptQualityGate"""
+
+    def test_good_script_passes(self, tracer):
+        """Test that a tagged Hinglish script near the target length passes and is recorded"""
+        gate = ScriptQualityGate()
+        scores, error = gate.check(_script(14), duration=120)
+        assert error is None, scores["problems"]
+        assert scores["lines"] == 14 and scores["tag_density"] == 1.0
+        assert scores["hinglish_ratio"] > 0.5 and scores["repeat_ratio"] == 0
+        assert 'wikitalks_span_flag_total{span="script.quality",flag="passed",value="true"} 1' in tracer.render_openmetrics()
+
+    def test_each_check_rejects(self):
+        """Test that length, tags, language, line length and repeats are each caught"""
+        gate = ScriptQualityGate()
+        assert "words for a target" in gate.score(_script(3))["problems"][0]
+        # Preview scripts are short on purpose
+        assert gate.score(_script(3), preview=True)["problems"] == []
+        untagged = _script(14, "Arre yaar, part {i} mein kya hua? Bilkul sahi baat hai bhai, sach mein.")
+        assert gate.score(untagged)["problems"] == ["too few [tags] (0 in 14 lines)"]
+        english = _script(18, "[laughing] Part {i} of the history is about the team winning the league title again.")
+        english = [{**line, "text": line["text"].replace(" Yeh toh kamaal hai.", " What a season.")} for line in english]
+        assert any("almost no Hindi" in problem for problem in gate.score(english)["problems"])
+        monologue = _script(13) + [{"speaker": "Ravi", "text": "[sighs] " + "haan " * 90}]
+        assert gate.score(monologue)["problems"] == ["a 90-word line"]
+        looping = _script(10) + _script(4)
+        assert gate.score(looping)["problems"] == ["4 repeated lines"]
+
+    def test_regenerates_before_failing(self, tracer):
+        """Test that a rejected script is regenerated, and the job fails if it keeps failing"""
+        gate = ScriptQualityGate({"max_regenerations": 1})
+        attempts = iter([(_script(3), None), (_script(14), None)])
+        script, error = gate.generate(lambda: next(attempts), duration=120)
+        assert error is None and len(script) == 14
+        assert tracer.summary()["script.quality"]["errors"] == 1
+
+        calls = []
+        script, error = gate.generate(lambda: calls.append(1) or (_script(3), None), duration=120)
+        assert script is None and error.startswith("Script failed quality gate:")
+        assert len(calls) == 2
+        # Generation errors are passed through without retrying here
+        assert gate.generate(lambda: (None, "429"), duration=120) == (None, "429")
@@ -0,0 +1,146 @@
+"""
+Unit tests for SingleFlight class
+"""
+
+import threading
+import time
+import pytest
+from coalesce import SingleFlight, script_key, scoped_key
+from pipeline import PipelineJob, run_job_coalesced
+from ratelimit import KeyPool
+
+
+def _run_concurrently(n, target):
+    """Start n threads on target, wait for them, return their results in start order"""
+    results = [None] * n
+    barrier = threading.Barrier(n)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+class TestSingleFlight:
+    """Test cases for SingleFlight"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        """Test that identical concurrent requests run the function once"""
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return ("content", None)
+
+        results = _run_concurrently(8, lambda: flight.do(("scrape", "url", "pro"), slow))
+
+        assert len(calls) == 1
+        assert all(result == ("content", None) for result, _ in results)
+        assert sum(1 for _, shared in results if shared) == 7
+        assert flight.stats == {"leaders": 1, "followers": 7}
+        assert flight.in_flight() == 0
+
+    def test_different_keys_do_not_coalesce(self):
+        """Test that distinct requests run independently"""
+        flight = SingleFlight()
+        keys = iter(range(4))
+        lock = threading.Lock()
+
+        def next_key():
+            with lock:
+                return next(keys)
+
+        results = _run_concurrently(4, lambda: flight.do(next_key(), lambda: time.sleep(0.01) or "ok"))
+
+        assert flight.stats["leaders"] == 4
+        assert not any(shared for _, shared in results)
+
+    def test_no_caching_after_completion(self):
+        """Test that a finished call is not reused by later requests"""
+        flight = SingleFlight()
+        flight.do("key", lambda: 1)
+        result, shared = flight.do("key", lambda: 2)
+
+        assert result == 2
+        assert shared is False
+
+    def test_exception_propagates_to_followers(self):
+        """Test that every waiter sees the leader's exception"""
+        flight = SingleFlight()
+
+        def boom():
+            time.sleep(0.05)
+            raise RuntimeError("upstream down")
+
+        def call():
+            try:
+                flight.do("key", boom)
+            except RuntimeError as e:
+                return str(e)
+
+        assert _run_concurrently(3, call) == ["upstream down"] * 3
+
+    def test_script_key_depends_on_content(self):
+        """Test script keys for identical and different inputs"""
+        assert script_key("abc", "RJ", 120) == script_key("abc", "RJ", 120)
+        assert script_key("abc", "RJ", 120) != script_key("abd", "RJ", 120)
+        assert script_key("abc", "RJ", 120) != script_key("abc", "Teams", 120)
+
+    def test_keys_scoped_by_credentials(self):
+        """Test that requests made with different API keys never share a call in flight"""
+        pool = KeyPool("gemini", [("key-a", 60)])
+        assert pool.scope == KeyPool("gemini", [("key-a", 60)]).scope
+        other = KeyPool("gemini", [("key-b", 60)])
+        request = script_key("abc", "RJ", 120)
+        assert scoped_key(request, pool.scope) != scoped_key(request, other.scope)
+        assert "key-a" not in pool.scope
+
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def denied():
+            release.wait(2)
+            return None, "Error generating script: 401 UNAUTHENTICATED"
+
+        leader = threading.Thread(target=flight.do, args=(scoped_key(request, pool.scope), denied))
+        leader.start()
+        time.sleep(0.05)
+        # Same request, other key: runs its own call instead of waiting for the leader's 401
+        result, shared = flight.do(scoped_key(request, other.scope), lambda: (["script"], None))
+        assert result == (["script"], None) and not shared
+        release.set()
+        leader.join()
+
+    def test_run_job_coalesced(self):
+        """Test pipeline-level coalescing of identical jobs"""
+        flight = SingleFlight()
+        calls = []
+
+        def scrape(job):
+            calls.append(job.job_id)
+            time.sleep(0.05)
+            job.content = "content"
+            return None
+
+        stages = [("scrape", scrape, 1)]
+        url = "https://en.wikipedia.org/wiki/Mumbai_Indians"
+        counter = iter(range(5))
+        lock = threading.Lock()
+
+        def submit():
+            with lock:
+                job_id = str(next(counter))
+            return run_job_coalesced(PipelineJob(url, "RJ", "pro", job_id=job_id), stages, flight)
+
+        jobs = _run_concurrently(5, submit)
+
+        assert len(calls) == 1
+        assert all(job.content == "content" and job.ok for job in jobs)
@@ -0,0 +1,116 @@
+"""
+Unit tests for stream_broadcast
+"""
+
+import time
+from scheduler import LaneScheduler
+from streaming import stream_broadcast, batch_lines, hold_slot
+
+
+def _lines(count, delay=0.0, error_at=None):
+    for i in range(count):
+        if delay:
+            time.sleep(delay)
+        if i == error_at:
+            yield None, "JSON parsing error: broken"
+            return
+        yield {"speaker": "Ravi" if i % 2 == 0 else "Priya", "text": f"Line {i}"}, None
+
+
+def _synthesize(lines):
+    return "|".join(line["text"] for line in lines).encode(), None
+
+
+class TestStreamBroadcast:
+    """Test cases for stream_broadcast"""
+
+    def test_batches_small_first_then_larger(self):
+        """Test the small first batch followed by full-size batches"""
+        batches = list(batch_lines(_lines(9), first_batch=2, batch_size=4))
+        assert [len(batch) for batch, _ in batches] == [2, 4, 3]
+        assert all(error is None for _, error in batches)
+
+    def test_chunks_in_order(self):
+        """Test that every line is voiced exactly once, in script order"""
+        chunks = list(stream_broadcast(_lines(7), _synthesize, first_batch=2, batch_size=3))
+        assert [chunk.index for chunk in chunks] == [0, 1, 2]
+        assert b"|".join(chunk.audio_bytes for chunk in chunks) == b"Line 0|Line 1|Line 2|Line 3|Line 4|Line 5|Line 6"
+        assert all(chunk.ok for chunk in chunks)
+
+    def test_first_audio_before_script_finishes(self):
+        """Test that TTS for the first batch overlaps with the rest of the script"""
+        chunks = stream_broadcast(_lines(10, delay=0.02), _synthesize, first_batch=2, batch_size=4)
+        first = next(chunks)
+        # Two lines have been written, eight are still to come (~0.16s)
+        assert first.elapsed < 0.12
+        assert len(list(chunks)) == 2
+
+    def test_script_error_keeps_earlier_lines(self):
+        """Test that a script error ends the stream after voicing the lines before it"""
+        chunks = list(stream_broadcast(_lines(5, error_at=3), _synthesize, first_batch=2, batch_size=4))
+        assert chunks[0].ok
+        assert chunks[1].lines == [{"speaker": "Ravi", "text": "Line 2"}]
+        assert chunks[1].audio_bytes == b"Line 2"
+        assert "JSON parsing error" in chunks[1].error
+
+    def test_audio_error_stops_stream(self):
+        """Test that a TTS failure is reported and the script thread is released"""
+        produced = []
+
+        def lines():
+            for line, error in _lines(20):
+                produced.append(line)
+                yield line, error
+
+        chunks = list(stream_broadcast(lines(), lambda batch: (None, "ElevenLabs API error: 500"), first_batch=2))
+        assert len(chunks) == 1
+        assert chunks[0].error == "ElevenLabs API error: 500"
+        time.sleep(0.3)
+        # The producer stops once its queue is full instead of reading the whole script
+        assert len(produced) < 20
+
+    def test_hold_slot_releases_after_script(self):
+        """Test that the lane slot and the guard are held only while the script is streaming"""
+        events = []
+
+        class Guard:
+            def acquire(self):
+                events.append(("guard", None))
+
+            def release(self, latency, failed):
+                events.append(("guard released", failed))
+
+            def cancel(self):
+                events.append(("guard cancelled", None))
+
+        class Lanes:
+            guard = Guard()
+
+            def slot(self, lane):
+                class Slot:
+                    def __enter__(self):
+                        events.append(("acquire", lane))
+
+                    def __exit__(self, *args):
+                        events.append(("release", lane))
+                return Slot()
+
+        lines = list(hold_slot(Lanes(), "interactive", _lines(2)))
+        assert len(lines) == 2
+        assert events == [("guard", None), ("acquire", "interactive"), ("release", "interactive"),
+                          ("guard released", False)]
+
+    def test_hold_slot_goes_through_guard(self, tmp_path):
+        """Test that a stream is refused by an open circuit and that its upstream errors count as failures"""
+        lanes = LaneScheduler("gemini", total=2, reserved_interactive=1, db_path=str(tmp_path / "lanes.sqlite"))
+        lanes.guard.failure_threshold = 1
+
+        def failing():
+            yield {"speaker": "Ravi", "text": "Arre yaar"}, None
+            yield None, "Network error: connection reset"
+
+        assert [error for _, error in hold_slot(lanes, "interactive", failing())] == [None, "Network error: connection reset"]
+        assert lanes.guard.state == "open"
+        lines = list(hold_slot(lanes, "interactive", _lines(2)))
+        assert len(lines) == 1 and "circuit open" in lines[0][1]
+        assert lanes.snapshot()["active"] == {}
@@ -0,0 +1,189 @@
+"""
+Unit tests for Tracer class
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+import pytest
+import config
+from telemetry import Tracer, OK
+from core_logic import ScriptGenerator, AudioEngine
+
+
+@pytest.fixture
+def tracer():
+    """A fresh process-wide tracer so instrumented code reports into it"""
+    fresh = Tracer(sink="", buckets=(0.1, 1.0), enabled=True)
+    with patch('telemetry._tracer', fresh):
+        yield fresh
+
+
+class TestTracer:
+    """Test cases for Tracer"""
+
+    def test_spans_nest_per_thread(self, tracer):
+        """Test that child spans share the trace and point at their parent"""
+        with tracer.span("script", variant="RJ") as parent:
+            with tracer.span("script.api") as child:
+                assert tracer.current() is child
+            assert tracer.current() is parent
+        assert child.trace_id == parent.trace_id
+        assert child.parent_id == parent.span_id
+        assert parent.parent_id is None
+        assert tracer.current().name == "noop"
+
+    def test_exception_marks_span_failed(self, tracer):
+        """Test that an exception escaping a span is recorded and re-raised"""
+        with pytest.raises(ValueError):
+            with tracer.span("script.parse"):
+                raise ValueError("bad json")
+        assert tracer.summary()["script.parse"]["errors"] == 1
+
+    def test_traced_records_result(self, tracer):
+        """Test that traced spans fail on an error message and measure successful results"""
+        @tracer.traced("scrape", measure=lambda content: {"characters": len(content)})
+        def scrape(content, error=None):
+            return (None, error) if error else (content, None)
+
+        assert scrape("abcdef") == ("abcdef", None)
+        scrape(None, "Page error: missing")
+        metrics = tracer.render_openmetrics()
+        assert 'wikitalks_span_duration_seconds_count{span="scrape",status="ok"} 1' in metrics
+        assert 'wikitalks_span_duration_seconds_count{span="scrape",status="error"} 1' in metrics
+        assert 'wikitalks_span_attribute_total{span="scrape",attribute="characters"} 6' in metrics
+
+    def test_openmetrics_histogram_and_collectors(self, tracer):
+        """Test cumulative buckets, flag counters and component gauges"""
+        for seconds in (0.05, 0.5, 5.0):
+            span = tracer.start("audio", cache_hit=seconds > 1)
+            span._t0 -= seconds
+            tracer.finish(span)
+        tracer.register_collector("lanes_gemini", lambda: {"total": 4, "guard": {"state": "open", "limit": 2.5}})
+        tracer.register_collector("broken", lambda: 1 / 0)
+        metrics = tracer.render_openmetrics()
+        assert 'wikitalks_span_duration_seconds_bucket{span="audio",status="ok",le="0.1"} 1' in metrics
+        assert 'wikitalks_span_duration_seconds_bucket{span="audio",status="ok",le="1.0"} 2' in metrics
+        assert 'wikitalks_span_duration_seconds_bucket{span="audio",status="ok",le="+Inf"} 3' in metrics
+        assert 'wikitalks_span_flag_total{span="audio",flag="cache_hit",value="true"} 1' in metrics
+        assert 'wikitalks_span_flag_total{span="audio",flag="cache_hit",value="false"} 2' in metrics
+        assert 'wikitalks_component{component="lanes_gemini",field="guard_limit"} 2.5' in metrics
+        assert 'wikitalks_component_state{component="lanes_gemini",field="guard_state",state="open"} 1' in metrics
+        assert metrics.endswith("# EOF\n")
+
+    def test_jsonl_file_sink(self, tmp_path):
+        """Test that each finished span is appended as one JSON line"""
+        path = tmp_path / "traces.jsonl"
+        tracer = Tracer(sink=str(path), enabled=True)
+        with tracer.span("scrape", mode="fast"):
+            with tracer.span("cache.scrape", cache_hit=False):
+                pass
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [record["name"] for record in records] == ["cache.scrape", "scrape"]
+        assert records[0]["parent_id"] == records[1]["span_id"]
+        assert records[1]["attributes"] == {"mode": "fast"}
+        assert records[1]["status"] == OK
+
+    def test_url_sink_posts_batches(self):
+        """Test that spans are POSTed as NDJSON once a batch is full and on flush"""
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                received.append(self.rfile.read(int(self.headers["Content-Length"])).decode())
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            tracer = Tracer(sink=f"http://127.0.0.1:{server.server_port}/traces", enabled=True, batch_size=2)
+            for name in ("a", "b", "c"):
+                with tracer.span(name):
+                    pass
+            tracer.flush()
+            assert len(received) == 2
+            assert [json.loads(line)["name"] for line in received[0].splitlines()] == ["a", "b"]
+            assert tracer.stats["exported"] == 3
+        finally:
+            server.shutdown()
+
+    def test_slow_url_sink_does_not_block_spans(self, monkeypatch):
+        """Test that spans are queued for a background sender and dropped once the queue is full"""
+        release = threading.Event()
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                release.wait(5)
+                received.append(self.rfile.read(int(self.headers["Content-Length"])).decode())
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        monkeypatch.setattr(config, "TELEMETRY_TRACE_QUEUE", 2)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            tracer = Tracer(sink=f"http://127.0.0.1:{server.server_port}/traces", enabled=True, batch_size=1)
+            start = time.perf_counter()
+            for name in ("a", "b", "c", "d", "e"):
+                with tracer.span(name):
+                    pass
+                time.sleep(0.05)  # lets the sender take "a" and block on its POST
+            assert time.perf_counter() - start < 1.0
+            # "a" is being sent, "b" and "c" fill the queue, "d" and "e" are dropped
+            assert tracer.stats["dropped"] == 2
+            release.set()
+            tracer.flush()
+            assert [json.loads(body)["name"] for body in received] == ["a", "b", "c"]
+            assert tracer.stats["exported"] == 3
+        finally:
+            release.set()
+            server.shutdown()
+
+    def test_disabled_tracer_records_nothing(self):
+        """Test that a disabled tracer hands out no-op spans"""
+        tracer = Tracer(sink="", enabled=False)
+        with tracer.span("scrape") as span:
+            span.set(characters=10)
+        assert tracer.summary() == {}
+        assert tracer.stats["spans"] == 0
+
+    @patch('core_logic.genai.Client')
+    def test_generate_script_stages(self, mock_client_class, tracer):
+        """Test that generate_script reports prompt, API and parse spans with token counts"""
+        mock_response = Mock()
+        mock_response.text = json.dumps([{"speaker": "Ravi", "text": "Arre yaar!"}])
+        mock_response.usage_metadata = Mock(prompt_token_count=812, candidates_token_count=64, thoughts_token_count=None)
+        mock_client_class.return_value.models.generate_content.return_value = mock_response
+
+        script, error = ScriptGenerator("test_key").generate_script("Mumbai Indians content", "RJ", 120)
+
+        assert error is None
+        assert set(tracer.summary()) == {"script", "script.prompt", "script.api", "script.parse"}
+        metrics = tracer.render_openmetrics()
+        assert 'wikitalks_span_attribute_total{span="script.api",attribute="prompt_tokens"} 812' in metrics
+        assert 'wikitalks_span_attribute_total{span="script.api",attribute="output_tokens"} 64' in metrics
+        assert 'wikitalks_span_attribute_total{span="script",attribute="lines"} 1' in metrics
+
+    @patch('core_logic.requests.post')
+    def test_audio_request_and_download(self, mock_post, tracer):
+        """Test that generate_dialogue_v3 times the request and the download separately"""
+        mock_post.return_value = Mock(status_code=200, content=b"x" * 1000)
+
+        audio_bytes, error = AudioEngine().generate_dialogue_v3([{"speaker": "Ravi", "text": "Namaste"}], "test_key")
+
+        assert error is None
+        summary = tracer.summary()
+        assert {"audio", "audio.request", "audio.download"} <= set(summary)
+        metrics = tracer.render_openmetrics()
+        assert 'wikitalks_span_attribute_total{span="audio.download",attribute="bytes"} 1000' in metrics
+        assert 'wikitalks_span_attribute_total{span="audio",attribute="characters"} 7' in metrics
@@ -0,0 +1,120 @@
+"""
+Unit tests for UpstreamGuard class
+"""
+
+import threading
+import time
+from scheduler import UpstreamGuard, LaneScheduler, is_upstream_failure, INTERACTIVE, CLOSED, OPEN, HALF_OPEN
+
+
+def _fail():
+    return None, "Network error: connection reset"
+
+
+def _succeed():
+    return b"audio", None
+
+
+class TestUpstreamGuard:
+    """Test cases for UpstreamGuard"""
+
+    def test_classifies_upstream_failures(self):
+        """Test that only upstream errors count against the upstream"""
+        assert is_upstream_failure("ElevenLabs API error: 503 - overloaded")
+        assert is_upstream_failure("ElevenLabs API error: 429 - too many requests")
+        assert is_upstream_failure("Network error: Read timed out")
+        assert not is_upstream_failure("ElevenLabs API error: 401 - invalid key")
+        assert not is_upstream_failure("Voice ID not found for speaker: Ravi")
+        assert not is_upstream_failure(None)
+        # Wrapped Gemini client errors count only for a 429, a 5xx or a network failure
+        assert is_upstream_failure("Error generating script: 503 UNAVAILABLE. {'error': {'code': 503}}")
+        assert is_upstream_failure("Error generating script: 429 RESOURCE_EXHAUSTED. {'error': {'code': 429}}")
+        assert is_upstream_failure("Error generating script: The read operation timed out")
+        assert not is_upstream_failure("Error generating script: 401 UNAUTHENTICATED. {'error': {'code': 401}}")
+        assert not is_upstream_failure("Error generating script: 403 PERMISSION_DENIED. {'error': {'code': 403}}")
+        assert not is_upstream_failure("Error generating audio: 'NoneType' object is not subscriptable")
+        # Waiting for our own quota, slots and keys says nothing about the upstream
+        assert not is_upstream_failure("Timed out waiting for an ElevenLabs slot")
+        assert not is_upstream_failure("Timed out waiting for a gemini slot (interactive lane)")
+        assert not is_upstream_failure("Insufficient ElevenLabs quota: job needs 500 characters, 20 remaining")
+        assert not is_upstream_failure("Rate limit: no gemini key has budget for 1 units")
+
+    def test_aimd_limit(self):
+        """Test multiplicative decrease on failure and additive increase on success"""
+        guard = UpstreamGuard("elevenlabs", max_limit=8, failure_threshold=100)
+        guard.run(_fail)
+        assert guard.limit == 4
+        guard.run(_fail)
+        assert guard.limit == 2
+        for _ in range(10):
+            guard.run(_succeed)
+        assert 2 < guard.limit <= 8
+
+    def test_slow_success_counts_as_congestion(self):
+        """Test that calls slower than the latency target shrink the limit"""
+        guard = UpstreamGuard("gemini", max_limit=4, latency_target=0.01)
+        guard.run(lambda: (time.sleep(0.02), None))
+        assert guard.limit == 2
+        assert guard.stats["slow"] == 1
+        assert guard.state == CLOSED
+
+    def test_concurrent_failures_halve_once(self):
+        """Test that failures of calls in flight together decrease the limit only once"""
+        guard = UpstreamGuard("gemini", max_limit=8, failure_threshold=100)
+        for _ in range(4):
+            assert guard.acquire(timeout=0) is None
+        for _ in range(4):
+            guard.release(0.5, failed=True)
+        assert guard.limit == 4
+
+    def test_limit_caps_concurrency(self):
+        """Test that acquire waits once the current limit is reached"""
+        guard = UpstreamGuard("gemini", max_limit=2)
+        assert guard.acquire(timeout=0) is None
+        assert guard.acquire(timeout=0) is None
+        error = guard.acquire(timeout=0.05)
+        assert "Timed out" in error
+
+        threading.Timer(0.05, lambda: guard.release(0.01, failed=False)).start()
+        assert guard.acquire(timeout=1) is None
+
+    def test_circuit_opens_and_recovers(self):
+        """Test fail-fast while open and a single probe in half-open state"""
+        guard = UpstreamGuard("elevenlabs", max_limit=4, failure_threshold=3, open_seconds=0.1)
+        for _ in range(3):
+            guard.run(_fail)
+        assert guard.state == OPEN
+
+        calls = []
+        audio, error = guard.run(lambda: calls.append(1) or _succeed())
+        assert audio is None
+        assert "circuit open" in error
+        assert calls == []
+
+        time.sleep(0.15)
+        assert guard.snapshot()["state"] == HALF_OPEN
+        assert guard.acquire(timeout=0) is None  # the probe
+        assert "Timed out" in guard.acquire(timeout=0)
+        guard.release(0.01, failed=False)
+        assert guard.state == CLOSED
+        assert guard.stats["opened"] == 1
+
+    def test_failed_probe_reopens(self):
+        """Test that a failed probe re-opens the circuit"""
+        guard = UpstreamGuard("gemini", max_limit=2, failure_threshold=1, open_seconds=0.05)
+        guard.run(_fail)
+        time.sleep(0.08)
+        guard.run(_fail)
+        assert guard.state == OPEN
+        assert guard.stats["opened"] == 2
+
+    def test_lane_scheduler_reports_guard(self, tmp_path):
+        """Test that lane runs feed the guard and expose its state"""
+        lanes = LaneScheduler("elevenlabs", total=2, reserved_interactive=0, db_path=str(tmp_path / "s.sqlite"))
+        lanes.guard.failure_threshold = 2
+        lanes.run(INTERACTIVE, _fail)
+        lanes.run(INTERACTIVE, _fail)
+        assert lanes.snapshot()["guard"]["state"] == OPEN
+        audio, error = lanes.run(INTERACTIVE, _succeed)
+        assert "circuit open" in error
+        assert lanes.snapshot()["active"] == {}
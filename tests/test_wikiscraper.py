@@ -146,3 +146,17 @@ class TestWikiScraper:
         # Should be capped at 200 words
         assert len(words) <= 200
 
+    
+    def test_custom_api_url(self):
+        """Test that a custom API URL is used, and refused by a wikipedia-api without the URL hook"""
+        scraper = WikiScraper(api_url="http://127.0.0.1:9/w/api.php")
+        assert scraper.wiki._build_url("en") == "http://127.0.0.1:9/w/api.php"
+        
+        class OldWikipedia:
+            def __init__(self, **kwargs):
+                pass
+        
+        with patch('core_logic.wikipediaapi.Wikipedia', OldWikipedia):
+            with pytest.raises(RuntimeError, match="custom API URL"):
+                WikiScraper(api_url="http://127.0.0.1:9/w/api.php")
+            assert WikiScraper().wiki is not None